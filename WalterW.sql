@@ -84,12 +84,18 @@ CREATE TABLE Medicamentos (
     ubicacion         VARCHAR2(50), -- Es opcional (NULL permitido)
     descripcion       VARCHAR2(500), -- Es opcional (NULL permitido)
     estado            VARCHAR2(10) DEFAULT 'Activo' NOT NULL,
+    -- Último cambio de stock, precio de venta o estado (trg_version_medicamento); feed /api/medicamentos/cambios
+    version_cambio    NUMBER(19) DEFAULT 0 NOT NULL,
+    fecha_cambio      DATE DEFAULT SYSDATE NOT NULL,
     CONSTRAINT pk_medicamentos PRIMARY KEY (id_medicamento),
     CONSTRAINT fk_medicamentos_cat FOREIGN KEY (id_categoria) REFERENCES Categorias(id_categoria),
     CONSTRAINT fk_medicamentos_prov FOREIGN KEY (id_proveedor) REFERENCES Proveedores(id_proveedor),
     CONSTRAINT chk_medicamentos_stock CHECK (stock >= 0)
 );
 
+-- Numera los cambios de Medicamentos en el orden en que ocurren
+CREATE SEQUENCE seq_cambios_medicamentos;
+
 -- 2.4. Ventas y Auditoría
 CREATE TABLE Ventas (
     id_venta          NUMBER(10) GENERATED BY DEFAULT AS IDENTITY NOT NULL,
@@ -118,12 +124,154 @@ CREATE TABLE Auditoria_Medicamentos (
     id_auditoria      NUMBER(10) GENERATED BY DEFAULT AS IDENTITY NOT NULL,
     id_medicamento_afectado NUMBER(10),
     nombre_medicamento  VARCHAR2(100),
+    tipo_accion         VARCHAR2(30),
     accion_realizada    VARCHAR2(2000),
     usuario_db          VARCHAR2(50),
     fecha_accion        TIMESTAMP DEFAULT SYSTIMESTAMP,
     CONSTRAINT pk_auditoria PRIMARY KEY (id_auditoria)
 );
 
+-- Cola de salida de auditoría: los triggers solo agregan aquí (sin índices secundarios)
+-- y pkg_gestion_farmacia.p_drenar_auditoria la traslada por lotes a Auditoria_Medicamentos
+CREATE TABLE Auditoria_Pendiente (
+    id_pendiente      NUMBER(10) GENERATED BY DEFAULT AS IDENTITY NOT NULL,
+    id_medicamento_afectado NUMBER(10),
+    nombre_medicamento  VARCHAR2(100),
+    tipo_accion         VARCHAR2(30),
+    accion_realizada    VARCHAR2(2000),
+    usuario_db          VARCHAR2(50),
+    fecha_accion        TIMESTAMP DEFAULT SYSTIMESTAMP,
+    CONSTRAINT pk_auditoria_pendiente PRIMARY KEY (id_pendiente)
+);
+
+-- Claves Idempotency-Key de POST /api/ventas: un reintento con la misma clave devuelve la
+-- venta ya registrada en vez de registrarla otra vez (se depuran después de VENTAS_IDEMPOTENCIA_HORAS)
+CREATE TABLE Ventas_Idempotencia (
+    clave             VARCHAR2(100) NOT NULL,
+    huella            VARCHAR2(64) NOT NULL,
+    id_venta          NUMBER(10),
+    fecha_registro    DATE DEFAULT SYSDATE NOT NULL,
+    CONSTRAINT pk_ventas_idempotencia PRIMARY KEY (clave)
+);
+
+-- 2.5. Resúmenes diarios de ventas (mantenidos por triggers en la misma transacción de la venta)
+CREATE TABLE Resumen_Ventas_Empleado (
+    dia               DATE NOT NULL,
+    dni_empleado      VARCHAR2(15) NOT NULL,
+    num_ventas        NUMBER(10) DEFAULT 0 NOT NULL,
+    total_dinero      NUMBER(14, 2) DEFAULT 0 NOT NULL,
+    CONSTRAINT pk_resumen_vta_emp PRIMARY KEY (dia, dni_empleado)
+);
+
+CREATE TABLE Resumen_Ventas_Cliente (
+    dia               DATE NOT NULL,
+    dni_cliente       VARCHAR2(15) NOT NULL,
+    num_compras       NUMBER(10) DEFAULT 0 NOT NULL,
+    total_gastado     NUMBER(14, 2) DEFAULT 0 NOT NULL,
+    CONSTRAINT pk_resumen_vta_cli PRIMARY KEY (dia, dni_cliente)
+);
+
+CREATE TABLE Resumen_Ventas_Medicamento (
+    dia               DATE NOT NULL,
+    id_medicamento    NUMBER(10) NOT NULL,
+    unidades          NUMBER(10) DEFAULT 0 NOT NULL,
+    importe           NUMBER(14, 2) DEFAULT 0 NOT NULL,
+    CONSTRAINT pk_resumen_vta_med PRIMARY KEY (dia, id_medicamento)
+);
+
+-- 2.6. Índices secundarios
+CREATE INDEX idx_venta_detalle_venta ON Venta_Detalle (id_venta);
+CREATE INDEX idx_venta_detalle_med ON Venta_Detalle (id_medicamento);
+CREATE INDEX idx_ventas_fecha ON Ventas (fecha_venta, id_venta);
+CREATE INDEX idx_ventas_cliente ON Ventas (dni_cliente);
+CREATE INDEX idx_ventas_empleado ON Ventas (dni_empleado);
+CREATE INDEX idx_medicamentos_estado_stock ON Medicamentos (estado, stock);
+CREATE INDEX idx_medicamentos_vencimiento ON Medicamentos (fecha_vencimiento);
+-- Único: el lote duplicado lo rechaza el índice (ORA-00001), también entre cargas concurrentes
+CREATE UNIQUE INDEX idx_medicamentos_lote_nombre ON Medicamentos (lote, nombre);
+CREATE INDEX idx_medicamentos_nombre ON Medicamentos (nombre, id_medicamento);
+CREATE INDEX idx_medicamentos_nombre_upper ON Medicamentos (UPPER(nombre), id_medicamento);
+CREATE INDEX idx_medicamentos_categoria ON Medicamentos (id_categoria);
+CREATE INDEX idx_medicamentos_proveedor ON Medicamentos (id_proveedor);
+CREATE INDEX idx_medicamentos_version ON Medicamentos (version_cambio);
+CREATE INDEX idx_ventas_idempotencia_fecha ON Ventas_Idempotencia (fecha_registro);
+CREATE INDEX idx_auditoria_fecha ON Auditoria_Medicamentos (fecha_accion, id_auditoria);
+CREATE INDEX idx_auditoria_medicamento ON Auditoria_Medicamentos (id_medicamento_afectado, fecha_accion);
+CREATE INDEX idx_auditoria_tipo ON Auditoria_Medicamentos (tipo_accion, fecha_accion);
+
+-- 2.7. Importación masiva (/api/medicamentos/importar)
+-- Inserta por lotes (executemany con batcherrors). El lote duplicado lo rechaza
+-- idx_medicamentos_lote_nombre fila por fila; la API traduce ese ORA-00001 al mensaje de ORA-20006.
+
+-- 2.8. Archivo histórico (tablas frías)
+-- pkg_gestion_farmacia.p_archivar_ventas / p_archivar_auditoria trasladan por lotes a estas
+-- tablas las filas anteriores al corte de cada tabla (inicio del mes de hace ARCHIVO_RETENCION_DIAS).
+-- Archivo_Corte guarda dos marcas: `corte` es la que usan las consultas (un rango anterior a ella
+-- también lee la tabla histórica) y `corte_firme` la que limita el traslado. Un corte nuevo pasa
+-- a firme recién ARCHIVO_MARGEN segundos después, cuando ningún proceso sigue usando el anterior.
+CREATE TABLE Ventas_Historico (
+    id_venta          NUMBER(10) NOT NULL,
+    dni_cliente       VARCHAR2(15) NOT NULL,
+    dni_empleado      VARCHAR2(15) NOT NULL,
+    fecha_venta       TIMESTAMP NOT NULL,
+    total_venta       NUMBER(10, 2),
+    CONSTRAINT pk_ventas_historico PRIMARY KEY (id_venta)
+);
+
+CREATE TABLE Venta_Detalle_Historico (
+    id_detalle        NUMBER(10) NOT NULL,
+    id_venta          NUMBER(10) NOT NULL,
+    id_medicamento    NUMBER(10) NOT NULL,
+    cantidad          NUMBER(4) NOT NULL,
+    precio_unitario_venta NUMBER(10, 2) NOT NULL,
+    subtotal          NUMBER(14, 2),
+    CONSTRAINT pk_venta_detalle_historico PRIMARY KEY (id_detalle)
+);
+
+CREATE TABLE Auditoria_Historico (
+    id_auditoria      NUMBER(10) NOT NULL,
+    id_medicamento_afectado NUMBER(10),
+    nombre_medicamento  VARCHAR2(100),
+    tipo_accion         VARCHAR2(30),
+    accion_realizada    VARCHAR2(2000),
+    usuario_db          VARCHAR2(50),
+    fecha_accion        TIMESTAMP,
+    CONSTRAINT pk_auditoria_historico PRIMARY KEY (id_auditoria)
+);
+
+CREATE TABLE Archivo_Corte (
+    tabla             VARCHAR2(30) NOT NULL,
+    corte             DATE NOT NULL,
+    corte_firme       DATE NOT NULL,
+    fecha_cambio      DATE DEFAULT SYSDATE NOT NULL,
+    CONSTRAINT pk_archivo_corte PRIMARY KEY (tabla)
+);
+
+INSERT INTO Archivo_Corte (tabla, corte, corte_firme) VALUES ('VENTAS', DATE '1900-01-01', DATE '1900-01-01');
+INSERT INTO Archivo_Corte (tabla, corte, corte_firme) VALUES ('AUDITORIA', DATE '1900-01-01', DATE '1900-01-01');
+COMMIT;
+
+CREATE INDEX idx_ventas_hist_fecha ON Ventas_Historico (fecha_venta, id_venta);
+CREATE INDEX idx_ventas_hist_cliente ON Ventas_Historico (dni_cliente);
+CREATE INDEX idx_ventas_hist_empleado ON Ventas_Historico (dni_empleado);
+CREATE INDEX idx_venta_detalle_hist_venta ON Venta_Detalle_Historico (id_venta);
+CREATE INDEX idx_auditoria_hist_fecha ON Auditoria_Historico (fecha_accion, id_auditoria);
+CREATE INDEX idx_auditoria_hist_medicamento ON Auditoria_Historico (id_medicamento_afectado, fecha_accion);
+CREATE INDEX idx_auditoria_hist_tipo ON Auditoria_Historico (tipo_accion, fecha_accion);
+
+-- 2.9. Latido de replicación (réplica de lectura, DB_DSN_LECTURA)
+-- Cada worker de la API escribe aquí la hora (segundos desde 1970, reloj de la app) en la
+-- primaria y la lee en la réplica: la diferencia es el retraso de la réplica (src/replica.py).
+CREATE TABLE Replica_Latido (
+    id                NUMBER(1) NOT NULL,
+    marca             NUMBER NOT NULL,
+    CONSTRAINT pk_replica_latido PRIMARY KEY (id),
+    CONSTRAINT ck_replica_latido_id CHECK (id = 1)
+);
+
+INSERT INTO Replica_Latido (id, marca) VALUES (1, 0);
+COMMIT;
+
 -- ==========================================================
 -- 3. TRIGGERS
 -- ==========================================================
@@ -156,10 +304,10 @@ BEGIN
     -- Calcular métricas de rentabilidad y auditar si es necesario
     v_margen_porcentaje := ROUND(((v_precio_venta - v_precio_compra) / v_precio_venta) * 100, 2);
     IF v_margen_porcentaje < 20 THEN
-        INSERT INTO Auditoria_Medicamentos (
-            id_medicamento_afectado, nombre_medicamento, accion_realizada, usuario_db, fecha_accion
+        INSERT INTO Auditoria_Pendiente (
+            id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db, fecha_accion
         ) VALUES (
-            :NEW.id_medicamento, v_nombre_med, 'VENTA_MARGEN_BAJO: ' || v_margen_porcentaje || '% | Cant: ' || :NEW.cantidad, USER, SYSTIMESTAMP
+            :NEW.id_medicamento, v_nombre_med, 'VENTA_MARGEN_BAJO', 'VENTA_MARGEN_BAJO: ' || v_margen_porcentaje || '% | Cant: ' || :NEW.cantidad, USER, SYSTIMESTAMP
         );
     END IF;
     
@@ -170,10 +318,10 @@ BEGIN
     
     -- Si el stock resultante es crítico (<=5), registrar alerta de auditoría
     IF (v_stock_actual - :NEW.cantidad) <= 5 AND (v_stock_actual - :NEW.cantidad) > 0 THEN
-        INSERT INTO Auditoria_Medicamentos (
-            id_medicamento_afectado, nombre_medicamento, accion_realizada, usuario_db, fecha_accion
+        INSERT INTO Auditoria_Pendiente (
+            id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db, fecha_accion
         ) VALUES (
-            :NEW.id_medicamento, v_nombre_med, 'ALERTA_STOCK_CRITICO: Quedan ' || (v_stock_actual - :NEW.cantidad) || ' unidades', USER, SYSTIMESTAMP
+            :NEW.id_medicamento, v_nombre_med, 'ALERTA_STOCK_CRITICO', 'ALERTA_STOCK_CRITICO: Quedan ' || (v_stock_actual - :NEW.cantidad) || ' unidades', USER, SYSTIMESTAMP
         );
     END IF;
     
@@ -191,7 +339,6 @@ CREATE OR REPLACE TRIGGER trg_validar_medicamento_completo
 BEFORE INSERT OR UPDATE ON Medicamentos FOR EACH ROW
 DECLARE
     v_dias_para_vencer NUMBER;
-    v_count_lote NUMBER;
 BEGIN
     -- No permitir cambios a registros lógicamente eliminados, a menos que se esté reactivando
     IF :OLD.estado = 'Inactivo' AND :NEW.estado = 'Inactivo' THEN
@@ -225,20 +372,8 @@ BEGIN
             'Margen de ganancia muy bajo (menor al 10%). Ajuste los precios.');
     END IF;
     
-    -- 5. Validar duplicado de lote
-    IF INSERTING THEN
-        SELECT COUNT(*) INTO v_count_lote
-        FROM Medicamentos
-        WHERE lote = :NEW.lote 
-          AND nombre = :NEW.nombre
-          AND id_medicamento != NVL(:NEW.id_medicamento, -1);
-        
-        IF v_count_lote > 0 THEN
-            RAISE_APPLICATION_ERROR(-20006, 
-                'Ya existe un medicamento con el lote ' || :NEW.lote || 
-                '. Use un lote diferente o verifique si es reposición.');
-        END IF;
-    END IF;
+    -- 5. El duplicado de lote y nombre lo rechaza idx_medicamentos_lote_nombre (UNIQUE):
+    --    una consulta aquí no ve las filas de otras transacciones ni sirve en un INSERT por arreglos
     
     -- 6. GESTIÓN DE ESTADO CENTRALIZADA
     -- Solo se gestiona el estado si no está siendo marcado como 'Inactivo' manualmente.
@@ -314,16 +449,18 @@ BEGIN
         
     END IF;
 
-    -- Insertar el registro de auditoría
-    INSERT INTO Auditoria_Medicamentos (
+    -- Encolar el registro de auditoría (se traslada a Auditoria_Medicamentos por lotes)
+    INSERT INTO Auditoria_Pendiente (
         id_medicamento_afectado,
         nombre_medicamento,
+        tipo_accion,
         accion_realizada,
         usuario_db,
         fecha_accion
     ) VALUES (
         NVL(:NEW.id_medicamento, :OLD.id_medicamento), -- Usar NEW para INSERT/UPDATE, OLD para DELETE
         NVL(:NEW.nombre, :OLD.nombre),
+        v_accion,
         v_accion || ' - ' || v_detalles,
         USER,
         SYSTIMESTAMP
@@ -337,6 +474,82 @@ END;
 /
 
 
+-- 3.4.
+
+CREATE OR REPLACE TRIGGER trg_resumen_ventas
+AFTER INSERT ON Ventas FOR EACH ROW
+BEGIN
+    -- Si otra venta del mismo día inserta la fila entre el ON y el INSERT del MERGE, este
+    -- falla con DUP_VAL_ON_INDEX: la fila ya existe y basta con sumarle la venta
+    BEGIN
+        MERGE INTO Resumen_Ventas_Empleado r
+        USING (SELECT TRUNC(:NEW.fecha_venta) AS dia, :NEW.dni_empleado AS dni FROM dual) s
+        ON (r.dia = s.dia AND r.dni_empleado = s.dni)
+        WHEN MATCHED THEN UPDATE SET num_ventas = num_ventas + 1, total_dinero = total_dinero + NVL(:NEW.total_venta, 0)
+        WHEN NOT MATCHED THEN INSERT (dia, dni_empleado, num_ventas, total_dinero) VALUES (s.dia, s.dni, 1, NVL(:NEW.total_venta, 0));
+    EXCEPTION
+        WHEN DUP_VAL_ON_INDEX THEN
+            UPDATE Resumen_Ventas_Empleado
+            SET num_ventas = num_ventas + 1, total_dinero = total_dinero + NVL(:NEW.total_venta, 0)
+            WHERE dia = TRUNC(:NEW.fecha_venta) AND dni_empleado = :NEW.dni_empleado;
+    END;
+
+    BEGIN
+        MERGE INTO Resumen_Ventas_Cliente r
+        USING (SELECT TRUNC(:NEW.fecha_venta) AS dia, :NEW.dni_cliente AS dni FROM dual) s
+        ON (r.dia = s.dia AND r.dni_cliente = s.dni)
+        WHEN MATCHED THEN UPDATE SET num_compras = num_compras + 1, total_gastado = total_gastado + NVL(:NEW.total_venta, 0)
+        WHEN NOT MATCHED THEN INSERT (dia, dni_cliente, num_compras, total_gastado) VALUES (s.dia, s.dni, 1, NVL(:NEW.total_venta, 0));
+    EXCEPTION
+        WHEN DUP_VAL_ON_INDEX THEN
+            UPDATE Resumen_Ventas_Cliente
+            SET num_compras = num_compras + 1, total_gastado = total_gastado + NVL(:NEW.total_venta, 0)
+            WHERE dia = TRUNC(:NEW.fecha_venta) AND dni_cliente = :NEW.dni_cliente;
+    END;
+END;
+/
+
+-- 3.5.
+
+CREATE OR REPLACE TRIGGER trg_resumen_venta_detalle
+AFTER INSERT ON Venta_Detalle FOR EACH ROW
+DECLARE
+    v_dia DATE;
+BEGIN
+    SELECT TRUNC(fecha_venta) INTO v_dia FROM Ventas WHERE id_venta = :NEW.id_venta;
+
+    MERGE INTO Resumen_Ventas_Medicamento r
+    USING (SELECT v_dia AS dia, :NEW.id_medicamento AS id_med FROM dual) s
+    ON (r.dia = s.dia AND r.id_medicamento = s.id_med)
+    WHEN MATCHED THEN UPDATE SET unidades = unidades + :NEW.cantidad, importe = importe + :NEW.cantidad * :NEW.precio_unitario_venta
+    WHEN NOT MATCHED THEN INSERT (dia, id_medicamento, unidades, importe) VALUES (s.dia, s.id_med, :NEW.cantidad, :NEW.cantidad * :NEW.precio_unitario_venta);
+EXCEPTION
+    -- Primera venta del día del medicamento en dos cajas a la vez (ver trg_resumen_ventas)
+    WHEN DUP_VAL_ON_INDEX THEN
+        UPDATE Resumen_Ventas_Medicamento
+        SET unidades = unidades + :NEW.cantidad, importe = importe + :NEW.cantidad * :NEW.precio_unitario_venta
+        WHERE dia = v_dia AND id_medicamento = :NEW.id_medicamento;
+END;
+/
+
+-- 3.6.
+
+-- Marca con un número de secuencia cada alta y cada cambio de stock, precio de venta o estado
+-- (incluidos los descuentos de trg_control_stock_inteligente). Corre después de la gestión de
+-- estado de trg_validar_medicamento_completo para ver el estado definitivo.
+CREATE OR REPLACE TRIGGER trg_version_medicamento
+BEFORE INSERT OR UPDATE OF stock, precio_venta, estado ON Medicamentos FOR EACH ROW
+FOLLOWS trg_validar_medicamento_completo
+BEGIN
+    IF INSERTING OR :OLD.stock != :NEW.stock OR :OLD.precio_venta != :NEW.precio_venta
+       OR :OLD.estado != :NEW.estado THEN
+        :NEW.version_cambio := seq_cambios_medicamentos.NEXTVAL;
+        :NEW.fecha_cambio := SYSDATE;
+    END IF;
+END;
+/
+
+
 -- ==========================================================
 -- 4. DATOS INICIALES
 -- ==========================================================
@@ -522,6 +735,36 @@ CREATE OR REPLACE PACKAGE pkg_gestion_farmacia AS
         p_dni_cliente IN VARCHAR2, p_nombre_cli IN VARCHAR2, p_ape_pat_cli IN VARCHAR2, p_ape_mat_cli IN VARCHAR2,
         p_dni_empleado IN VARCHAR2, p_total_venta IN NUMBER, p_id_venta_generada OUT NUMBER
     );
+
+    -- Venta completa en una sola llamada: las líneas llegan como arreglos paralelos.
+    -- Con p_clave_idempotencia, una clave ya usada devuelve esa venta con p_repetida = 1.
+    -- p_espera_bloqueo: segundos máximos esperando un medicamento bloqueado por otra venta (ORA-30006)
+    TYPE t_numeros IS TABLE OF NUMBER INDEX BY PLS_INTEGER;
+
+    PROCEDURE p_registrar_venta_completa (
+        p_dni_cliente IN VARCHAR2, p_nombre_cli IN VARCHAR2, p_ape_pat_cli IN VARCHAR2, p_ape_mat_cli IN VARCHAR2,
+        p_dni_empleado IN VARCHAR2, p_total_venta IN NUMBER,
+        p_ids_medicamento IN t_numeros, p_cantidades IN t_numeros, p_precios IN t_numeros,
+        p_id_venta_generada OUT NUMBER, p_linea_error OUT NUMBER, p_mensaje_error OUT VARCHAR2,
+        p_repetida OUT NUMBER, p_clave_idempotencia IN VARCHAR2 DEFAULT NULL, p_huella IN VARCHAR2 DEFAULT NULL,
+        p_espera_bloqueo IN NUMBER DEFAULT 5
+    );
+
+    -- Recalcula los resúmenes diarios de ventas desde p_desde (NULL = todo el historial)
+    PROCEDURE p_reconstruir_resumenes_ventas (p_desde IN DATE DEFAULT NULL);
+
+    -- Traslada hasta p_lote eventos de Auditoria_Pendiente a Auditoria_Medicamentos
+    PROCEDURE p_drenar_auditoria (p_lote IN NUMBER, p_movidos OUT NUMBER);
+
+    -- Borra las claves de idempotencia de más de p_horas horas
+    PROCEDURE p_purgar_idempotencia (p_horas IN NUMBER, p_borrados OUT NUMBER);
+
+    -- Archivo histórico: trasladan hasta p_lote ventas (con su detalle) o eventos de auditoría
+    -- anteriores al corte firme a las tablas *_Historico y avanzan el corte al inicio del mes de
+    -- hace p_dias días. Cada lote se confirma por separado: si se interrumpe, la siguiente
+    -- llamada continúa donde quedó.
+    PROCEDURE p_archivar_ventas (p_dias IN NUMBER, p_margen IN NUMBER, p_lote IN NUMBER, p_movidos OUT NUMBER);
+    PROCEDURE p_archivar_auditoria (p_dias IN NUMBER, p_margen IN NUMBER, p_lote IN NUMBER, p_movidos OUT NUMBER);
 END pkg_gestion_farmacia;
 /
 
@@ -593,6 +836,215 @@ CREATE OR REPLACE PACKAGE BODY pkg_gestion_farmacia AS
         INSERT INTO Clientes (dni) SELECT p_dni_cliente FROM DUAL WHERE NOT EXISTS (SELECT 1 FROM Clientes WHERE dni = p_dni_cliente);
         INSERT INTO Ventas (dni_cliente, dni_empleado, total_venta) VALUES (p_dni_cliente, p_dni_empleado, p_total_venta) RETURNING id_venta INTO p_id_venta_generada;
     END;
+
+    PROCEDURE p_registrar_venta_completa (
+        p_dni_cliente IN VARCHAR2, p_nombre_cli IN VARCHAR2, p_ape_pat_cli IN VARCHAR2, p_ape_mat_cli IN VARCHAR2,
+        p_dni_empleado IN VARCHAR2, p_total_venta IN NUMBER,
+        p_ids_medicamento IN t_numeros, p_cantidades IN t_numeros, p_precios IN t_numeros,
+        p_id_venta_generada OUT NUMBER, p_linea_error OUT NUMBER, p_mensaje_error OUT VARCHAR2,
+        p_repetida OUT NUMBER, p_clave_idempotencia IN VARCHAR2 DEFAULT NULL, p_huella IN VARCHAR2 DEFAULT NULL,
+        p_espera_bloqueo IN NUMBER DEFAULT 5
+    ) AS
+        TYPE t_conjunto IS TABLE OF BOOLEAN INDEX BY PLS_INTEGER;
+        v_linea PLS_INTEGER := 0;
+        v_orden t_conjunto;
+        v_id PLS_INTEGER;
+        v_bloqueado NUMBER;
+        v_huella_previa VARCHAR2(64);
+    BEGIN
+        p_repetida := 0;
+        SAVEPOINT sp_venta_completa;
+
+        -- La clave se inserta primero: un reintento concurrente con la misma clave espera en el
+        -- índice único a que esta transacción termine y luego encuentra la venta confirmada
+        IF p_clave_idempotencia IS NOT NULL THEN
+            BEGIN
+                INSERT INTO Ventas_Idempotencia (clave, huella) VALUES (p_clave_idempotencia, p_huella);
+            EXCEPTION
+                WHEN DUP_VAL_ON_INDEX THEN
+                    SELECT id_venta, huella INTO p_id_venta_generada, v_huella_previa
+                    FROM Ventas_Idempotencia WHERE clave = p_clave_idempotencia;
+                    IF v_huella_previa != p_huella THEN
+                        RAISE_APPLICATION_ERROR(-20020, 'La clave de idempotencia ya se usó con otra venta');
+                    END IF;
+                    p_repetida := 1;
+                    RETURN;
+            END;
+        END IF;
+
+        -- Bloqueo de los medicamentos en orden de id (las claves de v_orden se recorren ordenadas):
+        -- dos ventas con productos en común hacen fila en el primero que comparten en vez de
+        -- bloquearse en cruz (ORA-00060) al descontar stock línea por línea
+        FOR i IN 1 .. p_ids_medicamento.COUNT LOOP
+            v_orden(p_ids_medicamento(i)) := TRUE;
+        END LOOP;
+        v_id := v_orden.FIRST;
+        WHILE v_id IS NOT NULL LOOP
+            BEGIN
+                EXECUTE IMMEDIATE 'SELECT id_medicamento FROM Medicamentos WHERE id_medicamento = :id FOR UPDATE WAIT '
+                    || TO_CHAR(TRUNC(p_espera_bloqueo)) INTO v_bloqueado USING v_id;
+            EXCEPTION
+                -- El detalle informa el medicamento inexistente con su número de línea
+                WHEN NO_DATA_FOUND THEN NULL;
+            END;
+            v_id := v_orden.NEXT(v_id);
+        END LOOP;
+
+        p_registrar_venta_con_cliente(p_dni_cliente, p_nombre_cli, p_ape_pat_cli, p_ape_mat_cli,
+                                      p_dni_empleado, p_total_venta, p_id_venta_generada);
+        IF p_clave_idempotencia IS NOT NULL THEN
+            UPDATE Ventas_Idempotencia SET id_venta = p_id_venta_generada WHERE clave = p_clave_idempotencia;
+        END IF;
+
+        -- Cada INSERT sigue disparando trg_control_stock_inteligente (validación de stock y auditoría)
+        FOR i IN 1 .. p_ids_medicamento.COUNT LOOP
+            v_linea := i;
+            INSERT INTO Venta_Detalle (id_venta, id_medicamento, cantidad, precio_unitario_venta)
+            VALUES (p_id_venta_generada, p_ids_medicamento(i), p_cantidades(i), p_precios(i));
+        END LOOP;
+    EXCEPTION
+        WHEN OTHERS THEN
+            -- Se deshace la venta completa y se informa qué línea falló (0 = cabecera)
+            ROLLBACK TO sp_venta_completa;
+            p_id_venta_generada := NULL;
+            p_linea_error := v_linea;
+            p_mensaje_error := SQLERRM;
+    END;
+
+    PROCEDURE p_reconstruir_resumenes_ventas (p_desde IN DATE DEFAULT NULL) AS
+        v_desde DATE := NVL(TRUNC(p_desde), DATE '1900-01-01');
+    BEGIN
+        DELETE FROM Resumen_Ventas_Empleado WHERE dia >= v_desde;
+        DELETE FROM Resumen_Ventas_Cliente WHERE dia >= v_desde;
+        DELETE FROM Resumen_Ventas_Medicamento WHERE dia >= v_desde;
+
+        -- Las ventas archivadas del rango se leen de las tablas históricas (rango vacío si
+        -- v_desde es posterior al corte)
+        INSERT INTO Resumen_Ventas_Empleado (dia, dni_empleado, num_ventas, total_dinero)
+        SELECT TRUNC(fecha_venta), dni_empleado, COUNT(*), NVL(SUM(total_venta), 0)
+        FROM (SELECT fecha_venta, dni_empleado, total_venta FROM Ventas WHERE fecha_venta >= v_desde
+              UNION ALL
+              SELECT fecha_venta, dni_empleado, total_venta FROM Ventas_Historico WHERE fecha_venta >= v_desde)
+        GROUP BY TRUNC(fecha_venta), dni_empleado;
+
+        INSERT INTO Resumen_Ventas_Cliente (dia, dni_cliente, num_compras, total_gastado)
+        SELECT TRUNC(fecha_venta), dni_cliente, COUNT(*), NVL(SUM(total_venta), 0)
+        FROM (SELECT fecha_venta, dni_cliente, total_venta FROM Ventas WHERE fecha_venta >= v_desde
+              UNION ALL
+              SELECT fecha_venta, dni_cliente, total_venta FROM Ventas_Historico WHERE fecha_venta >= v_desde)
+        GROUP BY TRUNC(fecha_venta), dni_cliente;
+
+        INSERT INTO Resumen_Ventas_Medicamento (dia, id_medicamento, unidades, importe)
+        SELECT TRUNC(fecha_venta), id_medicamento, SUM(cantidad), SUM(subtotal)
+        FROM (SELECT v.fecha_venta, d.id_medicamento, d.cantidad, d.subtotal
+              FROM Venta_Detalle d JOIN Ventas v ON d.id_venta = v.id_venta
+              WHERE v.fecha_venta >= v_desde
+              UNION ALL
+              SELECT v.fecha_venta, d.id_medicamento, d.cantidad, d.subtotal
+              FROM Venta_Detalle_Historico d JOIN Ventas_Historico v ON d.id_venta = v.id_venta
+              WHERE v.fecha_venta >= v_desde)
+        GROUP BY TRUNC(fecha_venta), id_medicamento;
+        COMMIT;
+    END;
+
+    PROCEDURE p_drenar_auditoria (p_lote IN NUMBER, p_movidos OUT NUMBER) AS
+        v_ids t_numeros;
+    BEGIN
+        -- SKIP LOCKED permite que varios procesos drenen a la vez sin bloquearse
+        SELECT id_pendiente BULK COLLECT INTO v_ids
+        FROM Auditoria_Pendiente
+        WHERE ROWNUM <= p_lote
+        FOR UPDATE SKIP LOCKED;
+
+        FORALL i IN 1 .. v_ids.COUNT
+            INSERT INTO Auditoria_Medicamentos (id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db, fecha_accion)
+            SELECT id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db, fecha_accion
+            FROM Auditoria_Pendiente WHERE id_pendiente = v_ids(i);
+
+        FORALL i IN 1 .. v_ids.COUNT
+            DELETE FROM Auditoria_Pendiente WHERE id_pendiente = v_ids(i);
+
+        p_movidos := v_ids.COUNT;
+        COMMIT;
+    END;
+
+    PROCEDURE p_purgar_idempotencia (p_horas IN NUMBER, p_borrados OUT NUMBER) AS
+    BEGIN
+        DELETE FROM Ventas_Idempotencia WHERE fecha_registro < SYSDATE - p_horas / 24;
+        p_borrados := SQL%ROWCOUNT;
+        COMMIT;
+    END;
+
+    -- Devuelve el corte firme de la tabla y, si corresponde, avanza el corte. El bloqueo de la
+    -- fila de Archivo_Corte (hasta el COMMIT del lote) evita que dos procesos archiven a la vez.
+    FUNCTION f_corte_firme (p_tabla IN VARCHAR2, p_dias IN NUMBER, p_margen IN NUMBER) RETURN DATE AS
+        v_corte       Archivo_Corte.corte%TYPE;
+        v_firme       Archivo_Corte.corte_firme%TYPE;
+        v_cambio      Archivo_Corte.fecha_cambio%TYPE;
+        v_nuevo       DATE := TRUNC(SYSDATE - p_dias, 'MM');
+    BEGIN
+        SELECT corte, corte_firme, fecha_cambio INTO v_corte, v_firme, v_cambio
+        FROM Archivo_Corte WHERE tabla = p_tabla FOR UPDATE;
+
+        IF v_firme < v_corte AND v_cambio <= SYSDATE - p_margen / 86400 THEN
+            v_firme := v_corte;
+            UPDATE Archivo_Corte SET corte_firme = v_firme WHERE tabla = p_tabla;
+        END IF;
+        IF v_firme = v_corte AND v_nuevo > v_corte THEN
+            UPDATE Archivo_Corte SET corte = v_nuevo, fecha_cambio = SYSDATE WHERE tabla = p_tabla;
+        END IF;
+        RETURN v_firme;
+    END;
+
+    PROCEDURE p_archivar_ventas (p_dias IN NUMBER, p_margen IN NUMBER, p_lote IN NUMBER, p_movidos OUT NUMBER) AS
+        v_firme DATE := f_corte_firme('VENTAS', p_dias, p_margen);
+        v_ids   t_numeros;
+    BEGIN
+        SELECT id_venta BULK COLLECT INTO v_ids
+        FROM Ventas
+        WHERE fecha_venta < v_firme AND ROWNUM <= p_lote
+        FOR UPDATE SKIP LOCKED;
+
+        FORALL i IN 1 .. v_ids.COUNT
+            INSERT INTO Ventas_Historico (id_venta, dni_cliente, dni_empleado, fecha_venta, total_venta)
+            SELECT id_venta, dni_cliente, dni_empleado, fecha_venta, total_venta
+            FROM Ventas WHERE id_venta = v_ids(i);
+
+        FORALL i IN 1 .. v_ids.COUNT
+            INSERT INTO Venta_Detalle_Historico (id_detalle, id_venta, id_medicamento, cantidad, precio_unitario_venta, subtotal)
+            SELECT id_detalle, id_venta, id_medicamento, cantidad, precio_unitario_venta, subtotal
+            FROM Venta_Detalle WHERE id_venta = v_ids(i);
+
+        FORALL i IN 1 .. v_ids.COUNT
+            DELETE FROM Venta_Detalle WHERE id_venta = v_ids(i);
+
+        FORALL i IN 1 .. v_ids.COUNT
+            DELETE FROM Ventas WHERE id_venta = v_ids(i);
+
+        p_movidos := v_ids.COUNT;
+        COMMIT;
+    END;
+
+    PROCEDURE p_archivar_auditoria (p_dias IN NUMBER, p_margen IN NUMBER, p_lote IN NUMBER, p_movidos OUT NUMBER) AS
+        v_firme DATE := f_corte_firme('AUDITORIA', p_dias, p_margen);
+        v_ids   t_numeros;
+    BEGIN
+        SELECT id_auditoria BULK COLLECT INTO v_ids
+        FROM Auditoria_Medicamentos
+        WHERE fecha_accion < v_firme AND ROWNUM <= p_lote
+        FOR UPDATE SKIP LOCKED;
+
+        FORALL i IN 1 .. v_ids.COUNT
+            INSERT INTO Auditoria_Historico (id_auditoria, id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db, fecha_accion)
+            SELECT id_auditoria, id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db, fecha_accion
+            FROM Auditoria_Medicamentos WHERE id_auditoria = v_ids(i);
+
+        FORALL i IN 1 .. v_ids.COUNT
+            DELETE FROM Auditoria_Medicamentos WHERE id_auditoria = v_ids(i);
+
+        p_movidos := v_ids.COUNT;
+        COMMIT;
+    END;
 END pkg_gestion_farmacia;
 /
 
@@ -621,16 +1073,16 @@ CREATE OR REPLACE PACKAGE pkg_reportes_farmacia AS
     PROCEDURE p_reporte_medicamentos_sin_stock (p_cursor OUT T_CURSOR);
     
     -- 7. Ventas por Empleado
-    PROCEDURE p_reporte_ventas_por_empleado (p_cursor OUT T_CURSOR);
+    PROCEDURE p_reporte_ventas_por_empleado (p_desde IN DATE, p_hasta IN DATE, p_cursor OUT T_CURSOR);
     
     -- 8. Ventas por Cliente
-    PROCEDURE p_reporte_ventas_por_cliente (p_cursor OUT T_CURSOR);
+    PROCEDURE p_reporte_ventas_por_cliente (p_desde IN DATE, p_hasta IN DATE, p_cursor OUT T_CURSOR);
     
     -- 9. Top Vendidos
-    PROCEDURE p_reporte_top_5_vendidos (p_cursor OUT T_CURSOR);
+    PROCEDURE p_reporte_top_5_vendidos (p_desde IN DATE, p_hasta IN DATE, p_cursor OUT T_CURSOR);
     
     -- 10. Ingresos Mensuales
-    PROCEDURE p_reporte_ingresos_por_mes (p_cursor OUT T_CURSOR);
+    PROCEDURE p_reporte_ingresos_por_mes (p_desde IN DATE, p_hasta IN DATE, p_cursor OUT T_CURSOR);
 
 END pkg_reportes_farmacia;
 /
@@ -698,37 +1150,44 @@ CREATE OR REPLACE PACKAGE BODY pkg_reportes_farmacia AS
             WHERE m.stock <= 0 OR m.estado = 'Agotado'; 
     END;
 
+    -- Los reportes 7 a 10 leen los resúmenes diarios; p_desde / p_hasta (inclusive) son opcionales
+
     -- 7. VENTAS POR EMPLEADO
-    PROCEDURE p_reporte_ventas_por_empleado (p_cursor OUT T_CURSOR) AS BEGIN
+    PROCEDURE p_reporte_ventas_por_empleado (p_desde IN DATE, p_hasta IN DATE, p_cursor OUT T_CURSOR) AS BEGIN
         OPEN p_cursor FOR 
-            SELECT u.nombre || ' ' || u.apellido_paterno as empleado, COUNT(v.id_venta) as total_ventas, SUM(v.total_venta) as total_dinero
-            FROM Ventas v JOIN Empleados e ON v.dni_empleado = e.dni JOIN Usuarios u ON e.dni = u.dni 
+            SELECT u.nombre || ' ' || u.apellido_paterno as empleado, SUM(r.num_ventas) as total_ventas, SUM(r.total_dinero) as total_dinero
+            FROM Resumen_Ventas_Empleado r JOIN Empleados e ON r.dni_empleado = e.dni JOIN Usuarios u ON e.dni = u.dni 
+            WHERE r.dia >= NVL(TRUNC(p_desde), DATE '1900-01-01') AND r.dia <= NVL(TRUNC(p_hasta), DATE '9999-12-31')
             GROUP BY u.nombre, u.apellido_paterno ORDER BY total_dinero DESC;
     END;
 
     -- 8. VENTAS POR CLIENTE
-    PROCEDURE p_reporte_ventas_por_cliente (p_cursor OUT T_CURSOR) AS BEGIN
+    PROCEDURE p_reporte_ventas_por_cliente (p_desde IN DATE, p_hasta IN DATE, p_cursor OUT T_CURSOR) AS BEGIN
         OPEN p_cursor FOR 
-            SELECT u.nombre || ' ' || u.apellido_paterno as cliente, COUNT(v.id_venta) as compras, SUM(v.total_venta) as gastado
-            FROM Ventas v JOIN Clientes c ON v.dni_cliente = c.dni JOIN Usuarios u ON c.dni = u.dni 
+            SELECT u.nombre || ' ' || u.apellido_paterno as cliente, SUM(r.num_compras) as compras, SUM(r.total_gastado) as gastado
+            FROM Resumen_Ventas_Cliente r JOIN Clientes c ON r.dni_cliente = c.dni JOIN Usuarios u ON c.dni = u.dni 
+            WHERE r.dia >= NVL(TRUNC(p_desde), DATE '1900-01-01') AND r.dia <= NVL(TRUNC(p_hasta), DATE '9999-12-31')
             GROUP BY u.nombre, u.apellido_paterno ORDER BY gastado DESC;
     END;
 
     -- 9. TOP 5 VENDIDOS
-    PROCEDURE p_reporte_top_5_vendidos (p_cursor OUT T_CURSOR) AS BEGIN 
+    PROCEDURE p_reporte_top_5_vendidos (p_desde IN DATE, p_hasta IN DATE, p_cursor OUT T_CURSOR) AS BEGIN 
         OPEN p_cursor FOR 
-            SELECT m.nombre, c.nombre as categoria, SUM(d.cantidad) as total_unidades
-            FROM Venta_Detalle d 
-            JOIN Medicamentos m ON d.id_medicamento = m.id_medicamento 
+            SELECT m.nombre, c.nombre as categoria, SUM(r.unidades) as total_unidades
+            FROM Resumen_Ventas_Medicamento r 
+            JOIN Medicamentos m ON r.id_medicamento = m.id_medicamento 
             JOIN Categorias c ON m.id_categoria = c.id_categoria
+            WHERE r.dia >= NVL(TRUNC(p_desde), DATE '1900-01-01') AND r.dia <= NVL(TRUNC(p_hasta), DATE '9999-12-31')
             GROUP BY m.nombre, c.nombre ORDER BY total_unidades DESC FETCH FIRST 5 ROWS ONLY; 
     END;
 
     -- 10. INGRESOS MENSUALES
-    PROCEDURE p_reporte_ingresos_por_mes (p_cursor OUT T_CURSOR) AS BEGIN 
+    PROCEDURE p_reporte_ingresos_por_mes (p_desde IN DATE, p_hasta IN DATE, p_cursor OUT T_CURSOR) AS BEGIN 
         OPEN p_cursor FOR 
-            SELECT TO_CHAR(fecha_venta, 'YYYY-MM') as mes, COUNT(id_venta) as num_ventas, SUM(total_venta) as total_ingresos
-            FROM Ventas GROUP BY TO_CHAR(fecha_venta, 'YYYY-MM') ORDER BY mes DESC; 
+            SELECT TO_CHAR(dia, 'YYYY-MM') as mes, SUM(num_ventas) as num_ventas, SUM(total_dinero) as total_ingresos
+            FROM Resumen_Ventas_Empleado
+            WHERE dia >= NVL(TRUNC(p_desde), DATE '1900-01-01') AND dia <= NVL(TRUNC(p_hasta), DATE '9999-12-31')
+            GROUP BY TO_CHAR(dia, 'YYYY-MM') ORDER BY mes DESC; 
     END;
 
 END pkg_reportes_farmacia;
@@ -0,0 +1,426 @@
+"""Prueba de carga y latencia de los blueprints (gestión, ventas y reportes).
+
+Ejecuta una mezcla de operaciones (ventas de caja, navegación del catálogo,
+reportes, resumen, historial) desde varios hilos durante un tiempo fijo y guarda
+throughput y percentiles p50/p95/p99 por endpoint en JSON (ver benchmark.comparar).
+
+    python -m benchmark.carga --duracion 30 --hilos 8 --salida base.json
+
+Backends:
+  falso   (por defecto) la app corre en proceso contra benchmark.oracledb_falso, con
+          una base SQLite sintética creada en cada corrida.
+  oracle  la app corre en proceso contra el Oracle configurado en .env (DB_*);
+          usa los datos ya cargados en esa base.
+Con --url se ignora el backend y se mide un servidor ya levantado por HTTP.
+
+Con los backends en proceso todos los hilos comparten el GIL: los números sirven
+para comparar corridas entre sí, no como capacidad absoluta del servidor.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+MEZCLA_POR_DEFECTO = "venta=25,reposicion=5,catalogo=35,reporte=10,resumen=10,historial=15"
+
+REPORTES = ['medicamentos-por-categoria', 'rentabilidad-productos', 'bajo-stock', 'medicamentos-inactivos',
+            'proximos-vencer', 'sin-stock', 'ventas-por-empleado', 'ventas-por-cliente', 'top-vendidos',
+            'ingresos-mensuales']
+FORMATOS = ['json', 'json', 'ndjson', 'csv']
+
+
+# --- Clientes: en proceso (Flask test client) o HTTP ---
+
+class ClienteLocal:
+    def __init__(self, app):
+        self._cliente = app.test_client()
+
+    def solicitar(self, metodo, ruta, cuerpo=None, cabeceras=None):
+        respuesta = self._cliente.open(ruta, method=metodo, json=cuerpo, headers=cabeceras)
+        try:
+            datos = respuesta.get_data()
+        finally:
+            # Como un servidor WSGI: close() siempre, aunque el cuerpo no se haya leído (HEAD)
+            respuesta.close()
+        return respuesta.status_code, datos
+
+
+class ClienteHttp:
+    def __init__(self, url):
+        self._url = url.rstrip('/')
+
+    def solicitar(self, metodo, ruta, cuerpo=None, cabeceras=None):
+        datos = json.dumps(cuerpo).encode('utf-8') if cuerpo is not None else None
+        cabeceras = dict(cabeceras or {})
+        if datos:
+            cabeceras['Content-Type'] = 'application/json'
+        peticion = urllib.request.Request(self._url + ruta, data=datos, method=metodo, headers=cabeceras)
+        try:
+            with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+                return respuesta.status, respuesta.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except OSError:
+            return 599, b''
+
+
+# --- Operaciones de la mezcla: cada una hace una solicitud y la registra con medir() ---
+
+def _cuerpo_venta(rnd, catalogo, medicamentos):
+    lineas = {}
+    for med in medicamentos:
+        lineas.setdefault(med['id_medicamento'], [med, 0])[1] += rnd.randint(1, 3)
+    detalles = [{"id_medicamento": id_med, "cantidad": cantidad, "precio_unitario_venta": med['precio_venta']}
+                for id_med, (med, cantidad) in lineas.items()]
+    dni = f"7{rnd.randrange(1, catalogo['clientes'] + 1):07d}"
+    return {
+        "cliente": {"dni": dni, "nombre": "Cliente", "apellido_paterno": "Benchmark", "apellido_materno": ""},
+        "dni_empleado": rnd.choice(catalogo['empleados']),
+        "total_venta": round(sum(d['cantidad'] * d['precio_unitario_venta'] for d in detalles), 2),
+        "detalles": detalles
+    }
+
+
+def op_venta(medir, rnd, catalogo, estado):
+    medicamentos = rnd.choices(catalogo['medicamentos'], weights=catalogo['pesos'], k=rnd.randint(1, 4))
+    status, datos = medir("POST /api/ventas", "POST", "/api/ventas", _cuerpo_venta(rnd, catalogo, medicamentos))
+    if status == 201:
+        estado['ventas'].append(json.loads(datos)['id_venta'])
+
+
+def op_venta_caliente(medir, rnd, catalogo, estado):
+    # Tickets de 2 a 5 líneas tomadas de los pocos productos más vendidos, en orden aleatorio:
+    # todas las cajas compiten por las mismas filas. Cada venta lleva Idempotency-Key y una de
+    # cada diez se reenvía (como un cliente que no recibió respuesta): debe volver el mismo id.
+    calientes = catalogo['calientes']
+    medicamentos = rnd.sample(calientes, min(len(calientes), rnd.randint(2, 5)))
+    cuerpo = _cuerpo_venta(rnd, catalogo, medicamentos)
+    clave = {"Idempotency-Key": f"carga-{rnd.getrandbits(64):016x}"}
+    status, datos = medir("POST /api/ventas (caliente)", "POST", "/api/ventas", cuerpo, clave)
+    if status == 201:
+        id_venta = json.loads(datos)['id_venta']
+        estado['ventas'].append(id_venta)
+        if rnd.random() < 0.1:
+            status, datos = medir("POST /api/ventas (reenvío)", "POST", "/api/ventas", cuerpo, clave)
+            if status == 201 and json.loads(datos)['id_venta'] != id_venta:
+                raise ValueError(f"El reenvío registró otra venta ({id_venta} -> {json.loads(datos)['id_venta']})")
+
+
+def op_reposicion_caliente(medir, rnd, catalogo, estado):
+    med = rnd.choice(catalogo['calientes'])
+    medir("PATCH /api/medicamentos/<id>/stock", "PATCH", f"/api/medicamentos/{med['id_medicamento']}/stock",
+          {"cantidad_agregada": rnd.randint(200, 500)})
+
+
+def op_reposicion(medir, rnd, catalogo, estado):
+    med = rnd.choices(catalogo['medicamentos'], weights=catalogo['pesos'])[0]
+    medir("PATCH /api/medicamentos/<id>/stock", "PATCH", f"/api/medicamentos/{med['id_medicamento']}/stock",
+          {"cantidad_agregada": rnd.randint(50, 200)})
+
+
+def op_catalogo(medir, rnd, catalogo, estado):
+    sorteo = rnd.random()
+    if sorteo < 0.15:
+        med = rnd.choice(catalogo['medicamentos'])
+        medir("GET /api/medicamentos/<id>", "GET", f"/api/medicamentos/{med['id_medicamento']}")
+    elif sorteo < 0.25:
+        medir("GET /api/categorias", "GET", "/api/categorias")
+    elif sorteo < 0.45:
+        prefijo = rnd.choice(catalogo['medicamentos'])['nombre'][:rnd.randint(2, 5)]
+        medir("GET /api/medicamentos?nombre", "GET", f"/api/medicamentos?estado=Activo&nombre={urllib.request.quote(prefijo)}")
+    elif sorteo < 0.70 and estado['siguiente']:
+        # Continúa la navegación del mismo hilo en la página siguiente
+        status, datos = medir("GET /api/medicamentos?siguiente", "GET", f"/api/medicamentos?siguiente={estado['siguiente']}")
+        estado['siguiente'] = json.loads(datos).get('siguiente') if status == 200 else None
+    else:
+        status, datos = medir("GET /api/medicamentos", "GET", "/api/medicamentos?limite=50")
+        estado['siguiente'] = json.loads(datos).get('siguiente') if status == 200 else None
+
+
+def op_reporte(medir, rnd, catalogo, estado):
+    nombre = rnd.choice(REPORTES)
+    formato = rnd.choice(FORMATOS)
+    if rnd.random() < 0.1:
+        # Sin cuerpo: la respuesta se cierra sin recorrer el REF CURSOR
+        medir("HEAD /api/reportes/<nombre>", "HEAD", f"/api/reportes/{nombre}?format={formato}")
+    else:
+        medir(f"GET /api/reportes/{nombre}", "GET", f"/api/reportes/{nombre}?format={formato}")
+
+
+def op_resumen(medir, rnd, catalogo, estado):
+    medir("GET /api/reportes/resumen-general", "GET", "/api/reportes/resumen-general")
+
+
+def op_edicion(medir, rnd, catalogo, estado):
+    # Carga del modal de edición: secuencial (3 solicitudes) o compuesta (1 solicitud en paralelo)
+    med = rnd.choice(catalogo['medicamentos'])
+    if rnd.random() < 0.5:
+        t0 = time.perf_counter()
+        status = max(medir("GET /api/medicamentos/<id>", "GET", f"/api/medicamentos/{med['id_medicamento']}")[0],
+                     medir("GET /api/categorias", "GET", "/api/categorias")[0],
+                     medir("GET /api/proveedores", "GET", "/api/proveedores")[0])
+        medir.registrar("EDICION secuencial (3 solicitudes)", status, t0, time.perf_counter())
+    else:
+        medir("GET /api/compuesto", "GET",
+              f"/api/compuesto?partes=medicamento,categorias,proveedores&id_medicamento={med['id_medicamento']}")
+
+
+def op_busqueda(medir, rnd, catalogo, estado):
+    # Autocompletado de la pantalla de ventas: un término de 2 a 6 letras del nombre
+    prefijo = rnd.choice(catalogo['medicamentos'])['nombre'][:rnd.randint(2, 6)]
+    medir("GET /api/medicamentos/buscar", "GET",
+          f"/api/medicamentos/buscar?q={urllib.request.quote(prefijo)}&solo_disponibles=1&limite=10")
+
+
+def op_historial(medir, rnd, catalogo, estado):
+    if estado['ventas'] and rnd.random() < 0.5:
+        medir("GET /api/ventas/<id>", "GET", f"/api/ventas/{rnd.choice(estado['ventas'][-50:])}")
+    else:
+        medir("GET /api/ventas", "GET", "/api/ventas?limite=50")
+
+
+OPERACIONES = {
+    "venta": op_venta,
+    "venta_caliente": op_venta_caliente,
+    "reposicion_caliente": op_reposicion_caliente,
+    "reposicion": op_reposicion,
+    "catalogo": op_catalogo,
+    "reporte": op_reporte,
+    "resumen": op_resumen,
+    "historial": op_historial,
+    "edicion": op_edicion,
+    "busqueda": op_busqueda,
+}
+
+
+def leer_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        nombre = nombre.strip()
+        if nombre not in OPERACIONES:
+            raise argparse.ArgumentTypeError(f"Operación desconocida '{nombre}' (opciones: {', '.join(OPERACIONES)})")
+        mezcla[nombre] = float(peso or 1)
+    return mezcla
+
+
+# --- Estadísticas ---
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+def resumir(muestras, duracion):
+    latencias = sorted(m[1] * 1000 for m in muestras)
+    errores = sum(1 for m in muestras if m[0] >= 400 and m[0] != 409)
+    return {
+        "solicitudes": len(muestras),
+        "errores": errores,
+        "rechazos_409": sum(1 for m in muestras if m[0] == 409),
+        "rps": round(len(muestras) / duracion, 2) if duracion else 0.0,
+        "p50_ms": round(percentil(latencias, 50), 3),
+        "p95_ms": round(percentil(latencias, 95), 3),
+        "p99_ms": round(percentil(latencias, 99), 3),
+        "max_ms": round(latencias[-1], 3) if latencias else 0.0,
+        "media_ms": round(sum(latencias) / len(latencias), 3) if latencias else 0.0,
+    }
+
+
+# --- Preparación ---
+
+def preparar_app(args):
+    """Configura el backend, importa main y devuelve (app, tamaños de la base)."""
+    tamanos = None
+    if args.backend == 'falso':
+        from benchmark import oracledb_falso
+        ruta = args.base or os.path.join(tempfile.mkdtemp(prefix='badbreaking-bench-'), 'farmacia.db')
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        inicio = time.perf_counter()
+        tamanos = oracledb_falso.preparar_base(ruta, medicamentos=args.medicamentos, clientes=args.clientes,
+                                               ventas=args.ventas, dias_historial=args.dias, semilla=args.semilla)
+        print(f"Base sintética en {ruta} ({time.perf_counter() - inicio:.1f}s): "
+              f"{tamanos['medicamentos']} medicamentos, {tamanos['ventas']} ventas")
+        oracledb_falso.instalar()
+        os.environ.update(DB_USER='bench', DB_PASSWORD='', DB_DSN=ruta)
+    if args.pool_max:
+        os.environ['DB_POOL_MAX'] = str(args.pool_max)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+    return main.create_app(), tamanos
+
+
+def leer_catalogo(cliente, clientes, calientes=5):
+    status, datos = cliente.solicitar("GET", "/api/medicamentos?estado=Activo&todo=1")
+    if status != 200:
+        raise SystemExit(f"No se pudo leer el catálogo (HTTP {status}): {datos[:200]!r}")
+    medicamentos = json.loads(datos)['datos']
+    status, datos = cliente.solicitar("GET", "/api/empleados")
+    if status != 200:
+        raise SystemExit(f"No se pudo leer la lista de empleados (HTTP {status})")
+    empleados = [e['dni'] for e in json.loads(datos)['datos']]
+    if not medicamentos or not empleados:
+        raise SystemExit("La base no tiene medicamentos activos o empleados")
+    # Pocos productos concentran la mayoría de las ventas (productos "calientes")
+    orden = random.Random(0).sample(range(len(medicamentos)), len(medicamentos))
+    pesos = [0.0] * len(medicamentos)
+    for rango, i in enumerate(orden):
+        pesos[i] = 1 / (rango + 1)
+    return {"medicamentos": medicamentos, "pesos": pesos, "empleados": empleados, "clientes": clientes,
+            "calientes": [medicamentos[i] for i in orden[:calientes]]}
+
+
+def trabajador(i, crear_cliente, catalogo, mezcla, semilla, inicio_medicion, fin, muestras, ejemplos):
+    rnd = random.Random(semilla * 1000 + i)
+    cliente = crear_cliente()
+    estado = {"siguiente": None, "ventas": []}
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    propias = {}
+
+    def registrar(nombre, status, t0, t1):
+        if t0 >= inicio_medicion:
+            propias.setdefault(nombre, []).append((status, t1 - t0))
+
+    def medir(nombre, metodo, ruta, cuerpo=None, cabeceras=None):
+        t0 = time.perf_counter()
+        status, datos = cliente.solicitar(metodo, ruta, cuerpo, cabeceras)
+        t1 = time.perf_counter()
+        registrar(nombre, status, t0, t1)
+        if t0 >= inicio_medicion:
+            if status >= 400 and status != 409 and len(ejemplos.setdefault(nombre, [])) < 3:
+                ejemplos[nombre].append(f"HTTP {status}: {datos[:300].decode('utf-8', 'replace')}")
+        return status, datos
+
+    medir.registrar = registrar
+    while time.perf_counter() < fin:
+        operacion = OPERACIONES[rnd.choices(nombres, weights=pesos)[0]]
+        try:
+            operacion(medir, rnd, catalogo, estado)
+        except (ValueError, KeyError) as e:
+            propias.setdefault("errores_cliente", []).append((599, 0.0))
+            print(f"[hilo {i}] respuesta inesperada: {e}")
+    muestras[i] = propias
+
+
+def ejecutar(args):
+    if args.url:
+        app, tamanos = None, None
+        crear_cliente = lambda: ClienteHttp(args.url)
+    else:
+        app, tamanos = preparar_app(args)
+        crear_cliente = lambda: ClienteLocal(app)
+
+    catalogo = leer_catalogo(crear_cliente(), args.clientes, args.calientes)
+    ahora = time.perf_counter()
+    inicio_medicion = ahora + args.calentamiento
+    fin = inicio_medicion + args.duracion
+    muestras = [None] * args.hilos
+    # Hasta 3 respuestas de error por endpoint, para diagnosticar sin repetir la corrida
+    ejemplos = {}
+    hilos = [threading.Thread(target=trabajador, name=f"carga-{i}",
+                              args=(i, crear_cliente, catalogo, args.mezcla, args.semilla, inicio_medicion, fin,
+                                    muestras, ejemplos))
+             for i in range(args.hilos)]
+    print(f"{args.hilos} hilos, {args.calentamiento}s de calentamiento + {args.duracion}s de medición...")
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    por_endpoint = {}
+    for propias in muestras:
+        for nombre, lista in (propias or {}).items():
+            por_endpoint.setdefault(nombre, []).extend(lista)
+    todas = [m for lista in por_endpoint.values() for m in lista]
+
+    resultado = {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec='seconds'),
+            "backend": "http" if args.url else args.backend,
+            "url": args.url,
+            "hilos": args.hilos,
+            "duracion_s": args.duracion,
+            "calentamiento_s": args.calentamiento,
+            "mezcla": args.mezcla,
+            "semilla": args.semilla,
+            "base": tamanos,
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+        },
+        "total": resumir(todas, args.duracion),
+        "endpoints": {nombre: resumir(lista, args.duracion) for nombre, lista in sorted(por_endpoint.items())},
+        "ejemplos_error": ejemplos,
+    }
+    if app is not None:
+        from src.db import get_pool_stats
+        from src.contencion import get_contencion_stats
+        with app.app_context():
+            resultado["meta"]["pool"] = get_pool_stats()
+        # Terminadas todas las solicitudes, una conexión todavía ocupada es una fuga
+        resultado["meta"]["conexiones_sin_devolver"] = resultado["meta"]["pool"].get("ocupadas", 0)
+        # Conflictos de bloqueo, reintentos y ventas repetidas por Idempotency-Key
+        resultado["meta"]["contencion"] = get_contencion_stats()
+    return resultado
+
+
+def imprimir(resultado):
+    print(f"\n{'endpoint':<45}{'n':>8}{'err':>6}{'409':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    filas = list(resultado['endpoints'].items()) + [("TOTAL", resultado['total'])]
+    for nombre, r in filas:
+        print(f"{nombre:<45}{r['solicitudes']:>8}{r['errores']:>6}{r['rechazos_409']:>6}{r['rps']:>9.1f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}")
+    contencion = resultado['meta'].get('contencion')
+    if contencion:
+        conflictos = ", ".join(f"{tipo}={n}" for tipo, n in contencion['conflictos'].items() if n) or "ninguno"
+        print(f"\nVentas: {contencion['reintentos']} reintentos, {contencion['agotados']} agotados (503), "
+              f"{contencion['repetidas']} repetidas por Idempotency-Key; conflictos: {conflictos}")
+    for nombre, lista in resultado['ejemplos_error'].items():
+        print(f"\n{nombre}:\n  " + "\n  ".join(lista))
+    if resultado['meta'].get('conexiones_sin_devolver'):
+        print(f"\nFUGA: {resultado['meta']['conexiones_sin_devolver']} conexión(es) del pool siguen ocupadas al terminar")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de la farmacia")
+    parser.add_argument('--backend', choices=['falso', 'oracle'], default='falso')
+    parser.add_argument('--url', help="Medir un servidor ya levantado (ej. http://127.0.0.1:8080)")
+    parser.add_argument('--base', help="Ruta del archivo SQLite del backend falso (se recrea)")
+    parser.add_argument('--medicamentos', type=int, default=2000)
+    parser.add_argument('--clientes', type=int, default=5000)
+    parser.add_argument('--ventas', type=int, default=20000, help="Ventas del historial sintético")
+    parser.add_argument('--dias', type=int, default=180, help="Días que abarca el historial sintético")
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--duracion', type=float, default=30, help="Segundos de medición")
+    parser.add_argument('--calentamiento', type=float, default=3, help="Segundos iniciales sin medir")
+    parser.add_argument('--mezcla', type=leer_mezcla, default=leer_mezcla(MEZCLA_POR_DEFECTO),
+                        help=f"Pesos por operación (por defecto: {MEZCLA_POR_DEFECTO})")
+    parser.add_argument('--pool-max', type=int, help="DB_POOL_MAX para la app en proceso")
+    parser.add_argument('--calientes', type=int, default=5,
+                        help="Productos que comparten venta_caliente y reposicion_caliente")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help="Archivo JSON de resultados (por defecto solo se imprime)")
+    args = parser.parse_args(argv)
+
+    resultado = ejecutar(args)
+    imprimir(resultado)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados en {args.salida}")
+    if resultado['meta'].get('conexiones_sin_devolver'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
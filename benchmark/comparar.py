@@ -0,0 +1,73 @@
+"""Compara dos resultados de benchmark.carga y marca regresiones por endpoint.
+
+    python -m benchmark.comparar base.json nuevo.json --tolerancia 10
+
+Una regresión es una latencia (p50/p95/p99) más de --tolerancia % por encima de la
+base, y al menos --minimo-ms más lenta, o un throughput más de --tolerancia % por debajo.
+Termina con código 1 si hay regresiones (útil en CI).
+"""
+import argparse
+import json
+import sys
+
+LATENCIAS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def comparar(base, nuevo, tolerancia, minimo_ms):
+    filas, regresiones = [], []
+    endpoints = list(base['endpoints']) + [n for n in nuevo['endpoints'] if n not in base['endpoints']]
+    for nombre in endpoints + ['TOTAL']:
+        a = base['total'] if nombre == 'TOTAL' else base['endpoints'].get(nombre)
+        b = nuevo['total'] if nombre == 'TOTAL' else nuevo['endpoints'].get(nombre)
+        if a is None or b is None:
+            filas.append((nombre, None, "solo en " + ("nuevo" if a is None else "base")))
+            continue
+        cambios = {}
+        for metrica in LATENCIAS + ('rps',):
+            cambios[metrica] = ((b[metrica] - a[metrica]) / a[metrica] * 100) if a[metrica] else 0.0
+        motivos = [m for m in LATENCIAS
+                   if cambios[m] > tolerancia and b[m] - a[m] >= minimo_ms]
+        if cambios['rps'] < -tolerancia:
+            motivos.append('rps')
+        if b['errores'] > a['errores']:
+            motivos.append('errores')
+        filas.append((nombre, cambios, ", ".join(motivos)))
+        if motivos:
+            regresiones.append((nombre, motivos))
+    return filas, regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos corridas de benchmark.carga")
+    parser.add_argument('base')
+    parser.add_argument('nuevo')
+    parser.add_argument('--tolerancia', type=float, default=10.0, help="Variación permitida en %% (por defecto 10)")
+    parser.add_argument('--minimo-ms', type=float, default=1.0,
+                        help="Diferencia mínima de latencia para considerar regresión (por defecto 1 ms)")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.nuevo, encoding='utf-8') as f:
+        nuevo = json.load(f)
+
+    for clave in ('backend', 'hilos', 'duracion_s', 'mezcla', 'base'):
+        if base['meta'].get(clave) != nuevo['meta'].get(clave):
+            print(f"Aviso: '{clave}' difiere entre corridas ({base['meta'].get(clave)} vs {nuevo['meta'].get(clave)})")
+
+    filas, regresiones = comparar(base, nuevo, args.tolerancia, args.minimo_ms)
+    print(f"{'endpoint':<45}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}  regresión")
+    for nombre, cambios, motivos in filas:
+        if cambios is None:
+            print(f"{nombre:<45}{'':>36}  ({motivos})")
+            continue
+        print(f"{nombre:<45}" + "".join(f"{cambios[m]:>+8.1f}%" for m in LATENCIAS + ('rps',)) + f"  {motivos}")
+
+    if regresiones:
+        print(f"\n{len(regresiones)} endpoint(s) con regresión (tolerancia {args.tolerancia}%)")
+        sys.exit(1)
+    print("\nSin regresiones")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Catálogo e historial de ventas sintéticos para el benchmark.
+
+Se cargan antes de crear los triggers (inserción directa, sin validaciones) y con
+una semilla fija, de modo que dos corridas con los mismos tamaños parten de la
+misma base.
+"""
+import random
+from datetime import datetime, timedelta
+
+from benchmark.oracledb_falso import a_dias
+
+CATEGORIAS = ['Analgesicos', 'Antibioticos', 'Vitaminas', 'Antiinflamatorios', 'Antihistamínicos',
+              'Antihipertensivos', 'Antidiabéticos', 'Dermatológicos', 'Gastrointestinales', 'Respiratorios',
+              'Antiácidos']
+PRINCIPIOS = ['Paracetamol', 'Ibuprofeno', 'Amoxicilina', 'Omeprazol', 'Loratadina', 'Metformina', 'Losartan',
+              'Diclofenaco', 'Cetirizina', 'Azitromicina', 'Naproxeno', 'Ranitidina', 'Salbutamol', 'Clotrimazol',
+              'Vitamina C', 'Complejo B', 'Enalapril', 'Glibenclamida', 'Ketorolaco', 'Dexametasona']
+PRESENTACIONES = ['100mg', '250mg', '500mg', '1g', 'Jarabe 120ml', 'Crema 20g', 'Gotas 15ml', 'Tabletas x30']
+NOMBRES = ['Ana', 'Luis', 'María', 'Carlos', 'Lucía', 'Jorge', 'Rosa', 'Pedro', 'Elena', 'Miguel', 'Sofía', 'Raúl']
+APELLIDOS = ['García', 'Quispe', 'Flores', 'Rojas', 'Torres', 'Mendoza', 'Vargas', 'Castillo', 'Huamán', 'Díaz']
+
+TAMANOS = {"medicamentos": 2000, "clientes": 5000, "empleados": 10, "proveedores": 20,
+           "ventas": 20000, "dias_historial": 180, "semilla": 42}
+
+
+def _persona(rnd, dni):
+    return (dni, rnd.choice(NOMBRES), rnd.choice(APELLIDOS), rnd.choice(APELLIDOS))
+
+
+def cargar(con, medicamentos=None, clientes=None, empleados=None, proveedores=None, ventas=None,
+           dias_historial=None, semilla=None):
+    """Inserta el catálogo y el historial; devuelve los tamaños efectivos."""
+    t = dict(TAMANOS)
+    t.update({k: v for k, v in dict(medicamentos=medicamentos, clientes=clientes, empleados=empleados,
+                                    proveedores=proveedores, ventas=ventas, dias_historial=dias_historial,
+                                    semilla=semilla).items() if v is not None})
+    rnd = random.Random(t["semilla"])
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    con.execute("BEGIN")
+    con.executemany("INSERT INTO Categorias (id_categoria, nombre, descripcion) VALUES (?, ?, ?)",
+                    [(i, nombre, None) for i, nombre in enumerate(CATEGORIAS, 1)])
+    con.executemany("INSERT INTO Proveedores (id_proveedor, nombre, contacto_telefono, email, direccion) VALUES (?, ?, ?, ?, ?)",
+                    [(i, f"Proveedor {i:03d}", f"9{rnd.randrange(10**8):08d}", f"ventas{i}@proveedor.pe", "Lima")
+                     for i in range(1, t["proveedores"] + 1)])
+
+    dnis_empleados = [f"4{i:07d}" for i in range(1, t["empleados"] + 1)]
+    dnis_clientes = [f"7{i:07d}" for i in range(1, t["clientes"] + 1)]
+    con.executemany("INSERT INTO Usuarios (dni, nombre, apellido_paterno, apellido_materno) VALUES (?, ?, ?, ?)",
+                    [_persona(rnd, dni) for dni in dnis_empleados + dnis_clientes])
+    con.executemany("INSERT INTO Empleados (dni, puesto, fecha_contratacion, usuario_sistema) VALUES (?, ?, ?, ?)",
+                    [(dni, "Vendedor", a_dias(hoy - timedelta(days=rnd.randrange(30, 2000))), f"emp{dni}")
+                     for dni in dnis_empleados])
+    con.executemany("INSERT INTO Clientes (dni) VALUES (?)", [(dni,) for dni in dnis_clientes])
+
+    # ~3% inactivos, ~2% agotados y ~10% con margen bajo (< 20%, generan auditoría al venderse)
+    filas_med, precios = [], {}
+    for id_med in range(1, t["medicamentos"] + 1):
+        compra = round(rnd.uniform(0.5, 80), 2)
+        margen = rnd.uniform(0.12, 0.19) if rnd.random() < 0.10 else rnd.uniform(0.2, 0.6)
+        venta = round(compra / (1 - margen), 2)
+        sorteo = rnd.random()
+        estado, stock = ('Inactivo', rnd.randrange(0, 50)) if sorteo < 0.03 else \
+                        ('Agotado', 0) if sorteo < 0.05 else ('Activo', rnd.randrange(20, 5000))
+        nombre = f"{rnd.choice(PRINCIPIOS)} {rnd.choice(PRESENTACIONES)} {id_med:05d}"
+        filas_med.append((id_med, nombre, rnd.randint(1, len(CATEGORIAS)), rnd.randint(1, t["proveedores"]), stock,
+                          compra, venta, a_dias(hoy + timedelta(days=rnd.randrange(10, 900))), f"L{id_med:06d}",
+                          f"Estante {rnd.choice('ABCDEF')}{rnd.randint(1, 20)}", None, estado))
+        precios[id_med] = venta
+    con.executemany("""INSERT INTO Medicamentos (id_medicamento, nombre, id_categoria, id_proveedor, stock, precio_compra,
+                                                 precio_venta, fecha_vencimiento, lote, ubicacion, descripcion, estado)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", filas_med)
+    con.executemany("""INSERT INTO Auditoria_Medicamentos (id_medicamento_afectado, nombre_medicamento, tipo_accion,
+                                                           accion_realizada, usuario_db, fecha_accion)
+                       VALUES (?, ?, 'REGISTRO_NUEVO', ?, 'BENCH', ?)""",
+                    [(f[0], f[1], f"REGISTRO_NUEVO - Stock inicial: {f[4]}",
+                      a_dias(hoy - timedelta(days=t["dias_historial"] + 1))) for f in filas_med])
+
+    # Historial: los productos más vendidos siguen una distribución sesgada (pocos concentran las ventas)
+    ids_med = list(precios)
+    pesos = [1 / (i + 1) for i in range(len(ids_med))]
+    cabeceras, detalles = [], []
+    for id_venta in range(1, t["ventas"] + 1):
+        fecha = hoy - timedelta(days=rnd.random() * t["dias_historial"])
+        lineas = {}
+        for id_med in rnd.choices(ids_med, weights=pesos, k=rnd.randint(1, 4)):
+            lineas[id_med] = lineas.get(id_med, 0) + rnd.randint(1, 3)
+        total = round(sum(precios[m] * c for m, c in lineas.items()), 2)
+        cabeceras.append((id_venta, rnd.choice(dnis_clientes), rnd.choice(dnis_empleados), a_dias(fecha), total))
+        detalles.extend((id_venta, m, c, precios[m]) for m, c in lineas.items())
+    con.executemany("INSERT INTO Ventas (id_venta, dni_cliente, dni_empleado, fecha_venta, total_venta) VALUES (?, ?, ?, ?, ?)",
+                    cabeceras)
+    con.executemany("INSERT INTO Venta_Detalle (id_venta, id_medicamento, cantidad, precio_unitario_venta) VALUES (?, ?, ?, ?)",
+                    detalles)
+    con.commit()
+    t["lineas_venta"] = len(detalles)
+    return t
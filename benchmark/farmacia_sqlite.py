@@ -0,0 +1,565 @@
+"""Esquema, triggers y paquetes de WalterW.sql reescritos para SQLite.
+
+Lo usa benchmark.oracledb_falso: las tablas, índices y triggers replican las reglas
+de la versión Oracle (validación de stock y precios, auditoría encolada, resúmenes
+diarios) y los procedimientos de pkg_gestion_farmacia / pkg_reportes_farmacia se
+implementan como funciones de Python sobre la misma conexión.
+
+Las fechas se guardan como días (REAL) desde 1970-01-01; ver oracledb_falso.a_dias.
+"""
+from datetime import datetime
+
+TABLAS = """
+CREATE TABLE Usuarios (
+    dni TEXT PRIMARY KEY, nombre TEXT NOT NULL, apellido_paterno TEXT NOT NULL, apellido_materno TEXT
+);
+CREATE TABLE Clientes (
+    dni TEXT PRIMARY KEY REFERENCES Usuarios(dni) ON DELETE CASCADE
+);
+CREATE TABLE Empleados (
+    dni TEXT PRIMARY KEY REFERENCES Usuarios(dni) ON DELETE CASCADE, puesto TEXT NOT NULL,
+    fecha_contratacion DATE, usuario_sistema TEXT UNIQUE NOT NULL
+);
+CREATE TABLE Proveedores (
+    id_proveedor INTEGER PRIMARY KEY, nombre TEXT NOT NULL, contacto_telefono TEXT, email TEXT,
+    direccion TEXT, estado TEXT DEFAULT 'Activo' NOT NULL
+);
+CREATE TABLE Categorias (
+    id_categoria INTEGER PRIMARY KEY, nombre TEXT NOT NULL, descripcion TEXT
+);
+CREATE TABLE Medicamentos (
+    id_medicamento INTEGER PRIMARY KEY, nombre TEXT NOT NULL,
+    id_categoria INTEGER NOT NULL REFERENCES Categorias(id_categoria),
+    id_proveedor INTEGER REFERENCES Proveedores(id_proveedor),
+    stock INTEGER DEFAULT 0 NOT NULL CHECK (stock >= 0), precio_compra REAL NOT NULL, precio_venta REAL NOT NULL,
+    fecha_vencimiento DATE NOT NULL, lote TEXT NOT NULL, ubicacion TEXT, descripcion TEXT,
+    estado TEXT DEFAULT 'Activo' NOT NULL, version_cambio INTEGER DEFAULT 0 NOT NULL,
+    fecha_cambio DATE DEFAULT (ROUND((julianday('now', 'localtime') - 2440587.5) * 86400) / 86400) NOT NULL
+);
+-- Equivalente de seq_cambios_medicamentos
+CREATE TABLE Secuencia_Cambios (valor INTEGER NOT NULL);
+INSERT INTO Secuencia_Cambios VALUES (0);
+CREATE TABLE Ventas (
+    id_venta INTEGER PRIMARY KEY, dni_cliente TEXT NOT NULL REFERENCES Clientes(dni),
+    dni_empleado TEXT NOT NULL REFERENCES Empleados(dni),
+    fecha_venta TIMESTAMP DEFAULT (ROUND((julianday('now', 'localtime') - 2440587.5) * 86400) / 86400) NOT NULL, total_venta REAL DEFAULT 0
+);
+CREATE TABLE Venta_Detalle (
+    id_detalle INTEGER PRIMARY KEY, id_venta INTEGER NOT NULL REFERENCES Ventas(id_venta) ON DELETE CASCADE,
+    id_medicamento INTEGER NOT NULL REFERENCES Medicamentos(id_medicamento),
+    cantidad INTEGER NOT NULL, precio_unitario_venta REAL NOT NULL,
+    subtotal REAL GENERATED ALWAYS AS (cantidad * precio_unitario_venta) VIRTUAL
+);
+CREATE TABLE Auditoria_Medicamentos (
+    id_auditoria INTEGER PRIMARY KEY, id_medicamento_afectado INTEGER, nombre_medicamento TEXT,
+    tipo_accion TEXT, accion_realizada TEXT, usuario_db TEXT,
+    fecha_accion TIMESTAMP DEFAULT (ROUND((julianday('now', 'localtime') - 2440587.5) * 86400) / 86400)
+);
+CREATE TABLE Auditoria_Pendiente (
+    id_pendiente INTEGER PRIMARY KEY, id_medicamento_afectado INTEGER, nombre_medicamento TEXT,
+    tipo_accion TEXT, accion_realizada TEXT, usuario_db TEXT,
+    fecha_accion TIMESTAMP DEFAULT (ROUND((julianday('now', 'localtime') - 2440587.5) * 86400) / 86400)
+);
+CREATE TABLE Ventas_Idempotencia (
+    clave TEXT PRIMARY KEY, huella TEXT NOT NULL, id_venta INTEGER,
+    fecha_registro DATE DEFAULT (ROUND((julianday('now', 'localtime') - 2440587.5) * 86400) / 86400) NOT NULL
+);
+CREATE TABLE Ventas_Historico (
+    id_venta INTEGER PRIMARY KEY, dni_cliente TEXT NOT NULL, dni_empleado TEXT NOT NULL,
+    fecha_venta TIMESTAMP NOT NULL, total_venta REAL
+);
+CREATE TABLE Venta_Detalle_Historico (
+    id_detalle INTEGER PRIMARY KEY, id_venta INTEGER NOT NULL, id_medicamento INTEGER NOT NULL,
+    cantidad INTEGER NOT NULL, precio_unitario_venta REAL NOT NULL, subtotal REAL
+);
+CREATE TABLE Auditoria_Historico (
+    id_auditoria INTEGER PRIMARY KEY, id_medicamento_afectado INTEGER, nombre_medicamento TEXT,
+    tipo_accion TEXT, accion_realizada TEXT, usuario_db TEXT, fecha_accion TIMESTAMP
+);
+CREATE TABLE Archivo_Corte (
+    tabla TEXT PRIMARY KEY, corte DATE NOT NULL, corte_firme DATE NOT NULL,
+    fecha_cambio DATE DEFAULT (ROUND((julianday('now', 'localtime') - 2440587.5) * 86400) / 86400) NOT NULL
+);
+-- 1900-01-01 en días desde 1970-01-01
+INSERT INTO Archivo_Corte (tabla, corte, corte_firme) VALUES ('VENTAS', -25567, -25567), ('AUDITORIA', -25567, -25567);
+CREATE TABLE Replica_Latido (id INTEGER PRIMARY KEY CHECK (id = 1), marca REAL NOT NULL);
+INSERT INTO Replica_Latido (id, marca) VALUES (1, 0);
+CREATE TABLE Resumen_Ventas_Empleado (
+    dia DATE NOT NULL, dni_empleado TEXT NOT NULL, num_ventas INTEGER DEFAULT 0 NOT NULL,
+    total_dinero REAL DEFAULT 0 NOT NULL, PRIMARY KEY (dia, dni_empleado)
+);
+CREATE TABLE Resumen_Ventas_Cliente (
+    dia DATE NOT NULL, dni_cliente TEXT NOT NULL, num_compras INTEGER DEFAULT 0 NOT NULL,
+    total_gastado REAL DEFAULT 0 NOT NULL, PRIMARY KEY (dia, dni_cliente)
+);
+CREATE TABLE Resumen_Ventas_Medicamento (
+    dia DATE NOT NULL, id_medicamento INTEGER NOT NULL, unidades INTEGER DEFAULT 0 NOT NULL,
+    importe REAL DEFAULT 0 NOT NULL, PRIMARY KEY (dia, id_medicamento)
+);
+
+CREATE INDEX idx_venta_detalle_venta ON Venta_Detalle (id_venta);
+CREATE INDEX idx_venta_detalle_med ON Venta_Detalle (id_medicamento);
+CREATE INDEX idx_ventas_fecha ON Ventas (fecha_venta, id_venta);
+CREATE INDEX idx_ventas_cliente ON Ventas (dni_cliente);
+CREATE INDEX idx_ventas_empleado ON Ventas (dni_empleado);
+CREATE INDEX idx_medicamentos_estado_stock ON Medicamentos (estado, stock);
+CREATE INDEX idx_medicamentos_vencimiento ON Medicamentos (fecha_vencimiento);
+CREATE UNIQUE INDEX idx_medicamentos_lote_nombre ON Medicamentos (lote, nombre);
+CREATE INDEX idx_medicamentos_nombre ON Medicamentos (nombre, id_medicamento);
+CREATE INDEX idx_medicamentos_nombre_upper ON Medicamentos (UPPER(nombre), id_medicamento);
+CREATE INDEX idx_medicamentos_categoria ON Medicamentos (id_categoria);
+CREATE INDEX idx_medicamentos_proveedor ON Medicamentos (id_proveedor);
+CREATE INDEX idx_medicamentos_version ON Medicamentos (version_cambio);
+CREATE INDEX idx_ventas_hist_fecha ON Ventas_Historico (fecha_venta, id_venta);
+CREATE INDEX idx_ventas_hist_cliente ON Ventas_Historico (dni_cliente);
+CREATE INDEX idx_ventas_hist_empleado ON Ventas_Historico (dni_empleado);
+CREATE INDEX idx_venta_detalle_hist_venta ON Venta_Detalle_Historico (id_venta);
+CREATE INDEX idx_auditoria_hist_fecha ON Auditoria_Historico (fecha_accion, id_auditoria);
+CREATE INDEX idx_auditoria_hist_medicamento ON Auditoria_Historico (id_medicamento_afectado, fecha_accion);
+CREATE INDEX idx_auditoria_hist_tipo ON Auditoria_Historico (tipo_accion, fecha_accion);
+CREATE INDEX idx_auditoria_fecha ON Auditoria_Medicamentos (fecha_accion, id_auditoria);
+CREATE INDEX idx_auditoria_medicamento ON Auditoria_Medicamentos (id_medicamento_afectado, fecha_accion);
+CREATE INDEX idx_auditoria_tipo ON Auditoria_Medicamentos (tipo_accion, fecha_accion);
+"""
+
+# ORA_ERROR(codigo, mensaje) aborta la sentencia con el mensaje 'ORA-<codigo>: <mensaje>'
+TRIGGERS = """
+CREATE TRIGGER trg_control_stock_validar BEFORE INSERT ON Venta_Detalle
+BEGIN
+    SELECT ORA_ERROR(20002, 'Medicamento no encontrado ID: ' || NEW.id_medicamento)
+    WHERE NOT EXISTS (SELECT 1 FROM Medicamentos WHERE id_medicamento = NEW.id_medicamento);
+    SELECT ORA_ERROR(20003, 'Stock insuficiente para ' || nombre || '. Disponible: ' || stock || ', Solicitado: ' || NEW.cantidad)
+    FROM Medicamentos WHERE id_medicamento = NEW.id_medicamento AND stock < NEW.cantidad;
+END;
+
+CREATE TRIGGER trg_control_stock_inteligente AFTER INSERT ON Venta_Detalle
+BEGIN
+    INSERT INTO Auditoria_Pendiente (id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db)
+    SELECT id_medicamento, nombre, 'VENTA_MARGEN_BAJO',
+           'VENTA_MARGEN_BAJO: ' || ROUND((precio_venta - precio_compra) / precio_venta * 100, 2) || '% | Cant: ' || NEW.cantidad, 'BENCH'
+    FROM Medicamentos
+    WHERE id_medicamento = NEW.id_medicamento AND (precio_venta - precio_compra) / precio_venta * 100 < 20;
+
+    UPDATE Medicamentos SET stock = stock - NEW.cantidad,
+           estado = CASE WHEN estado != 'Inactivo' AND stock - NEW.cantidad <= 0 THEN 'Agotado' ELSE estado END
+    WHERE id_medicamento = NEW.id_medicamento;
+
+    INSERT INTO Auditoria_Pendiente (id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db)
+    SELECT id_medicamento, nombre, 'ALERTA_STOCK_CRITICO', 'ALERTA_STOCK_CRITICO: Quedan ' || stock || ' unidades', 'BENCH'
+    FROM Medicamentos WHERE id_medicamento = NEW.id_medicamento AND stock <= 5 AND stock > 0;
+END;
+
+CREATE TRIGGER trg_validar_medicamento_insert BEFORE INSERT ON Medicamentos
+BEGIN
+    SELECT ORA_ERROR(20001, 'No se puede registrar medicamento vencido') WHERE NEW.fecha_vencimiento < TRUNC(SYSDATE());
+    SELECT ORA_ERROR(20004, 'Precio de venta debe ser mayor al precio de compra') WHERE NEW.precio_venta <= NEW.precio_compra;
+    SELECT ORA_ERROR(20005, 'Margen de ganancia muy bajo (menor al 10%)')
+    WHERE (NEW.precio_venta - NEW.precio_compra) / NEW.precio_venta < 0.10;
+END;
+
+CREATE TRIGGER trg_validar_medicamento_update BEFORE UPDATE OF nombre, id_categoria, id_proveedor, stock, precio_compra,
+    precio_venta, fecha_vencimiento, lote, ubicacion, descripcion, estado ON Medicamentos
+BEGIN
+    SELECT ORA_ERROR(20010, 'No se pueden modificar medicamentos marcados como Inactivos.')
+    WHERE OLD.estado = 'Inactivo' AND NEW.estado = 'Inactivo';
+    SELECT ORA_ERROR(20001, 'No se puede registrar medicamento vencido') WHERE NEW.fecha_vencimiento < TRUNC(SYSDATE());
+    SELECT ORA_ERROR(20004, 'Precio de venta debe ser mayor al precio de compra') WHERE NEW.precio_venta <= NEW.precio_compra;
+    SELECT ORA_ERROR(20005, 'Margen de ganancia muy bajo (menor al 10%)')
+    WHERE (NEW.precio_venta - NEW.precio_compra) / NEW.precio_venta < 0.10;
+END;
+
+-- Gestión de estado centralizada (en Oracle la hace el trigger BEFORE modificando :NEW)
+CREATE TRIGGER trg_estado_medicamento_insert AFTER INSERT ON Medicamentos
+WHEN NEW.estado != 'Inactivo' AND NEW.estado != CASE WHEN NEW.stock <= 0 THEN 'Agotado' ELSE 'Activo' END
+BEGIN
+    UPDATE Medicamentos SET estado = CASE WHEN stock <= 0 THEN 'Agotado' ELSE 'Activo' END
+    WHERE id_medicamento = NEW.id_medicamento;
+END;
+
+CREATE TRIGGER trg_estado_medicamento_update AFTER UPDATE OF stock, estado ON Medicamentos
+WHEN NEW.estado != 'Inactivo' AND NEW.estado != CASE WHEN NEW.stock <= 0 THEN 'Agotado' ELSE 'Activo' END
+BEGIN
+    UPDATE Medicamentos SET estado = CASE WHEN stock <= 0 THEN 'Agotado' ELSE 'Activo' END
+    WHERE id_medicamento = NEW.id_medicamento;
+END;
+
+CREATE TRIGGER trg_auditoria_medicamentos_insert AFTER INSERT ON Medicamentos
+BEGIN
+    INSERT INTO Auditoria_Pendiente (id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db)
+    VALUES (NEW.id_medicamento, NEW.nombre, 'REGISTRO_NUEVO',
+            'REGISTRO_NUEVO - Stock inicial: ' || NEW.stock || ' | Precio Venta: S/.' || NEW.precio_venta || ' | Lote: ' || NEW.lote, 'BENCH');
+END;
+
+CREATE TRIGGER trg_auditoria_medicamentos_update AFTER UPDATE ON Medicamentos
+WHEN OLD.nombre != NEW.nombre OR OLD.stock != NEW.stock OR OLD.precio_compra != NEW.precio_compra
+  OR OLD.precio_venta != NEW.precio_venta OR OLD.estado != NEW.estado OR OLD.lote != NEW.lote
+BEGIN
+    INSERT INTO Auditoria_Pendiente (id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db)
+    SELECT NEW.id_medicamento, NEW.nombre, accion, accion || ' - ' || detalles, 'BENCH'
+    FROM (SELECT CASE WHEN OLD.estado != 'Inactivo' AND NEW.estado = 'Inactivo' AND OLD.nombre = NEW.nombre
+                           AND OLD.stock = NEW.stock AND OLD.precio_compra = NEW.precio_compra
+                           AND OLD.precio_venta = NEW.precio_venta AND OLD.lote = NEW.lote
+                      THEN 'ELIMINACION_LOGICA' ELSE 'ACTUALIZACION' END AS accion,
+            CASE WHEN OLD.nombre != NEW.nombre THEN 'Nombre: "' || OLD.nombre || '" -> "' || NEW.nombre || '". ' ELSE '' END ||
+            CASE WHEN OLD.stock != NEW.stock THEN 'Stock: ' || OLD.stock || ' -> ' || NEW.stock || '. ' ELSE '' END ||
+            CASE WHEN OLD.precio_compra != NEW.precio_compra THEN 'P. Compra: ' || OLD.precio_compra || ' -> ' || NEW.precio_compra || '. ' ELSE '' END ||
+            CASE WHEN OLD.precio_venta != NEW.precio_venta THEN 'P. Venta: ' || OLD.precio_venta || ' -> ' || NEW.precio_venta || '. ' ELSE '' END ||
+            CASE WHEN OLD.estado != NEW.estado THEN 'Estado: "' || OLD.estado || '" -> "' || NEW.estado || '". ' ELSE '' END ||
+            CASE WHEN OLD.lote != NEW.lote THEN 'Lote: "' || OLD.lote || '" -> "' || NEW.lote || '". ' ELSE '' END
+                 AS detalles);
+END;
+
+-- Versión de cambios (en Oracle trg_version_medicamento asigna :NEW en el BEFORE)
+CREATE TRIGGER trg_version_medicamento_insert AFTER INSERT ON Medicamentos
+BEGIN
+    UPDATE Secuencia_Cambios SET valor = valor + 1;
+    UPDATE Medicamentos SET version_cambio = (SELECT valor FROM Secuencia_Cambios), fecha_cambio = SYSDATE()
+    WHERE id_medicamento = NEW.id_medicamento;
+END;
+
+CREATE TRIGGER trg_version_medicamento_update AFTER UPDATE OF stock, precio_venta, estado ON Medicamentos
+WHEN OLD.stock != NEW.stock OR OLD.precio_venta != NEW.precio_venta OR OLD.estado != NEW.estado
+BEGIN
+    UPDATE Secuencia_Cambios SET valor = valor + 1;
+    UPDATE Medicamentos SET version_cambio = (SELECT valor FROM Secuencia_Cambios), fecha_cambio = SYSDATE()
+    WHERE id_medicamento = NEW.id_medicamento;
+END;
+
+CREATE TRIGGER trg_resumen_ventas AFTER INSERT ON Ventas
+BEGIN
+    INSERT INTO Resumen_Ventas_Empleado (dia, dni_empleado, num_ventas, total_dinero)
+    VALUES (TRUNC(NEW.fecha_venta), NEW.dni_empleado, 1, IFNULL(NEW.total_venta, 0))
+    ON CONFLICT (dia, dni_empleado) DO UPDATE SET num_ventas = num_ventas + 1, total_dinero = total_dinero + excluded.total_dinero;
+    INSERT INTO Resumen_Ventas_Cliente (dia, dni_cliente, num_compras, total_gastado)
+    VALUES (TRUNC(NEW.fecha_venta), NEW.dni_cliente, 1, IFNULL(NEW.total_venta, 0))
+    ON CONFLICT (dia, dni_cliente) DO UPDATE SET num_compras = num_compras + 1, total_gastado = total_gastado + excluded.total_gastado;
+END;
+
+CREATE TRIGGER trg_resumen_venta_detalle AFTER INSERT ON Venta_Detalle
+BEGIN
+    INSERT INTO Resumen_Ventas_Medicamento (dia, id_medicamento, unidades, importe)
+    SELECT TRUNC(fecha_venta), NEW.id_medicamento, NEW.cantidad, NEW.cantidad * NEW.precio_unitario_venta
+    FROM Ventas WHERE id_venta = NEW.id_venta
+    ON CONFLICT (dia, id_medicamento) DO UPDATE SET unidades = unidades + excluded.unidades, importe = importe + excluded.importe;
+END;
+"""
+
+
+class ErrorAplicacion(Exception):
+    """Equivalente a RAISE_APPLICATION_ERROR dentro de un procedimiento."""
+
+    def __init__(self, codigo, mensaje):
+        super().__init__(f"ORA-{codigo}: {mensaje}")
+
+
+def crear_esquema(con):
+    con.executescript(TABLAS)
+
+
+def crear_triggers(con):
+    con.executescript(TRIGGERS)
+
+
+def _v(valor):
+    # Desenvuelve variables de enlace (cursor.var / arrayvar) recibidas como IN
+    return valor.getvalue() if hasattr(valor, "getvalue") else valor
+
+
+def _fecha(texto):
+    from benchmark.oracledb_falso import a_dias
+    return a_dias(datetime.strptime(texto, "%Y-%m-%d"))
+
+
+def _escritura(con):
+    # Toma el bloqueo de escritura al inicio para no fallar a mitad de la transacción
+    if not con.in_transaction:
+        con.execute("BEGIN IMMEDIATE")
+
+
+# --- pkg_gestion_farmacia ---
+
+def p_registrar_medicamento(con, p_nombre, p_id_categoria, p_id_proveedor, p_stock, p_precio_compra,
+                            p_precio_venta, p_fecha_vencimiento, p_lote, p_ubicacion=None, p_descripcion=None):
+    _escritura(con)
+    con.execute("""INSERT INTO Medicamentos (nombre, id_categoria, id_proveedor, stock, precio_compra, precio_venta,
+                                             fecha_vencimiento, lote, ubicacion, descripcion)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (p_nombre, p_id_categoria, p_id_proveedor, p_stock, p_precio_compra, p_precio_venta,
+                 _fecha(p_fecha_vencimiento), p_lote, p_ubicacion, p_descripcion))
+    con.commit()
+
+
+def p_editar_medicamento_completo(con, p_id_medicamento, p_nombre, p_id_categoria, p_id_proveedor, p_stock,
+                                  p_precio_compra, p_precio_venta, p_fecha_vencimiento, p_lote,
+                                  p_ubicacion=None, p_descripcion=None):
+    _escritura(con)
+    con.execute("""UPDATE Medicamentos SET nombre = ?, id_categoria = ?, id_proveedor = ?, stock = ?, precio_compra = ?,
+                          precio_venta = ?, fecha_vencimiento = ?, lote = ?, ubicacion = ?, descripcion = ?
+                   WHERE id_medicamento = ?""",
+                (p_nombre, p_id_categoria, p_id_proveedor, p_stock, p_precio_compra, p_precio_venta,
+                 _fecha(p_fecha_vencimiento), p_lote, p_ubicacion, p_descripcion, p_id_medicamento))
+    con.commit()
+
+
+def p_editar_precio(con, p_id_medicamento, p_nuevo_precio_compra, p_nuevo_precio_venta):
+    _escritura(con)
+    con.execute("UPDATE Medicamentos SET precio_compra = ?, precio_venta = ? WHERE id_medicamento = ?",
+                (p_nuevo_precio_compra, p_nuevo_precio_venta, p_id_medicamento))
+    con.commit()
+
+
+def p_actualizar_stock(con, p_id_medicamento, p_cantidad_agregada):
+    _escritura(con)
+    con.execute("""UPDATE Medicamentos SET stock = stock + ?,
+                          estado = CASE WHEN estado = 'Agotado' THEN 'Activo' ELSE estado END
+                   WHERE id_medicamento = ?""", (p_cantidad_agregada, p_id_medicamento))
+    con.commit()
+
+
+def p_eliminar_medicamento(con, p_id_medicamento):
+    _escritura(con)
+    con.execute("UPDATE Medicamentos SET estado = 'Inactivo' WHERE id_medicamento = ?", (p_id_medicamento,))
+    con.commit()
+
+
+def p_cambiar_estado_medicamento(con, p_id_medicamento, p_nuevo_estado):
+    _escritura(con)
+    if p_nuevo_estado == 'Activo':
+        con.execute("""UPDATE Medicamentos SET estado = CASE WHEN stock <= 0 THEN 'Agotado' ELSE 'Activo' END
+                       WHERE id_medicamento = ?""", (p_id_medicamento,))
+    else:
+        con.execute("UPDATE Medicamentos SET estado = ? WHERE id_medicamento = ?", (p_nuevo_estado, p_id_medicamento))
+    con.commit()
+
+
+def p_registrar_venta_con_cliente(con, p_dni_cliente, p_nombre_cli, p_ape_pat_cli, p_ape_mat_cli,
+                                  p_dni_empleado, p_total_venta, p_id_venta_generada):
+    _escritura(con)
+    con.execute("""INSERT INTO Usuarios (dni, nombre, apellido_paterno, apellido_materno) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (dni) DO UPDATE SET nombre = excluded.nombre, apellido_paterno = excluded.apellido_paterno,
+                                                   apellido_materno = excluded.apellido_materno""",
+                (p_dni_cliente, p_nombre_cli, p_ape_pat_cli, p_ape_mat_cli))
+    con.execute("INSERT OR IGNORE INTO Clientes (dni) VALUES (?)", (p_dni_cliente,))
+    fila = con.execute("INSERT INTO Ventas (dni_cliente, dni_empleado, total_venta) VALUES (?, ?, ?) RETURNING id_venta",
+                       (p_dni_cliente, p_dni_empleado, p_total_venta)).fetchone()
+    p_id_venta_generada.setvalue(0, fila[0])
+
+
+def p_registrar_venta_completa(con, p_dni_cliente, p_nombre_cli, p_ape_pat_cli, p_ape_mat_cli, p_dni_empleado,
+                               p_total_venta, p_ids_medicamento, p_cantidades, p_precios,
+                               p_id_venta_generada, p_linea_error, p_mensaje_error,
+                               p_repetida=None, p_clave_idempotencia=None, p_huella=None, p_espera_bloqueo=5):
+    # SQLite bloquea la base completa (BEGIN IMMEDIATE): no hay orden de bloqueo por fila que imitar
+    _escritura(con)
+    p_linea_error.setvalue(0, None)
+    p_mensaje_error.setvalue(0, None)
+    if p_repetida is not None:
+        p_repetida.setvalue(0, 0)
+    con.execute("SAVEPOINT sp_venta_completa")
+    linea = 0
+    try:
+        if p_clave_idempotencia is not None:
+            previa = con.execute("SELECT id_venta, huella FROM Ventas_Idempotencia WHERE clave = ?",
+                                 (p_clave_idempotencia,)).fetchone()
+            if previa is not None:
+                if previa[1] != p_huella:
+                    raise ErrorAplicacion(20020, 'La clave de idempotencia ya se usó con otra venta')
+                p_id_venta_generada.setvalue(0, previa[0])
+                p_repetida.setvalue(0, 1)
+                con.execute("RELEASE sp_venta_completa")
+                return
+            con.execute("INSERT INTO Ventas_Idempotencia (clave, huella) VALUES (?, ?)", (p_clave_idempotencia, p_huella))
+        p_registrar_venta_con_cliente(con, p_dni_cliente, p_nombre_cli, p_ape_pat_cli, p_ape_mat_cli,
+                                      p_dni_empleado, p_total_venta, p_id_venta_generada)
+        id_venta = p_id_venta_generada.getvalue()
+        if p_clave_idempotencia is not None:
+            con.execute("UPDATE Ventas_Idempotencia SET id_venta = ? WHERE clave = ?", (id_venta, p_clave_idempotencia))
+        for linea, (id_med, cantidad, precio) in enumerate(zip(_v(p_ids_medicamento), _v(p_cantidades), _v(p_precios)), 1):
+            con.execute("""INSERT INTO Venta_Detalle (id_venta, id_medicamento, cantidad, precio_unitario_venta)
+                           VALUES (?, ?, ?, ?)""", (id_venta, id_med, cantidad, precio))
+    except Exception as e:
+        con.execute("ROLLBACK TO sp_venta_completa")
+        p_id_venta_generada.setvalue(0, None)
+        p_linea_error.setvalue(0, linea)
+        p_mensaje_error.setvalue(0, str(e) if isinstance(e, ErrorAplicacion) else con.mensaje_error(e))
+
+
+def p_reconstruir_resumenes_ventas(con, p_desde=None):
+    from benchmark.oracledb_falso import a_dias
+    _escritura(con)
+    desde = a_dias(p_desde) if p_desde else -1e9
+    for tabla in ("Resumen_Ventas_Empleado", "Resumen_Ventas_Cliente", "Resumen_Ventas_Medicamento"):
+        con.execute(f"DELETE FROM {tabla} WHERE dia >= ?", (desde,))
+    # Las ventas archivadas del rango se leen de las tablas históricas
+    ventas = """(SELECT fecha_venta, dni_empleado, dni_cliente, total_venta FROM Ventas WHERE fecha_venta >= :desde
+                 UNION ALL
+                 SELECT fecha_venta, dni_empleado, dni_cliente, total_venta FROM Ventas_Historico WHERE fecha_venta >= :desde)"""
+    con.execute(f"""INSERT INTO Resumen_Ventas_Empleado (dia, dni_empleado, num_ventas, total_dinero)
+                    SELECT TRUNC(fecha_venta), dni_empleado, COUNT(*), IFNULL(SUM(total_venta), 0)
+                    FROM {ventas} GROUP BY TRUNC(fecha_venta), dni_empleado""", {"desde": desde})
+    con.execute(f"""INSERT INTO Resumen_Ventas_Cliente (dia, dni_cliente, num_compras, total_gastado)
+                    SELECT TRUNC(fecha_venta), dni_cliente, COUNT(*), IFNULL(SUM(total_venta), 0)
+                    FROM {ventas} GROUP BY TRUNC(fecha_venta), dni_cliente""", {"desde": desde})
+    con.execute("""INSERT INTO Resumen_Ventas_Medicamento (dia, id_medicamento, unidades, importe)
+                   SELECT TRUNC(fecha_venta), id_medicamento, SUM(cantidad), SUM(subtotal)
+                   FROM (SELECT v.fecha_venta, d.id_medicamento, d.cantidad, d.subtotal
+                         FROM Venta_Detalle d JOIN Ventas v ON d.id_venta = v.id_venta WHERE v.fecha_venta >= :desde
+                         UNION ALL
+                         SELECT v.fecha_venta, d.id_medicamento, d.cantidad, d.subtotal
+                         FROM Venta_Detalle_Historico d JOIN Ventas_Historico v ON d.id_venta = v.id_venta
+                         WHERE v.fecha_venta >= :desde)
+                   GROUP BY TRUNC(fecha_venta), id_medicamento""", {"desde": desde})
+    con.commit()
+
+
+def p_drenar_auditoria(con, p_lote, p_movidos):
+    _escritura(con)
+    ids = [r[0] for r in con.execute("SELECT id_pendiente FROM Auditoria_Pendiente LIMIT ?", (p_lote,))]
+    if ids:
+        marcas = ",".join("?" * len(ids))
+        con.execute(f"""INSERT INTO Auditoria_Medicamentos (id_medicamento_afectado, nombre_medicamento, tipo_accion,
+                                                            accion_realizada, usuario_db, fecha_accion)
+                        SELECT id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db, fecha_accion
+                        FROM Auditoria_Pendiente WHERE id_pendiente IN ({marcas})""", ids)
+        con.execute(f"DELETE FROM Auditoria_Pendiente WHERE id_pendiente IN ({marcas})", ids)
+    p_movidos.setvalue(0, len(ids))
+    con.commit()
+
+
+def p_purgar_idempotencia(con, p_horas, p_borrados):
+    _escritura(con)
+    cursor = con.execute("DELETE FROM Ventas_Idempotencia WHERE fecha_registro < SYSDATE() - ? / 24.0", (p_horas,))
+    p_borrados.setvalue(0, cursor.rowcount)
+    con.commit()
+
+
+def _corte_firme(con, tabla, p_dias, p_margen):
+    # "+ 0" evita el conversor de DATE: se compara en días
+    corte, firme, cambio = con.execute("SELECT corte + 0, corte_firme + 0, fecha_cambio + 0 FROM Archivo_Corte "
+                                       "WHERE tabla = ?", (tabla,)).fetchone()
+    ahora = con.execute("SELECT SYSDATE()").fetchone()[0]
+    if firme < corte and cambio <= ahora - p_margen / 86400:
+        firme = corte
+        con.execute("UPDATE Archivo_Corte SET corte_firme = ? WHERE tabla = ?", (firme, tabla))
+    nuevo = con.execute("SELECT TRUNC(SYSDATE() - ?, 'MM')", (p_dias,)).fetchone()[0]
+    if firme == corte and nuevo > corte:
+        con.execute("UPDATE Archivo_Corte SET corte = ?, fecha_cambio = ? WHERE tabla = ?", (nuevo, ahora, tabla))
+    return firme
+
+
+def p_archivar_ventas(con, p_dias, p_margen, p_lote, p_movidos):
+    _escritura(con)
+    firme = _corte_firme(con, "VENTAS", p_dias, p_margen)
+    ids = [r[0] for r in con.execute("SELECT id_venta FROM Ventas WHERE fecha_venta < ? LIMIT ?", (firme, p_lote))]
+    if ids:
+        marcas = ",".join("?" * len(ids))
+        con.execute(f"""INSERT INTO Ventas_Historico (id_venta, dni_cliente, dni_empleado, fecha_venta, total_venta)
+                        SELECT id_venta, dni_cliente, dni_empleado, fecha_venta, total_venta
+                        FROM Ventas WHERE id_venta IN ({marcas})""", ids)
+        con.execute(f"""INSERT INTO Venta_Detalle_Historico (id_detalle, id_venta, id_medicamento, cantidad,
+                                                             precio_unitario_venta, subtotal)
+                        SELECT id_detalle, id_venta, id_medicamento, cantidad, precio_unitario_venta, subtotal
+                        FROM Venta_Detalle WHERE id_venta IN ({marcas})""", ids)
+        con.execute(f"DELETE FROM Venta_Detalle WHERE id_venta IN ({marcas})", ids)
+        con.execute(f"DELETE FROM Ventas WHERE id_venta IN ({marcas})", ids)
+    p_movidos.setvalue(0, len(ids))
+    con.commit()
+
+
+def p_archivar_auditoria(con, p_dias, p_margen, p_lote, p_movidos):
+    _escritura(con)
+    firme = _corte_firme(con, "AUDITORIA", p_dias, p_margen)
+    ids = [r[0] for r in con.execute("SELECT id_auditoria FROM Auditoria_Medicamentos WHERE fecha_accion < ? LIMIT ?",
+                                     (firme, p_lote))]
+    if ids:
+        marcas = ",".join("?" * len(ids))
+        con.execute(f"""INSERT INTO Auditoria_Historico (id_auditoria, id_medicamento_afectado, nombre_medicamento,
+                                                         tipo_accion, accion_realizada, usuario_db, fecha_accion)
+                        SELECT id_auditoria, id_medicamento_afectado, nombre_medicamento, tipo_accion,
+                               accion_realizada, usuario_db, fecha_accion
+                        FROM Auditoria_Medicamentos WHERE id_auditoria IN ({marcas})""", ids)
+        con.execute(f"DELETE FROM Auditoria_Medicamentos WHERE id_auditoria IN ({marcas})", ids)
+    p_movidos.setvalue(0, len(ids))
+    con.commit()
+
+
+# --- pkg_reportes_farmacia (cada uno abre el REF CURSOR recibido como último parámetro) ---
+
+_RANGO = "dia >= IFNULL(TRUNC(:desde), -1e9) AND dia <= IFNULL(TRUNC(:hasta), 1e9)"
+
+REPORTES = {
+    "p_reporte_medicamentos_por_categoria": """
+        SELECT c.nombre AS categoria, m.nombre AS medicamento, p.nombre AS proveedor, m.stock, m.precio_venta
+        FROM Medicamentos m JOIN Categorias c ON m.id_categoria = c.id_categoria
+        LEFT JOIN Proveedores p ON m.id_proveedor = p.id_proveedor
+        WHERE m.estado = 'Activo' ORDER BY c.nombre, m.nombre""",
+    "p_reporte_rentabilidad_productos": """
+        SELECT m.nombre, c.nombre AS categoria, p.nombre AS proveedor, m.stock, m.precio_compra, m.precio_venta,
+               (m.precio_venta - m.precio_compra) AS ganancia_unitaria,
+               ROUND(((m.precio_venta - m.precio_compra) / NULLIF(m.precio_venta, 0)) * 100, 1) AS margen_porcentaje
+        FROM Medicamentos m JOIN Categorias c ON m.id_categoria = c.id_categoria
+        LEFT JOIN Proveedores p ON m.id_proveedor = p.id_proveedor
+        WHERE m.estado = 'Activo' ORDER BY ganancia_unitaria DESC""",
+    "p_reporte_medicamentos_bajo_stock_detalle": """
+        SELECT m.nombre, c.nombre AS categoria, p.nombre AS proveedor, m.stock, m.precio_compra, m.precio_venta,
+               m.ubicacion, m.lote, m.fecha_vencimiento
+        FROM Medicamentos m JOIN Categorias c ON m.id_categoria = c.id_categoria
+        LEFT JOIN Proveedores p ON m.id_proveedor = p.id_proveedor
+        WHERE m.stock <= 10 AND m.estado = 'Activo' ORDER BY m.stock ASC""",
+    "p_reporte_medicamentos_inactivos": """
+        SELECT m.nombre, c.nombre AS categoria, p.nombre AS proveedor, m.lote, m.ubicacion, m.stock, m.precio_compra,
+               m.fecha_vencimiento
+        FROM Medicamentos m JOIN Categorias c ON m.id_categoria = c.id_categoria
+        LEFT JOIN Proveedores p ON m.id_proveedor = p.id_proveedor
+        WHERE m.estado = 'Inactivo' ORDER BY m.nombre""",
+    "p_reporte_medicamentos_proximos_vencer": """
+        SELECT nombre, lote, fecha_vencimiento, (fecha_vencimiento - TRUNC(SYSDATE())) AS dias_restantes
+        FROM Medicamentos
+        WHERE fecha_vencimiento BETWEEN TRUNC(SYSDATE()) AND TRUNC(SYSDATE()) + :dias AND estado = 'Activo'
+        ORDER BY fecha_vencimiento ASC""",
+    "p_reporte_medicamentos_sin_stock": """
+        SELECT m.nombre, m.lote, m.estado, p.nombre AS proveedor
+        FROM Medicamentos m LEFT JOIN Proveedores p ON m.id_proveedor = p.id_proveedor
+        WHERE m.stock <= 0 OR m.estado = 'Agotado'""",
+    "p_reporte_ventas_por_empleado": f"""
+        SELECT u.nombre || ' ' || u.apellido_paterno AS empleado, SUM(r.num_ventas) AS total_ventas,
+               SUM(r.total_dinero) AS total_dinero
+        FROM Resumen_Ventas_Empleado r JOIN Empleados e ON r.dni_empleado = e.dni JOIN Usuarios u ON e.dni = u.dni
+        WHERE {_RANGO} GROUP BY u.nombre, u.apellido_paterno ORDER BY total_dinero DESC""",
+    "p_reporte_ventas_por_cliente": f"""
+        SELECT u.nombre || ' ' || u.apellido_paterno AS cliente, SUM(r.num_compras) AS compras,
+               SUM(r.total_gastado) AS gastado
+        FROM Resumen_Ventas_Cliente r JOIN Clientes c ON r.dni_cliente = c.dni JOIN Usuarios u ON c.dni = u.dni
+        WHERE {_RANGO} GROUP BY u.nombre, u.apellido_paterno ORDER BY gastado DESC""",
+    "p_reporte_top_5_vendidos": f"""
+        SELECT m.nombre, c.nombre AS categoria, SUM(r.unidades) AS total_unidades
+        FROM Resumen_Ventas_Medicamento r JOIN Medicamentos m ON r.id_medicamento = m.id_medicamento
+        JOIN Categorias c ON m.id_categoria = c.id_categoria
+        WHERE {_RANGO} GROUP BY m.nombre, c.nombre ORDER BY total_unidades DESC LIMIT 5""",
+    "p_reporte_ingresos_por_mes": f"""
+        SELECT TO_CHAR(dia, 'YYYY-MM') AS mes, SUM(num_ventas) AS num_ventas, SUM(total_dinero) AS total_ingresos
+        FROM Resumen_Ventas_Empleado
+        WHERE {_RANGO} GROUP BY TO_CHAR(dia, 'YYYY-MM') ORDER BY mes DESC""",
+}
+
+
+def _reporte(sql):
+    def procedimiento(con, *parametros):
+        *entradas, salida = parametros
+        binds = {}
+        if ":dias" in sql:
+            binds["dias"] = _v(entradas[0])
+        if ":desde" in sql:
+            binds["desde"], binds["hasta"] = (_v(x) for x in entradas[:2])
+        salida.execute(sql, binds)
+    return procedimiento
+
+
+PROCEDIMIENTOS = {
+    "pkg_gestion_farmacia." + f.__name__: f for f in (
+        p_registrar_medicamento, p_editar_medicamento_completo, p_editar_precio, p_actualizar_stock,
+        p_eliminar_medicamento, p_cambiar_estado_medicamento, p_registrar_venta_con_cliente,
+        p_registrar_venta_completa, p_reconstruir_resumenes_ventas, p_drenar_auditoria, p_purgar_idempotencia,
+        p_archivar_ventas, p_archivar_auditoria)
+}
+PROCEDIMIENTOS.update({"pkg_reportes_farmacia." + nombre: _reporte(sql) for nombre, sql in REPORTES.items()})
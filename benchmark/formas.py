@@ -0,0 +1,66 @@
+"""Microbenchmark de las dos formas de respuesta de los listados (?shape=rows / columns).
+
+    python -m benchmark.formas --filas 20000 --repeticiones 5
+
+Serializa filas sintéticas con la forma de Ventas (enteros, textos, fechas y Decimal):
+ - rows:    un dict por fila y el proveedor JSON de Flask (lo que hace jsonify)
+ - columns: las tuplas tal cual con src.filas.cuerpo_columnas
+e informa el tiempo de CPU por serialización y los bytes del cuerpo, sin comprimir y con gzip.
+"""
+import argparse
+import gzip
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import Flask
+from src.filas import como_dicts, cuerpo_columnas
+
+NOMBRES = ['id_venta', 'dni_cliente', 'dni_empleado', 'fecha_venta', 'total_venta']
+
+
+def filas_sinteticas(n, semilla=1):
+    azar = random.Random(semilla)
+    inicio = datetime(2025, 1, 1)
+    return [(i, f"{azar.randrange(10**7, 10**8)}", f"{azar.randrange(10**7, 10**8)}",
+             inicio + timedelta(seconds=azar.randrange(0, 365 * 86400)),
+             Decimal(azar.randrange(100, 100000)) / 100)
+            for i in range(n, 0, -1)]
+
+
+def medir(serializar, repeticiones):
+    """(ms de CPU de la mejor repetición, cuerpo)."""
+    mejor, cuerpo = None, None
+    for _ in range(repeticiones):
+        inicio = time.process_time()
+        cuerpo = serializar()
+        transcurrido = time.process_time() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor * 1000, cuerpo.encode('utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara el costo de ?shape=rows y ?shape=columns")
+    parser.add_argument('--filas', type=int, default=20000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    filas = filas_sinteticas(args.filas)
+    app = Flask(__name__)
+    with app.app_context():
+        formas = {
+            'rows': lambda: app.json.dumps({"estado": "exito", "datos": como_dicts(NOMBRES, filas)}),
+            'columns': lambda: cuerpo_columnas(NOMBRES, filas),
+        }
+        resultados = {forma: medir(f, args.repeticiones) for forma, f in formas.items()}
+
+    print(f"{args.filas} filas, mejor de {args.repeticiones} repeticiones")
+    print(f"{'forma':<10}{'cpu_ms':>10}{'bytes':>12}{'gzip':>10}")
+    for forma, (cpu_ms, cuerpo) in resultados.items():
+        print(f"{forma:<10}{cpu_ms:>10.1f}{len(cuerpo):>12}{len(gzip.compress(cuerpo)):>10}")
+    (cpu_a, a), (cpu_b, b) = resultados['rows'], resultados['columns']
+    print(f"columns/rows: cpu {cpu_b / cpu_a:.2f}x, bytes {len(b) / len(a):.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,532 @@
+"""Sustituto local del módulo `oracledb` respaldado por SQLite.
+
+Implementa la parte de la API que usa la aplicación (pool, conexiones, cursores,
+variables de enlace, callproc y REF CURSOR) para correr los blueprints sin un
+Oracle. El esquema y los paquetes PL/SQL están en benchmark.farmacia_sqlite.
+
+Uso: instalar() antes de `import main`; el DSN es la ruta del archivo SQLite
+(creado con preparar_base()).
+
+La API asíncrona (create_pool_async) envuelve la síncrona: cada llamada corre en
+un hilo del ejecutor del bucle de eventos, como un viaje de red en paralelo.
+"""
+import asyncio
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from benchmark import farmacia_sqlite
+
+# Constantes que la aplicación referencia
+NUMBER = "NUMBER"
+STRING = "STRING"
+DATETIME = "DATETIME"
+CURSOR = "CURSOR"
+POOL_GETMODE_WAIT = 0
+POOL_GETMODE_NOWAIT = 1
+POOL_GETMODE_FORCEGET = 2
+POOL_GETMODE_TIMEDWAIT = 3
+
+_EPOCA = datetime(1970, 1, 1)
+
+
+class _ErrorOracle:
+    """Objeto de error que expone `.message` y `.code` como el de python-oracledb."""
+
+    def __init__(self, message, offset=0):
+        self.message = message
+        self.offset = offset
+        coincide = re.match(r"ORA-(\d+)", message)
+        self.code = int(coincide.group(1)) if coincide else 0
+        self.full_code = f"ORA-{self.code:05d}" if coincide else ""
+
+    def __str__(self):
+        return self.message
+
+
+class Error(Exception):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class IntegrityError(DatabaseError):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+def _error(mensaje, clase=DatabaseError):
+    return clase(_ErrorOracle(mensaje))
+
+
+# --- Fechas: días (REAL) desde 1970-01-01, redondeados al segundo ---
+
+def a_dias(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return valor
+    if not isinstance(valor, datetime):
+        valor = datetime(valor.year, valor.month, valor.day)
+    return round((valor.replace(tzinfo=None) - _EPOCA).total_seconds()) / 86400
+
+
+def de_dias(valor):
+    return _EPOCA + timedelta(days=float(valor))
+
+
+sqlite3.register_adapter(datetime, a_dias)
+sqlite3.register_adapter(date, a_dias)
+sqlite3.register_converter("DATE", de_dias)
+sqlite3.register_converter("TIMESTAMP", de_dias)
+
+
+def _sysdate():
+    return a_dias(datetime.now())
+
+
+def _trunc(valor, formato=None):
+    if valor is None:
+        return None
+    if formato and formato.upper() == "MM":
+        return a_dias(de_dias(valor).replace(day=1, hour=0, minute=0, second=0, microsecond=0))
+    return float(int(valor // 1))
+
+
+def _add_months(valor, meses):
+    if valor is None:
+        return None
+    fecha = de_dias(valor)
+    total = fecha.year * 12 + fecha.month - 1 + int(meses)
+    return a_dias(fecha.replace(year=total // 12, month=total % 12 + 1, day=min(fecha.day, 28)))
+
+
+_FORMATOS = {"YYYY": "%Y", "MM": "%m", "DD": "%d", "HH24": "%H", "MI": "%M", "SS": "%S"}
+
+
+def _to_char(valor, formato=None):
+    if valor is None:
+        return None
+    if formato is None:
+        return str(valor)
+    patron = re.sub(r"YYYY|HH24|MM|DD|MI|SS", lambda m: _FORMATOS[m.group(0)], formato)
+    return de_dias(valor).strftime(patron)
+
+
+# --- Traducción de SQL de Oracle al dialecto de SQLite ---
+
+_TRADUCCIONES = [
+    (re.compile(r"FETCH\s+FIRST\s+(:\w+|\d+)\s+ROWS\s+ONLY", re.I), r"LIMIT \1"),
+    (re.compile(r"\b(SYSDATE|SYSTIMESTAMP)\b(?!\s*\()", re.I), "SYSDATE()"),
+    (re.compile(r"\s+FROM\s+DUAL\b", re.I), ""),
+    (re.compile(r":(\d+)\b"), r"?\1"),
+]
+_cache_sql = {}
+
+
+def traducir(sql):
+    traducida = _cache_sql.get(sql)
+    if traducida is None:
+        traducida = sql
+        for patron, reemplazo in _TRADUCCIONES:
+            traducida = patron.sub(reemplazo, traducida)
+        _cache_sql[sql] = traducida
+    return traducida
+
+
+def _valor_enlace(valor):
+    return valor.getvalue() if isinstance(valor, Var) else valor
+
+
+def _enlaces(parametros):
+    if parametros is None:
+        return ()
+    if isinstance(parametros, dict):
+        return {k: _valor_enlace(v) for k, v in parametros.items()}
+    return [_valor_enlace(v) for v in parametros]
+
+
+class _Sesion(sqlite3.Connection):
+    """Conexión SQLite que recuerda el último RAISE_APPLICATION_ERROR de un trigger."""
+
+    error_pendiente = None
+
+    def mensaje_error(self, excepcion):
+        mensaje, self.error_pendiente = self.error_pendiente, None
+        if mensaje:
+            return mensaje
+        if isinstance(excepcion, Error):
+            return str(excepcion)
+        texto = str(excepcion)
+        if "UNIQUE" in texto or "PRIMARY KEY" in texto:
+            indice = self._indice_unico(texto)
+            if indice:
+                return f"ORA-00001: restricción única (BENCH.{indice.upper()}) violada"
+            return f"ORA-00001: restricción única violada ({texto})"
+        if "FOREIGN KEY" in texto:
+            return f"ORA-02291: restricción de integridad violada ({texto})"
+        if "CHECK" in texto:
+            return f"ORA-02290: restricción de control violada ({texto})"
+        if "locked" in texto or "busy" in texto:
+            return f"ORA-00054: recurso ocupado ({texto})"
+        return f"ORA-00900: {texto}"
+
+    def _indice_unico(self, texto):
+        # SQLite nombra las columnas ("UNIQUE constraint failed: T.a, T.b"); Oracle, el índice
+        columnas = [c.strip().split('.') for c in texto.partition(':')[2].split(',')]
+        if not columnas or any(len(c) != 2 for c in columnas):
+            return None
+        tabla = columnas[0][0]
+        for _, nombre, unico, origen, *_ in self.execute(f"PRAGMA index_list({tabla})").fetchall():
+            if unico and origen == 'c' and \
+                    [c[2] for c in self.execute(f"PRAGMA index_info({nombre})")] == [c[1] for c in columnas]:
+                return nombre
+        return None
+
+
+def _abrir_sesion(ruta):
+    con = sqlite3.connect(ruta, factory=_Sesion, timeout=30, isolation_level=None,
+                          check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def ora_error(codigo, mensaje):
+        con.error_pendiente = f"ORA-{int(codigo)}: {mensaje}"
+        raise ValueError(con.error_pendiente)
+
+    con.create_function("ORA_ERROR", 2, ora_error)
+    # Como en Oracle, SYSDATE es constante dentro de una sentencia: al declararla determinista
+    # SQLite la evalúa una vez por ejecución y puede usar índices en filtros como fecha >= TRUNC(SYSDATE)
+    con.create_function("SYSDATE", 0, _sysdate, deterministic=True)
+    con.create_function("TRUNC", 1, _trunc, deterministic=True)
+    con.create_function("TRUNC", 2, _trunc, deterministic=True)
+    con.create_function("ADD_MONTHS", 2, _add_months, deterministic=True)
+    con.create_function("TO_CHAR", 1, _to_char, deterministic=True)
+    con.create_function("TO_CHAR", 2, _to_char, deterministic=True)
+    con.create_function("NVL", 2, lambda a, b: b if a is None else a, deterministic=True)
+    con.execute("PRAGMA journal_mode = WAL")
+    con.execute("PRAGMA synchronous = NORMAL")
+    con.execute("PRAGMA foreign_keys = ON")
+    return con
+
+
+class Var:
+    def __init__(self, tipo, valor=None, es_arreglo=False):
+        self.type = tipo
+        self._valor = valor
+        self._es_arreglo = es_arreglo
+
+    def getvalue(self, pos=0):
+        return self._valor
+
+    def setvalue(self, pos, valor):
+        self._valor = valor
+
+
+class Cursor:
+    def __init__(self, conexion):
+        self.connection = conexion
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self._cur = None
+        self._tipos_entrada = None
+        self._errores_lote = []
+
+    def _sesion(self):
+        if self.connection._sesion is None:
+            raise _error("DPI-1010: not connected")
+        return self.connection._sesion
+
+    def _ejecutar(self, funcion, *args, **kwargs):
+        sesion = self._sesion()
+        try:
+            return funcion(*args, **kwargs)
+        except sqlite3.Error as e:
+            raise _error(sesion.mensaje_error(e)) from e
+        except farmacia_sqlite.ErrorAplicacion as e:
+            raise _error(str(e)) from e
+
+    def execute(self, sql, parametros=None, **kw):
+        sesion = self._sesion()
+        if kw:
+            parametros = dict(parametros or {}, **kw)
+        traducida = traducir(sql)
+        if not self.connection.autocommit and not sesion.in_transaction \
+                and not traducida.lstrip().upper().startswith(("SELECT", "WITH")):
+            sesion.execute("BEGIN IMMEDIATE")
+        self._cur = self._ejecutar(sesion.execute, traducida, _enlaces(parametros))
+        if self.connection.autocommit and sesion.in_transaction:
+            sesion.commit()
+        return self if self._cur.description else None
+
+    def executemany(self, sql, filas, batcherrors=False, arraydmlrowcounts=False):
+        sesion = self._sesion()
+        if not sesion.in_transaction:
+            sesion.execute("BEGIN IMMEDIATE")
+        traducida = traducir(sql)
+        self._errores_lote = []
+        if batcherrors:
+            # Como en Oracle: las filas que fallan se informan y el resto se aplica
+            for posicion, fila in enumerate(filas):
+                try:
+                    self._cur = sesion.execute(traducida, _enlaces(fila))
+                except sqlite3.Error as e:
+                    self._errores_lote.append(_ErrorOracle(sesion.mensaje_error(e), posicion))
+        else:
+            self._cur = self._ejecutar(sesion.executemany, traducida, [_enlaces(f) for f in filas])
+        if self.connection.autocommit:
+            sesion.commit()
+
+    def getbatcherrors(self):
+        return list(self._errores_lote)
+
+    def setinputsizes(self, *args, **kwargs):
+        self._tipos_entrada = args or kwargs
+
+    def var(self, tipo, size=0, arraysize=1, inconverter=None, outconverter=None, typename=None):
+        return Var(tipo)
+
+    def arrayvar(self, tipo, valor, size=0):
+        return Var(tipo, list(valor) if not isinstance(valor, int) else [], es_arreglo=True)
+
+    def callproc(self, nombre, parameters=None, keywordParameters=None):
+        procedimiento = farmacia_sqlite.PROCEDIMIENTOS.get(nombre)
+        if procedimiento is None:
+            raise _error(f"PLS-00302: el componente '{nombre}' debe ser declarado")
+        sesion = self._sesion()
+        self._ejecutar(procedimiento, sesion, *(parameters or []), **(keywordParameters or {}))
+        if self.connection.autocommit and sesion.in_transaction:
+            sesion.commit()
+        return list(parameters or [])
+
+    @property
+    def description(self):
+        if self._cur is None or self._cur.description is None:
+            return None
+        return [(d[0].upper(), None, None, None, None, None, True) for d in self._cur.description]
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount if self._cur is not None else 0
+
+    def fetchone(self):
+        return self._ejecutar(self._cur.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._ejecutar(self._cur.fetchmany, size or self.arraysize)
+
+    def fetchall(self):
+        return self._ejecutar(self._cur.fetchall)
+
+    def __iter__(self):
+        while True:
+            fila = self.fetchone()
+            if fila is None:
+                return
+            yield fila
+
+    def close(self):
+        if self._cur is not None:
+            self._cur.close()
+            self._cur = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Connection:
+    def __init__(self, ruta, usuario, pool=None):
+        self._sesion = _abrir_sesion(ruta)
+        self._pool = pool
+        self.username = usuario
+        self.dsn = ruta
+        self.autocommit = False
+        self.ultimo_uso = time.monotonic()
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        if self._sesion.in_transaction:
+            self._sesion.commit()
+
+    def rollback(self):
+        if self._sesion.in_transaction:
+            self._sesion.rollback()
+
+    def ping(self):
+        self._sesion.execute("SELECT 1")
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.release(self)
+        elif self._sesion is not None:
+            self._sesion.close()
+            self._sesion = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, user=None, password=None, dsn=None, min=1, max=2, increment=1,
+                 getmode=POOL_GETMODE_WAIT, wait_timeout=0, ping_interval=60, stmtcachesize=20, **kwargs):
+        if not dsn:
+            raise _error("DPY-4001: no se indicó el DSN (ruta del archivo SQLite)")
+        self.dsn = dsn
+        self.username = user
+        self.min, self.max, self.increment = min, max, increment
+        self.getmode = getmode
+        self.wait_timeout = wait_timeout
+        self.ping_interval = ping_interval
+        self.stmtcachesize = stmtcachesize
+        self._libres = []
+        self._ocupadas = set()
+        self._cond = threading.Condition()
+        for _ in range(min):
+            self._libres.append(Connection(dsn, user))
+
+    @property
+    def busy(self):
+        return len(self._ocupadas)
+
+    @property
+    def opened(self):
+        return len(self._ocupadas) + len(self._libres)
+
+    def acquire(self):
+        limite = time.monotonic() + self.wait_timeout / 1000
+        with self._cond:
+            while not self._libres and self.opened >= self.max:
+                if self.getmode == POOL_GETMODE_NOWAIT:
+                    raise _error("DPY-4005: el pool no tiene conexiones disponibles")
+                restante = limite - time.monotonic() if self.getmode == POOL_GETMODE_TIMEDWAIT else None
+                if restante is not None and restante <= 0:
+                    raise _error("DPY-4005: se agotó el tiempo de espera del pool de conexiones")
+                self._cond.wait(restante)
+            conexion = self._libres.pop() if self._libres else Connection(self.dsn, self.username)
+            self._ocupadas.add(conexion)
+        conexion._pool = self
+        conexion.autocommit = False
+        return conexion
+
+    def release(self, conexion):
+        conexion.rollback()
+        conexion.ultimo_uso = time.monotonic()
+        with self._cond:
+            self._ocupadas.discard(conexion)
+            self._libres.append(conexion)
+            self._cond.notify()
+
+    def close(self, force=False):
+        with self._cond:
+            for conexion in self._libres + list(self._ocupadas):
+                conexion._sesion.close()
+            self._libres, self._ocupadas = [], set()
+
+
+def create_pool(**kwargs):
+    return ConnectionPool(**kwargs)
+
+
+class AsyncCursor:
+    def __init__(self, conexion):
+        self._cursor = Cursor(conexion)
+
+    arraysize = property(lambda self: self._cursor.arraysize,
+                         lambda self, valor: setattr(self._cursor, 'arraysize', valor))
+    prefetchrows = property(lambda self: self._cursor.prefetchrows,
+                            lambda self, valor: setattr(self._cursor, 'prefetchrows', valor))
+    description = property(lambda self: self._cursor.description)
+
+    async def execute(self, sql, parametros=None, **kw):
+        await asyncio.to_thread(self._cursor.execute, sql, parametros, **kw)
+
+    async def callproc(self, nombre, parameters=None, keywordParameters=None):
+        parameters = [p._cursor if isinstance(p, AsyncCursor) else p for p in parameters or []]
+        return await asyncio.to_thread(self._cursor.callproc, nombre, parameters, keywordParameters)
+
+    async def fetchone(self):
+        return await asyncio.to_thread(self._cursor.fetchone)
+
+    async def fetchmany(self, size=None):
+        return await asyncio.to_thread(self._cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await asyncio.to_thread(self._cursor.fetchall)
+
+    def close(self):
+        self._cursor.close()
+
+
+class AsyncConnection:
+    def __init__(self, conexion):
+        self._conexion = conexion
+
+    def cursor(self):
+        return AsyncCursor(self._conexion)
+
+    async def commit(self):
+        await asyncio.to_thread(self._conexion.commit)
+
+    async def rollback(self):
+        await asyncio.to_thread(self._conexion.rollback)
+
+
+class AsyncConnectionPool:
+    def __init__(self, **kwargs):
+        self._pool = ConnectionPool(**kwargs)
+
+    busy = property(lambda self: self._pool.busy)
+    opened = property(lambda self: self._pool.opened)
+    min = property(lambda self: self._pool.min)
+    max = property(lambda self: self._pool.max)
+
+    async def acquire(self):
+        return AsyncConnection(await asyncio.to_thread(self._pool.acquire))
+
+    async def release(self, conexion):
+        await asyncio.to_thread(self._pool.release, conexion._conexion)
+
+    async def close(self, force=False):
+        self._pool.close(force)
+
+
+def create_pool_async(**kwargs):
+    return AsyncConnectionPool(**kwargs)
+
+
+def connect(user=None, password=None, dsn=None, **kwargs):
+    return Connection(dsn, user)
+
+
+def preparar_base(ruta, **tamanos):
+    """Crea el archivo SQLite con el esquema, los datos sintéticos y los triggers."""
+    from benchmark import datos
+    con = _abrir_sesion(ruta)
+    try:
+        farmacia_sqlite.crear_esquema(con)
+        resumen = datos.cargar(con, **tamanos)
+        farmacia_sqlite.p_reconstruir_resumenes_ventas(con)
+        farmacia_sqlite.crear_triggers(con)
+        con.execute("ANALYZE")
+        return resumen
+    finally:
+        con.close()
+
+
+def instalar():
+    """Registra este módulo como `oracledb` para las importaciones posteriores."""
+    sys.modules["oracledb"] = sys.modules[__name__]
@@ -0,0 +1,50 @@
+# Servidor de producción: gunicorn -c gunicorn.conf.py
+# Cada worker es un proceso con su propio pool de conexiones (workers * DB_POOL_MAX
+# sesiones en total) y atiende SERVIDOR_HILOS solicitudes a la vez.
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# La app se crea dentro de cada worker, después del fork (sin preload)
+wsgi_app = "main:create_app(segundo_plano=False)"
+preload_app = False
+
+bind = os.environ.get('SERVIDOR_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('SERVIDOR_WORKERS', 2 * (os.cpu_count() or 1) + 1))
+worker_class = 'gthread'
+# Conviene que no supere DB_POOL_MAX para no esperar por conexiones del pool
+threads = int(os.environ.get('SERVIDOR_HILOS', 8))
+timeout = int(os.environ.get('SERVIDOR_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('SERVIDOR_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# Recicla los workers cada N solicitudes (0 = nunca), con variación para no reiniciarlos a la vez
+max_requests = int(os.environ.get('SERVIDOR_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+
+
+def post_worker_init(worker):
+    # Corre en el worker ya cargado y antes de aceptar conexiones
+    import signal
+    from src.servidor import iniciar_apagado, preparar_worker
+    preparar_worker(worker.wsgi)
+
+    # Al recibir TERM el worker sigue atendiendo lo ya aceptado hasta graceful_timeout:
+    # desde ese momento las ventas nuevas reciben 503 con Retry-After y los streams SSE,
+    # que no terminan solos, se cierran (el navegador se reconecta a otro worker)
+    manejador = signal.getsignal(signal.SIGTERM)
+
+    def al_terminar(signum, frame):
+        iniciar_apagado()
+        if callable(manejador):
+            manejador(signum, frame)
+
+    signal.signal(signal.SIGTERM, al_terminar)
+
+
+def worker_exit(server, worker):
+    # Si el worker falló al cargar la app no hay nada que cerrar
+    if getattr(worker, 'wsgi', None) is not None:
+        from src.servidor import apagar_worker
+        apagar_worker(worker.wsgi)
@@ -1,5 +1,5 @@
 import os
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -7,51 +7,152 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from src.db import close_db_connection
+from src.auditoria import iniciar_drenado_auditoria
+from src.metricas import iniciar_metricas
+from src.replica import iniciar_monitor_replica, iniciar_ruteo
+from src.estaticos import Estaticos
 from src.blueprints.gestion import gestion_bp
 from src.blueprints.reportes import reportes_bp
 from src.blueprints.ventas import ventas_bp
+from src.blueprints.compuesto import compuesto_bp
 
-app = Flask(__name__)
-CORS(app)
-
-app.config.update(
-    DB_USER=os.environ.get('DB_USER'),
-    DB_PASSWORD=os.environ.get('DB_PASSWORD'),
-    DB_DSN=os.environ.get('DB_DSN')
-)
-
-app.teardown_appcontext(close_db_connection)
-
-# Registro de Blueprints (API)
-app.register_blueprint(gestion_bp)
-app.register_blueprint(reportes_bp)
-app.register_blueprint(ventas_bp)
-
-# --- Rutas para servir el Frontend separado ---
-@app.route("/")
-def index():
-    """Redirige a la página principal (dashboard)."""
-    return send_from_directory('src', 'dashboard.html')
-
-@app.route("/<path:filename>")
-def serve_static(filename):
-    """Sirve cualquier archivo HTML, CSS o JS que esté dentro de 'src'."""
-    return send_from_directory('src', filename)
-
-# --- Diagnóstico ---
-@app.route("/db-test")
-def db_test():
-    from src.db import get_db_connection
-    import oracledb
-    connection = get_db_connection()
-    if not connection:
-        return jsonify({"estado": "error", "mensaje": "Fallo conexion BD"}), 503
-    try:
-        cursor = connection.cursor()
-        cursor.execute("SELECT 1 FROM DUAL")
-        return jsonify({"estado": "exito", "mensaje": "Conectado a Oracle"}), 200
-    except oracledb.Error as e:
-        return jsonify({"estado": "error", "mensaje": str(e)}), 500
 
+def create_app(segundo_plano=True):
+    """Crea la aplicación. En producción (gunicorn.conf.py) se llama con segundo_plano=False
+    y cada worker arranca sus hilos y calienta su pool después del fork (src/servidor.py)."""
+    app = Flask(__name__)
+    CORS(app)
+
+    app.config.update(
+        DB_USER=os.environ.get('DB_USER'),
+        DB_PASSWORD=os.environ.get('DB_PASSWORD'),
+        DB_DSN=os.environ.get('DB_DSN'),
+        # Pool de conexiones
+        DB_POOL_MIN=int(os.environ.get('DB_POOL_MIN', 2)),
+        DB_POOL_MAX=int(os.environ.get('DB_POOL_MAX', 10)),
+        DB_POOL_INCREMENT=int(os.environ.get('DB_POOL_INCREMENT', 1)),
+        DB_POOL_PING_INTERVAL=int(os.environ.get('DB_POOL_PING_INTERVAL', 60)),
+        DB_POOL_WAIT_TIMEOUT=int(os.environ.get('DB_POOL_WAIT_TIMEOUT', 5000)),
+        DB_STMT_CACHE_SIZE=int(os.environ.get('DB_STMT_CACHE_SIZE', 50)),
+        # Réplica de lectura (vacío = todo a la primaria): pool propio, retraso máximo (segundos)
+        # para leer de ella y segundos entre mediciones del retraso (ver src/replica.py)
+        DB_DSN_LECTURA=os.environ.get('DB_DSN_LECTURA') or None,
+        DB_LECTURA_POOL_MIN=int(os.environ.get('DB_LECTURA_POOL_MIN', 2)),
+        DB_LECTURA_POOL_MAX=int(os.environ.get('DB_LECTURA_POOL_MAX', 10)),
+        DB_LECTURA_MAX_RETRASO=int(os.environ.get('DB_LECTURA_MAX_RETRASO', 30)),
+        DB_LECTURA_VERIFICAR=int(os.environ.get('DB_LECTURA_VERIFICAR', 2)),
+        # Pool asíncrono para las consultas en paralelo de /api/compuesto
+        DB_ASYNC_POOL_MIN=int(os.environ.get('DB_ASYNC_POOL_MIN', 0)),
+        DB_ASYNC_POOL_MAX=int(os.environ.get('DB_ASYNC_POOL_MAX', 8)),
+        COMPUESTO_TIMEOUT=int(os.environ.get('COMPUESTO_TIMEOUT', 30)),
+        # Caché en proceso de categorías, proveedores, empleados y medicamento por id
+        CACHE_CATALOGO_TTL=int(os.environ.get('CACHE_CATALOGO_TTL', 300)),
+        CACHE_CATALOGO_MAX=int(os.environ.get('CACHE_CATALOGO_MAX', 2000)),
+        # Filas por viaje al leer los REF CURSOR de reportes
+        REPORTE_ARRAYSIZE=int(os.environ.get('REPORTE_ARRAYSIZE', 500)),
+        # Antigüedad máxima (segundos) del snapshot del resumen general
+        RESUMEN_MAX_EDAD=int(os.environ.get('RESUMEN_MAX_EDAD', 60)),
+        # Reposición sugerida: días de historial, plazo de entrega y días a cubrir por defecto,
+        # y antigüedad máxima (segundos) del historial y de los resultados en caché
+        REPOSICION_DIAS=int(os.environ.get('REPOSICION_DIAS', 90)),
+        REPOSICION_PLAZO=int(os.environ.get('REPOSICION_PLAZO', 7)),
+        REPOSICION_COBERTURA=int(os.environ.get('REPOSICION_COBERTURA', 30)),
+        REPOSICION_MAX_EDAD=int(os.environ.get('REPOSICION_MAX_EDAD', 300)),
+        # Segundos entre reconstrucciones completas del índice de /api/medicamentos/buscar
+        BUSQUEDA_MAX_EDAD=int(os.environ.get('BUSQUEDA_MAX_EDAD', 300)),
+        # Feed de cambios de medicamentos: segundos en que un cambio puede confirmarse tarde,
+        # y streams SSE por worker (cada uno ocupa un hilo), sondeo, latido y duración máxima
+        CAMBIOS_MARGEN=int(os.environ.get('CAMBIOS_MARGEN', 10)),
+        CAMBIOS_SSE_MAX=int(os.environ.get('CAMBIOS_SSE_MAX', 4)),
+        CAMBIOS_SSE_INTERVALO=int(os.environ.get('CAMBIOS_SSE_INTERVALO', 2)),
+        CAMBIOS_SSE_LATIDO=int(os.environ.get('CAMBIOS_SSE_LATIDO', 15)),
+        CAMBIOS_SSE_DURACION=int(os.environ.get('CAMBIOS_SSE_DURACION', 300)),
+        # Filas por lote (executemany y COMMIT) en /api/medicamentos/importar
+        IMPORTACION_LOTE=int(os.environ.get('IMPORTACION_LOTE', 1000)),
+        # Ventas: espera máxima (segundos) por un medicamento bloqueado por otra venta, reintentos
+        # tras un conflicto de bloqueo (backoff exponencial con jitter) y vida de las Idempotency-Key
+        VENTAS_ESPERA_BLOQUEO=int(os.environ.get('VENTAS_ESPERA_BLOQUEO', 2)),
+        VENTAS_REINTENTOS=int(os.environ.get('VENTAS_REINTENTOS', 3)),
+        VENTAS_REINTENTO_BASE_MS=int(os.environ.get('VENTAS_REINTENTO_BASE_MS', 50)),
+        VENTAS_REINTENTO_MAX_MS=int(os.environ.get('VENTAS_REINTENTO_MAX_MS', 1000)),
+        VENTAS_IDEMPOTENCIA_HORAS=int(os.environ.get('VENTAS_IDEMPOTENCIA_HORAS', 24)),
+        # Drenado en segundo plano de la cola de auditoría
+        AUDITORIA_DRENADO=os.environ.get('AUDITORIA_DRENADO', '1') == '1',
+        AUDITORIA_INTERVALO=int(os.environ.get('AUDITORIA_INTERVALO', 5)),
+        AUDITORIA_LOTE=int(os.environ.get('AUDITORIA_LOTE', 500)),
+        # Archivo histórico: días de ventas y auditoría en las tablas calientes (0 = no archivar),
+        # segundos entre ejecuciones, filas por lote y espera antes de trasladar con un corte nuevo
+        ARCHIVO_RETENCION_DIAS=int(os.environ.get('ARCHIVO_RETENCION_DIAS', 365)),
+        ARCHIVO_INTERVALO=int(os.environ.get('ARCHIVO_INTERVALO', 3600)),
+        ARCHIVO_LOTE=int(os.environ.get('ARCHIVO_LOTE', 1000)),
+        ARCHIVO_MARGEN=int(os.environ.get('ARCHIVO_MARGEN', 300)),
+        # Métricas por endpoint en /metrics y registro de solicitudes lentas (0 = desactivado)
+        METRICAS_ACTIVAS=os.environ.get('METRICAS_ACTIVAS', '1') == '1',
+        METRICAS_LENTO_MS=int(os.environ.get('METRICAS_LENTO_MS', 0)),
+        # Servidor de producción: calentamiento del pool y espera de ventas en curso al apagar
+        SERVIDOR_CALENTAR=os.environ.get('SERVIDOR_CALENTAR', '1') == '1',
+        SERVIDOR_GRACEFUL_TIMEOUT=int(os.environ.get('SERVIDOR_GRACEFUL_TIMEOUT', 30))
+    )
+
+    app.teardown_appcontext(close_db_connection)
+    if segundo_plano:
+        iniciar_drenado_auditoria(app)
+        iniciar_monitor_replica(app)
+    iniciar_metricas(app)
+    iniciar_ruteo(app)
+
+    # Registro de Blueprints (API)
+    app.register_blueprint(gestion_bp)
+    app.register_blueprint(reportes_bp)
+    app.register_blueprint(ventas_bp)
+    app.register_blueprint(compuesto_bp)
+
+    # --- Rutas para servir el Frontend separado ---
+    # HTML, CSS y JS desde memoria, comprimidos y con versiones con huella (ver src/estaticos.py)
+    estaticos = Estaticos(os.path.join(app.root_path, 'src'))
+
+    @app.route("/")
+    def index():
+        """Redirige a la página principal (dashboard)."""
+        return estaticos.servir('dashboard.html')
+
+    @app.route("/<path:filename>")
+    def serve_static(filename):
+        """Sirve cualquier archivo HTML, CSS o JS que esté dentro de 'src'."""
+        return estaticos.servir(filename)
+
+    # --- Diagnóstico ---
+    @app.route("/db-test")
+    def db_test():
+        from src.db import get_db_connection
+        import oracledb
+        connection = get_db_connection()
+        if not connection:
+            return jsonify({"estado": "error", "mensaje": "Fallo conexion BD"}), 503
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1 FROM DUAL")
+            return jsonify({"estado": "exito", "mensaje": "Conectado a Oracle"}), 200
+        except oracledb.Error as e:
+            return jsonify({"estado": "error", "mensaje": str(e)}), 500
+
+    @app.route("/db-pool")
+    def db_pool():
+        """Estadísticas de los pools de conexiones (ocupadas, abiertas, tiempos de espera) y de la réplica."""
+        from src.db import REPLICA, get_pool_stats, hay_replica
+        from src.db_async import get_pool_async_stats
+        from src.replica import get_replica_stats
+        datos = get_pool_stats()
+        datos["async"] = get_pool_async_stats()
+        if hay_replica():
+            datos["replica"] = dict(get_replica_stats(), pool=get_pool_stats(REPLICA),
+                                    pool_async=get_pool_async_stats(REPLICA))
+        datos["pid"] = os.getpid()
+        return jsonify({"estado": "exito", "datos": datos}), 200
+
+    return app
+
+
+# Desarrollo: python main.py (o flask --app main run). Producción: gunicorn (ver gunicorn.conf.py)
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=8080, debug=True)
@@ -0,0 +1,27 @@
+-- ==========================================================
+-- MIGRACIÓN 001: ÍNDICES SECUNDARIOS
+-- Para bases creadas con una versión anterior de WalterW.sql
+-- (las instalaciones nuevas ya los crean en la sección 2.6).
+-- ==========================================================
+
+-- Detalle de venta: búsqueda por venta (obtener_detalle_venta, ON DELETE CASCADE) y por medicamento (FK)
+CREATE INDEX idx_venta_detalle_venta ON Venta_Detalle (id_venta);
+CREATE INDEX idx_venta_detalle_med ON Venta_Detalle (id_medicamento);
+
+-- Ventas: rango de fechas y orden del listado paginado; FKs usadas como filtros
+CREATE INDEX idx_ventas_fecha ON Ventas (fecha_venta, id_venta);
+CREATE INDEX idx_ventas_cliente ON Ventas (dni_cliente);
+CREATE INDEX idx_ventas_empleado ON Ventas (dni_empleado);
+
+-- Medicamentos: filtros por estado/stock, vencimientos, duplicado de lote y orden del listado
+CREATE INDEX idx_medicamentos_estado_stock ON Medicamentos (estado, stock);
+CREATE INDEX idx_medicamentos_vencimiento ON Medicamentos (fecha_vencimiento);
+CREATE INDEX idx_medicamentos_lote_nombre ON Medicamentos (lote, nombre);
+CREATE INDEX idx_medicamentos_nombre ON Medicamentos (nombre, id_medicamento);
+CREATE INDEX idx_medicamentos_categoria ON Medicamentos (id_categoria);
+CREATE INDEX idx_medicamentos_proveedor ON Medicamentos (id_proveedor);
+
+BEGIN
+    DBMS_STATS.GATHER_SCHEMA_STATS(USER);
+END;
+/
@@ -0,0 +1,27 @@
+-- ==========================================================
+-- MIGRACIÓN 002: VERSIÓN DE CAMBIOS EN MEDICAMENTOS
+-- Para bases creadas con una versión anterior de WalterW.sql
+-- (las instalaciones nuevas ya lo crean en las secciones 2.3, 2.6 y 3.6).
+-- Necesaria para /api/medicamentos/cambios y su stream.
+-- ==========================================================
+
+CREATE SEQUENCE seq_cambios_medicamentos;
+
+ALTER TABLE Medicamentos ADD (
+    version_cambio NUMBER(19) DEFAULT 0 NOT NULL,
+    fecha_cambio   DATE DEFAULT SYSDATE NOT NULL
+);
+
+CREATE INDEX idx_medicamentos_version ON Medicamentos (version_cambio);
+
+CREATE OR REPLACE TRIGGER trg_version_medicamento
+BEFORE INSERT OR UPDATE OF stock, precio_venta, estado ON Medicamentos FOR EACH ROW
+FOLLOWS trg_validar_medicamento_completo
+BEGIN
+    IF INSERTING OR :OLD.stock != :NEW.stock OR :OLD.precio_venta != :NEW.precio_venta
+       OR :OLD.estado != :NEW.estado THEN
+        :NEW.version_cambio := seq_cambios_medicamentos.NEXTVAL;
+        :NEW.fecha_cambio := SYSDATE;
+    END IF;
+END;
+/
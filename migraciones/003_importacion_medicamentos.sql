@@ -0,0 +1,91 @@
+-- ==========================================================
+-- MIGRACIÓN 003: IMPORTACIÓN MASIVA DE MEDICAMENTOS
+-- Para bases creadas con una versión anterior de WalterW.sql
+-- (las instalaciones nuevas ya lo crean en las secciones 2.7 y 3.2).
+-- Necesaria para /api/medicamentos/importar.
+-- ==========================================================
+
+-- La API valida los lotes duplicados del archivo contra la tabla antes de insertar por lotes
+-- (executemany). Mientras la sesión lo indica, trg_validar_medicamento_completo omite esa
+-- consulta: en un INSERT por arreglos la tabla está mutando y la consulta fallaría (ORA-04091).
+CREATE OR REPLACE PACKAGE pkg_importacion AS
+    g_lotes_validados BOOLEAN := FALSE;
+    PROCEDURE p_lotes_validados (p_activo IN NUMBER);
+END pkg_importacion;
+/
+
+CREATE OR REPLACE PACKAGE BODY pkg_importacion AS
+    PROCEDURE p_lotes_validados (p_activo IN NUMBER) AS BEGIN
+        g_lotes_validados := (p_activo = 1);
+    END;
+END pkg_importacion;
+/
+
+CREATE OR REPLACE TRIGGER trg_validar_medicamento_completo
+BEFORE INSERT OR UPDATE ON Medicamentos FOR EACH ROW
+DECLARE
+    v_dias_para_vencer NUMBER;
+    v_count_lote NUMBER;
+BEGIN
+    -- No permitir cambios a registros lógicamente eliminados, a menos que se esté reactivando
+    IF :OLD.estado = 'Inactivo' AND :NEW.estado = 'Inactivo' THEN
+        RAISE_APPLICATION_ERROR(-20010, 'No se pueden modificar medicamentos marcados como Inactivos.');
+    END IF;
+    
+    -- 1. Validar fecha de vencimiento (no puede ser pasada)
+    IF :NEW.fecha_vencimiento < TRUNC(SYSDATE) THEN
+        RAISE_APPLICATION_ERROR(-20001, 
+            'No se puede registrar medicamento vencido. Fecha: ' || 
+            TO_CHAR(:NEW.fecha_vencimiento, 'DD/MM/YYYY'));
+    END IF;
+    
+    -- 2. Validar si está próximo a vencer (menos de 60 días)
+    v_dias_para_vencer := :NEW.fecha_vencimiento - TRUNC(SYSDATE);
+    IF v_dias_para_vencer <= 60 AND v_dias_para_vencer > 0 THEN
+        DBMS_OUTPUT.PUT_LINE('⚠️  ADVERTENCIA: ' || :NEW.nombre || 
+                            ' vence en ' || v_dias_para_vencer || ' días');
+    END IF;
+    
+    -- 3. Validar precios lógicos
+    IF :NEW.precio_venta <= :NEW.precio_compra THEN
+        RAISE_APPLICATION_ERROR(-20004, 
+            'Precio de venta debe ser mayor al precio de compra. ' ||
+            'Compra: S/.' || :NEW.precio_compra || ', Venta: S/.' || :NEW.precio_venta);
+    END IF;
+    
+    -- 4. Validar margen mínimo del 10%
+    IF ((:NEW.precio_venta - :NEW.precio_compra) / :NEW.precio_venta) < 0.10 THEN
+        RAISE_APPLICATION_ERROR(-20005, 
+            'Margen de ganancia muy bajo (menor al 10%). Ajuste los precios.');
+    END IF;
+    
+    -- 5. Validar duplicado de lote (la importación masiva ya lo validó, ver pkg_importacion)
+    IF INSERTING AND NOT pkg_importacion.g_lotes_validados THEN
+        SELECT COUNT(*) INTO v_count_lote
+        FROM Medicamentos
+        WHERE lote = :NEW.lote 
+          AND nombre = :NEW.nombre
+          AND id_medicamento != NVL(:NEW.id_medicamento, -1);
+        
+        IF v_count_lote > 0 THEN
+            RAISE_APPLICATION_ERROR(-20006, 
+                'Ya existe un medicamento con el lote ' || :NEW.lote || 
+                '. Use un lote diferente o verifique si es reposición.');
+        END IF;
+    END IF;
+    
+    -- 6. GESTIÓN DE ESTADO CENTRALIZADA
+    -- Solo se gestiona el estado si no está siendo marcado como 'Inactivo' manualmente.
+    -- El estado 'Inactivo' tiene prioridad para borrados lógicos.
+    IF :NEW.estado != 'Inactivo' THEN
+        IF :NEW.stock <= 0 THEN
+            :NEW.estado := 'Agotado';
+        ELSE
+            -- Si el stock es positivo, siempre debe estar 'Activo'.
+            -- Esto también resuelve el caso de reponer stock a un producto 'Agotado'.
+            :NEW.estado := 'Activo';
+        END IF;
+    END IF;
+    
+END;
+/
@@ -0,0 +1,17 @@
+-- ==========================================================
+-- MIGRACIÓN 004: IDEMPOTENCIA Y ORDEN DE BLOQUEO EN VENTAS
+-- Para bases creadas con una versión anterior de WalterW.sql
+-- (las instalaciones nuevas ya lo crean en las secciones 2.4 y 2.6).
+-- Después de esta migración hay que volver a ejecutar la sección 5 (pkg_gestion_farmacia):
+-- p_registrar_venta_completa recibe la clave de idempotencia y bloquea los medicamentos en orden.
+-- ==========================================================
+
+CREATE TABLE Ventas_Idempotencia (
+    clave             VARCHAR2(100) NOT NULL,
+    huella            VARCHAR2(64) NOT NULL,
+    id_venta          NUMBER(10),
+    fecha_registro    DATE DEFAULT SYSDATE NOT NULL,
+    CONSTRAINT pk_ventas_idempotencia PRIMARY KEY (clave)
+);
+
+CREATE INDEX idx_ventas_idempotencia_fecha ON Ventas_Idempotencia (fecha_registro);
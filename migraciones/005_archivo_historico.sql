@@ -0,0 +1,58 @@
+-- ==========================================================
+-- MIGRACIÓN 005: ARCHIVO HISTÓRICO DE VENTAS Y AUDITORÍA
+-- Para bases creadas con una versión anterior de WalterW.sql
+-- (las instalaciones nuevas ya lo crean en la sección 2.8).
+-- Después de esta migración hay que volver a ejecutar la sección 5 (pkg_gestion_farmacia):
+-- agrega p_archivar_ventas / p_archivar_auditoria y la reconstrucción de resúmenes lee
+-- también las tablas históricas.
+-- ==========================================================
+
+CREATE TABLE Ventas_Historico (
+    id_venta          NUMBER(10) NOT NULL,
+    dni_cliente       VARCHAR2(15) NOT NULL,
+    dni_empleado      VARCHAR2(15) NOT NULL,
+    fecha_venta       TIMESTAMP NOT NULL,
+    total_venta       NUMBER(10, 2),
+    CONSTRAINT pk_ventas_historico PRIMARY KEY (id_venta)
+);
+
+CREATE TABLE Venta_Detalle_Historico (
+    id_detalle        NUMBER(10) NOT NULL,
+    id_venta          NUMBER(10) NOT NULL,
+    id_medicamento    NUMBER(10) NOT NULL,
+    cantidad          NUMBER(4) NOT NULL,
+    precio_unitario_venta NUMBER(10, 2) NOT NULL,
+    subtotal          NUMBER(14, 2),
+    CONSTRAINT pk_venta_detalle_historico PRIMARY KEY (id_detalle)
+);
+
+CREATE TABLE Auditoria_Historico (
+    id_auditoria      NUMBER(10) NOT NULL,
+    id_medicamento_afectado NUMBER(10),
+    nombre_medicamento  VARCHAR2(100),
+    tipo_accion         VARCHAR2(30),
+    accion_realizada    VARCHAR2(2000),
+    usuario_db          VARCHAR2(50),
+    fecha_accion        TIMESTAMP,
+    CONSTRAINT pk_auditoria_historico PRIMARY KEY (id_auditoria)
+);
+
+CREATE TABLE Archivo_Corte (
+    tabla             VARCHAR2(30) NOT NULL,
+    corte             DATE NOT NULL,
+    corte_firme       DATE NOT NULL,
+    fecha_cambio      DATE DEFAULT SYSDATE NOT NULL,
+    CONSTRAINT pk_archivo_corte PRIMARY KEY (tabla)
+);
+
+INSERT INTO Archivo_Corte (tabla, corte, corte_firme) VALUES ('VENTAS', DATE '1900-01-01', DATE '1900-01-01');
+INSERT INTO Archivo_Corte (tabla, corte, corte_firme) VALUES ('AUDITORIA', DATE '1900-01-01', DATE '1900-01-01');
+COMMIT;
+
+CREATE INDEX idx_ventas_hist_fecha ON Ventas_Historico (fecha_venta, id_venta);
+CREATE INDEX idx_ventas_hist_cliente ON Ventas_Historico (dni_cliente);
+CREATE INDEX idx_ventas_hist_empleado ON Ventas_Historico (dni_empleado);
+CREATE INDEX idx_venta_detalle_hist_venta ON Venta_Detalle_Historico (id_venta);
+CREATE INDEX idx_auditoria_hist_fecha ON Auditoria_Historico (fecha_accion, id_auditoria);
+CREATE INDEX idx_auditoria_hist_medicamento ON Auditoria_Historico (id_medicamento_afectado, fecha_accion);
+CREATE INDEX idx_auditoria_hist_tipo ON Auditoria_Historico (tipo_accion, fecha_accion);
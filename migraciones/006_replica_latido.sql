@@ -0,0 +1,16 @@
+-- ==========================================================
+-- MIGRACIÓN 006: LATIDO PARA LA RÉPLICA DE LECTURA
+-- Para bases creadas con una versión anterior de WalterW.sql
+-- (las instalaciones nuevas ya lo crean en la sección 2.9).
+-- Se ejecuta en la primaria; la tabla llega a la réplica por la replicación.
+-- ==========================================================
+
+CREATE TABLE Replica_Latido (
+    id                NUMBER(1) NOT NULL,
+    marca             NUMBER NOT NULL,
+    CONSTRAINT pk_replica_latido PRIMARY KEY (id),
+    CONSTRAINT ck_replica_latido_id CHECK (id = 1)
+);
+
+INSERT INTO Replica_Latido (id, marca) VALUES (1, 0);
+COMMIT;
@@ -0,0 +1,187 @@
+-- ==========================================================
+-- MIGRACIÓN 007: COLA DE AUDITORÍA Y TIPO DE ACCIÓN
+-- Para bases creadas con una versión anterior de WalterW.sql
+-- (las instalaciones nuevas ya lo crean en las secciones 2.4, 2.6, 3.1 y 3.3).
+-- Necesaria para el drenado de auditoría y /api/reportes/auditoria.
+-- No depende de otras migraciones. Se puede volver a ejecutar: los objetos que ya existen
+-- (bases creadas con una versión intermedia de WalterW.sql) se dejan como están.
+-- Después de esta migración hay que volver a ejecutar la sección 5 (pkg_gestion_farmacia):
+-- agrega p_drenar_auditoria, que traslada la cola a Auditoria_Medicamentos. Hasta entonces
+-- los eventos nuevos esperan en Auditoria_Pendiente.
+-- ==========================================================
+
+DECLARE
+    -- Ejecuta una sentencia DDL ignorando el error de "ya existe" indicado
+    PROCEDURE ejecutar(p_ddl IN VARCHAR2, p_existe IN NUMBER) IS
+    BEGIN
+        EXECUTE IMMEDIATE p_ddl;
+    EXCEPTION
+        WHEN OTHERS THEN
+            IF SQLCODE != p_existe THEN
+                RAISE;
+            END IF;
+    END;
+BEGIN
+    -- Cola de salida de auditoría: los triggers solo agregan aquí (sin índices secundarios)
+    -- y pkg_gestion_farmacia.p_drenar_auditoria la traslada por lotes a Auditoria_Medicamentos
+    ejecutar('CREATE TABLE Auditoria_Pendiente (
+        id_pendiente      NUMBER(10) GENERATED BY DEFAULT AS IDENTITY NOT NULL,
+        id_medicamento_afectado NUMBER(10),
+        nombre_medicamento  VARCHAR2(100),
+        tipo_accion         VARCHAR2(30),
+        accion_realizada    VARCHAR2(2000),
+        usuario_db          VARCHAR2(50),
+        fecha_accion        TIMESTAMP DEFAULT SYSTIMESTAMP,
+        CONSTRAINT pk_auditoria_pendiente PRIMARY KEY (id_pendiente)
+    )', -955);
+
+    -- ORA-01430: la columna ya existe
+    ejecutar('ALTER TABLE Auditoria_Medicamentos ADD (tipo_accion VARCHAR2(30))', -1430);
+
+    ejecutar('CREATE INDEX idx_auditoria_fecha ON Auditoria_Medicamentos (fecha_accion, id_auditoria)', -955);
+    ejecutar('CREATE INDEX idx_auditoria_medicamento ON Auditoria_Medicamentos (id_medicamento_afectado, fecha_accion)', -955);
+    ejecutar('CREATE INDEX idx_auditoria_tipo ON Auditoria_Medicamentos (tipo_accion, fecha_accion)', -955);
+END;
+/
+
+-- Las filas anteriores guardan el tipo al inicio del texto ('ACTUALIZACION - ...', 'ALERTA_STOCK_CRITICO: ...')
+UPDATE Auditoria_Medicamentos
+SET tipo_accion = REGEXP_SUBSTR(accion_realizada, '^[A-Z_]+')
+WHERE tipo_accion IS NULL;
+COMMIT;
+
+-- Los triggers encolan en Auditoria_Pendiente en lugar de escribir Auditoria_Medicamentos
+CREATE OR REPLACE TRIGGER trg_control_stock_inteligente
+AFTER INSERT ON Venta_Detalle FOR EACH ROW
+DECLARE
+    v_stock_actual NUMBER;
+    v_nombre_med VARCHAR2(100);
+    v_precio_compra NUMBER(10,2);
+    v_precio_venta NUMBER(10,2);
+    v_ganancia NUMBER(10,2);
+    v_margen_porcentaje NUMBER(5,2);
+BEGIN
+    -- Obtener información del medicamento
+    SELECT stock, nombre, precio_compra, precio_venta
+    INTO v_stock_actual, v_nombre_med, v_precio_compra, v_precio_venta
+    FROM Medicamentos
+    WHERE id_medicamento = :NEW.id_medicamento;
+    
+    -- Validar stock suficiente
+    IF v_stock_actual < :NEW.cantidad THEN
+        RAISE_APPLICATION_ERROR(-20003, 
+            'Stock insuficiente para ' || v_nombre_med || 
+            '. Disponible: ' || v_stock_actual || ', Solicitado: ' || :NEW.cantidad);
+    END IF;
+    
+    -- Calcular métricas de rentabilidad y auditar si es necesario
+    v_margen_porcentaje := ROUND(((v_precio_venta - v_precio_compra) / v_precio_venta) * 100, 2);
+    IF v_margen_porcentaje < 20 THEN
+        INSERT INTO Auditoria_Pendiente (
+            id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db, fecha_accion
+        ) VALUES (
+            :NEW.id_medicamento, v_nombre_med, 'VENTA_MARGEN_BAJO', 'VENTA_MARGEN_BAJO: ' || v_margen_porcentaje || '% | Cant: ' || :NEW.cantidad, USER, SYSTIMESTAMP
+        );
+    END IF;
+    
+    -- Reducir stock. El estado ('Agotado' o 'Activo') será actualizado por el trigger trg_validar_medicamento_completo
+    UPDATE Medicamentos
+    SET stock = stock - :NEW.cantidad
+    WHERE id_medicamento = :NEW.id_medicamento;
+    
+    -- Si el stock resultante es crítico (<=5), registrar alerta de auditoría
+    IF (v_stock_actual - :NEW.cantidad) <= 5 AND (v_stock_actual - :NEW.cantidad) > 0 THEN
+        INSERT INTO Auditoria_Pendiente (
+            id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada, usuario_db, fecha_accion
+        ) VALUES (
+            :NEW.id_medicamento, v_nombre_med, 'ALERTA_STOCK_CRITICO', 'ALERTA_STOCK_CRITICO: Quedan ' || (v_stock_actual - :NEW.cantidad) || ' unidades', USER, SYSTIMESTAMP
+        );
+    END IF;
+    
+EXCEPTION
+    WHEN NO_DATA_FOUND THEN
+        RAISE_APPLICATION_ERROR(-20002, 'Medicamento no encontrado ID: ' || :NEW.id_medicamento);
+    WHEN OTHERS THEN
+        RAISE_APPLICATION_ERROR(-20099, 'Error en control de stock: ' || SQLERRM);
+END;
+/
+
+CREATE OR REPLACE TRIGGER trg_auditoria_avanzada_medicamentos
+AFTER INSERT OR UPDATE OR DELETE ON Medicamentos FOR EACH ROW
+DECLARE
+    v_accion VARCHAR2(500);
+    v_detalles VARCHAR2(2000) := ''; -- Aumentado para más detalles
+BEGIN
+    IF INSERTING THEN
+        v_accion := 'REGISTRO_NUEVO';
+        v_detalles := 'Stock inicial: ' || :NEW.stock || 
+                     ' | Precio Venta: S/.' || :NEW.precio_venta ||
+                     ' | Vence: ' || TO_CHAR(:NEW.fecha_vencimiento, 'DD/MM/YYYY') ||
+                     ' | Lote: ' || :NEW.lote;
+        
+    ELSIF DELETING THEN
+        v_accion := 'ELIMINACION_FISICA';
+        v_detalles := 'Se eliminó permanentemente el registro. ' ||
+                     'Último stock: ' || :OLD.stock ||
+                     ' | Último estado: ' || :OLD.estado ||
+                     ' | Lote: ' || :OLD.lote ||
+                     ' | Valor inventario perdido: S/.' || ROUND(:OLD.stock * :OLD.precio_compra, 2);
+
+    ELSIF UPDATING THEN
+        v_accion := 'ACTUALIZACION';
+        
+        -- Construir una cadena con todos los cambios detectados
+        IF :OLD.nombre != :NEW.nombre THEN
+            v_detalles := v_detalles || 'Nombre: "' || :OLD.nombre || '" -> "' || :NEW.nombre || '". ';
+        END IF;
+        IF :OLD.stock != :NEW.stock THEN
+            v_detalles := v_detalles || 'Stock: ' || :OLD.stock || ' -> ' || :NEW.stock || '. ';
+        END IF;
+        IF :OLD.precio_compra != :NEW.precio_compra THEN
+            v_detalles := v_detalles || 'P. Compra: ' || :OLD.precio_compra || ' -> ' || :NEW.precio_compra || '. ';
+        END IF;
+        IF :OLD.precio_venta != :NEW.precio_venta THEN
+            v_detalles := v_detalles || 'P. Venta: ' || :OLD.precio_venta || ' -> ' || :NEW.precio_venta || '. ';
+        END IF;
+        IF :OLD.estado != :NEW.estado THEN
+            v_detalles := v_detalles || 'Estado: "' || :OLD.estado || '" -> "' || :NEW.estado || '". ';
+        END IF;
+        IF :OLD.lote != :NEW.lote THEN
+            v_detalles := v_detalles || 'Lote: "' || :OLD.lote || '" -> "' || :NEW.lote || '". ';
+        END IF;
+        
+        -- Si no se detectó ningún cambio auditable, no se inserta nada
+        IF LENGTH(v_detalles) = 0 THEN
+            RETURN; -- Salir del trigger si no hay cambios relevantes
+        END IF;
+        
+        -- Si el único cambio es para marcar como inactivo, usar un mensaje más específico
+        IF :OLD.estado != 'Inactivo' AND :NEW.estado = 'Inactivo' AND v_detalles = 'Estado: "' || :OLD.estado || '" -> "' || :NEW.estado || '". ' THEN
+            v_accion := 'ELIMINACION_LOGICA';
+        END IF;
+        
+    END IF;
+
+    -- Encolar el registro de auditoría (se traslada a Auditoria_Medicamentos por lotes)
+    INSERT INTO Auditoria_Pendiente (
+        id_medicamento_afectado,
+        nombre_medicamento,
+        tipo_accion,
+        accion_realizada,
+        usuario_db,
+        fecha_accion
+    ) VALUES (
+        NVL(:NEW.id_medicamento, :OLD.id_medicamento), -- Usar NEW para INSERT/UPDATE, OLD para DELETE
+        NVL(:NEW.nombre, :OLD.nombre),
+        v_accion,
+        v_accion || ' - ' || v_detalles,
+        USER,
+        SYSTIMESTAMP
+    );
+    
+EXCEPTION
+    WHEN OTHERS THEN
+        -- No interfiere con la operación principal si la auditoría falla
+        DBMS_OUTPUT.PUT_LINE('Error en auditoría (no crítico): ' || SQLERRM);
+END;
+/
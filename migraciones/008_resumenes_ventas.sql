@@ -0,0 +1,124 @@
+-- ==========================================================
+-- MIGRACIÓN 008: RESÚMENES DIARIOS DE VENTAS
+-- Para bases creadas con una versión anterior de WalterW.sql
+-- (las instalaciones nuevas ya lo crean en las secciones 2.5, 3.4 y 3.5).
+-- Necesaria para los reportes de ventas, ingresos y más vendidos, y para la reposición sugerida.
+-- No depende de otras migraciones ni de los paquetes: crea las tablas y los triggers y las
+-- carga desde el historial de ventas. Después hay que volver a ejecutar las secciones 5 y 6
+-- (pkg_gestion_farmacia con p_reconstruir_resumenes_ventas y pkg_reportes_farmacia, que lee
+-- de estas tablas).
+-- ==========================================================
+
+CREATE TABLE Resumen_Ventas_Empleado (
+    dia               DATE NOT NULL,
+    dni_empleado      VARCHAR2(15) NOT NULL,
+    num_ventas        NUMBER(10) DEFAULT 0 NOT NULL,
+    total_dinero      NUMBER(14, 2) DEFAULT 0 NOT NULL,
+    CONSTRAINT pk_resumen_vta_emp PRIMARY KEY (dia, dni_empleado)
+);
+
+CREATE TABLE Resumen_Ventas_Cliente (
+    dia               DATE NOT NULL,
+    dni_cliente       VARCHAR2(15) NOT NULL,
+    num_compras       NUMBER(10) DEFAULT 0 NOT NULL,
+    total_gastado     NUMBER(14, 2) DEFAULT 0 NOT NULL,
+    CONSTRAINT pk_resumen_vta_cli PRIMARY KEY (dia, dni_cliente)
+);
+
+CREATE TABLE Resumen_Ventas_Medicamento (
+    dia               DATE NOT NULL,
+    id_medicamento    NUMBER(10) NOT NULL,
+    unidades          NUMBER(10) DEFAULT 0 NOT NULL,
+    importe           NUMBER(14, 2) DEFAULT 0 NOT NULL,
+    CONSTRAINT pk_resumen_vta_med PRIMARY KEY (dia, id_medicamento)
+);
+
+-- Mantenidos por triggers en la misma transacción de la venta
+CREATE OR REPLACE TRIGGER trg_resumen_ventas
+AFTER INSERT ON Ventas FOR EACH ROW
+BEGIN
+    -- Si otra venta del mismo día inserta la fila entre el ON y el INSERT del MERGE, este
+    -- falla con DUP_VAL_ON_INDEX: la fila ya existe y basta con sumarle la venta
+    BEGIN
+        MERGE INTO Resumen_Ventas_Empleado r
+        USING (SELECT TRUNC(:NEW.fecha_venta) AS dia, :NEW.dni_empleado AS dni FROM dual) s
+        ON (r.dia = s.dia AND r.dni_empleado = s.dni)
+        WHEN MATCHED THEN UPDATE SET num_ventas = num_ventas + 1, total_dinero = total_dinero + NVL(:NEW.total_venta, 0)
+        WHEN NOT MATCHED THEN INSERT (dia, dni_empleado, num_ventas, total_dinero) VALUES (s.dia, s.dni, 1, NVL(:NEW.total_venta, 0));
+    EXCEPTION
+        WHEN DUP_VAL_ON_INDEX THEN
+            UPDATE Resumen_Ventas_Empleado
+            SET num_ventas = num_ventas + 1, total_dinero = total_dinero + NVL(:NEW.total_venta, 0)
+            WHERE dia = TRUNC(:NEW.fecha_venta) AND dni_empleado = :NEW.dni_empleado;
+    END;
+
+    BEGIN
+        MERGE INTO Resumen_Ventas_Cliente r
+        USING (SELECT TRUNC(:NEW.fecha_venta) AS dia, :NEW.dni_cliente AS dni FROM dual) s
+        ON (r.dia = s.dia AND r.dni_cliente = s.dni)
+        WHEN MATCHED THEN UPDATE SET num_compras = num_compras + 1, total_gastado = total_gastado + NVL(:NEW.total_venta, 0)
+        WHEN NOT MATCHED THEN INSERT (dia, dni_cliente, num_compras, total_gastado) VALUES (s.dia, s.dni, 1, NVL(:NEW.total_venta, 0));
+    EXCEPTION
+        WHEN DUP_VAL_ON_INDEX THEN
+            UPDATE Resumen_Ventas_Cliente
+            SET num_compras = num_compras + 1, total_gastado = total_gastado + NVL(:NEW.total_venta, 0)
+            WHERE dia = TRUNC(:NEW.fecha_venta) AND dni_cliente = :NEW.dni_cliente;
+    END;
+END;
+/
+
+CREATE OR REPLACE TRIGGER trg_resumen_venta_detalle
+AFTER INSERT ON Venta_Detalle FOR EACH ROW
+DECLARE
+    v_dia DATE;
+BEGIN
+    SELECT TRUNC(fecha_venta) INTO v_dia FROM Ventas WHERE id_venta = :NEW.id_venta;
+
+    MERGE INTO Resumen_Ventas_Medicamento r
+    USING (SELECT v_dia AS dia, :NEW.id_medicamento AS id_med FROM dual) s
+    ON (r.dia = s.dia AND r.id_medicamento = s.id_med)
+    WHEN MATCHED THEN UPDATE SET unidades = unidades + :NEW.cantidad, importe = importe + :NEW.cantidad * :NEW.precio_unitario_venta
+    WHEN NOT MATCHED THEN INSERT (dia, id_medicamento, unidades, importe) VALUES (s.dia, s.id_med, :NEW.cantidad, :NEW.cantidad * :NEW.precio_unitario_venta);
+EXCEPTION
+    -- Primera venta del día del medicamento en dos cajas a la vez (ver trg_resumen_ventas)
+    WHEN DUP_VAL_ON_INDEX THEN
+        UPDATE Resumen_Ventas_Medicamento
+        SET unidades = unidades + :NEW.cantidad, importe = importe + :NEW.cantidad * :NEW.precio_unitario_venta
+        WHERE dia = v_dia AND id_medicamento = :NEW.id_medicamento;
+END;
+/
+
+-- Carga inicial. Si ya se aplicó el archivo histórico (migración 005) también se suman
+-- las ventas trasladadas a Ventas_Historico / Venta_Detalle_Historico. Las ventas quedan
+-- en espera hasta el COMMIT; lo que los triggers ya sumaron se vuelve a calcular desde cero
+DECLARE
+    v_ventas  VARCHAR2(400) := 'SELECT id_venta, fecha_venta, dni_empleado, dni_cliente, total_venta FROM Ventas';
+    v_detalle VARCHAR2(400) := 'SELECT id_venta, id_medicamento, cantidad, precio_unitario_venta FROM Venta_Detalle';
+    v_historico NUMBER;
+BEGIN
+    SELECT COUNT(*) INTO v_historico FROM user_tables WHERE table_name = 'VENTAS_HISTORICO';
+    LOCK TABLE Ventas, Venta_Detalle IN SHARE MODE;
+    IF v_historico > 0 THEN
+        EXECUTE IMMEDIATE 'LOCK TABLE Ventas_Historico, Venta_Detalle_Historico IN SHARE MODE';
+        v_ventas := v_ventas || ' UNION ALL SELECT id_venta, fecha_venta, dni_empleado, dni_cliente, total_venta FROM Ventas_Historico';
+        v_detalle := v_detalle || ' UNION ALL SELECT id_venta, id_medicamento, cantidad, precio_unitario_venta FROM Venta_Detalle_Historico';
+    END IF;
+    DELETE FROM Resumen_Ventas_Empleado;
+    DELETE FROM Resumen_Ventas_Cliente;
+    DELETE FROM Resumen_Ventas_Medicamento;
+
+    EXECUTE IMMEDIATE 'INSERT INTO Resumen_Ventas_Empleado (dia, dni_empleado, num_ventas, total_dinero)
+        SELECT TRUNC(fecha_venta), dni_empleado, COUNT(*), NVL(SUM(total_venta), 0)
+        FROM (' || v_ventas || ') GROUP BY TRUNC(fecha_venta), dni_empleado';
+
+    EXECUTE IMMEDIATE 'INSERT INTO Resumen_Ventas_Cliente (dia, dni_cliente, num_compras, total_gastado)
+        SELECT TRUNC(fecha_venta), dni_cliente, COUNT(*), NVL(SUM(total_venta), 0)
+        FROM (' || v_ventas || ') GROUP BY TRUNC(fecha_venta), dni_cliente';
+
+    EXECUTE IMMEDIATE 'INSERT INTO Resumen_Ventas_Medicamento (dia, id_medicamento, unidades, importe)
+        SELECT TRUNC(v.fecha_venta), d.id_medicamento, SUM(d.cantidad), SUM(d.cantidad * d.precio_unitario_venta)
+        FROM (' || v_detalle || ') d JOIN (' || v_ventas || ') v ON d.id_venta = v.id_venta
+        GROUP BY TRUNC(v.fecha_venta), d.id_medicamento';
+    COMMIT;
+END;
+/
@@ -0,0 +1,14 @@
+-- ==========================================================
+-- MIGRACIÓN 009: ÍNDICE PARA EL FILTRO POR NOMBRE
+-- Para bases creadas con una versión anterior de WalterW.sql
+-- (las instalaciones nuevas ya lo crean en la sección 2.6).
+-- ==========================================================
+
+-- GET /api/medicamentos?nombre= filtra con UPPER(m.nombre) LIKE 'PREFIJO%': sin un índice
+-- sobre la expresión, idx_medicamentos_nombre no sirve y cada página recorre Medicamentos
+CREATE INDEX idx_medicamentos_nombre_upper ON Medicamentos (UPPER(nombre), id_medicamento);
+
+BEGIN
+    DBMS_STATS.GATHER_TABLE_STATS(USER, 'MEDICAMENTOS', cascade => TRUE);
+END;
+/
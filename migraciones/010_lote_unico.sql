@@ -0,0 +1,91 @@
+-- ==========================================================
+-- MIGRACIÓN 010: LOTE ÚNICO POR MEDICAMENTO
+-- Para bases creadas con una versión anterior de WalterW.sql
+-- (las instalaciones nuevas ya lo crean en las secciones 2.6 y 3.2).
+-- Reemplaza a pkg_importacion (migración 003).
+-- ==========================================================
+
+-- El duplicado de lote y nombre pasa del trigger a idx_medicamentos_lote_nombre (UNIQUE).
+-- La consulta del trigger no veía las filas sin confirmar de otras sesiones y la importación
+-- la desactivaba con una variable de paquete que quedaba en la sesión del pool.
+-- Si la base ya tiene duplicados, el índice falla con ORA-01452; se listan con:
+--   SELECT lote, nombre, COUNT(*) FROM Medicamentos GROUP BY lote, nombre HAVING COUNT(*) > 1;
+-- y hay que corregir esos lotes antes de volver a ejecutar la migración.
+
+DECLARE
+    e_no_existe EXCEPTION;
+    PRAGMA EXCEPTION_INIT(e_no_existe, -1418);
+BEGIN
+    EXECUTE IMMEDIATE 'DROP INDEX idx_medicamentos_lote_nombre';
+EXCEPTION
+    WHEN e_no_existe THEN NULL;
+END;
+/
+
+CREATE UNIQUE INDEX idx_medicamentos_lote_nombre ON Medicamentos (lote, nombre);
+
+CREATE OR REPLACE TRIGGER trg_validar_medicamento_completo
+BEFORE INSERT OR UPDATE ON Medicamentos FOR EACH ROW
+DECLARE
+    v_dias_para_vencer NUMBER;
+BEGIN
+    -- No permitir cambios a registros lógicamente eliminados, a menos que se esté reactivando
+    IF :OLD.estado = 'Inactivo' AND :NEW.estado = 'Inactivo' THEN
+        RAISE_APPLICATION_ERROR(-20010, 'No se pueden modificar medicamentos marcados como Inactivos.');
+    END IF;
+    
+    -- 1. Validar fecha de vencimiento (no puede ser pasada)
+    IF :NEW.fecha_vencimiento < TRUNC(SYSDATE) THEN
+        RAISE_APPLICATION_ERROR(-20001, 
+            'No se puede registrar medicamento vencido. Fecha: ' || 
+            TO_CHAR(:NEW.fecha_vencimiento, 'DD/MM/YYYY'));
+    END IF;
+    
+    -- 2. Validar si está próximo a vencer (menos de 60 días)
+    v_dias_para_vencer := :NEW.fecha_vencimiento - TRUNC(SYSDATE);
+    IF v_dias_para_vencer <= 60 AND v_dias_para_vencer > 0 THEN
+        DBMS_OUTPUT.PUT_LINE('⚠️  ADVERTENCIA: ' || :NEW.nombre || 
+                            ' vence en ' || v_dias_para_vencer || ' días');
+    END IF;
+    
+    -- 3. Validar precios lógicos
+    IF :NEW.precio_venta <= :NEW.precio_compra THEN
+        RAISE_APPLICATION_ERROR(-20004, 
+            'Precio de venta debe ser mayor al precio de compra. ' ||
+            'Compra: S/.' || :NEW.precio_compra || ', Venta: S/.' || :NEW.precio_venta);
+    END IF;
+    
+    -- 4. Validar margen mínimo del 10%
+    IF ((:NEW.precio_venta - :NEW.precio_compra) / :NEW.precio_venta) < 0.10 THEN
+        RAISE_APPLICATION_ERROR(-20005, 
+            'Margen de ganancia muy bajo (menor al 10%). Ajuste los precios.');
+    END IF;
+    
+    -- 5. El duplicado de lote y nombre lo rechaza idx_medicamentos_lote_nombre (UNIQUE):
+    --    una consulta aquí no ve las filas de otras transacciones ni sirve en un INSERT por arreglos
+    
+    -- 6. GESTIÓN DE ESTADO CENTRALIZADA
+    -- Solo se gestiona el estado si no está siendo marcado como 'Inactivo' manualmente.
+    -- El estado 'Inactivo' tiene prioridad para borrados lógicos.
+    IF :NEW.estado != 'Inactivo' THEN
+        IF :NEW.stock <= 0 THEN
+            :NEW.estado := 'Agotado';
+        ELSE
+            -- Si el stock es positivo, siempre debe estar 'Activo'.
+            -- Esto también resuelve el caso de reponer stock a un producto 'Agotado'.
+            :NEW.estado := 'Activo';
+        END IF;
+    END IF;
+    
+END;
+/
+
+DECLARE
+    e_no_existe EXCEPTION;
+    PRAGMA EXCEPTION_INIT(e_no_existe, -4043);
+BEGIN
+    EXECUTE IMMEDIATE 'DROP PACKAGE pkg_importacion';
+EXCEPTION
+    WHEN e_no_existe THEN NULL;
+END;
+/
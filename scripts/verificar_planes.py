@@ -0,0 +1,333 @@
+"""Verificación de planes de ejecución (EXPLAIN PLAN) de todo el SQL de la aplicación.
+
+Recoge las sentencias que ejecuta la aplicación (registrando el SQL de todo cursor de
+oracledb mientras se llaman las rutas GET y las escrituras), las constantes SQL_* de src/
+y las de los triggers y paquetes de WalterW.sql, carga un conjunto de datos sintético del
+tamaño indicado y falla si algún plan recorre completo (TABLE ACCESS FULL) una tabla
+grande que no esté en la lista de permitidos.
+
+Uso (contra un esquema de pruebas, los datos sintéticos y las escrituras se confirman en la BD):
+    python scripts/verificar_planes.py --medicamentos 20000 --ventas 50000 --umbral 1000
+"""
+import argparse
+import importlib
+import inspect
+import os
+import random
+import re
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import oracledb
+from dotenv import load_dotenv
+
+# Recorridos completos esperados: listados/reportes que por diseño leen casi toda la tabla
+PERMITIDOS = {
+    "GET /api/medicamentos?todo=1": {"MEDICAMENTOS"},
+    "GET /api/reportes/resumen-general": {"MEDICAMENTOS"},
+    # Índice de búsqueda en memoria y catálogo de la reposición: leen todos los medicamentos
+    "GET /api/medicamentos/buscar?q=para": {"MEDICAMENTOS"},
+    "GET /api/reportes/reposicion": {"MEDICAMENTOS"},
+    "pkg_reportes_farmacia.p_reporte_medicamentos_por_categoria": {"MEDICAMENTOS"},
+    "pkg_reportes_farmacia.p_reporte_rentabilidad_productos": {"MEDICAMENTOS"},
+    "pkg_reportes_farmacia.p_reporte_medicamentos_sin_stock": {"MEDICAMENTOS"},
+    "pkg_gestion_farmacia.p_reconstruir_resumenes_ventas": {"VENTAS", "VENTA_DETALLE"},
+}
+
+# Rutas GET que se ejecutan para capturar el SQL de la aplicación (las escrituras, en _escrituras)
+RUTAS = [
+    "/api/medicamentos?limite=50",
+    "/api/medicamentos?limite=50&siguiente={token_med}",
+    "/api/medicamentos?estado=Activo&id_categoria=1&id_proveedor=1&nombre=Par&total=1",
+    "/api/medicamentos?vence_desde=2026-01-01&vence_hasta=2026-03-31",
+    "/api/medicamentos?todo=1",
+    "/api/medicamentos/1",
+    "/api/categorias",
+    "/api/proveedores",
+    "/api/empleados",
+    "/api/ventas?limite=50",
+    "/api/ventas?limite=50&siguiente={token_vta}",
+    "/api/ventas?desde=2025-01-01&hasta=2025-01-31&total=1",
+    "/api/ventas?dni_cliente=45678901&dni_empleado=12345678",
+    "/api/ventas/1",
+    "/api/reportes/resumen-general",
+    "/api/reportes/auditoria?limite=50",
+    "/api/reportes/auditoria?id_medicamento=1&desde=2025-01-01",
+    "/api/reportes/auditoria?tipo=ACTUALIZACION",
+    "/api/reportes/reposicion",
+    "/api/medicamentos/buscar?q=para",
+    "/api/medicamentos/cambios",
+    "/api/medicamentos/cambios?since={marca}",
+    "/api/compuesto?partes=medicamento,categorias,proveedores,empleados,resumen&id_medicamento=1",
+]
+
+
+# --- Datos sintéticos ---
+
+def cargar_datos(conn, n_medicamentos, n_ventas):
+    cur = conn.cursor()
+    cur.execute("SELECT id_categoria FROM Categorias")
+    categorias = [r[0] for r in cur]
+    cur.execute("SELECT id_proveedor FROM Proveedores")
+    proveedores = [r[0] for r in cur]
+    cur.execute("SELECT dni FROM Clientes")
+    clientes = [r[0] for r in cur]
+    cur.execute("SELECT dni FROM Empleados")
+    empleados = [r[0] for r in cur]
+
+    tablas = ("Medicamentos", "Ventas", "Venta_Detalle")
+    for tabla in tablas:
+        cur.execute(f"ALTER TABLE {tabla} DISABLE ALL TRIGGERS")
+    try:
+        hoy = datetime.now()
+        filas = []
+        for i in range(n_medicamentos):
+            compra = round(random.uniform(0.5, 50), 2)
+            filas.append((f"SINT-{i:07d}", random.choice(categorias), random.choice(proveedores),
+                          random.randint(0, 500), compra, round(compra * random.uniform(1.2, 2.5), 2),
+                          hoy + timedelta(days=random.randint(1, 900)), f"LOTE-S{i:07d}",
+                          random.choice(("Activo", "Activo", "Activo", "Agotado", "Inactivo"))))
+        cur.executemany("""INSERT INTO Medicamentos (nombre, id_categoria, id_proveedor, stock, precio_compra,
+                               precio_venta, fecha_vencimiento, lote, estado)
+                           VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9)""", filas)
+        cur.execute("SELECT MIN(id_medicamento), MAX(id_medicamento) FROM Medicamentos")
+        id_min, id_max = cur.fetchone()
+
+        for inicio in range(0, n_ventas, 1000):
+            ventas = [(random.choice(clientes), random.choice(empleados),
+                       hoy - timedelta(days=random.randint(0, 730), seconds=random.randint(0, 86399)),
+                       round(random.uniform(1, 300), 2))
+                      for _ in range(min(1000, n_ventas - inicio))]
+            ids = cur.var(oracledb.NUMBER, arraysize=len(ventas))
+            cur.setinputsizes(None, None, None, None, ids)
+            cur.executemany("""INSERT INTO Ventas (dni_cliente, dni_empleado, fecha_venta, total_venta)
+                               VALUES (:1, :2, :3, :4) RETURNING id_venta INTO :5""", ventas)
+            detalles = [(int(ids.getvalue(i)[0]), random.randint(id_min, id_max), random.randint(1, 5),
+                         round(random.uniform(1, 60), 2))
+                        for i in range(len(ventas)) for _ in range(random.randint(1, 4))]
+            cur.executemany("""INSERT INTO Venta_Detalle (id_venta, id_medicamento, cantidad, precio_unitario_venta)
+                               VALUES (:1, :2, :3, :4)""", detalles)
+        conn.commit()
+    finally:
+        for tabla in tablas:
+            cur.execute(f"ALTER TABLE {tabla} ENABLE ALL TRIGGERS")
+
+    cur.callproc("pkg_gestion_farmacia.p_reconstruir_resumenes_ventas")
+    cur.callproc("DBMS_STATS.GATHER_SCHEMA_STATS", [conn.username.upper()])
+
+
+# --- Recolección de sentencias ---
+
+def _grabador(original, registro):
+    if inspect.iscoroutinefunction(original):
+        async def execute_async(cursor, sql, *args, **kwargs):
+            if isinstance(sql, str):
+                registro.append(sql)
+            return await original(cursor, sql, *args, **kwargs)
+        return execute_async
+
+    def execute(cursor, sql, *args, **kwargs):
+        if isinstance(sql, str):
+            registro.append(sql)
+        return original(cursor, sql, *args, **kwargs)
+    return execute
+
+
+@contextmanager
+def grabando(registro):
+    """Registra el SQL de todo cursor de oracledb: pool de las solicitudes, pool asíncrono
+    de /api/compuesto y conexiones abiertas por los módulos fuera de los blueprints."""
+    originales = {(clase, metodo): getattr(clase, metodo)
+                  for clase in (oracledb.Cursor, oracledb.AsyncCursor) for metodo in ("execute", "executemany")
+                  if hasattr(clase, metodo)}
+    for (clase, metodo), original in originales.items():
+        setattr(clase, metodo, _grabador(original, registro))
+    try:
+        yield
+    finally:
+        for (clase, metodo), original in originales.items():
+            setattr(clase, metodo, original)
+
+
+def _pedir(cliente, metodo, ruta, **kwargs):
+    respuesta = cliente.open(ruta, method=metodo, **kwargs)
+    respuesta.get_data()
+    if respuesta.status_code >= (500 if metodo == "GET" else 400):
+        print(f"AVISO: {metodo} {ruta} respondió {respuesta.status_code}")
+    return respuesta
+
+
+def _escrituras(cliente):
+    """(etiqueta, método, ruta, kwargs) de las escrituras: un medicamento nuevo que se edita y se
+    da de baja, una importación de dos filas y una venta repetida con la misma Idempotency-Key."""
+    sufijo = datetime.now().strftime("%Y%m%d%H%M%S")
+    nombre, vence = f"VERIF PLANES {sufijo}", (datetime.now() + timedelta(days=400)).strftime("%Y-%m-%d")
+    yield "POST /api/medicamentos", "POST", "/api/medicamentos", {"json": {
+        "p_nombre": nombre, "p_id_categoria": 1, "p_stock": 10, "p_precio_compra": 1,
+        "p_precio_venta": 2, "p_fecha_vencimiento": vence, "p_lote": f"VP-{sufijo}"}}
+    datos = cliente.get("/api/medicamentos", query_string={"nombre": nombre, "limite": 1}).get_json()["datos"]
+    if datos:
+        ruta = f"/api/medicamentos/{datos[0]['id_medicamento']}"
+        yield "PUT /api/medicamentos/<id>/precio", "PUT", ruta + "/precio", {"json": {
+            "nuevo_precio_compra": 1.5, "nuevo_precio_venta": 3}}
+        yield "PATCH /api/medicamentos/<id>/stock", "PATCH", ruta + "/stock", {"json": {"cantidad_agregada": 5}}
+        yield "PUT /api/medicamentos/<id>", "PUT", ruta, {"json": {
+            "nombre": nombre, "id_categoria": 1, "stock": 15, "precio_compra": 1.5, "precio_venta": 3,
+            "fecha_vencimiento": vence, "lote": f"VP-{sufijo}-2"}}
+        yield "PATCH /api/medicamentos/<id>/estado", "PATCH", ruta + "/estado", {"json": {"estado": "Inactivo"}}
+        yield "PATCH /api/medicamentos/<id>/estado", "PATCH", ruta + "/estado", {"json": {"estado": "Activo"}}
+        yield "DELETE /api/medicamentos/<id>", "DELETE", ruta, {}
+    csv = "nombre,id_categoria,stock,precio_compra,precio_venta,fecha_vencimiento,lote\n" + "".join(
+        f"{nombre} IMP{i},1,10,1,2,{vence},VP-{sufijo}-I{i}\n" for i in range(2))
+    yield "POST /api/medicamentos/importar", "POST", "/api/medicamentos/importar", {
+        "data": csv, "content_type": "text/csv"}
+
+    disponibles = [m for m in cliente.get("/api/medicamentos?estado=Activo&limite=50").get_json()["datos"]
+                   if m["stock"] > 0]
+    empleados = cliente.get("/api/empleados").get_json()["datos"]
+    if disponibles and empleados:
+        medicamento = disponibles[0]
+        venta = {"cliente": {"dni": "79999999", "nombre": "Verificacion", "apellido_paterno": "Planes"},
+                 "dni_empleado": empleados[0]["dni"], "total_venta": medicamento["precio_venta"],
+                 "detalles": [{"id_medicamento": medicamento["id_medicamento"], "cantidad": 1,
+                               "precio_unitario_venta": medicamento["precio_venta"]}]}
+        for _ in range(2):
+            yield "POST /api/ventas", "POST", "/api/ventas", {"json": venta,
+                                                               "headers": {"Idempotency-Key": f"VP-{sufijo}"}}
+
+
+def sentencias_constantes():
+    """Constantes SQL_* de los módulos de src/ (las plantillas con {} se cubren al ejecutarse)."""
+    sentencias = {}
+    # src/ y src/blueprints no tienen __init__.py: se recorren los archivos
+    for carpeta, _, archivos in sorted(os.walk(os.path.join(RAIZ, "src"))):
+        paquete = os.path.relpath(carpeta, RAIZ).replace(os.sep, ".")
+        for archivo in sorted(a for a in archivos if a.endswith(".py")):
+            modulo = importlib.import_module(f"{paquete}.{archivo[:-3]}")
+            for nombre, valor in vars(modulo).items():
+                if nombre.startswith("SQL_") and isinstance(valor, str) and "{" not in valor:
+                    sentencias.setdefault(" ".join(valor.split()), f"{modulo.__name__}.{nombre}")
+    return sentencias
+
+
+def sentencias_aplicacion():
+    """Sentencias que ejecuta la aplicación, capturadas en el cursor mientras se llama a las
+    rutas de RUTAS y a las escrituras (se confirman en la BD, como los datos sintéticos)."""
+    # Todo a la primaria: los planes se verifican sobre los datos recién cargados
+    os.environ["DB_DSN_LECTURA"] = ""
+    import main
+    from src.cambios import codificar_marcas
+    from src.paginacion import codificar_token
+
+    tokens = {"token_med": codificar_token(["M", 1]),
+              "token_vta": codificar_token([datetime.now(), 10 ** 9]),
+              "marca": codificar_marcas(0, 0)}
+    app = main.create_app(segundo_plano=False)
+    cliente = app.test_client()
+    registro, sentencias = [], {}
+
+    def anotar(etiqueta):
+        for sql in registro:
+            sentencias.setdefault(" ".join(sql.split()), etiqueta)
+        del registro[:]
+
+    with grabando(registro):
+        for ruta in RUTAS:
+            ruta = ruta.format(**tokens)
+            _pedir(cliente, "GET", ruta)
+            anotar("GET " + ruta.split("&siguiente")[0])
+        for etiqueta, metodo, ruta, kwargs in _escrituras(cliente):
+            anotar("(lecturas previas a las escrituras)")
+            _pedir(cliente, metodo, ruta, **kwargs)
+            anotar(etiqueta)
+    return sentencias
+
+
+_SENTENCIA = re.compile(r"^\s*((?:SELECT|INSERT|UPDATE|DELETE|MERGE)\b.*?);", re.S | re.M | re.I)
+
+
+def _a_binds(sql):
+    sql = re.sub(r":(NEW|OLD)\.(\w+)", lambda m: f":{m.group(1).lower()}_{m.group(2)}", sql)
+    sql = re.sub(r"(?<![:.\w])([pv]_\w+)\(\w+\)", r":\1", sql)
+    sql = re.sub(r"(?<![:.\w])([pv]_\w+)\b", r":\1", sql)
+    sql = re.sub(r"\s+RETURNING\s+.*$", "", sql, flags=re.S | re.I)
+    if re.match(r"\s*SELECT\b", sql, re.I):
+        sql = re.sub(r"\bINTO\b.*?\bFROM\b", "FROM", sql, count=1, flags=re.S | re.I)
+    return " ".join(sql.split())
+
+
+def sentencias_paquetes(ruta_sql):
+    with open(ruta_sql, encoding="utf-8") as f:
+        script = f.read()
+    sentencias = {}
+    for bloque in re.finditer(r"CREATE OR REPLACE (TRIGGER|PACKAGE BODY) (\w+)(.*?)\n/\n", script, re.S):
+        nombre, cuerpo = bloque.group(2), re.sub(r"--[^\n]*", "", bloque.group(3))
+        for sentencia in _SENTENCIA.finditer(cuerpo):
+            procedimientos = re.findall(r"PROCEDURE (\w+)", cuerpo[:sentencia.start()])
+            etiqueta = f"{nombre}.{procedimientos[-1]}" if procedimientos and bloque.group(1) != "TRIGGER" else nombre
+            sentencias.setdefault(_a_binds(sentencia.group(1)), etiqueta)
+    return sentencias
+
+
+# --- Verificación ---
+
+def verificar(conn, sentencias, umbral):
+    cur = conn.cursor()
+    cur.execute("SELECT table_name, NVL(num_rows, 0) FROM user_tables")
+    filas_por_tabla = dict(cur.fetchall())
+    fallos, errores = [], []
+    for i, (sql, etiqueta) in enumerate(sentencias.items()):
+        id_plan = f"vp{i}"
+        try:
+            cur.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{id_plan}' FOR {sql}")
+        except oracledb.Error as e:
+            errores.append((etiqueta, sql, str(e).splitlines()[0]))
+            continue
+        cur.execute("""SELECT object_name FROM plan_table
+                       WHERE statement_id = :id AND operation = 'TABLE ACCESS' AND options = 'FULL'""",
+                    {"id": id_plan})
+        for (tabla,) in cur.fetchall():
+            if filas_por_tabla.get(tabla, 0) >= umbral and tabla not in PERMITIDOS.get(etiqueta, set()):
+                fallos.append((etiqueta, tabla, filas_por_tabla[tabla], sql))
+        cur.execute("DELETE FROM plan_table WHERE statement_id = :id", {"id": id_plan})
+    conn.rollback()
+    return fallos, errores
+
+
+def main():
+    load_dotenv(os.path.join(RAIZ, ".env"))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--medicamentos", type=int, default=20000, help="medicamentos sintéticos a cargar")
+    parser.add_argument("--ventas", type=int, default=50000, help="ventas sintéticas a cargar")
+    parser.add_argument("--umbral", type=int, default=1000, help="filas a partir de las cuales una tabla es grande")
+    parser.add_argument("--sin-datos", action="store_true", help="no cargar datos (usar los existentes)")
+    args = parser.parse_args()
+
+    conn = oracledb.connect(user=os.environ.get("DB_USER"), password=os.environ.get("DB_PASSWORD"),
+                            dsn=os.environ.get("DB_DSN"))
+    if not args.sin_datos:
+        print(f"Cargando {args.medicamentos} medicamentos y {args.ventas} ventas sintéticas...")
+        cargar_datos(conn, args.medicamentos, args.ventas)
+
+    sentencias = sentencias_paquetes(os.path.join(RAIZ, "WalterW.sql"))
+    sentencias.update(sentencias_aplicacion())
+    for sql, etiqueta in sentencias_constantes().items():
+        sentencias.setdefault(sql, etiqueta)
+    fallos, errores = verificar(conn, sentencias, args.umbral)
+
+    print(f"{len(sentencias)} sentencias analizadas")
+    for etiqueta, sql, error in errores:
+        print(f"ERROR EXPLAIN [{etiqueta}] {error}\n    {sql[:200]}")
+    for etiqueta, tabla, filas, sql in fallos:
+        print(f"FULL SCAN [{etiqueta}] {tabla} ({filas} filas)\n    {sql[:200]}")
+    if fallos or errores:
+        sys.exit(1)
+    print("OK: ningún recorrido completo inesperado sobre tablas grandes")
+
+
+if __name__ == "__main__":
+    main()
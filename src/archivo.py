@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+import oracledb
+from src.db import get_pool
+
+# Archivo histórico (sección 2.8 de WalterW.sql). Las ventas y la auditoría anteriores al corte
+# de cada tabla pasan por lotes a Ventas_Historico / Venta_Detalle_Historico / Auditoria_Historico,
+# de modo que las tablas calientes guardan solo los últimos ARCHIVO_RETENCION_DIAS (más el mes
+# en curso). Las consultas se dividen en dos tramos por fecha:
+#  - caliente: la tabla normal desde el corte
+#  - frío:     lo anterior al corte, en la tabla histórica o aún sin trasladar
+# y el tramo frío solo se consulta si el rango pedido llega a antes del corte.
+PROCEDIMIENTOS = {
+    'VENTAS': "pkg_gestion_farmacia.p_archivar_ventas",
+    'AUDITORIA': "pkg_gestion_farmacia.p_archivar_auditoria",
+}
+SQL_CORTES = "SELECT tabla, corte FROM Archivo_Corte"
+VENTAS_FRIO = """(
+    SELECT id_venta, dni_cliente, dni_empleado, fecha_venta, total_venta FROM Ventas WHERE fecha_venta < :corte
+    UNION ALL
+    SELECT id_venta, dni_cliente, dni_empleado, fecha_venta, total_venta FROM Ventas_Historico
+)"""
+AUDITORIA_FRIO = """(
+    SELECT id_auditoria, id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada,
+           usuario_db, fecha_accion
+    FROM Auditoria_Medicamentos WHERE fecha_accion < :corte
+    UNION ALL
+    SELECT id_auditoria, id_medicamento_afectado, nombre_medicamento, tipo_accion, accion_realizada,
+           usuario_db, fecha_accion
+    FROM Auditoria_Historico
+)"""
+# Segundos que un proceso reutiliza los cortes leídos. El traslado espera ARCHIVO_MARGEN
+# segundos antes de usar un corte nuevo, así que ARCHIVO_MARGEN debe ser mayor.
+CORTE_VIGENCIA = 60
+
+_cortes = {}
+_leidos = None
+_stats = {tabla: {"movidas": 0, "lecturas_frias": 0} for tabla in PROCEDIMIENTOS}
+_lock = threading.Lock()
+
+
+def _reiniciar_tras_fork():
+    global _leidos, _lock
+    _cortes.clear()
+    _leidos, _lock = None, threading.Lock()
+    for stats in _stats.values():
+        stats.update(movidas=0, lecturas_frias=0)
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def corte(connection, tabla):
+    """Fecha desde la que las filas de `tabla` ('VENTAS' o 'AUDITORIA') están en la tabla caliente."""
+    global _leidos
+    with _lock:
+        if _leidos is not None and time.monotonic() - _leidos <= CORTE_VIGENCIA:
+            return _cortes[tabla]
+    cursor = connection.cursor()
+    cursor.execute(SQL_CORTES)
+    cortes = dict(cursor.fetchall())
+    with _lock:
+        _cortes.update(cortes)
+        _leidos = time.monotonic()
+    return cortes[tabla]
+
+
+def tramos(corte, desde=None, hasta=None, antes_de=None):
+    """Tramos a consultar, del más reciente al más antiguo: 'caliente' y/o 'frio'.
+
+    desde: límite inferior inclusivo; hasta: límite superior exclusivo; antes_de: fecha de la
+    clave de paginación (orden descendente).
+    """
+    lista = []
+    if not ((hasta is not None and hasta <= corte) or (antes_de is not None and antes_de < corte)):
+        lista.append('caliente')
+    if desde is None or desde < corte:
+        lista.append('frio')
+    return lista
+
+
+def registrar_lectura_fria(tabla):
+    with _lock:
+        _stats[tabla]["lecturas_frias"] += 1
+
+
+def archivar_lote(tabla, dias, margen, lote):
+    """Traslada un lote de `tabla` a su tabla histórica; devuelve cuántas filas movió."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        cursor = conn.cursor()
+        movidos_var = cursor.var(oracledb.NUMBER)
+        cursor.callproc(PROCEDIMIENTOS[tabla], [dias, margen, lote, movidos_var])
+        movidos = int(movidos_var.getvalue() or 0)
+    finally:
+        pool.release(conn)
+    with _lock:
+        _stats[tabla]["movidas"] += movidos
+    return movidos
+
+
+def get_archivo_stats():
+    with _lock:
+        return {tabla.lower(): dict(stats) for tabla, stats in _stats.items()}
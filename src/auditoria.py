@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+import oracledb
+from src.archivo import PROCEDIMIENTOS as TABLAS_ARCHIVO, archivar_lote
+from src.db import get_pool
+
+# Hilo de fondo que traslada los eventos de Auditoria_Pendiente (escritos por los
+# triggers) a Auditoria_Medicamentos en lotes, fuera de las transacciones de venta.
+# Cada PURGA_INTERVALO segundos también borra las Idempotency-Key de ventas vencidas, y cada
+# ARCHIVO_INTERVALO traslada al archivo histórico las ventas y la auditoría fuera de la retención.
+PURGA_INTERVALO = 600
+_hilo = None
+_hilo_lock = threading.Lock()
+_detener = threading.Event()
+
+
+def _reiniciar_tras_fork():
+    # Los hilos no sobreviven al fork: cada worker arranca el suyo (ver src/servidor.py)
+    global _hilo, _hilo_lock, _detener
+    _hilo, _hilo_lock, _detener = None, threading.Lock(), threading.Event()
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def drenar_auditoria(lote):
+    """Drena la cola completa en lotes de `lote` filas; devuelve cuántos eventos movió."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        cursor = conn.cursor()
+        movidos_var = cursor.var(oracledb.NUMBER)
+        total = 0
+        while True:
+            cursor.callproc("pkg_gestion_farmacia.p_drenar_auditoria", [lote, movidos_var])
+            movidos = int(movidos_var.getvalue() or 0)
+            total += movidos
+            if movidos < lote:
+                return total
+    finally:
+        pool.release(conn)
+
+
+def purgar_idempotencia(horas):
+    """Borra las claves de idempotencia de ventas con más de `horas` horas; devuelve cuántas."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        cursor = conn.cursor()
+        borrados_var = cursor.var(oracledb.NUMBER)
+        cursor.callproc("pkg_gestion_farmacia.p_purgar_idempotencia", [horas, borrados_var])
+        return int(borrados_var.getvalue() or 0)
+    finally:
+        pool.release(conn)
+
+
+def archivar(dias, margen, lote):
+    """Traslada por lotes lo que quedó fuera de la retención; devuelve las filas movidas por tabla.
+
+    Se detiene entre lotes si el worker se está apagando: la siguiente ejecución continúa.
+    """
+    movidas = {}
+    for tabla in TABLAS_ARCHIVO:
+        movidas[tabla] = 0
+        while not _detener.is_set():
+            movidos = archivar_lote(tabla, dias, margen, lote)
+            movidas[tabla] += movidos
+            if movidos < lote:
+                break
+    return movidas
+
+
+def _bucle_drenado(app):
+    with app.app_context():
+        intervalo = app.config.get('AUDITORIA_INTERVALO', 5)
+        lote = app.config.get('AUDITORIA_LOTE', 500)
+        horas = app.config.get('VENTAS_IDEMPOTENCIA_HORAS', 24)
+        retencion = app.config.get('ARCHIVO_RETENCION_DIAS', 365)
+        proxima_purga = proximo_archivo = 0.0
+        while not _detener.is_set():
+            try:
+                drenar_auditoria(lote)
+                if time.monotonic() >= proxima_purga:
+                    purgar_idempotencia(horas)
+                    proxima_purga = time.monotonic() + PURGA_INTERVALO
+            except oracledb.Error as e:
+                print(f"Error al drenar auditoría: {e}")
+            if retencion > 0 and time.monotonic() >= proximo_archivo:
+                proximo_archivo = time.monotonic() + app.config.get('ARCHIVO_INTERVALO', 3600)
+                try:
+                    archivar(retencion, app.config.get('ARCHIVO_MARGEN', 300), app.config.get('ARCHIVO_LOTE', 1000))
+                except oracledb.Error as e:
+                    print(f"Error al archivar historial: {e}")
+            _detener.wait(intervalo)
+
+
+def iniciar_drenado_auditoria(app):
+    global _hilo
+    if not app.config.get('AUDITORIA_DRENADO', True):
+        return
+    with _hilo_lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_bucle_drenado, args=(app,), daemon=True, name='drenado-auditoria')
+            _hilo.start()
+
+
+def detener_drenado_auditoria(timeout=10):
+    """Detiene el hilo de drenado (apagado del worker) y espera a que termine su lote."""
+    global _hilo
+    with _hilo_lock:
+        hilo, _hilo = _hilo, None
+    if hilo is not None:
+        _detener.set()
+        hilo.join(timeout)
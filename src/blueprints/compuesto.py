@@ -0,0 +1,113 @@
+from flask import Blueprint, jsonify, request, current_app
+from src.db_async import Consulta, ejecutar_concurrente
+from src.blueprints.gestion import SQL_MEDICAMENTO, SQL_CATEGORIAS, SQL_PROVEEDORES, SQL_EMPLEADOS, catalogo
+from src.blueprints.reportes import PROCEDIMIENTOS_REPORTE, SQL_RESUMEN
+from src.paginacion import leer_fecha
+from src.replica import requerir_al_dia
+import oracledb
+import time
+
+compuesto_bp = Blueprint('compuesto', __name__, url_prefix='/api')
+
+# Búsquedas disponibles además de los reportes (por su nombre en /api/reportes/<nombre>)
+BUSQUEDAS = {
+    'categorias': SQL_CATEGORIAS,
+    'proveedores': SQL_PROVEEDORES,
+    'empleados': SQL_EMPLEADOS,
+}
+
+# Cada parte ocupa una conexión del pool asíncrono mientras dura. Como las demás lecturas,
+# la consulta compuesta va a la réplica cuando está al día (src/replica.py)
+MAX_PARTES = 8
+
+
+def _clave_catalogo(nombre, args):
+    if nombre == 'medicamento':
+        return ('medicamento', args.get('id_medicamento', type=int))
+    return (nombre,) if nombre in BUSQUEDAS else None
+
+
+def _consulta(nombre, args):
+    if nombre == 'medicamento':
+        id_medicamento = args.get('id_medicamento', type=int)
+        if id_medicamento is None:
+            raise ValueError("La parte 'medicamento' requiere ?id_medicamento")
+        return Consulta(SQL_MEDICAMENTO, {'id': id_medicamento}, una_fila=True)
+    if nombre == 'resumen':
+        return Consulta(SQL_RESUMEN, una_fila=True)
+    if nombre in BUSQUEDAS:
+        return Consulta(BUSQUEDAS[nombre])
+    if nombre in PROCEDIMIENTOS_REPORTE:
+        proc, tipo = PROCEDIMIENTOS_REPORTE[nombre]
+        params = []
+        if tipo == 'dias':
+            params = [args.get('dias', default=30, type=int)]
+        elif tipo == 'rango':
+            params = [leer_fecha(args, 'desde'), leer_fecha(args, 'hasta')]
+        return Consulta(proc=proc, params=params)
+    raise ValueError(f"Parte desconocida: {nombre}")
+
+
+# --- CONSULTA COMPUESTA ---
+# GET /api/compuesto?partes=medicamento,categorias,proveedores&id_medicamento=5
+# Ejecuta las partes en paralelo y devuelve {"datos": {parte: ...}} en una sola respuesta;
+# la latencia total se acerca a la de la parte más lenta. Parámetros compartidos:
+# id_medicamento, dias, desde, hasta. Las partes que fallan se informan en "errores".
+@compuesto_bp.route('/compuesto', methods=['GET'])
+def consulta_compuesta():
+    nombres = [p.strip() for p in request.args.get('partes', '').split(',') if p.strip()]
+    nombres = list(dict.fromkeys(nombres))
+    if not nombres:
+        return jsonify({"estado": "error", "mensaje": "Indique ?partes=nombre1,nombre2"}), 400
+    if len(nombres) > MAX_PARTES:
+        return jsonify({"estado": "error", "mensaje": f"Máximo {MAX_PARTES} partes por solicitud"}), 400
+    try:
+        consultas = {nombre: _consulta(nombre, request.args) for nombre in nombres}
+    except ValueError as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), 400
+
+    inicio = time.perf_counter()
+    # Las búsquedas que ya están en la caché del catálogo no van a la BD. El medicamento sí:
+    # su stock cambia con ventas de otros workers y la consulta corre en paralelo con las
+    # demás partes (de paso renueva la copia en caché)
+    en_cache, fichas = {}, {}
+    for nombre in list(consultas):
+        clave = _clave_catalogo(nombre, request.args)
+        if clave is None:
+            continue
+        entrada = catalogo.leer(clave) if nombre != 'medicamento' else None
+        if entrada is not None:
+            en_cache[nombre] = entrada.datos
+            del consultas[nombre]
+        else:
+            fichas[nombre] = (clave, catalogo.ficha(clave))
+
+    if fichas:
+        # Lo que se guarda en la caché no puede venir de una réplica anterior a su invalidación
+        requerir_al_dia(catalogo.ultima_invalidacion())
+    datos, errores, tiempos = {}, {}, {}
+    if consultas:
+        try:
+            datos, errores, tiempos = ejecutar_concurrente(
+                consultas,
+                arraysize=current_app.config.get('REPORTE_ARRAYSIZE', 500),
+                timeout=current_app.config.get('COMPUESTO_TIMEOUT', 30))
+        except oracledb.Error as e:
+            print(f"Error BD: {e}")
+            return jsonify({"estado": "error", "mensaje": "Sin conexión"}), 503
+    for nombre, (clave, ficha) in fichas.items():
+        if datos.get(nombre) is not None:
+            catalogo.guardar(clave, datos[nombre], ficha)
+    for nombre, valor in en_cache.items():
+        datos[nombre], tiempos[nombre] = valor, 0.0
+    total_ms = round((time.perf_counter() - inicio) * 1000, 3)
+
+    if 'medicamento' in datos and datos['medicamento'] is None:
+        del datos['medicamento']
+        errores['medicamento'] = "No encontrado"
+
+    respuesta = {"estado": "exito" if datos else "error", "datos": datos,
+                 "tiempos_ms": tiempos, "total_ms": total_ms}
+    if errores:
+        respuesta["errores"] = errores
+    return jsonify(respuesta), 200 if datos else 500
@@ -1,18 +1,138 @@
-from flask import Blueprint, jsonify, request
-from src.db import get_db_connection
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context
+from src.db import PRIMARIA, get_db_connection
+from src.busqueda import buscar
+from src.cache import CacheLectura, ErrorCarga
+from src.cambios import (abrir_suscripcion, cerrar_suscripcion, codificar_marcas, generar_stream,
+                         leer_cambios, leer_marcas, version_actual)
+from src.eventos import notificar_cambio, suscribir
+from src.filas import ajustar_lectura, columnas, como_dicts, leer_forma, respuesta_lista
+from src.importacion import Importacion, ErrorImportacion, detectar_formato, leer_csv, leer_json, lote_duplicado
+from src.paginacion import (codificar_token, decodificar_token, leer_limite, leer_flag,
+                             leer_fecha, dia_siguiente, escapar_like)
+from src.servidor import operacion_critica
 import oracledb
 
 gestion_bp = Blueprint('gestion', __name__, url_prefix='/api')
 
+# Consultas de búsqueda (también las usa /api/compuesto)
+SQL_MEDICAMENTO = """
+    SELECT id_medicamento, nombre, id_categoria, id_proveedor, stock, 
+           precio_compra, precio_venta, 
+           TO_CHAR(fecha_vencimiento, 'YYYY-MM-DD') as fecha_vencimiento, 
+           lote, ubicacion, descripcion, version_cambio 
+    FROM Medicamentos 
+    WHERE id_medicamento = :id
+"""
+# version_cambio cambia con cada venta, reposición o cambio de precio o estado (trg_version_medicamento)
+SQL_VERSION_MEDICAMENTO = "SELECT version_cambio FROM Medicamentos WHERE id_medicamento = :id"
+SQL_CATEGORIAS = "SELECT id_categoria, nombre FROM Categorias ORDER BY nombre"
+SQL_PROVEEDORES = "SELECT id_proveedor, nombre, estado FROM Proveedores ORDER BY nombre"
+SQL_EMPLEADOS = """
+    SELECT e.dni, u.nombre, u.apellido_paterno 
+    FROM Empleados e 
+    JOIN Usuarios u ON e.dni = u.dni 
+    ORDER BY u.nombre ASC
+"""
+
+# Caché de las búsquedas anteriores. Claves: ('medicamento', id), ('categorias',),
+# ('proveedores',) y ('empleados',). También la consulta /api/compuesto. El stock de un
+# medicamento cambia con las ventas de cualquier worker: cada acierto de ('medicamento', id)
+# se confirma con su version_cambio (ver medicamento_vigente).
+catalogo = CacheLectura('catalogo', 'CACHE_CATALOGO_TTL', 'CACHE_CATALOGO_MAX')
+
+# Resultados por búsqueda del autocompletado
+LIMITE_BUSQUEDA = 20
+LIMITE_BUSQUEDA_MAXIMO = 50
+
+
+def _invalidar_catalogo(tabla, id):
+    if tabla == 'Medicamentos':
+        if id is None:
+            catalogo.invalidar(lambda clave, datos: clave[0] == 'medicamento')
+        else:
+            catalogo.invalidar_clave(('medicamento', int(id)))
+    elif tabla == 'Usuarios':
+        # Una venta actualiza el nombre del cliente: solo importa si ese DNI es de un empleado
+        catalogo.invalidar_clave_si(('empleados',), lambda datos: id is None or any(e['dni'] == id for e in datos))
+    else:
+        catalogo.invalidar_clave((tabla.lower(),))
+
+
+for _tabla in ('Medicamentos', 'Categorias', 'Proveedores', 'Empleados', 'Usuarios'):
+    suscribir(_tabla, _invalidar_catalogo)
+
+
+def medicamento_vigente(datos):
+    """True si la fila en caché sigue siendo la última versión del medicamento."""
+    connection = get_db_connection()
+    if not connection: raise ErrorCarga("Sin conexion", 503)
+    cursor = connection.cursor()
+    cursor.execute(SQL_VERSION_MEDICAMENTO, {'id': datos['id_medicamento']})
+    fila = cursor.fetchone()
+    # Una réplica atrasada puede devolver una versión anterior a la guardada: sigue vigente
+    return fila is not None and (fila[0] or 0) <= (datos['version_cambio'] or 0)
+
+
+def _consultar(sql, params=None):
+    connection = get_db_connection()
+    if not connection: raise ErrorCarga("Sin conexion", 503)
+    cursor = connection.cursor()
+    ajustar_lectura(cursor)
+    cursor.execute(sql, params or {})
+    return como_dicts(columnas(cursor), cursor.fetchall())
+
 
 # --- LISTAR MEDICAMENTOS ---
+# Paginado por clave (nombre, id_medicamento) con ?limite y ?siguiente=<token>. Filtros opcionales: estado, id_categoria,
+# id_proveedor, nombre (prefijo), vence_desde / vence_hasta (YYYY-MM-DD).
+# ?todo=1 conserva el listado completo sin paginar; ?total=1 agrega el conteo total.
 @gestion_bp.route('/medicamentos', methods=['GET'])
 def obtener_medicamentos():
+    args = request.args
+    try:
+        condiciones, binds = [], {}
+        if args.get('estado'):
+            condiciones.append("m.estado = :estado")
+            binds['estado'] = args['estado']
+        if args.get('id_categoria'):
+            condiciones.append("m.id_categoria = :id_categoria")
+            binds['id_categoria'] = int(args['id_categoria'])
+        if args.get('id_proveedor'):
+            condiciones.append("m.id_proveedor = :id_proveedor")
+            binds['id_proveedor'] = int(args['id_proveedor'])
+        if args.get('nombre'):
+            # Rango sobre idx_medicamentos_nombre_upper (UPPER(nombre), id_medicamento)
+            condiciones.append("UPPER(m.nombre) LIKE :nombre ESCAPE '\\'")
+            binds['nombre'] = escapar_like(args['nombre'].upper()) + '%'
+        vence_desde = leer_fecha(args, 'vence_desde')
+        if vence_desde:
+            condiciones.append("m.fecha_vencimiento >= :vence_desde")
+            binds['vence_desde'] = vence_desde
+        vence_hasta = leer_fecha(args, 'vence_hasta')
+        if vence_hasta:
+            condiciones.append("m.fecha_vencimiento < :vence_hasta")
+            binds['vence_hasta'] = dia_siguiente(vence_hasta)
+
+        todo = leer_flag(args, 'todo')
+        limite = leer_limite(args)
+        forma = leer_forma(args)
+        clave = decodificar_token(args['siguiente']) if args.get('siguiente') and not todo else None
+        if clave:
+            clave = [str(clave[0]), int(clave[1])]
+    except (ValueError, TypeError, IndexError) as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), 400
+
     connection = get_db_connection()
     if not connection: return jsonify({"estado": "error", "mensaje": "Sin conexion"}), 503
     try:
         cursor = connection.cursor()
-        sql = """
+        filtros = condiciones[:]
+        consulta = dict(binds)
+        if clave:
+            filtros.append("(m.nombre > :k_nombre OR (m.nombre = :k_nombre AND m.id_medicamento > :k_id))")
+            consulta['k_nombre'], consulta['k_id'] = clave
+        where = ("WHERE " + " AND ".join(filtros)) if filtros else ""
+        sql = f"""
             SELECT m.id_medicamento, 
                    m.nombre, 
                    c.nombre AS categoria, 
@@ -28,12 +148,33 @@ def obtener_medicamentos():
                    m.estado 
             FROM Medicamentos m
             JOIN Categorias c ON m.id_categoria = c.id_categoria
-            ORDER BY m.nombre
+            {where}
+            ORDER BY m.nombre, m.id_medicamento
         """
-        cursor.execute(sql)
-        columnas = [col[0].lower() for col in cursor.description]
-        medicamentos = [dict(zip(columnas, row)) for row in cursor.fetchall()]
-        return jsonify({"estado": "exito", "datos": medicamentos, "total": len(medicamentos)}), 200
+        if todo:
+            ajustar_lectura(cursor)
+            cursor.execute(sql, consulta)
+            medicamentos = cursor.fetchall()
+            return respuesta_lista(columnas(cursor), medicamentos, forma, total=len(medicamentos)), 200
+
+        # Se pide una fila extra para saber si existe una página siguiente
+        consulta['limite'] = limite + 1
+        ajustar_lectura(cursor, limite + 1)
+        cursor.execute(sql + " FETCH FIRST :limite ROWS ONLY", consulta)
+        nombres = columnas(cursor)
+        medicamentos = cursor.fetchall()
+        siguiente = None
+        if len(medicamentos) > limite:
+            medicamentos = medicamentos[:limite]
+            ultimo = medicamentos[-1]
+            siguiente = codificar_token([ultimo[nombres.index('nombre')], ultimo[nombres.index('id_medicamento')]])
+
+        extra = {"siguiente": siguiente}
+        if leer_flag(args, 'total'):
+            where_total = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+            cursor.execute(f"SELECT COUNT(*) FROM Medicamentos m {where_total}", binds)
+            extra['total'] = cursor.fetchone()[0]
+        return respuesta_lista(nombres, medicamentos, forma, **extra), 200
     except oracledb.Error as e:
         return jsonify({"estado": "error", "mensaje": str(e)}), 500
 
@@ -41,29 +182,88 @@ def obtener_medicamentos():
 # --- OBTENER UN MEDICAMENTO ---
 @gestion_bp.route('/medicamentos/<int:id_medicamento>', methods=['GET'])
 def obtener_un_medicamento(id_medicamento):
-    connection = get_db_connection()
-    if not connection: return jsonify({"estado": "error", "mensaje": "Sin conexion"}), 503
+    def cargar():
+        filas = _consultar(SQL_MEDICAMENTO, {'id': id_medicamento})
+        if not filas: raise ErrorCarga("No encontrado", 404)
+        return filas[0]
+    return catalogo.responder(('medicamento', id_medicamento), cargar, medicamento_vigente)
+
+
+# --- BUSCAR MEDICAMENTOS (autocompletado) ---
+# GET /api/medicamentos/buscar?q=para 500&limite=10&solo_disponibles=1
+# Cada término coincide por prefijo o subcadena en nombre, lote o categoría (sin tildes ni
+# mayúsculas). Primero los activos con stock, luego los que empiezan por el término.
+# Responde desde el índice en memoria de src/busqueda.py.
+@gestion_bp.route('/medicamentos/buscar', methods=['GET'])
+def buscar_medicamentos():
+    consulta = request.args.get('q', '').strip()
+    limite = max(1, min(request.args.get('limite', default=LIMITE_BUSQUEDA, type=int), LIMITE_BUSQUEDA_MAXIMO))
     try:
-        cursor = connection.cursor()
-        sql = """
-            SELECT id_medicamento, nombre, id_categoria, id_proveedor, stock, 
-                   precio_compra, precio_venta, 
-                   TO_CHAR(fecha_vencimiento, 'YYYY-MM-DD') as fecha_vencimiento, 
-                   lote, ubicacion, descripcion 
-            FROM Medicamentos 
-            WHERE id_medicamento = :id
-        """
-        cursor.execute(sql, {'id': id_medicamento})
-        row = cursor.fetchone()
-        if not row: return jsonify({"estado": "error", "mensaje": "No encontrado"}), 404
+        # El índice se completa con los cambios recién confirmados: se leen de la primaria
+        datos, total = buscar(consulta, limite, leer_flag(request.args, 'solo_disponibles'),
+                              lambda: get_db_connection(PRIMARIA), current_app._get_current_object())
+        return jsonify({"estado": "exito", "datos": datos, "total": total}), 200
+    except ErrorCarga as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), e.status
+    except oracledb.Error as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), 500
+
 
-        cols = [col[0].lower() for col in cursor.description]
-        data = dict(zip(cols, row))
-        return jsonify({"estado": "exito", "datos": data}), 200
+# --- CAMBIOS DE MEDICAMENTOS (sincronización incremental) ---
+# GET /api/medicamentos/cambios              -> token de la versión actual en "siguiente" (sin datos);
+#                                               se pide antes de cargar el catálogo completo
+# GET /api/medicamentos/cambios?since=<tok>  -> filas cuyo stock, precio_venta o estado cambió
+# Cada fila trae su "version"; si "hay_mas" es true se vuelve a pedir con el nuevo token.
+@gestion_bp.route('/medicamentos/cambios', methods=['GET'])
+def obtener_cambios_medicamentos():
+    try:
+        marcas = leer_marcas(request.args['since']) if request.args.get('since') else None
+        limite = leer_limite(request.args)
+    except (ValueError, TypeError) as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), 400
+
+    # Siempre en la primaria: un token emitido por ella no debe leerse en una réplica atrasada
+    connection = get_db_connection(PRIMARIA)
+    if not connection: return jsonify({"estado": "error", "mensaje": "Sin conexion"}), 503
+    margen = current_app.config.get('CAMBIOS_MARGEN', 10)
+    try:
+        if marcas is None:
+            siguiente = codificar_marcas(*version_actual(connection, margen))
+            return jsonify({"estado": "exito", "datos": [], "siguiente": siguiente, "hay_mas": False}), 200
+        filas, asentado, ultimo, hay_mas = leer_cambios(connection, *marcas, limite, margen)
+        return jsonify({"estado": "exito", "datos": filas, "siguiente": codificar_marcas(asentado, ultimo),
+                        "hay_mas": hay_mas}), 200
     except oracledb.Error as e:
         return jsonify({"estado": "error", "mensaje": str(e)}), 500
 
 
+# GET /api/medicamentos/cambios/stream[?since=<tok>] (text/event-stream)
+# Eventos "version" (token inicial) y "cambios" (lista de filas como en /cambios). El id de
+# cada evento es el token: al reconectar, EventSource lo envía en Last-Event-ID y se continúa.
+@gestion_bp.route('/medicamentos/cambios/stream', methods=['GET'])
+def stream_cambios_medicamentos():
+    token = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        marcas = leer_marcas(token) if token else None
+    except (ValueError, TypeError) as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), 400
+
+    app = current_app._get_current_object()
+    suscripcion = abrir_suscripcion(app)
+    if suscripcion is None:
+        respuesta = jsonify({"estado": "error", "mensaje": "Demasiados streams abiertos, use /api/medicamentos/cambios"})
+        respuesta.headers['Retry-After'] = '30'
+        return respuesta, 503
+    respuesta = Response(stream_with_context(generar_stream(app, suscripcion, marcas, app.json.dumps)),
+                         mimetype='text/event-stream')
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    # Sin buffer en proxies (nginx)
+    respuesta.headers['X-Accel-Buffering'] = 'no'
+    # Si el cliente corta antes de empezar la transmisión el generador nunca corre
+    respuesta.call_on_close(lambda: cerrar_suscripcion(suscripcion))
+    return respuesta
+
+
 # --- REGISTRAR MEDICAMENTO ---
 @gestion_bp.route('/medicamentos', methods=['POST'])
 def registrar_medicamento():
@@ -87,6 +287,7 @@ def registrar_medicamento():
             'p_descripcion': datos.get('p_descripcion')
         }
         cursor.callproc("pkg_gestion_farmacia.p_registrar_medicamento", keywordParameters=params)
+        notificar_cambio('Medicamentos')
         return jsonify({"estado": "exito", "mensaje": "Registrado"}), 201
     except oracledb.DatabaseError as e:
         msg = e.args[0].message
@@ -96,11 +297,57 @@ def registrar_medicamento():
             return jsonify({"estado": "error", "mensaje": "El precio de venta debe ser mayor al precio de compra"}), 400
         elif "ORA-20005" in msg:
             return jsonify({"estado": "error", "mensaje": "El margen de ganancia es muy bajo (mínimo 10%)"}), 400
-        elif "ORA-20006" in msg:
+        elif lote_duplicado(msg):
             return jsonify({"estado": "error", "mensaje": "Ya existe un medicamento con este lote. Verifique si es reposición"}), 409
         return jsonify({"estado": "error", "mensaje": "Error en la base de datos"}), 500
 
 
+# --- IMPORTACIÓN MASIVA ---
+# POST /api/medicamentos/importar con un CSV (encabezado con los nombres de columna de
+# src/importacion.COLUMNAS) o JSON (arreglo de objetos o uno por línea), en el cuerpo o como
+# campo 'archivo' de un formulario multipart. ?formato=csv|json si el tipo no lo indica.
+# Las filas válidas se insertan por lotes de IMPORTACION_LOTE con un COMMIT por lote: si la
+# carga se corta, lo ya confirmado queda. Responde el informe (conteos, filas/s) y los errores por fila.
+@gestion_bp.route('/medicamentos/importar', methods=['POST'])
+@operacion_critica
+def importar_medicamentos():
+    archivo = request.files.get('archivo') if request.mimetype == 'multipart/form-data' else None
+    if archivo is not None:
+        flujo, formato = archivo.stream, detectar_formato(request.args.get('formato'), archivo.mimetype, archivo.filename)
+    else:
+        flujo, formato = request.stream, detectar_formato(request.args.get('formato'), request.mimetype, None)
+    if formato is None:
+        return jsonify({"estado": "error", "mensaje": "Formato no reconocido: envíe CSV o JSON, o indique ?formato=csv|json"}), 400
+
+    connection = get_db_connection()
+    if not connection: return jsonify({"estado": "error", "mensaje": "Sin conexion"}), 503
+    importacion = Importacion(connection, current_app.config.get('IMPORTACION_LOTE', 1000))
+    try:
+        importacion.ejecutar(leer_csv(flujo) if formato == 'csv' else leer_json(flujo))
+        if importacion.filas == 0:
+            estado, mensaje, codigo = "error", "El archivo no tiene registros", 400
+        elif importacion.rechazadas == 0:
+            estado, mensaje, codigo = "exito", "Importación completa", 201
+        elif importacion.insertadas:
+            estado, mensaje, codigo = "parcial", "Importación con filas rechazadas", 200
+        else:
+            estado, mensaje, codigo = "error", "Ninguna fila es válida", 400
+    except ErrorImportacion as e:
+        estado, mensaje, codigo = "error", str(e), 400
+    except oracledb.Error as e:
+        print(f"Error BD en la importación: {e}")
+        estado, mensaje, codigo = "error", "Error en la base de datos", 500
+    finally:
+        if importacion.insertadas:
+            notificar_cambio('Medicamentos')
+
+    respuesta = {"estado": estado, "mensaje": mensaje, "informe": importacion.informe(),
+                 "errores": sorted(importacion.errores, key=lambda e: e['fila'])}
+    if importacion.rechazadas > len(importacion.errores):
+        respuesta["errores_omitidos"] = importacion.rechazadas - len(importacion.errores)
+    return jsonify(respuesta), codigo
+
+
 # --- EDITAR MEDICAMENTO COMPLETO ---
 @gestion_bp.route('/medicamentos/<int:id_medicamento>', methods=['PUT'])
 def editar_medicamento_completo(id_medicamento):
@@ -123,6 +370,7 @@ def editar_medicamento_completo(id_medicamento):
             'p_descripcion': datos.get('descripcion')
         }
         cursor.callproc("pkg_gestion_farmacia.p_editar_medicamento_completo", keywordParameters=params)
+        notificar_cambio('Medicamentos', id_medicamento)
         return jsonify({"estado": "exito", "mensaje": "Medicamento actualizado correctamente"}), 200
     except oracledb.DatabaseError as e:
         msg = e.args[0].message
@@ -132,7 +380,7 @@ def editar_medicamento_completo(id_medicamento):
             return jsonify({"estado": "error", "mensaje": "El precio de venta debe ser mayor al precio de compra"}), 400
         elif "ORA-20005" in msg:
             return jsonify({"estado": "error", "mensaje": "El margen de ganancia es muy bajo (mínimo 10%)"}), 400
-        elif "ORA-20006" in msg:
+        elif lote_duplicado(msg):
             return jsonify({"estado": "error", "mensaje": "Ya existe un medicamento con este lote"}), 409
         elif "ORA-20010" in msg:
             return jsonify({"estado": "error", "mensaje": "No se puede modificar un medicamento inactivo. Reactívelo primero"}), 403
@@ -153,6 +401,7 @@ def editar_precio_medicamento(id_medicamento):
                             'p_nuevo_precio_compra': datos['nuevo_precio_compra'],
                             'p_nuevo_precio_venta': datos['nuevo_precio_venta']
                         })
+        notificar_cambio('Medicamentos', id_medicamento)
         return jsonify({"estado": "exito", "mensaje": "Actualizado"}), 200
     except oracledb.DatabaseError as e:
         return jsonify({"estado": "error", "mensaje": str(e)}), 500
@@ -171,6 +420,7 @@ def actualizar_stock_medicamento(id_medicamento):
                             'p_id_medicamento': id_medicamento,
                             'p_cantidad_agregada': datos['cantidad_agregada']
                         })
+        notificar_cambio('Medicamentos', id_medicamento)
         return jsonify({"estado": "exito", "mensaje": "Stock actualizado"}), 200
     except oracledb.DatabaseError as e:
         msg = e.args[0].message
@@ -188,6 +438,7 @@ def eliminar_medicamento(id_medicamento):
         cursor = connection.cursor()
         cursor.callproc("pkg_gestion_farmacia.p_eliminar_medicamento",
                         keywordParameters={'p_id_medicamento': id_medicamento})
+        notificar_cambio('Medicamentos', id_medicamento)
         return jsonify({"estado": "exito", "mensaje": "Eliminado"}), 200
     except oracledb.Error as e:
         return jsonify({"estado": "error", "mensaje": str(e)}), 500
@@ -210,6 +461,7 @@ def cambiar_estado_medicamento(id_medicamento):
                             'p_id_medicamento': id_medicamento,
                             'p_nuevo_estado': nuevo_estado
                         })
+        notificar_cambio('Medicamentos', id_medicamento)
         return jsonify({"estado": "exito", "mensaje": "Estado actualizado"}), 200
     except oracledb.Error as e:
         return jsonify({"estado": "error", "mensaje": str(e)}), 500
@@ -218,48 +470,16 @@ def cambiar_estado_medicamento(id_medicamento):
 # --- LISTAR CATEGORIAS ---
 @gestion_bp.route('/categorias', methods=['GET'])
 def obtener_categorias():
-    connection = get_db_connection()
-    if not connection: return jsonify({"estado": "error", "mensaje": "Sin conexion"}), 503
-    try:
-        cursor = connection.cursor()
-        cursor.execute("SELECT id_categoria, nombre FROM Categorias ORDER BY nombre")
-        columnas = [col[0].lower() for col in cursor.description]
-        return jsonify({"estado": "exito", "datos": [dict(zip(columnas, row)) for row in cursor.fetchall()]}), 200
-    except oracledb.Error as e:
-        return jsonify({"estado": "error", "mensaje": str(e)}), 500
+    return catalogo.responder(('categorias',), lambda: _consultar(SQL_CATEGORIAS))
 
 
 # --- LISTAR PROVEEDORES ---
 @gestion_bp.route('/proveedores', methods=['GET'])
 def obtener_proveedores():
-    connection = get_db_connection()
-    if not connection: return jsonify({"estado": "error", "mensaje": "Sin conexion"}), 503
-    try:
-        cursor = connection.cursor()
-        cursor.execute("SELECT id_proveedor, nombre, estado FROM Proveedores ORDER BY nombre")
-        columnas = [col[0].lower() for col in cursor.description]
-        return jsonify({"estado": "exito", "datos": [dict(zip(columnas, row)) for row in cursor.fetchall()]}), 200
-    except oracledb.Error as e:
-        return jsonify({"estado": "error", "mensaje": str(e)}), 500
+    return catalogo.responder(('proveedores',), lambda: _consultar(SQL_PROVEEDORES))
 
 
 # --- LISTAR EMPLEADOS ---
 @gestion_bp.route('/empleados', methods=['GET'])
 def obtener_empleados():
-    connection = get_db_connection()
-    if not connection:
-        return jsonify({"estado": "error", "mensaje": "Sin conexion"}), 503
-    try:
-        cursor = connection.cursor()
-        sql = """
-            SELECT e.dni, u.nombre, u.apellido_paterno 
-            FROM Empleados e 
-            JOIN Usuarios u ON e.dni = u.dni 
-            ORDER BY u.nombre ASC
-        """
-        cursor.execute(sql)
-        columnas = [col[0].lower() for col in cursor.description]
-        datos = [dict(zip(columnas, row)) for row in cursor.fetchall()]
-        return jsonify({"estado": "exito", "datos": datos}), 200
-    except oracledb.Error as e:
-        return jsonify({"estado": "error", "mensaje": str(e)}), 500
\ No newline at end of file
+    return catalogo.responder(('empleados',), lambda: _consultar(SQL_EMPLEADOS))
\ No newline at end of file
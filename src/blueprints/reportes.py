@@ -1,104 +1,430 @@
-from flask import Blueprint, jsonify, request
-from src.db import get_db_connection
+from flask import Blueprint, jsonify, request, Response, stream_with_context, current_app
+from src.archivo import AUDITORIA_FRIO, corte, registrar_lectura_fria, tramos
+from src.db import PRIMARIA, REPLICA, get_db_connection, get_pool, separar_db_connection
+from src.eventos import suscribir
+from src.filas import ajustar_lectura, columnas, como_dicts, dumps_compacto, leer_forma
+from src.replica import disponible, requerir_al_dia
+from src.paginacion import codificar_token, decodificar_token, leer_limite, leer_fecha, dia_siguiente
+from src.reposicion import reposicion, ultima_invalidacion
 import oracledb
-from datetime import date
+import csv
+import io
+import threading
+import time
+from datetime import date, datetime
 
 reportes_bp = Blueprint('reportes', __name__, url_prefix='/api/reportes')
 
 
-def ejecutar_reporte(proc_name, params=[]):
+# Formatos de salida: ?format=json (por defecto), ndjson o csv. Todos se transmiten
+# por lotes desde el REF CURSOR, sin materializar el resultado completo en memoria.
+# json y ndjson admiten ?shape=columns (ver src/filas.py): en ndjson la primera línea
+# trae los nombres de columna y cada línea siguiente una fila como arreglo.
+FORMATOS_REPORTE = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'  # Werkzeug agrega charset=utf-8 a los tipos text/*
+}
+
+
+def _valor_plano(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+def _lotes(out_cursor):
+    while True:
+        filas = out_cursor.fetchmany()
+        if not filas:
+            break
+        yield filas
+
+
+def _generar_json(columnas, out_cursor, forma):
+    # Cada lote se serializa en una sola llamada y se le quitan los corchetes exteriores
+    if forma == 'columns':
+        dumps, convertir = dumps_compacto, None
+        yield '{"estado":"exito","columnas":' + dumps(columnas) + ',"datos":['
+    else:
+        dumps, convertir = current_app.json.dumps, lambda filas: como_dicts(columnas, filas)
+        yield '{"estado": "exito", "datos": ['
+    primero = True
+    for filas in _lotes(out_cursor):
+        trozo = dumps(convertir(filas) if convertir else filas)[1:-1]
+        yield trozo if primero else "," + trozo
+        primero = False
+    yield ']}\n'
+
+
+def _generar_ndjson(columnas, out_cursor, forma):
+    if forma == 'columns':
+        yield dumps_compacto(columnas) + "\n"
+        for filas in _lotes(out_cursor):
+            yield "".join(dumps_compacto(row) + "\n" for row in filas)
+        return
+    dumps = current_app.json.dumps
+    for filas in _lotes(out_cursor):
+        yield "".join(dumps(dict(zip(columnas, row))) + "\n" for row in filas)
+
+
+def _generar_csv(columnas, out_cursor, forma):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(columnas)
+    for filas in _lotes(out_cursor):
+        escritor.writerows([_valor_plano(v) for v in row] for row in filas)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _liberador(out_cursor, connection, pool):
+    """Función que cierra el REF CURSOR y devuelve la conexión al pool una sola vez."""
+    lock, pendiente = threading.Lock(), [True]
+
+    def liberar():
+        with lock:
+            if not pendiente:
+                return
+            pendiente.clear()
+        try:
+            out_cursor.close()
+        except oracledb.Error:
+            pass
+        try:
+            pool.release(connection)
+        except oracledb.Error as e:
+            print(f"Error al liberar la conexión del reporte: {e}")
+    return liberar
+
+
+def _liberar_al_terminar(generador, liberar):
+    # El teardown de la solicitud corre antes de transmitir el cuerpo: la conexión se
+    # devuelve al pool recién cuando el cursor terminó (o el cliente cortó la descarga)
+    try:
+        yield from generador
+    finally:
+        liberar()
+
+
+def ejecutar_reporte(proc_name, params=[], rango=False):
+    formato = request.args.get('format', 'json').lower()
+    if formato not in FORMATOS_REPORTE:
+        return jsonify({"estado": "error", "mensaje": "Formato no soportado (json, ndjson, csv)"}), 400
+    try:
+        forma = leer_forma(request.args)
+    except ValueError as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), 400
+    if rango:
+        # Rango opcional ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD (ambos inclusive)
+        try:
+            params = params + [leer_fecha(request.args, 'desde'), leer_fecha(request.args, 'hasta')]
+        except ValueError as e:
+            return jsonify({"estado": "error", "mensaje": str(e)}), 400
+
     connection = get_db_connection()
     if not connection: return jsonify({"estado": "error", "mensaje": "Sin conexión"}), 503
     try:
         cursor = connection.cursor()
 
         out_cursor = connection.cursor()
+        # Tamaño de lote por viaje a la BD (se fija antes de abrir el cursor)
+        ajustar_lectura(out_cursor)
 
         cursor.callproc(proc_name, params + [out_cursor])
 
-        columnas = [col[0].lower() for col in out_cursor.description]
-        resultados = [dict(zip(columnas, row)) for row in out_cursor]
-
-        return jsonify({"estado": "exito", "datos": resultados}), 200
+        nombres = columnas(out_cursor)
 
     except Exception as e:
         return jsonify({"estado": "error", "mensaje": str(e)}), 500
-    finally:
-        if connection:
-            connection.close()
+
+    generadores = {'json': _generar_json, 'ndjson': _generar_ndjson, 'csv': _generar_csv}
+    liberar = _liberador(out_cursor, *separar_db_connection())
+    cuerpo = _liberar_al_terminar(generadores[formato](nombres, out_cursor, forma), liberar)
+    respuesta = Response(stream_with_context(cuerpo), mimetype=FORMATOS_REPORTE[formato])
+    # Si el cuerpo nunca se recorre (HEAD, cliente que corta antes) el generador no corre
+    respuesta.call_on_close(liberar)
+    if formato == 'csv':
+        nombre = proc_name.split('.')[-1].replace('p_reporte_', '')
+        respuesta.headers['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
+    return respuesta
+
+
+# Procedimiento de cada reporte y sus parámetros: None, 'dias' (?dias) o 'rango' (?desde/?hasta).
+# También los usa /api/compuesto.
+PROCEDIMIENTOS_REPORTE = {
+    'medicamentos-por-categoria': ("pkg_reportes_farmacia.p_reporte_medicamentos_por_categoria", None),
+    'rentabilidad-productos': ("pkg_reportes_farmacia.p_reporte_rentabilidad_productos", None),
+    'bajo-stock': ("pkg_reportes_farmacia.p_reporte_medicamentos_bajo_stock_detalle", None),
+    'medicamentos-inactivos': ("pkg_reportes_farmacia.p_reporte_medicamentos_inactivos", None),
+    'proximos-vencer': ("pkg_reportes_farmacia.p_reporte_medicamentos_proximos_vencer", 'dias'),
+    'sin-stock': ("pkg_reportes_farmacia.p_reporte_medicamentos_sin_stock", None),
+    'ventas-por-empleado': ("pkg_reportes_farmacia.p_reporte_ventas_por_empleado", 'rango'),
+    'ventas-por-cliente': ("pkg_reportes_farmacia.p_reporte_ventas_por_cliente", 'rango'),
+    'top-vendidos': ("pkg_reportes_farmacia.p_reporte_top_5_vendidos", 'rango'),
+    'ingresos-mensuales': ("pkg_reportes_farmacia.p_reporte_ingresos_por_mes", 'rango'),
+}
+
+
+def _reporte(nombre, params=[]):
+    proc, tipo = PROCEDIMIENTOS_REPORTE[nombre]
+    return ejecutar_reporte(proc, params, rango=(tipo == 'rango'))
 
 
 @reportes_bp.route('/medicamentos-por-categoria')
 def r_categoria():
-    return ejecutar_reporte("pkg_reportes_farmacia.p_reporte_medicamentos_por_categoria")
+    return _reporte('medicamentos-por-categoria')
 
 
 @reportes_bp.route('/rentabilidad-productos')
 def r_rentabilidad():
-    return ejecutar_reporte("pkg_reportes_farmacia.p_reporte_rentabilidad_productos")
+    return _reporte('rentabilidad-productos')
 
 
+# 'auditoria-cambios' se conserva por compatibilidad: es el reporte de bajo stock
+@reportes_bp.route('/bajo-stock')
 @reportes_bp.route('/auditoria-cambios')
 def r_auditoria():
-    return ejecutar_reporte("pkg_reportes_farmacia.p_reporte_medicamentos_bajo_stock_detalle")
+    return _reporte('bajo-stock')
 
 
 @reportes_bp.route('/medicamentos-inactivos')
 def r_inactivos():
-    return ejecutar_reporte("pkg_reportes_farmacia.p_reporte_medicamentos_inactivos")
+    return _reporte('medicamentos-inactivos')
 
 
 @reportes_bp.route('/proximos-vencer')
 def r_vencer():
     dias = request.args.get('dias', default=30, type=int)
-    return ejecutar_reporte("pkg_reportes_farmacia.p_reporte_medicamentos_proximos_vencer", [dias])
+    return _reporte('proximos-vencer', [dias])
 
 
 @reportes_bp.route('/sin-stock')
 def r_sin_stock():
-    return ejecutar_reporte("pkg_reportes_farmacia.p_reporte_medicamentos_sin_stock")
+    return _reporte('sin-stock')
 
 
 @reportes_bp.route('/ventas-por-empleado')
 def r_empleado():
-    return ejecutar_reporte("pkg_reportes_farmacia.p_reporte_ventas_por_empleado")
+    return _reporte('ventas-por-empleado')
 
 
 @reportes_bp.route('/ventas-por-cliente')
 def r_cliente():
-    return ejecutar_reporte("pkg_reportes_farmacia.p_reporte_ventas_por_cliente")
+    return _reporte('ventas-por-cliente')
 
 
 @reportes_bp.route('/top-vendidos')
 def r_top():
-    return ejecutar_reporte("pkg_reportes_farmacia.p_reporte_top_5_vendidos")
+    return _reporte('top-vendidos')
 
 
 @reportes_bp.route('/ingresos-mensuales')
 def r_ingresos():
-    return ejecutar_reporte("pkg_reportes_farmacia.p_reporte_ingresos_por_mes")
+    return _reporte('ingresos-mensuales')
+
+
+# Historial de auditoría de medicamentos, paginado por clave (fecha_accion DESC, id_auditoria DESC)
+# con ?limite y ?siguiente=<token>. Filtros: id_medicamento, tipo (tipo_accion), desde / hasta.
+# Los eventos anteriores al corte del archivo (src/archivo.py) se leen solo si hacen falta.
+SQL_AUDITORIA = """
+    SELECT a.id_auditoria, a.id_medicamento_afectado AS id_medicamento, a.nombre_medicamento,
+           a.tipo_accion, a.accion_realizada, a.usuario_db, a.fecha_accion
+    FROM {origen} a
+    {where}
+    ORDER BY a.fecha_accion DESC, a.id_auditoria DESC
+    FETCH FIRST :limite ROWS ONLY
+"""
+
+
+@reportes_bp.route('/auditoria')
+def auditoria():
+    args = request.args
+    try:
+        condiciones, binds = [], {}
+        if args.get('id_medicamento'):
+            condiciones.append("a.id_medicamento_afectado = :id_medicamento")
+            binds['id_medicamento'] = int(args['id_medicamento'])
+        if args.get('tipo'):
+            condiciones.append("a.tipo_accion = :tipo")
+            binds['tipo'] = args['tipo'].upper()
+        desde = leer_fecha(args, 'desde')
+        if desde:
+            condiciones.append("a.fecha_accion >= :desde")
+            binds['desde'] = desde
+        hasta = leer_fecha(args, 'hasta')
+        if hasta:
+            condiciones.append("a.fecha_accion < :hasta")
+            binds['hasta'] = dia_siguiente(hasta)
+        limite = leer_limite(args)
+        clave = decodificar_token(args['siguiente']) if args.get('siguiente') else None
+        if clave:
+            condiciones.append("(a.fecha_accion < :k_fecha OR (a.fecha_accion = :k_fecha AND a.id_auditoria < :k_id))")
+            binds['k_fecha'], binds['k_id'] = datetime.fromisoformat(clave[0]), int(clave[1])
+    except (ValueError, TypeError, IndexError) as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), 400
+
+    connection = get_db_connection()
+    if not connection: return jsonify({"estado": "error", "mensaje": "Sin conexión"}), 503
+    try:
+        cursor = connection.cursor()
+        binds['corte'] = corte(connection, 'AUDITORIA')
+        eventos = []
+        for tramo in tramos(binds['corte'], desde, binds.get('hasta'), binds.get('k_fecha')):
+            if len(eventos) > limite:
+                break
+            if tramo == 'caliente':
+                origen, condiciones_tramo = "Auditoria_Medicamentos", condiciones + ["a.fecha_accion >= :corte"]
+            else:
+                registrar_lectura_fria('AUDITORIA')
+                origen, condiciones_tramo = AUDITORIA_FRIO, condiciones
+            where = ("WHERE " + " AND ".join(condiciones_tramo)) if condiciones_tramo else ""
+            binds['limite'] = limite + 1 - len(eventos)
+            cursor.arraysize = binds['limite']
+            cursor.execute(SQL_AUDITORIA.format(origen=origen, where=where), binds)
+            columnas = [col[0].lower() for col in cursor.description]
+            eventos += [dict(zip(columnas, row)) for row in cursor.fetchall()]
+        siguiente = None
+        if len(eventos) > limite:
+            eventos = eventos[:limite]
+            siguiente = codificar_token([eventos[-1]['fecha_accion'], eventos[-1]['id_auditoria']])
+        return jsonify({"estado": "exito", "datos": eventos, "siguiente": siguiente}), 200
+    except oracledb.Error as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), 500
 
 
 # El resumen general
+# Todos los indicadores en una sola consulta; el filtro del mes es un rango sobre
+# fecha_venta (sin TO_CHAR) para que pueda usar índices.
+SQL_RESUMEN = """
+    WITH m AS (
+        SELECT COUNT(CASE WHEN estado = 'Activo' THEN 1 END) AS medicamentos_activos,
+               COUNT(CASE WHEN estado = 'Activo' AND stock < 10 THEN 1 END) AS medicamentos_bajo_stock,
+               COUNT(CASE WHEN fecha_vencimiento BETWEEN TRUNC(SYSDATE) AND TRUNC(SYSDATE) + 30 THEN 1 END) AS medicamentos_proximos_vencer
+        FROM Medicamentos
+    ), v AS (
+        SELECT COUNT(*) AS ventas_mes_actual, NVL(SUM(total_venta), 0) AS ingresos_mes_actual
+        FROM Ventas
+        WHERE fecha_venta >= TRUNC(SYSDATE, 'MM') AND fecha_venta < ADD_MONTHS(TRUNC(SYSDATE, 'MM'), 1)
+    ), c AS (
+        SELECT COUNT(*) AS total_clientes FROM Clientes
+    )
+    SELECT m.medicamentos_activos, m.medicamentos_bajo_stock, v.ventas_mes_actual, v.ingresos_mes_actual,
+           c.total_clientes, m.medicamentos_proximos_vencer
+    FROM m CROSS JOIN v CROSS JOIN c
+"""
+
+# Snapshot en memoria del resumen. Se sirve mientras tenga menos de RESUMEN_MAX_EDAD
+# segundos; pasada la mitad de ese tiempo se refresca en segundo plano, y cualquier
+# escritura en medicamentos, ventas o clientes lo invalida (versión). Tras una invalidación
+# se recalcula en la primaria o en una réplica que ya tenga esa escritura.
+_resumen = {"datos": None, "generado": 0.0, "version": 0, "version_datos": -1, "refrescando": False,
+            "invalidado": 0.0}
+_resumen_lock = threading.Lock()
+
+
+def _invalidar_resumen(tabla, id):
+    with _resumen_lock:
+        _resumen["version"] += 1
+        _resumen["invalidado"] = time.time()
+
+
+for _tabla in ('Medicamentos', 'Ventas', 'Clientes'):
+    suscribir(_tabla, _invalidar_resumen)
+
+
+def _calcular_resumen(connection):
+    with _resumen_lock:
+        version = _resumen["version"]
+    c = connection.cursor()
+    c.execute(SQL_RESUMEN)
+    columnas = [col[0].lower() for col in c.description]
+    datos = dict(zip(columnas, c.fetchone()))
+    datos["ingresos_mes_actual"] = float(datos["ingresos_mes_actual"])
+    generado = time.time()
+    with _resumen_lock:
+        if generado >= _resumen["generado"]:
+            _resumen.update(datos=datos, generado=generado, version_datos=version)
+    return datos, generado
+
+
+def _refrescar_resumen(app):
+    with app.app_context():
+        try:
+            with _resumen_lock:
+                invalidado = _resumen["invalidado"]
+            pool = get_pool(REPLICA if disponible(invalidado) else PRIMARIA)
+            conn = pool.acquire()
+            try:
+                _calcular_resumen(conn)
+            finally:
+                pool.release(conn)
+        except oracledb.Error as e:
+            print(f"Error al refrescar resumen: {e}")
+        finally:
+            with _resumen_lock:
+                _resumen["refrescando"] = False
+
+
+def _respuesta_resumen(datos, generado):
+    edad = max(0.0, time.time() - generado)
+    return jsonify({"estado": "exito", "datos": datos,
+                    "snapshot": {"generado": datetime.fromtimestamp(generado).isoformat(timespec='seconds'),
+                                 "edad_segundos": round(edad, 1)}}), 200
+
+
 @reportes_bp.route('/resumen-general')
 def resumen():
+    max_edad = current_app.config.get('RESUMEN_MAX_EDAD', 60)
+    refrescar = False
+    with _resumen_lock:
+        datos, generado, invalidado = _resumen["datos"], _resumen["generado"], _resumen["invalidado"]
+        edad = time.time() - generado
+        vigente = datos is not None and _resumen["version_datos"] == _resumen["version"] and edad <= max_edad
+        if vigente and edad > max_edad / 2 and not _resumen["refrescando"]:
+            _resumen["refrescando"] = refrescar = True
+    if vigente:
+        if refrescar:
+            threading.Thread(target=_refrescar_resumen, args=(current_app._get_current_object(),), daemon=True).start()
+        return _respuesta_resumen(datos, generado)
+
+    requerir_al_dia(invalidado)
     conn = get_db_connection()
+    if not conn: return jsonify({"estado": "error", "mensaje": "Sin conexión"}), 503
     try:
-        c = conn.cursor()
-        c.execute("SELECT COUNT(*) FROM Medicamentos WHERE estado='Activo'")
-        activos = c.fetchone()[0]
-        c.execute("SELECT COUNT(*) FROM Medicamentos WHERE stock < 10 AND estado='Activo'")
-        bajo = c.fetchone()[0]
-        c.execute(
-            "SELECT COUNT(*), NVL(SUM(total_venta),0) FROM Ventas WHERE TO_CHAR(fecha_venta,'YYYY-MM')=TO_CHAR(SYSDATE,'YYYY-MM')")
-        vm, im = c.fetchone()
-        c.execute("SELECT COUNT(*) FROM Clientes")
-        cli = c.fetchone()[0]
-        c.execute(
-            "SELECT COUNT(*) FROM Medicamentos WHERE fecha_vencimiento BETWEEN TRUNC(SYSDATE) AND TRUNC(SYSDATE)+30")
-        venc = c.fetchone()[0]
-        return jsonify({"estado": "exito", "datos": {"medicamentos_activos": activos, "medicamentos_bajo_stock": bajo,
-                                                     "ventas_mes_actual": vm, "ingresos_mes_actual": float(im),
-                                                     "total_clientes": cli, "medicamentos_proximos_vencer": venc}}), 200
+        datos, generado = _calcular_resumen(conn)
+        return _respuesta_resumen(datos, generado)
     except Exception as e:
-        return jsonify({"estado": "error", "mensaje": str(e)}), 500
\ No newline at end of file
+        return jsonify({"estado": "error", "mensaje": str(e)}), 500
+
+
+# Sugerencias de reposición por proveedor (ver src/reposicion.py). Parámetros: ?dias de
+# historial, ?plazo de entrega y ?cobertura en días que debe cubrir el pedido, ?id_proveedor.
+@reportes_bp.route('/reposicion')
+def r_reposicion():
+    config = current_app.config
+    try:
+        dias = int(request.args.get('dias', config.get('REPOSICION_DIAS', 90)))
+        plazo = int(request.args.get('plazo', config.get('REPOSICION_PLAZO', 7)))
+        cobertura = int(request.args.get('cobertura', config.get('REPOSICION_COBERTURA', 30)))
+        id_proveedor = int(request.args['id_proveedor']) if request.args.get('id_proveedor') else None
+    except ValueError:
+        return jsonify({"estado": "error", "mensaje": "Parámetros numéricos inválidos"}), 400
+    if not (7 <= dias <= 365 and 0 <= plazo <= 90 and 1 <= cobertura <= 180):
+        return jsonify({"estado": "error", "mensaje": "Rangos: dias 7-365, plazo 0-90, cobertura 1-180"}), 400
+
+    requerir_al_dia(ultima_invalidacion())
+    conn = get_db_connection()
+    if not conn: return jsonify({"estado": "error", "mensaje": "Sin conexión"}), 503
+    try:
+        datos, generado = reposicion(conn, dias, plazo, cobertura, config)
+    except oracledb.Error as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), 500
+    if id_proveedor is not None:
+        datos = {"proveedores": [g for g in datos["proveedores"] if g["id_proveedor"] == id_proveedor],
+                 "riesgo_vencimiento": [m for m in datos["riesgo_vencimiento"] if m["id_proveedor"] == id_proveedor]}
+    datos = dict(datos, parametros={"dias": dias, "plazo": plazo, "cobertura": cobertura})
+    return _respuesta_resumen(datos, generado)
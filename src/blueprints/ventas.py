@@ -1,42 +1,131 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
+from src.archivo import VENTAS_FRIO, corte, registrar_lectura_fria, tramos
+from src.contencion import espera_reintento, registrar, registrar_conflicto, tipo_conflicto
 from src.db import get_db_connection
+from src.eventos import notificar_cambio
+from src.filas import ajustar_lectura, columnas, leer_forma, respuesta_lista
+from src.servidor import operacion_critica
+from src.paginacion import codificar_token, decodificar_token, leer_limite, leer_flag, leer_fecha, dia_siguiente
+import hashlib
+import json
+import time
 import oracledb
+from datetime import datetime
 
 ventas_bp = Blueprint('ventas', __name__, url_prefix='/api')
 
+# Idempotency-Key: el cliente genera una clave por venta (p. ej. un UUID) y la repite en cada
+# reintento; si la venta ya se registró se devuelve la misma respuesta con Idempotent-Replayed.
+# Los choques de bloqueo con otras ventas se reintentan aquí hasta VENTAS_REINTENTOS veces.
+LARGO_CLAVE_IDEMPOTENCIA = 100
+
+
+def _huella(datos):
+    # La misma clave con otra venta es un error del cliente, no un reintento
+    texto = json.dumps(datos, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _error_venta(linea, msg, detalles):
+    error = {"estado": "error", "mensaje": msg, "linea": linea}
+    if linea > 0:
+        error["id_medicamento"] = detalles[linea - 1]['id_medicamento']
+    if "ORA-20003" in msg:
+        error["mensaje"] = f"Stock insuficiente para completar la venta (producto #{linea})"
+        return jsonify(error), 409
+    if "ORA-20020" in msg:
+        error["mensaje"] = "La clave Idempotency-Key ya se usó con otra venta"
+        return jsonify(error), 422
+    return jsonify(error), 500
+
+
 @ventas_bp.route('/ventas', methods=['POST'])
+@operacion_critica
 def registrar_venta_completa():
     datos = request.get_json()
+    detalles = datos.get('detalles') or []
+    if not detalles:
+        return jsonify({"estado": "error", "mensaje": "La venta debe tener al menos un producto"}), 400
+    clave = request.headers.get('Idempotency-Key', '').strip() or None
+    if clave is not None and len(clave) > LARGO_CLAVE_IDEMPOTENCIA:
+        return jsonify({"estado": "error", "mensaje": f"Idempotency-Key admite hasta {LARGO_CLAVE_IDEMPOTENCIA} caracteres"}), 400
+
     connection = get_db_connection()
     if not connection: return jsonify({"estado": "error", "mensaje": "Sin conexion"}), 503
 
+    config = current_app.config
+    reintentos = config.get('VENTAS_REINTENTOS', 3)
     cursor = None
     try:
         connection.autocommit = False
         cursor = connection.cursor()
         id_venta_var = cursor.var(oracledb.NUMBER)
+        linea_error_var = cursor.var(oracledb.NUMBER)
+        mensaje_error_var = cursor.var(oracledb.STRING, 4000)
+        repetida_var = cursor.var(oracledb.NUMBER)
 
         cli = datos['cliente']
 
-        cursor.callproc("pkg_gestion_farmacia.p_registrar_venta_con_cliente",
-                        keywordParameters={
-                            'p_dni_cliente': cli['dni'],
-                            'p_nombre_cli': cli['nombre'],
-                            'p_ape_pat_cli': cli['apellido_paterno'],
-                            'p_ape_mat_cli': cli.get('apellido_materno', ''),
-                            'p_dni_empleado': datos['dni_empleado'],
-                            'p_total_venta': datos['total_venta'],
-                            'p_id_venta_generada': id_venta_var
-                        })
-
-        id_venta = int(id_venta_var.getvalue())
+        # Cabecera y todas las líneas en un solo viaje a la BD (arreglos PL/SQL)
+        parametros = {
+            'p_dni_cliente': cli['dni'],
+            'p_nombre_cli': cli['nombre'],
+            'p_ape_pat_cli': cli['apellido_paterno'],
+            'p_ape_mat_cli': cli.get('apellido_materno', ''),
+            'p_dni_empleado': datos['dni_empleado'],
+            'p_total_venta': datos['total_venta'],
+            'p_ids_medicamento': cursor.arrayvar(oracledb.NUMBER, [d['id_medicamento'] for d in detalles]),
+            'p_cantidades': cursor.arrayvar(oracledb.NUMBER, [d['cantidad'] for d in detalles]),
+            'p_precios': cursor.arrayvar(oracledb.NUMBER, [d['precio_unitario_venta'] for d in detalles]),
+            'p_id_venta_generada': id_venta_var,
+            'p_linea_error': linea_error_var,
+            'p_mensaje_error': mensaje_error_var,
+            'p_repetida': repetida_var,
+            'p_clave_idempotencia': clave,
+            'p_huella': _huella(datos) if clave else None,
+            'p_espera_bloqueo': config.get('VENTAS_ESPERA_BLOQUEO', 2)
+        }
 
-        # Insertar detalles
-        sql_det = "INSERT INTO Venta_Detalle (id_venta, id_medicamento, cantidad, precio_unitario_venta) VALUES (:1, :2, :3, :4)"
-        for d in datos['detalles']:
-            cursor.execute(sql_det, (id_venta, d['id_medicamento'], d['cantidad'], d['precio_unitario_venta']))
+        for intento in range(reintentos + 1):
+            try:
+                cursor.callproc("pkg_gestion_farmacia.p_registrar_venta_completa", keywordParameters=parametros)
+                linea_error = linea_error_var.getvalue()
+                msg = mensaje_error_var.getvalue() or ""
+            except oracledb.DatabaseError as e:
+                # Sin pasar por el manejo de errores del procedimiento (p. ej. base ocupada)
+                msg = e.args[0].message
+                if tipo_conflicto(msg) is None:
+                    raise
+                linea_error = 0
+            if linea_error is None:
+                break
+            connection.rollback()
+            tipo = tipo_conflicto(msg)
+            if tipo is None:
+                return _error_venta(int(linea_error), msg, detalles)
+            registrar_conflicto(tipo)
+            if intento == reintentos:
+                registrar('agotados')
+                respuesta = jsonify({"estado": "error", "mensaje": "Los productos están ocupados por otras ventas, reintente"})
+                respuesta.headers['Retry-After'] = '1'
+                return respuesta, 503
+            registrar('reintentos')
+            time.sleep(espera_reintento(intento, config.get('VENTAS_REINTENTO_BASE_MS', 50),
+                                        config.get('VENTAS_REINTENTO_MAX_MS', 1000)))
 
+        id_venta = int(id_venta_var.getvalue())
         connection.commit()
+        if repetida_var.getvalue():
+            registrar('repetidas')
+            respuesta = jsonify({"estado": "exito", "id_venta": id_venta})
+            respuesta.headers['Idempotent-Replayed'] = 'true'
+            return respuesta, 201
+
+        notificar_cambio('Ventas', id_venta)
+        notificar_cambio('Clientes', cli['dni'])
+        notificar_cambio('Usuarios', cli['dni'])
+        for id_medicamento in {d['id_medicamento'] for d in detalles}:
+            notificar_cambio('Medicamentos', id_medicamento)
         return jsonify({"estado": "exito", "id_venta": id_venta}), 201
 
     except oracledb.DatabaseError as e:
@@ -51,55 +140,159 @@ def registrar_venta_completa():
         if cursor: cursor.close()
 
 
+# Paginado por clave (fecha_venta DESC, id_venta DESC) con ?limite y ?siguiente=<token>.
+# Filtros opcionales: desde / hasta (YYYY-MM-DD), dni_cliente, dni_empleado.
+# ?todo=1 conserva el listado completo sin paginar; ?total=1 agrega el conteo total.
+# Las ventas anteriores al corte del archivo histórico (src/archivo.py) se leen solo si la
+# página o el rango llegan hasta ellas.
+SQL_LISTA_VENTAS = """
+    SELECT v.id_venta, 
+           v.fecha_venta, 
+           uc.nombre || ' ' || uc.apellido_paterno AS cliente, 
+           ue.nombre || ' ' || ue.apellido_paterno AS empleado, 
+           v.total_venta 
+    FROM {origen} v 
+    JOIN Clientes c ON v.dni_cliente = c.dni 
+    JOIN Usuarios uc ON c.dni = uc.dni
+    JOIN Empleados e ON v.dni_empleado = e.dni 
+    JOIN Usuarios ue ON e.dni = ue.dni
+    {where}
+    ORDER BY v.fecha_venta DESC, v.id_venta DESC
+"""
+
+
+def _tramo_ventas(tramo, condiciones):
+    # Origen y filtros de un tramo: el caliente es la tabla Ventas desde el corte
+    if tramo == 'caliente':
+        return "Ventas", condiciones + ["v.fecha_venta >= :corte"]
+    return VENTAS_FRIO, condiciones
+
+
 @ventas_bp.route('/ventas', methods=['GET'])
 def obtener_ventas():
+    args = request.args
+    try:
+        condiciones, binds = [], {}
+        desde = leer_fecha(args, 'desde')
+        if desde:
+            condiciones.append("v.fecha_venta >= :desde")
+            binds['desde'] = desde
+        hasta = leer_fecha(args, 'hasta')
+        if hasta:
+            condiciones.append("v.fecha_venta < :hasta")
+            binds['hasta'] = dia_siguiente(hasta)
+        if args.get('dni_cliente'):
+            condiciones.append("v.dni_cliente = :dni_cliente")
+            binds['dni_cliente'] = args['dni_cliente']
+        if args.get('dni_empleado'):
+            condiciones.append("v.dni_empleado = :dni_empleado")
+            binds['dni_empleado'] = args['dni_empleado']
+
+        todo = leer_flag(args, 'todo')
+        limite = leer_limite(args)
+        forma = leer_forma(args)
+        clave = decodificar_token(args['siguiente']) if args.get('siguiente') and not todo else None
+        if clave:
+            clave = [datetime.fromisoformat(clave[0]), int(clave[1])]
+    except (ValueError, TypeError, IndexError) as e:
+        return jsonify({"estado": "error", "mensaje": str(e)}), 400
+
     connection = get_db_connection()
+    if not connection: return jsonify({"estado": "error", "mensaje": "Sin conexion"}), 503
     try:
         cursor = connection.cursor()
+        binds['corte'] = corte(connection, 'VENTAS')
+        lista = tramos(binds['corte'], desde, binds.get('hasta'), clave[0] if clave else None)
+        filtros = condiciones[:]
+        consulta = dict(binds)
+        if clave:
+            filtros.append("(v.fecha_venta < :k_fecha OR (v.fecha_venta = :k_fecha AND v.id_venta < :k_id))")
+            consulta['k_fecha'], consulta['k_id'] = clave
+
+        # Los tramos no se solapan en fecha: se recorren en orden y el frío solo si falta completar
+        ventas, nombres = [], []
+        for tramo in lista:
+            if not todo and len(ventas) > limite:
+                break
+            if tramo == 'frio':
+                registrar_lectura_fria('VENTAS')
+            origen, condiciones_tramo = _tramo_ventas(tramo, filtros)
+            where = ("WHERE " + " AND ".join(condiciones_tramo)) if condiciones_tramo else ""
+            sql = SQL_LISTA_VENTAS.format(origen=origen, where=where)
+            if todo:
+                ajustar_lectura(cursor)
+                cursor.execute(sql, consulta)
+            else:
+                # Se pide una fila extra para saber si existe una página siguiente
+                consulta['limite'] = limite + 1 - len(ventas)
+                ajustar_lectura(cursor, consulta['limite'])
+                cursor.execute(sql + " FETCH FIRST :limite ROWS ONLY", consulta)
+            nombres = columnas(cursor)
+            ventas += cursor.fetchall()
+        if todo:
+            return respuesta_lista(nombres, ventas, forma), 200
+
+        siguiente = None
+        if len(ventas) > limite:
+            ventas = ventas[:limite]
+            ultima = ventas[-1]
+            siguiente = codificar_token([ultima[nombres.index('fecha_venta')], ultima[nombres.index('id_venta')]])
 
-        sql = """
-            SELECT v.id_venta, 
-                   v.fecha_venta, 
-                   uc.nombre || ' ' || uc.apellido_paterno AS cliente, 
-                   ue.nombre || ' ' || ue.apellido_paterno AS empleado, 
-                   v.total_venta 
-            FROM Ventas v 
-            JOIN Clientes c ON v.dni_cliente = c.dni 
-            JOIN Usuarios uc ON c.dni = uc.dni
-            JOIN Empleados e ON v.dni_empleado = e.dni 
-            JOIN Usuarios ue ON e.dni = ue.dni
-            ORDER BY v.fecha_venta DESC
-        """
-        cursor.execute(sql)
-        columnas = [col[0].lower() for col in cursor.description]
-        return jsonify({"estado": "exito", "datos": [dict(zip(columnas, row)) for row in cursor.fetchall()]}), 200
+        extra = {"siguiente": siguiente}
+        if leer_flag(args, 'total'):
+            total = 0
+            for tramo in tramos(binds['corte'], desde, binds.get('hasta')):
+                origen, condiciones_tramo = _tramo_ventas(tramo, condiciones)
+                where = ("WHERE " + " AND ".join(condiciones_tramo)) if condiciones_tramo else ""
+                cursor.execute(f"SELECT COUNT(*) FROM {origen} v {where}", binds)
+                total += cursor.fetchone()[0]
+            extra['total'] = total
+        return respuesta_lista(nombres, ventas, forma, **extra), 200
     except oracledb.Error as e:
         return jsonify({"estado": "error", "mensaje": str(e)}), 500
 
 
+# Cabecera y líneas de una venta; si ya no está en las tablas calientes se busca en el archivo
+SQL_CABECERA_VENTA = """
+    SELECT v.id_venta, 
+           v.total_venta, 
+           uc.nombre || ' ' || uc.apellido_paterno AS cliente 
+    FROM {ventas} v 
+    JOIN Clientes c ON v.dni_cliente = c.dni 
+    JOIN Usuarios uc ON c.dni = uc.dni
+    WHERE v.id_venta = :id
+"""
+# Las líneas archivadas pueden referirse a medicamentos ya eliminados del catálogo
+SQL_LINEAS_VENTA = """
+    SELECT m.nombre AS medicamento, vd.cantidad, vd.precio_unitario_venta, vd.subtotal
+    FROM {detalle} vd LEFT JOIN Medicamentos m ON vd.id_medicamento = m.id_medicamento
+    WHERE vd.id_venta = :id
+"""
+TABLAS_VENTA = (("Ventas", "Venta_Detalle"), ("Ventas_Historico", "Venta_Detalle_Historico"))
+
+
 @ventas_bp.route('/ventas/<int:id_venta>', methods=['GET'])
 def obtener_detalle_venta(id_venta):
     connection = get_db_connection()
     try:
         cursor = connection.cursor()
-        sql_cabecera = """
-            SELECT v.id_venta, 
-                   v.total_venta, 
-                   uc.nombre || ' ' || uc.apellido_paterno AS cliente 
-            FROM Ventas v 
-            JOIN Clientes c ON v.dni_cliente = c.dni 
-            JOIN Usuarios uc ON c.dni = uc.dni
-            WHERE v.id_venta = :id
-        """
-        cursor.execute(sql_cabecera, {'id': id_venta})
-        venta = cursor.fetchone()
+        for ventas, detalle in TABLAS_VENTA:
+            cursor.execute(SQL_CABECERA_VENTA.format(ventas=ventas), {'id': id_venta})
+            venta = cursor.fetchone()
+            if venta:
+                break
         if not venta: return jsonify({"estado": "error"}), 404
+        if ventas == "Ventas_Historico":
+            registrar_lectura_fria('VENTAS')
         v_dict = dict(zip([c[0].lower() for c in cursor.description], venta))
 
-        cursor.execute(
-            "SELECT m.nombre AS medicamento, vd.cantidad, vd.precio_unitario_venta, vd.subtotal FROM Venta_Detalle vd JOIN Medicamentos m ON vd.id_medicamento = m.id_medicamento WHERE vd.id_venta = :id",
-            {'id': id_venta})
-        v_dict['detalles'] = [dict(zip([c[0].lower() for c in cursor.description], row)) for row in cursor.fetchall()]
+        cursor.execute(SQL_LINEAS_VENTA.format(detalle=detalle), {'id': id_venta})
+        lineas = cursor.fetchall()
+        if not lineas and detalle == "Venta_Detalle":
+            # Archivada entre las dos consultas (el traslado mueve la venta completa en un COMMIT)
+            cursor.execute(SQL_LINEAS_VENTA.format(detalle="Venta_Detalle_Historico"), {'id': id_venta})
+            lineas = cursor.fetchall()
+        v_dict['detalles'] = [dict(zip([c[0].lower() for c in cursor.description], row)) for row in lineas]
         return jsonify({"estado": "exito", "datos": v_dict}), 200
     except oracledb.Error as e:
-        return jsonify({"estado": "error", "mensaje": str(e)}), 500
\ No newline at end of file
+        return jsonify({"estado": "error", "mensaje": str(e)}), 500
@@ -0,0 +1,256 @@
+import heapq
+import os
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+import oracledb
+from src.cache import ErrorCarga
+from src.db import get_pool
+from src.eventos import suscribir
+
+# Índice en memoria para la búsqueda incremental de medicamentos (/api/medicamentos/buscar).
+# Cada medicamento aporta el texto normalizado de nombre, lote y categoría:
+#  - trigramas -> ids, para coincidencias por subcadena (términos de 3+ caracteres)
+#  - prefijos de palabra de 1-2 caracteres -> ids, para los primeros teclazos
+# Las escrituras solo marcan ids pendientes (sin viajes extra a la BD en la venta);
+# la búsqueda siguiente los relee en una sola consulta. Cada BUSQUEDA_MAX_EDAD segundos
+# se reconstruye completo en segundo plano (cambios hechos por otros workers).
+SQL_INDICE = """
+    SELECT m.id_medicamento, m.nombre, m.lote, c.nombre AS categoria, m.id_categoria,
+           m.stock, m.precio_venta, m.estado
+    FROM Medicamentos m
+    JOIN Categorias c ON m.id_categoria = c.id_categoria
+"""
+LOTE_RELECTURA = 500
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    return ''.join(ch for ch in texto if not unicodedata.combining(ch))
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _prefijos(texto):
+    prefijos = set()
+    for palabra in texto.split():
+        prefijos.add(palabra[:1])
+        prefijos.add(palabra[:2])
+    return prefijos
+
+
+class _Indice:
+    def __init__(self):
+        self.items = {}
+        self.textos = {}
+        self.trigramas = defaultdict(set)
+        self.prefijos = defaultdict(set)
+        # Activos con stock: se ordenan primero y son los únicos con ?solo_disponibles
+        self.disponibles = set()
+        self.max_id = 0
+
+    def agregar(self, item):
+        id_med = item['id_medicamento']
+        self.quitar(id_med)
+        texto = normalizar(f"{item['nombre']} {item['lote'] or ''} {item['categoria'] or ''}")
+        self.items[id_med] = item
+        # El nombre con un espacio delante: ' ' + término dentro de él = prefijo de alguna palabra
+        self.textos[id_med] = (' ' + normalizar(item['nombre']), texto)
+        if item['estado'] == 'Activo' and item['stock'] > 0:
+            self.disponibles.add(id_med)
+        for t in _trigramas(texto):
+            self.trigramas[t].add(id_med)
+        for p in _prefijos(texto):
+            self.prefijos[p].add(id_med)
+        self.max_id = max(self.max_id, id_med)
+
+    def quitar(self, id_med):
+        anterior = self.textos.pop(id_med, None)
+        self.items.pop(id_med, None)
+        self.disponibles.discard(id_med)
+        if anterior is None:
+            return
+        for t in _trigramas(anterior[1]):
+            self.trigramas[t].discard(id_med)
+        for p in _prefijos(anterior[1]):
+            self.prefijos[p].discard(id_med)
+
+    def candidatos(self, termino):
+        if len(termino) < 3:
+            return self.prefijos.get(termino, set())
+        conjuntos = sorted((self.trigramas.get(t, set()) for t in _trigramas(termino)), key=len)
+        ids = set(conjuntos[0])
+        for conjunto in conjuntos[1:]:
+            ids &= conjunto
+            if not ids:
+                break
+        if len(conjuntos) == 1:
+            return ids
+        # Los trigramas pueden coincidir por separado: se confirma la subcadena
+        return {i for i in ids if termino in self.textos[i][1]}
+
+
+_indice = None
+_pendientes = set()
+_nuevos = False
+_construido = 0.0
+_reconstruyendo = False
+_lock = threading.Lock()
+
+
+def _reiniciar_tras_fork():
+    global _indice, _pendientes, _nuevos, _construido, _reconstruyendo, _lock
+    _indice, _pendientes, _nuevos, _construido, _reconstruyendo = None, set(), False, 0.0, False
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def _marcar_cambio(tabla, id):
+    global _nuevos
+    with _lock:
+        if id is None:
+            _nuevos = True
+        else:
+            _pendientes.add(int(id))
+
+
+suscribir('Medicamentos', _marcar_cambio)
+
+
+def _filas(cursor):
+    columnas = [col[0].lower() for col in cursor.description]
+    for row in cursor:
+        item = dict(zip(columnas, row))
+        item['stock'] = int(item['stock'])
+        item['precio_venta'] = float(item['precio_venta'])
+        yield item
+
+
+def construir_indice(connection):
+    """Lee todo el catálogo y reemplaza el índice; devuelve cuántos medicamentos indexó."""
+    global _indice, _construido, _nuevos
+    inicio = time.time()
+    with _lock:
+        # Lo que cambie mientras se lee queda pendiente y se relee después
+        cubiertos = set(_pendientes)
+        _nuevos = False
+    cursor = connection.cursor()
+    cursor.arraysize = 1000
+    cursor.prefetchrows = 1000
+    cursor.execute(SQL_INDICE)
+    indice = _Indice()
+    for item in _filas(cursor):
+        indice.agregar(item)
+    with _lock:
+        _indice, _construido = indice, inicio
+        _pendientes.difference_update(cubiertos)
+    return len(indice.items)
+
+
+def _releer_pendientes(connection):
+    global _nuevos
+    with _lock:
+        ids, nuevos, max_id = sorted(_pendientes), _nuevos, _indice.max_id
+        _pendientes.clear()
+        _nuevos = False
+    if not ids and not nuevos:
+        return
+    cursor = connection.cursor()
+    encontrados = []
+    try:
+        for i in range(0, len(ids), LOTE_RELECTURA):
+            lote = ids[i:i + LOTE_RELECTURA]
+            binds = {f"id{n}": v for n, v in enumerate(lote)}
+            cursor.execute(SQL_INDICE + f" WHERE m.id_medicamento IN ({', '.join(':' + k for k in binds)})", binds)
+            encontrados.extend(_filas(cursor))
+        if nuevos:
+            cursor.execute(SQL_INDICE + " WHERE m.id_medicamento > :max_id", {'max_id': max_id})
+            encontrados.extend(_filas(cursor))
+    except oracledb.Error:
+        # Se reintenta en la búsqueda siguiente
+        with _lock:
+            _pendientes.update(ids)
+            _nuevos = _nuevos or nuevos
+        raise
+    with _lock:
+        vistos = {item['id_medicamento'] for item in encontrados}
+        for item in encontrados:
+            _indice.agregar(item)
+        for id_med in set(ids) - vistos:
+            _indice.quitar(id_med)
+
+
+def _reconstruir_en_segundo_plano(app):
+    global _reconstruyendo
+    with app.app_context():
+        try:
+            pool = get_pool()
+            conn = pool.acquire()
+            try:
+                construir_indice(conn)
+            finally:
+                pool.release(conn)
+        except oracledb.Error as e:
+            print(f"Error al reconstruir el índice de búsqueda: {e}")
+        finally:
+            with _lock:
+                _reconstruyendo = False
+
+
+def buscar(consulta, limite, solo_disponibles, obtener_conexion, app):
+    """Devuelve (resultados, total de coincidencias); construye o actualiza el índice si hace falta.
+
+    Lanza ErrorCarga si no hay conexión para construirlo, u oracledb.Error si falla la lectura.
+    """
+    global _reconstruyendo
+    if _indice is None:
+        connection = obtener_conexion()
+        if connection is None:
+            raise ErrorCarga("Sin conexion", 503)
+        with _lock:
+            pendiente = _indice is None
+        if pendiente:
+            construir_indice(connection)
+    if _pendientes or _nuevos:
+        connection = obtener_conexion()
+        if connection is not None:
+            _releer_pendientes(connection)
+
+    max_edad = app.config.get('BUSQUEDA_MAX_EDAD', 300)
+    with _lock:
+        if time.time() - _construido > max_edad and not _reconstruyendo:
+            _reconstruyendo = True
+            threading.Thread(target=_reconstruir_en_segundo_plano, args=(app,), daemon=True).start()
+
+        terminos = normalizar(consulta).split()
+        if not terminos:
+            return [], 0
+        indice = _indice
+        ids = None
+        for termino in sorted(terminos, key=len, reverse=True):
+            if ids is None:
+                ids = indice.candidatos(termino)
+            elif len(termino) < 3:
+                # Términos cortos después de uno largo: se filtran los candidatos ya hallados
+                inicio = ' ' + termino
+                ids = {i for i in ids if inicio in ' ' + indice.textos[i][1]}
+            else:
+                ids = ids & indice.candidatos(termino)
+            if not ids:
+                return [], 0
+        if solo_disponibles:
+            ids = ids & indice.disponibles
+        # Orden: disponibles, luego nombre que empieza con el primer término, luego alguna
+        # palabra del nombre que empieza con él, y por último nombre e id
+        inicio = ' ' + terminos[0]
+        textos, disponibles = indice.textos, indice.disponibles
+        claves = [(i not in disponibles,
+                   0 if textos[i][0].startswith(inicio) else 1 if inicio in textos[i][0] else 2,
+                   textos[i][0], i) for i in ids]
+        mejores = heapq.nsmallest(limite, claves)
+        return [dict(indice.items[clave[3]]) for clave in mejores], len(ids)
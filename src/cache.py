@@ -0,0 +1,196 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, current_app, jsonify, request
+import oracledb
+from src.filas import cuerpo_columnas, leer_forma
+from src.replica import requerir_al_dia
+
+# Caché de lectura en proceso (LRU con vencimiento) para búsquedas que casi no cambian.
+# Guarda los datos y el cuerpo JSON ya serializado con su ETag, de modo que un acierto
+# no toca la BD ni vuelve a serializar, y un If-None-Match que coincide responde 304.
+# Las escrituras la invalidan por clave vía src/eventos; entre workers la vigencia
+# máxima (TTL) acota lo desactualizado que puede estar una copia. Las claves con datos
+# que cambian en cualquier worker (stock de un medicamento) pasan a responder() una
+# función `vigente` que confirma cada acierto con una consulta mínima.
+_caches = []
+
+
+class ErrorCarga(Exception):
+    """Error de la función de carga que se responde tal cual y no se guarda en caché."""
+
+    def __init__(self, mensaje, status):
+        super().__init__(mensaje)
+        self.status = status
+
+
+class Entrada:
+    __slots__ = ("datos", "cuerpo", "etag", "expira", "columnas")
+
+    def __init__(self, datos, cuerpo, etag, expira):
+        self.datos = datos
+        self.cuerpo = cuerpo
+        self.etag = etag
+        self.expira = expira
+        self.columnas = None
+
+    def en_forma(self, forma):
+        """(cuerpo, etag) para ?shape; el de columnas se arma una vez, en el primer pedido."""
+        if forma != 'columns' or not isinstance(self.datos, list):
+            return self.cuerpo, self.etag
+        if self.columnas is None:
+            nombres = list(self.datos[0]) if self.datos else []
+            cuerpo = cuerpo_columnas(nombres, [list(d.values()) for d in self.datos]).encode('utf-8')
+            self.columnas = (cuerpo, hashlib.sha256(cuerpo).hexdigest()[:32])
+        return self.columnas
+
+
+class CacheLectura:
+    def __init__(self, nombre, clave_ttl, clave_max):
+        self.nombre = nombre
+        self._clave_ttl = clave_ttl
+        self._clave_max = clave_max
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        # Versión por clave y global: una carga que empezó antes de invalidar su clave no se guarda
+        self._versiones = {}
+        self._version_global = 0
+        # Hora de la última invalidación: las recargas leen de una réplica que ya la tenga
+        self._invalidado = 0.0
+        self.stats = {"aciertos": 0, "fallos": 0, "invalidaciones": 0, "desalojos": 0, "desactualizadas": 0}
+        _caches.append(self)
+
+    def ficha(self, clave):
+        """Versión vigente de la clave; se toma antes de consultar la BD y se pasa a guardar()."""
+        with self._lock:
+            return self._version_global, self._versiones.get(clave, 0)
+
+    def ultima_invalidacion(self):
+        """Hora (time.time()) de la última invalidación; una recarga debe leer algo igual o posterior."""
+        with self._lock:
+            return self._invalidado
+
+    def leer(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada.expira > ahora:
+                self._entradas.move_to_end(clave)
+                self.stats["aciertos"] += 1
+                return entrada
+            if entrada is not None:
+                del self._entradas[clave]
+            self.stats["fallos"] += 1
+            return None
+
+    def guardar(self, clave, datos, ficha):
+        cuerpo = current_app.json.dumps({"estado": "exito", "datos": datos}).encode('utf-8')
+        entrada = Entrada(datos, cuerpo, hashlib.sha256(cuerpo).hexdigest()[:32],
+                          time.monotonic() + current_app.config.get(self._clave_ttl, 300))
+        maximo = current_app.config.get(self._clave_max, 2000)
+        with self._lock:
+            if ficha == (self._version_global, self._versiones.get(clave, 0)):
+                self._entradas[clave] = entrada
+                self._entradas.move_to_end(clave)
+                while len(self._entradas) > maximo:
+                    self._entradas.popitem(last=False)
+                    self.stats["desalojos"] += 1
+        return entrada
+
+    def invalidar_clave(self, clave):
+        with self._lock:
+            self._versiones[clave] = self._versiones.get(clave, 0) + 1
+            self._invalidado = time.time()
+            if self._entradas.pop(clave, None) is not None:
+                self.stats["invalidaciones"] += 1
+
+    def invalidar_clave_si(self, clave, condicion):
+        """Invalida la clave si no está en caché (puede estar cargándose) o si condicion(datos)."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and not condicion(entrada.datos):
+                return
+        self.invalidar_clave(clave)
+
+    def invalidar(self, predicado):
+        """Quita las entradas cuya clave cumple predicado(clave, datos); descarta las cargas en curso."""
+        with self._lock:
+            self._version_global += 1
+            self._invalidado = time.time()
+            claves = [c for c, e in self._entradas.items() if predicado(c, e.datos)]
+            for clave in claves:
+                del self._entradas[clave]
+            self.stats["invalidaciones"] += len(claves)
+
+    def tamano(self):
+        with self._lock:
+            return len(self._entradas)
+
+    def _reiniciar(self):
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._versiones = {}
+        self._version_global = 0
+        self._invalidado = 0.0
+        self.stats = dict.fromkeys(self.stats, 0)
+
+    def _descartar_si_cambio(self, clave, entrada, vigente):
+        """None si vigente(datos) dice que la BD ya tiene otra versión (o no se pudo confirmar)."""
+        try:
+            if vigente(entrada.datos):
+                return entrada
+        except (oracledb.Error, ErrorCarga):
+            pass
+        with self._lock:
+            if self._entradas.get(clave) is entrada:
+                del self._entradas[clave]
+            self.stats["desactualizadas"] += 1
+        return None
+
+    def responder(self, clave, cargar, vigente=None):
+        """Respuesta {"estado": "exito", "datos": ...} desde la caché o desde cargar() (lectura directa).
+
+        cargar() consulta la BD; puede lanzar ErrorCarga (p. ej. 404) u oracledb.Error (500).
+        vigente(datos), si se indica, confirma cada acierto contra la BD; si devuelve False se recarga.
+        Las listas admiten ?shape=columns (ver src/filas.py).
+        """
+        try:
+            forma = leer_forma(request.args)
+        except ValueError as e:
+            return jsonify({"estado": "error", "mensaje": str(e)}), 400
+        entrada = self.leer(clave)
+        if entrada is not None and vigente is not None:
+            entrada = self._descartar_si_cambio(clave, entrada, vigente)
+        if entrada is None:
+            ficha = self.ficha(clave)
+            requerir_al_dia(self.ultima_invalidacion())
+            try:
+                datos = cargar()
+            except ErrorCarga as e:
+                return jsonify({"estado": "error", "mensaje": str(e)}), e.status
+            except oracledb.Error as e:
+                return jsonify({"estado": "error", "mensaje": str(e)}), 500
+            entrada = self.guardar(clave, datos, ficha)
+        cuerpo, etag = entrada.en_forma(forma)
+        if request.if_none_match.contains(etag):
+            respuesta = Response(status=304)
+        else:
+            respuesta = Response(cuerpo, mimetype='application/json')
+        respuesta.set_etag(etag)
+        # El navegador guarda la copia pero la revalida en cada uso (304 si no cambió)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        return respuesta
+
+
+def _reiniciar_tras_fork():
+    for cache in _caches:
+        cache._reiniciar()
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def get_cache_stats():
+    return {c.nombre: dict(c.stats, tamano=c.tamano()) for c in _caches}
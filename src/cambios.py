@@ -0,0 +1,253 @@
+import os
+import queue
+import threading
+import time
+import oracledb
+from src.db import get_pool
+from src.eventos import suscribir
+from src.paginacion import codificar_token, decodificar_token
+
+# Feed de cambios de Medicamentos (/api/medicamentos/cambios y su stream SSE) para que los
+# clientes actualicen stock, precio y estado sin volver a pedir el catálogo completo.
+# trg_version_medicamento numera con seq_cambios_medicamentos cada cambio de esas columnas.
+# La secuencia se asigna antes del COMMIT, así que una venta puede confirmarse con un número
+# menor a otro ya leído. Por eso el token lleva dos marcas:
+#  - asentado: todo cambio con versión <= asentado ya se entregó
+#  - ultimo:   la mayor versión entregada
+# y cada lectura revisa otra vez (asentado, ultimo] buscando filas cambiadas hace menos de
+# CAMBIOS_MARGEN segundos, las únicas que pueden haberse confirmado tarde. Esas filas pueden
+# llegar repetidas: el cliente aplica una fila solo si su versión es mayor a la que ya tiene.
+SQL_CAMBIOS = """
+    SELECT id_medicamento, stock, precio_venta, estado, version_cambio,
+           CASE WHEN fecha_cambio < SYSDATE - :margen THEN 1 ELSE 0 END AS asentado
+    FROM Medicamentos
+    WHERE version_cambio > :asentado
+      AND (version_cambio > :ultimo OR fecha_cambio >= SYSDATE - :margen)
+    ORDER BY version_cambio
+"""
+SQL_VERSION_ACTUAL = """
+    SELECT NVL(MAX(CASE WHEN fecha_cambio < SYSDATE - :margen THEN version_cambio END), 0),
+           NVL(MAX(version_cambio), 0)
+    FROM Medicamentos
+"""
+# Cambios por evento del stream y eventos en cola por cliente antes de cortarlo por lento
+LOTE_DIFUSION = 500
+COLA_MAXIMA = 100
+# Espera del navegador antes de reconectar un stream cortado
+REINTENTO_MS = 3000
+
+
+def codificar_marcas(asentado, ultimo):
+    return codificar_token([asentado, ultimo])
+
+
+def leer_marcas(token):
+    """Devuelve (asentado, ultimo); lanza ValueError si el token no es válido."""
+    valores = decodificar_token(token)
+    if len(valores) != 2:
+        raise ValueError("Token de cambios inválido")
+    asentado, ultimo = int(valores[0]), int(valores[1])
+    if asentado < 0 or asentado > ultimo:
+        raise ValueError("Token de cambios inválido")
+    return asentado, ultimo
+
+
+def version_actual(connection, margen):
+    """Marcas para un cliente que acaba de cargar el catálogo completo."""
+    cursor = connection.cursor()
+    cursor.execute(SQL_VERSION_ACTUAL, {'margen': margen / 86400})
+    asentado, ultimo = cursor.fetchone()
+    return int(asentado), int(ultimo)
+
+
+def leer_cambios(connection, asentado, ultimo, limite, margen):
+    """Devuelve (filas, asentado, ultimo, hay_mas) con hasta `limite` cambios nuevos."""
+    cursor = connection.cursor()
+    cursor.arraysize = min(limite + 1, 1000)
+    cursor.execute(SQL_CAMBIOS, {'margen': margen / 86400, 'asentado': asentado, 'ultimo': ultimo})
+    filas, nuevas, pendiente, hay_mas = [], 0, False, False
+    nuevo_asentado, nuevo_ultimo = asentado, ultimo
+    for id_medicamento, stock, precio_venta, estado, version, firme in cursor:
+        if version > ultimo:
+            if nuevas == limite:
+                hay_mas = True
+                break
+            nuevas += 1
+            nuevo_ultimo = version
+        # La marca asentada solo avanza mientras no aparezca una fila reciente
+        if not firme:
+            pendiente = True
+        elif not pendiente:
+            nuevo_asentado = version
+        filas.append({"id_medicamento": id_medicamento, "stock": stock, "precio_venta": precio_venta,
+                      "estado": estado, "version": version})
+    if not pendiente and not hay_mas:
+        nuevo_asentado = nuevo_ultimo
+    return filas, nuevo_asentado, nuevo_ultimo, hay_mas
+
+
+# --- Difusión a los streams SSE del proceso ---
+# Un solo hilo por worker consulta el feed (cada CAMBIOS_SSE_INTERVALO segundos, o apenas
+# una escritura local avisa por src/eventos) y reparte cada lote a las colas de los clientes.
+class Suscripcion:
+    def __init__(self):
+        self.cola = queue.Queue(maxsize=COLA_MAXIMA)
+        self.cortada = False
+
+
+_suscripciones = set()
+_hilo = None
+_cerrando = False
+_despertar = threading.Event()
+_lock = threading.Lock()
+
+
+def _reiniciar_tras_fork():
+    global _hilo, _cerrando, _despertar, _lock
+    _suscripciones.clear()
+    _hilo, _cerrando = None, False
+    _despertar, _lock = threading.Event(), threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def _avisar(tabla, id):
+    _despertar.set()
+
+
+suscribir('Medicamentos', _avisar)
+
+
+def abrir_suscripcion(app):
+    """Registra un cliente del stream; devuelve None si ya hay CAMBIOS_SSE_MAX en este worker."""
+    global _hilo
+    with _lock:
+        if _cerrando or len(_suscripciones) >= app.config.get('CAMBIOS_SSE_MAX', 4):
+            return None
+        suscripcion = Suscripcion()
+        _suscripciones.add(suscripcion)
+        if _hilo is None:
+            _hilo = threading.Thread(target=_difundir, args=(app,), daemon=True, name='cambios-sse')
+            _hilo.start()
+    return suscripcion
+
+
+def cerrar_suscripcion(suscripcion):
+    with _lock:
+        _suscripciones.discard(suscripcion)
+
+
+def _cortar(suscripcion):
+    # Cliente lento o apagado del worker: el stream termina y el navegador se reconecta
+    # con Last-Event-ID (a este u otro worker)
+    suscripcion.cortada = True
+    _suscripciones.discard(suscripcion)
+    try:
+        suscripcion.cola.put_nowait(None)
+    except queue.Full:
+        pass
+
+
+def cerrar_suscripciones():
+    """Termina todos los streams del worker (señal de apagado)."""
+    global _cerrando
+    with _lock:
+        _cerrando = True
+        for suscripcion in list(_suscripciones):
+            _cortar(suscripcion)
+    _despertar.set()
+
+
+def _difundir(app):
+    global _hilo
+    intervalo = app.config.get('CAMBIOS_SSE_INTERVALO', 2)
+    margen = app.config.get('CAMBIOS_MARGEN', 10)
+    marcas, enviadas = None, {}
+    with app.app_context():
+        while True:
+            with _lock:
+                if not _suscripciones or _cerrando:
+                    _hilo = None
+                    return
+            _despertar.clear()
+            hay_mas = False
+            try:
+                pool = get_pool()
+                conn = pool.acquire()
+                try:
+                    if marcas is None:
+                        marcas = version_actual(conn, margen)
+                    filas, asentado, ultimo, hay_mas = leer_cambios(conn, *marcas, LOTE_DIFUSION, margen)
+                finally:
+                    pool.release(conn)
+            except oracledb.Error as e:
+                print(f"Error al leer cambios para el stream: {e}")
+                _despertar.wait(intervalo)
+                continue
+            # Las filas recientes se releen hasta asentarse: solo se reenvían si cambiaron
+            nuevas = [f for f in filas if f['version'] > enviadas.get(f['id_medicamento'], 0)]
+            for fila in nuevas:
+                enviadas[fila['id_medicamento']] = fila['version']
+            marcas = (asentado, ultimo)
+            enviadas = {k: v for k, v in enviadas.items() if v > asentado}
+            if nuevas:
+                evento = (codificar_marcas(*marcas), nuevas)
+                with _lock:
+                    for suscripcion in list(_suscripciones):
+                        try:
+                            suscripcion.cola.put_nowait(evento)
+                        except queue.Full:
+                            _cortar(suscripcion)
+            if not hay_mas:
+                _despertar.wait(intervalo)
+
+
+def mensaje_sse(dumps, evento, datos, id=None):
+    lineas = f"id: {id}\n" if id else ""
+    return f"{lineas}event: {evento}\ndata: {dumps(datos)}\n\n"
+
+
+def generar_stream(app, suscripcion, marcas, dumps):
+    """Cuerpo text/event-stream: primero los cambios desde `marcas`, luego los de la difusión.
+
+    Con marcas=None el cliente recibe la versión actual (evento `version`) y desde ahí en adelante.
+    """
+    margen = app.config.get('CAMBIOS_MARGEN', 10)
+    latido = app.config.get('CAMBIOS_SSE_LATIDO', 15)
+    fin = time.monotonic() + app.config.get('CAMBIOS_SSE_DURACION', 300)
+    try:
+        yield f"retry: {REINTENTO_MS}\n\n"
+        pool = get_pool()
+        conn = pool.acquire()
+        try:
+            if marcas is None:
+                marcas = version_actual(conn, margen)
+                token = codificar_marcas(*marcas)
+                yield mensaje_sse(dumps, 'version', token, id=token)
+            else:
+                hay_mas = True
+                while hay_mas:
+                    filas, asentado, ultimo, hay_mas = leer_cambios(conn, *marcas, LOTE_DIFUSION, margen)
+                    marcas = (asentado, ultimo)
+                    if filas:
+                        token = codificar_marcas(*marcas)
+                        yield mensaje_sse(dumps, 'cambios', filas, id=token)
+        finally:
+            pool.release(conn)
+
+        while not suscripcion.cortada and time.monotonic() < fin:
+            try:
+                evento = suscripcion.cola.get(timeout=min(latido, max(fin - time.monotonic(), 0.1)))
+            except queue.Empty:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": latido\n\n"
+                continue
+            if evento is None:
+                break
+            token, filas = evento
+            yield mensaje_sse(dumps, 'cambios', filas, id=token)
+    except oracledb.Error as e:
+        print(f"Error en el stream de cambios: {e}")
+    finally:
+        cerrar_suscripcion(suscripcion)
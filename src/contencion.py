@@ -0,0 +1,61 @@
+import os
+import random
+import threading
+
+# Conflictos de bloqueo al registrar ventas. p_registrar_venta_completa bloquea los
+# medicamentos en orden de id con una espera acotada; si aun así choca con otra transacción
+# (ORA-30006 al agotar la espera, ORA-00060 con escrituras de otras pantallas) la venta se
+# deshace completa y POST /api/ventas la reintenta con backoff exponencial y jitter.
+ERRORES_BLOQUEO = {
+    'ORA-00060': 'deadlock',
+    'ORA-30006': 'espera_agotada',
+    'ORA-00054': 'recurso_ocupado',
+}
+
+_lock = threading.Lock()
+_stats = {"reintentos": 0, "agotados": 0, "repetidas": 0}
+_conflictos = {tipo: 0 for tipo in list(ERRORES_BLOQUEO.values()) + ['resumen_duplicado']}
+
+
+def _reiniciar_tras_fork():
+    global _lock
+    _lock = threading.Lock()
+    _stats.update(reintentos=0, agotados=0, repetidas=0)
+    for tipo in _conflictos:
+        _conflictos[tipo] = 0
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def tipo_conflicto(mensaje):
+    """Tipo de conflicto si el error justifica reintentar la venta completa; None si no."""
+    for codigo, tipo in ERRORES_BLOQUEO.items():
+        if codigo in mensaje:
+            return tipo
+    # Primera venta del día de un mismo empleado o cliente en dos cajas a la vez con la versión
+    # de trg_resumen_ventas anterior al manejo de DUP_VAL_ON_INDEX: ambos MERGE insertan la fila
+    if 'ORA-00001' in mensaje and 'PK_RESUMEN' in mensaje.upper():
+        return 'resumen_duplicado'
+    return None
+
+
+def espera_reintento(intento, base_ms, maximo_ms):
+    """Segundos antes del reintento `intento` (0, 1, ...): aleatorio entre 0 y min(maximo, base * 2^intento)."""
+    return random.uniform(0, min(maximo_ms, base_ms * 2 ** intento)) / 1000
+
+
+def registrar_conflicto(tipo):
+    with _lock:
+        _conflictos[tipo] += 1
+
+
+def registrar(evento):
+    """Cuenta un reintento, una venta que agotó los reintentos o una repetida por Idempotency-Key."""
+    with _lock:
+        _stats[evento] += 1
+
+
+def get_contencion_stats():
+    with _lock:
+        return dict(_stats, conflictos=dict(_conflictos))
@@ -1,24 +1,176 @@
 import oracledb
 import os
-from flask import g
+import threading
+import time
+from flask import g, current_app
 
-def get_db_connection():
+# Pools de sesiones del proceso (se crean bajo demanda): la primaria (DB_DSN) y, si se
+# configura DB_DSN_LECTURA, la réplica de lectura. El destino de cada solicitud lo decide
+# src/replica.py; sin réplica todo va a la primaria.
+PRIMARIA, REPLICA = 'primaria', 'replica'
+_pools = {}
+_pool_lock = threading.Lock()
+
+# Métricas de espera al obtener una conexión de cada pool
+_stats_lock = threading.Lock()
+_stats = {destino: {"adquisiciones": 0, "errores": 0, "espera_total_ms": 0.0, "espera_max_ms": 0.0}
+          for destino in (PRIMARIA, REPLICA)}
+
+
+def _reiniciar_tras_fork():
+    # Los pools heredados del proceso padre comparten sockets con él: el hijo los descarta
+    # sin cerrarlos y crea los suyos en el primer uso
+    global _pool_lock, _stats_lock
+    _pools.clear()
+    _pool_lock = threading.Lock()
+    _stats_lock = threading.Lock()
+    for stats in _stats.values():
+        stats.update(adquisiciones=0, errores=0, espera_total_ms=0.0, espera_max_ms=0.0)
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def _config(clave, defecto):
+    valor = current_app.config.get(clave)
+    if valor is None:
+        valor = os.environ.get(clave, defecto)
+    return valor
+
+
+def hay_replica():
+    return bool(_config("DB_DSN_LECTURA", None))
+
+
+def _crear_pool(destino):
+    if destino == REPLICA:
+        dsn = _config("DB_DSN_LECTURA", None)
+        minimo, maximo = _config("DB_LECTURA_POOL_MIN", 2), _config("DB_LECTURA_POOL_MAX", 10)
+    else:
+        dsn = _config("DB_DSN", None)
+        minimo, maximo = _config("DB_POOL_MIN", 2), _config("DB_POOL_MAX", 10)
+    return oracledb.create_pool(
+        user=_config("DB_USER", None),
+        password=_config("DB_PASSWORD", None),
+        dsn=dsn,
+        min=int(minimo),
+        max=int(maximo),
+        increment=int(_config("DB_POOL_INCREMENT", 1)),
+        # Verifica la conexión (ping) si estuvo ociosa más de N segundos
+        ping_interval=int(_config("DB_POOL_PING_INTERVAL", 60)),
+        # Espera acotada (ms) cuando todas las conexiones están ocupadas
+        getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+        wait_timeout=int(_config("DB_POOL_WAIT_TIMEOUT", 5000)),
+        stmtcachesize=int(_config("DB_STMT_CACHE_SIZE", 50))
+    )
+
+
+def get_pool(destino=PRIMARIA):
+    """Pool de la primaria, o de la réplica si se pide REPLICA y DB_DSN_LECTURA está configurado."""
+    if destino == REPLICA and not hay_replica():
+        destino = PRIMARIA
+    pool = _pools.get(destino)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(destino)
+            if pool is None:
+                pool = _pools[destino] = _crear_pool(destino)
+    return pool
+
+
+def _adquirir(destino):
+    inicio = time.perf_counter()
+    try:
+        conn = get_pool(destino).acquire()
+    except oracledb.Error as e:
+        with _stats_lock:
+            _stats[destino]["errores"] += 1
+        print(f"Error BD ({destino}): {e}")
+        return None
+    espera = (time.perf_counter() - inicio) * 1000
+    with _stats_lock:
+        stats = _stats[destino]
+        stats["adquisiciones"] += 1
+        stats["espera_total_ms"] += espera
+        stats["espera_max_ms"] = max(stats["espera_max_ms"], espera)
+    if g.get('medicion') is not None:
+        g.medicion.espera_pool += espera / 1000
+    return conn
+
+
+def get_db_connection(destino=None):
+    """Conexión de la solicitud (una por solicitud, se devuelve en el teardown).
+
+    El destino se fija en la primera llamada: el indicado o el que elija src/replica.py
+    (GET a la réplica si está al día). Si la réplica no entrega conexión se usa la primaria.
+    """
     if 'db_conn' not in g:
-        try:
-            g.db_conn = oracledb.connect(
-                user=os.environ.get("DB_USER"),
-                password=os.environ.get("DB_PASSWORD"),
-                dsn=os.environ.get("DB_DSN")
-            )
-        except oracledb.Error as e:
-            print(f"Error BD: {e}")
+        if destino is None:
+            from src.replica import elegir_destino
+            destino = elegir_destino()
+        conn = _adquirir(destino)
+        if conn is None and destino == REPLICA:
+            from src.replica import registrar_fallo
+            registrar_fallo()
+            destino = PRIMARIA
+            conn = _adquirir(destino)
+        if conn is None:
             return None
-    return g.db_conn
+        g.db_conn, g.db_destino = conn, destino
+    # Con métricas activas se entrega la conexión envuelta (ver src/metricas.py)
+    medicion = g.get('medicion')
+    return medicion.envolver(g.db_conn) if medicion is not None else g.db_conn
+
 
 def close_db_connection(e=None):
     db = g.pop('db_conn', None)
     if db is not None:
         try:
-            db.close()
-        except:
-            pass
\ No newline at end of file
+            # Devuelve la conexión al pool (las transacciones pendientes se descartan)
+            get_pool(g.get('db_destino', PRIMARIA)).release(db)
+        except oracledb.Error:
+            pass
+
+
+def cerrar_pool():
+    """Cierra los pools del proceso (apagado del worker); las conexiones ocupadas se cortan."""
+    with _pool_lock:
+        pools = list(_pools.items())
+        _pools.clear()
+    for destino, pool in pools:
+        try:
+            pool.close(force=True)
+        except oracledb.Error as e:
+            print(f"Error al cerrar el pool ({destino}): {e}")
+
+
+def separar_db_connection():
+    """Quita la conexión de la solicitud para que el teardown no la libere (respuestas en streaming).
+
+    Devuelve (conexión, pool al que hay que devolverla).
+    """
+    return g.pop('db_conn', None), get_pool(g.get('db_destino', PRIMARIA))
+
+
+def get_pool_stats(destino=PRIMARIA):
+    with _stats_lock:
+        stats = dict(_stats[destino])
+    stats["espera_promedio_ms"] = round(stats["espera_total_ms"] / stats["adquisiciones"], 3) if stats["adquisiciones"] else 0.0
+    stats["espera_total_ms"] = round(stats["espera_total_ms"], 3)
+    stats["espera_max_ms"] = round(stats["espera_max_ms"], 3)
+    pool = _pools.get(destino)
+    if pool is None:
+        stats.update({"creado": False})
+        return stats
+    stats.update({
+        "creado": True,
+        "ocupadas": pool.busy,
+        "abiertas": pool.opened,
+        "min": pool.min,
+        "max": pool.max,
+        "incremento": pool.increment,
+        "ping_interval": pool.ping_interval,
+        "wait_timeout_ms": pool.wait_timeout,
+        "stmtcachesize": pool.stmtcachesize
+    })
+    return stats
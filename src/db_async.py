@@ -0,0 +1,179 @@
+import asyncio
+import os
+import threading
+import time
+import oracledb
+from flask import g, has_request_context
+from src.db import PRIMARIA, REPLICA, _config, hay_replica
+
+# Ruta asíncrona para lanzar varias consultas independientes a la vez. Un único bucle
+# de eventos vive en un hilo de fondo junto con sus pools asíncronos (los pools quedan
+# atados a ese bucle): uno para la primaria y, con DB_DSN_LECTURA, otro para la réplica.
+# Las vistas de Flask, que son síncronas, le envían el trabajo y esperan.
+_loop = None
+_pools = {}
+_lock = threading.Lock()
+
+
+def _parametros_pool(destino):
+    # Se leen en el hilo de la solicitud (el bucle de fondo no tiene contexto de Flask)
+    return dict(
+        user=_config("DB_USER", None),
+        password=_config("DB_PASSWORD", None),
+        dsn=_config("DB_DSN_LECTURA" if destino == REPLICA else "DB_DSN", None),
+        min=int(_config("DB_ASYNC_POOL_MIN", 0)),
+        max=int(_config("DB_ASYNC_POOL_MAX", 8)),
+        increment=int(_config("DB_POOL_INCREMENT", 1)),
+        ping_interval=int(_config("DB_POOL_PING_INTERVAL", 60)),
+        getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+        wait_timeout=int(_config("DB_POOL_WAIT_TIMEOUT", 5000)),
+        stmtcachesize=int(_config("DB_STMT_CACHE_SIZE", 50))
+    )
+
+
+async def _crear_pool(parametros):
+    return oracledb.create_pool_async(**parametros)
+
+
+def _reiniciar_tras_fork():
+    # El hilo del bucle no existe en el hijo: se crean bucle y pools nuevos bajo demanda
+    global _loop, _lock
+    _loop, _lock = None, threading.Lock()
+    _pools.clear()
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def _obtener_pool(destino):
+    global _loop
+    pool = _pools.get(destino)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(destino)
+            if pool is None:
+                if _loop is None:
+                    _loop = asyncio.new_event_loop()
+                    threading.Thread(target=_loop.run_forever, daemon=True, name='oracledb-async').start()
+                pool = _pools[destino] = asyncio.run_coroutine_threadsafe(
+                    _crear_pool(_parametros_pool(destino)), _loop).result()
+    return pool
+
+
+class Consulta:
+    """Una sentencia SELECT (o un procedimiento con REF CURSOR de salida) a ejecutar."""
+
+    def __init__(self, sql=None, params=None, proc=None, una_fila=False):
+        self.sql = sql
+        self.params = params or {}
+        self.proc = proc
+        self.una_fila = una_fila
+
+
+class _SinConexion(Exception):
+    """El pool no entregó una conexión (la consulta no llegó a ejecutarse)."""
+
+
+async def _ejecutar(pool, consulta, arraysize):
+    try:
+        conn = await pool.acquire()
+    except oracledb.Error as e:
+        raise _SinConexion(str(e))
+    try:
+        cursor = conn.cursor()
+        if consulta.proc:
+            out_cursor = conn.cursor()
+            out_cursor.arraysize = arraysize
+            out_cursor.prefetchrows = arraysize
+            await cursor.callproc(consulta.proc, list(consulta.params) + [out_cursor])
+            cursor = out_cursor
+        else:
+            cursor.arraysize = arraysize
+            cursor.prefetchrows = arraysize
+            await cursor.execute(consulta.sql, consulta.params)
+        columnas = [col[0].lower() for col in cursor.description]
+        if consulta.una_fila:
+            row = await cursor.fetchone()
+            return dict(zip(columnas, row)) if row else None
+        return [dict(zip(columnas, row)) for row in await cursor.fetchall()]
+    finally:
+        await pool.release(conn)
+
+
+async def _medir(pool, nombre, consulta, arraysize, timeout):
+    inicio = time.perf_counter()
+    sin_conexion = False
+    try:
+        resultado = await asyncio.wait_for(_ejecutar(pool, consulta, arraysize), timeout)
+        error = None
+    except asyncio.TimeoutError:
+        resultado, error = None, f"Tiempo de espera agotado ({timeout} s)"
+    except _SinConexion as e:
+        resultado, error, sin_conexion = None, str(e), True
+    except oracledb.Error as e:
+        resultado, error = None, str(e)
+    return nombre, resultado, error, sin_conexion, (time.perf_counter() - inicio) * 1000
+
+
+async def _ejecutar_todas(pool, consultas, arraysize, timeout):
+    return await asyncio.gather(*(_medir(pool, nombre, c, arraysize, timeout) for nombre, c in consultas.items()))
+
+
+def _ejecutar_en(destino, consultas, arraysize, timeout):
+    pool = _obtener_pool(destino)
+    return asyncio.run_coroutine_threadsafe(_ejecutar_todas(pool, consultas, arraysize, timeout), _loop).result()
+
+
+def ejecutar_concurrente(consultas, arraysize=500, timeout=30, destino=None):
+    """Ejecuta {nombre: Consulta} en paralelo, cada una en su propia conexión del pool asíncrono.
+
+    El destino se decide como en get_db_connection (src/replica.py) y se llama desde el hilo
+    de la solicitud; si la réplica no entrega conexiones, esas partes se repiten en la primaria.
+    Devuelve (datos, errores, tiempos_ms) indexados por nombre; el fallo de una consulta
+    no cancela las demás.
+    """
+    if destino is None:
+        from src.replica import elegir_destino
+        destino = elegir_destino()
+    if destino == REPLICA and not hay_replica():
+        destino = PRIMARIA
+    resultados = {}
+    try:
+        resultados = {r[0]: r for r in _ejecutar_en(destino, consultas, arraysize, timeout)}
+    except oracledb.Error:
+        if destino != REPLICA:
+            raise
+    pendientes = {n: c for n, c in consultas.items() if n not in resultados or resultados[n][3]}
+    if destino == REPLICA and pendientes:
+        from src.replica import registrar_fallo
+        registrar_fallo()
+        destino = PRIMARIA
+        resultados.update((r[0], r) for r in _ejecutar_en(destino, pendientes, arraysize, timeout))
+    if has_request_context() and 'db_destino' not in g:
+        g.db_destino = destino
+    datos, errores, tiempos = {}, {}, {}
+    for nombre, resultado, error, _, ms in resultados.values():
+        tiempos[nombre] = round(ms, 3)
+        if error is None:
+            datos[nombre] = resultado
+        else:
+            errores[nombre] = error
+    return datos, errores, tiempos
+
+
+def cerrar_pool_async():
+    with _lock:
+        pools = list(_pools.items())
+        _pools.clear()
+    for destino, pool in pools:
+        try:
+            asyncio.run_coroutine_threadsafe(pool.close(force=True), _loop).result(10)
+        except Exception as e:
+            print(f"Error al cerrar el pool asíncrono ({destino}): {e}")
+
+
+def get_pool_async_stats(destino=PRIMARIA):
+    pool = _pools.get(destino)
+    if pool is None:
+        return {"creado": False}
+    return {"creado": True, "ocupadas": pool.busy, "abiertas": pool.opened, "min": pool.min, "max": pool.max}
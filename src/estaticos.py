@@ -0,0 +1,185 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+from flask import Response, current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    # Opcional: sin el paquete `brotli` solo se sirven variantes gzip
+    brotli = None
+
+# Frontend servido desde memoria. Al crear la app se leen los .css/.js/.html de
+# src/; cada CSS y JS se publica también con el hash de su contenido en el nombre
+# (js/ventas.3f9a0c1b2d.js) y caché inmutable de un año, y los HTML y los import
+# entre módulos JS se reescriben para apuntar a esas versiones. Las URL sin hash
+# siguen funcionando con ETag / 304. Cada archivo guarda sus variantes gzip/brotli.
+EXTENSIONES = ('.html', '.css', '.js')
+HUELLA = 10
+MIN_COMPRIMIR = 512
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'no-cache'
+
+_REF_HTML = re.compile(r'''((?:href|src)=["'])([^"':]+\.(?:css|js))(["'])''')
+_IMPORT_JS = re.compile(r'''((?:\bfrom|\bimport)\s*\(?\s*["'])(\.{1,2}/[^"']+\.js)(["'])''')
+
+
+class Activo:
+    __slots__ = ("cuerpo", "variantes", "etag", "mimetype", "cache")
+
+    def __init__(self, cuerpo, mimetype, cache, variantes=None):
+        self.cuerpo = cuerpo
+        self.mimetype = mimetype
+        self.cache = cache
+        self.etag = hashlib.sha256(cuerpo).hexdigest()[:20]
+        if variantes is not None:
+            self.variantes = variantes
+            return
+        self.variantes = {}
+        if len(cuerpo) >= MIN_COMPRIMIR:
+            comprimido = gzip.compress(cuerpo, compresslevel=9, mtime=0)
+            if len(comprimido) < len(cuerpo):
+                self.variantes['gzip'] = comprimido
+            if brotli is not None:
+                comprimido = brotli.compress(cuerpo, quality=11)
+                if len(comprimido) < len(cuerpo):
+                    self.variantes['br'] = comprimido
+
+
+def _huella(cuerpo):
+    return hashlib.sha256(cuerpo).hexdigest()[:HUELLA]
+
+
+def _con_huella(ruta, huella):
+    base, ext = posixpath.splitext(ruta)
+    return f"{base}.{huella}{ext}"
+
+
+def _leer(raiz):
+    archivos = {}
+    for carpeta, subcarpetas, nombres in os.walk(raiz):
+        subcarpetas[:] = [d for d in subcarpetas if not d.startswith(('.', '__'))]
+        for nombre in nombres:
+            if nombre.endswith(EXTENSIONES):
+                completa = os.path.join(carpeta, nombre)
+                ruta = os.path.relpath(completa, raiz).replace(os.sep, '/')
+                with open(completa, 'rb') as f:
+                    archivos[ruta] = f.read()
+    return archivos
+
+
+def _resolver(origen, referencia):
+    return posixpath.normpath(posixpath.join(posixpath.dirname(origen), referencia))
+
+
+def _relativa(origen, destino):
+    return posixpath.relpath(destino, posixpath.dirname(origen) or '.')
+
+
+def construir_manifiesto(raiz):
+    """Devuelve ({ruta: Activo}, {ruta original: ruta con huella})."""
+    archivos = _leer(raiz)
+    con_huella = {}
+
+    def publicar(ruta, pila=()):
+        # Un módulo JS se publica después de sus dependencias: su huella cubre los import
+        # reescritos. En un ciclo de import la referencia queda sin huella (ETag / 304).
+        if ruta in con_huella:
+            return con_huella[ruta]
+        cuerpo = archivos[ruta]
+        if ruta.endswith('.js'):
+            def reemplazar(m):
+                destino = _resolver(ruta, m.group(2))
+                if destino not in archivos or destino in pila:
+                    return m.group(0)
+                relativa = _relativa(ruta, publicar(destino, pila + (ruta,)))
+                return m.group(1) + (relativa if relativa.startswith('../') else './' + relativa) + m.group(3)
+            cuerpo = _IMPORT_JS.sub(reemplazar, cuerpo.decode('utf-8')).encode('utf-8')
+            archivos[ruta] = cuerpo
+        con_huella[ruta] = _con_huella(ruta, _huella(cuerpo))
+        return con_huella[ruta]
+
+    for ruta in archivos:
+        if ruta.endswith(('.css', '.js')):
+            publicar(ruta)
+
+    activos = {}
+    for ruta, cuerpo in archivos.items():
+        mimetype = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+        if ruta.endswith('.js'):
+            mimetype = 'text/javascript'
+        if ruta.endswith('.html'):
+            def reemplazar(m):
+                destino = _resolver(ruta, m.group(2))
+                if destino not in con_huella:
+                    return m.group(0)
+                return m.group(1) + _relativa(ruta, con_huella[destino]) + m.group(3)
+            cuerpo = _REF_HTML.sub(reemplazar, cuerpo.decode('utf-8')).encode('utf-8')
+            activos[ruta] = Activo(cuerpo, mimetype + '; charset=utf-8', CACHE_REVALIDAR)
+            continue
+        if mimetype.startswith('text/'):
+            mimetype += '; charset=utf-8'
+        activo = Activo(cuerpo, mimetype, CACHE_REVALIDAR)
+        activos[ruta] = activo
+        # La versión con huella comparte cuerpo y variantes, con caché inmutable
+        activos[con_huella[ruta]] = Activo(cuerpo, mimetype, CACHE_INMUTABLE, activo.variantes)
+    return activos, con_huella
+
+
+def _codificacion(activo):
+    aceptadas = request.accept_encodings
+    for codificacion in ('br', 'gzip'):
+        if codificacion in activo.variantes and aceptadas[codificacion]:
+            return codificacion
+    return None
+
+
+class Estaticos:
+    """Sirve los archivos de `raiz` desde el manifiesto; en modo debug lo reconstruye si cambian."""
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self._lock = threading.Lock()
+        self._firma = None
+        self.activos, self.huellas = {}, {}
+        self._cargar()
+
+    def _firma_actual(self):
+        firma = []
+        for carpeta, subcarpetas, nombres in os.walk(self.raiz):
+            subcarpetas[:] = [d for d in subcarpetas if not d.startswith(('.', '__'))]
+            firma.extend((os.path.join(carpeta, n), os.stat(os.path.join(carpeta, n)).st_mtime_ns)
+                         for n in nombres if n.endswith(EXTENSIONES))
+        return sorted(firma)
+
+    def _cargar(self):
+        firma = self._firma_actual()
+        activos, huellas = construir_manifiesto(self.raiz)
+        with self._lock:
+            self.activos, self.huellas, self._firma = activos, huellas, firma
+
+    def servir(self, ruta):
+        if current_app.debug and self._firma_actual() != self._firma:
+            self._cargar()
+        activo = self.activos.get(ruta)
+        if activo is None:
+            # Otros archivos (imágenes, etc.): send_from_directory ya responde con ETag / 304
+            return send_from_directory(self.raiz, ruta)
+
+        codificacion = _codificacion(activo)
+        etag = f"{activo.etag}-{codificacion}" if codificacion else activo.etag
+        if request.if_none_match.contains(etag):
+            respuesta = Response(status=304)
+        else:
+            cuerpo = activo.variantes[codificacion] if codificacion else activo.cuerpo
+            respuesta = Response(cuerpo, content_type=activo.mimetype)
+            if codificacion:
+                respuesta.headers['Content-Encoding'] = codificacion
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = activo.cache
+        respuesta.vary.add('Accept-Encoding')
+        return respuesta
@@ -0,0 +1,25 @@
+import threading
+from collections import defaultdict
+
+# Aviso en proceso de escrituras confirmadas en la BD. Los blueprints llaman a
+# notificar_cambio() después del COMMIT y los cachés/snapshots se suscriben por tabla.
+# Es local a cada proceso: otros workers dependen de su propio tiempo de vigencia.
+_suscriptores = defaultdict(list)
+_lock = threading.Lock()
+
+
+def suscribir(tabla, funcion):
+    """Registra funcion(tabla, id) para los cambios en la tabla indicada."""
+    with _lock:
+        _suscriptores[tabla].append(funcion)
+
+
+def notificar_cambio(tabla, id=None):
+    with _lock:
+        funciones = list(_suscriptores[tabla])
+    for funcion in funciones:
+        try:
+            funcion(tabla, id)
+        except Exception as e:
+            # Un suscriptor con fallos no debe romper la escritura que ya se confirmó
+            print(f"Error al notificar cambio en {tabla}: {e}")
@@ -0,0 +1,65 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response, current_app, jsonify
+
+# Lectura y forma de respuesta comunes a los listados.
+#  - ?shape=rows (por defecto): "datos" es una lista de objetos {columna: valor}
+#  - ?shape=columns: los nombres van una sola vez en "columnas" y "datos" trae una lista de
+#    valores por fila, en ese orden. Las filas del cursor se serializan tal cual (sin armar un
+#    dict por fila), sin espacios y con las fechas en ISO 8601.
+FORMAS = ('rows', 'columns')
+ARRAYSIZE_MAXIMO = 1000
+
+
+def leer_forma(args):
+    """'rows' o 'columns' según ?shape; lanza ValueError si no es ninguna."""
+    forma = args.get('shape', 'rows').lower()
+    if forma not in FORMAS:
+        raise ValueError("shape no soportado (rows, columns)")
+    return forma
+
+
+def ajustar_lectura(cursor, filas=None):
+    """Fija arraysize y prefetchrows antes del execute.
+
+    Con `filas` (p. ej. limite + 1) la primera ida a la BD trae la página completa y el fin
+    del cursor; sin ella se lee por lotes de REPORTE_ARRAYSIZE.
+    """
+    if filas is None:
+        cursor.arraysize = current_app.config.get('REPORTE_ARRAYSIZE', 500)
+        cursor.prefetchrows = cursor.arraysize
+    else:
+        cursor.arraysize = max(1, min(filas, ARRAYSIZE_MAXIMO))
+        cursor.prefetchrows = cursor.arraysize + 1
+
+
+def columnas(cursor):
+    return [col[0].lower() for col in cursor.description]
+
+
+def como_dicts(nombres, filas):
+    return [dict(zip(nombres, fila)) for fila in filas]
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+# Codificador en C de la librería estándar; solo las fechas y Decimal pasan por Python
+dumps_compacto = json.JSONEncoder(default=_valor_json, separators=(',', ':'), ensure_ascii=False).encode
+
+
+def cuerpo_columnas(nombres, filas, **extra):
+    return dumps_compacto({"estado": "exito", "columnas": nombres, "datos": filas, **extra})
+
+
+def respuesta_lista(nombres, filas, forma, **extra):
+    """Respuesta {"estado": "exito", "datos": ..., **extra} en la forma pedida."""
+    if forma == 'columns':
+        return Response(cuerpo_columnas(nombres, filas, **extra), mimetype='application/json')
+    return jsonify({"estado": "exito", "datos": como_dicts(nombres, filas), **extra})
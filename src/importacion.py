@@ -0,0 +1,295 @@
+import codecs
+import csv
+import io
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import oracledb
+
+# Importación masiva de medicamentos (/api/medicamentos/importar).
+# El archivo se lee por bloques mientras llega; cada registro se valida en Python con las
+# mismas reglas que trg_validar_medicamento_completo y los válidos se insertan por lotes
+# (executemany con batcherrors) con un COMMIT por lote, en vez de una llamada a
+# p_registrar_medicamento (y un COMMIT) por fila. El lote duplicado lo rechaza el índice único
+# idx_medicamentos_lote_nombre fila por fila, también frente a otra carga simultánea.
+COLUMNAS = ('nombre', 'id_categoria', 'id_proveedor', 'stock', 'precio_compra', 'precio_venta',
+            'fecha_vencimiento', 'lote', 'ubicacion', 'descripcion')
+OBLIGATORIAS = ('nombre', 'id_categoria', 'stock', 'precio_compra', 'precio_venta', 'fecha_vencimiento', 'lote')
+LARGOS = {'nombre': 100, 'lote': 50, 'ubicacion': 50, 'descripcion': 500}
+# Límites de NUMBER(6) y NUMBER(10, 2)
+STOCK_MAXIMO = 999999
+PRECIO_MAXIMO = Decimal('99999999.99')
+CENTIMOS = Decimal('0.01')
+MARGEN_MINIMO = Decimal('0.10')
+
+SQL_INSERTAR = """
+    INSERT INTO Medicamentos (nombre, id_categoria, id_proveedor, stock, precio_compra, precio_venta,
+                              fecha_vencimiento, lote, ubicacion, descripcion)
+    VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9, :10)
+"""
+SQL_CATEGORIAS = "SELECT id_categoria FROM Categorias"
+SQL_PROVEEDORES = "SELECT id_proveedor FROM Proveedores"
+# Índice único de (lote, nombre): su ORA-00001 equivale al ORA-20006 del trigger anterior
+INDICE_LOTE = 'IDX_MEDICAMENTOS_LOTE_NOMBRE'
+
+# Errores de la BD por fila (batcherrors) con el mismo texto que el registro individual
+MENSAJES_ORA = {
+    'ORA-20001': "No se puede registrar un medicamento vencido",
+    'ORA-20004': "El precio de venta debe ser mayor al precio de compra",
+    'ORA-20005': "El margen de ganancia es muy bajo (mínimo 10%)",
+    'ORA-20006': "Ya existe un medicamento con este lote",
+    'ORA-02291': "La categoría o el proveedor no existe",
+}
+# Errores por fila que se detallan en la respuesta (el resto solo se cuenta)
+ERRORES_MAXIMOS = 1000
+BLOQUE_LECTURA = 64 * 1024
+# Un objeto JSON que no termina de decodificarse en este tamaño es un error de formato
+OBJETO_MAXIMO = 1024 * 1024
+
+
+class ErrorImportacion(Exception):
+    """El archivo dejó de poder leerse: la carga se detiene (los lotes confirmados se conservan)."""
+
+
+def detectar_formato(formato, tipo, nombre_archivo):
+    """'csv' o 'json' según ?formato, el Content-Type o la extensión; None si no se reconoce."""
+    if formato:
+        formato = formato.lower()
+        return formato if formato in ('csv', 'json') else None
+    nombre_archivo = (nombre_archivo or '').lower()
+    if 'csv' in tipo or nombre_archivo.endswith('.csv'):
+        return 'csv'
+    if 'json' in tipo or nombre_archivo.endswith(('.json', '.ndjson')):
+        return 'json'
+    return None
+
+
+def leer_csv(flujo):
+    """Registros (número, dict) de un CSV UTF-8 con encabezado."""
+    texto = io.TextIOWrapper(flujo, encoding='utf-8-sig', newline='')
+    lector = csv.DictReader(texto)
+    try:
+        if lector.fieldnames is None:
+            return
+        lector.fieldnames = [(c or '').strip().lower() for c in lector.fieldnames]
+        faltan = [c for c in OBLIGATORIAS if c not in lector.fieldnames]
+        if faltan:
+            raise ErrorImportacion("Faltan columnas en el encabezado: " + ", ".join(faltan))
+        for numero, fila in enumerate(lector, start=1):
+            yield numero, fila
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ErrorImportacion(f"CSV inválido en la línea {lector.line_num}: {e}") from None
+    finally:
+        # Sin cerrar el flujo de la solicitud
+        texto.detach()
+
+
+def leer_json(flujo):
+    """Registros (número, objeto) de un arreglo JSON o de un objeto por línea (NDJSON).
+
+    Se decodifica por bloques: nunca se tiene el archivo completo en memoria.
+    """
+    decodificador = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+    texto, pos, numero, agotado = '', 0, 0, False
+    try:
+        while True:
+            # Entre objetos solo hay espacios, comas y los corchetes del arreglo
+            while pos < len(texto) and texto[pos] in ' \t\r\n,[]':
+                pos += 1
+            if pos < len(texto):
+                try:
+                    objeto, fin = decodificador.raw_decode(texto, pos)
+                except json.JSONDecodeError as e:
+                    if agotado or len(texto) - pos > OBJETO_MAXIMO:
+                        raise ErrorImportacion(f"JSON inválido después del registro {numero}: {e.msg}") from None
+                else:
+                    numero += 1
+                    yield numero, objeto
+                    pos = fin
+                    continue
+            elif agotado:
+                return
+            # Objeto incompleto o bloque consumido: se lee el siguiente
+            bloque = flujo.read(BLOQUE_LECTURA)
+            agotado = not bloque
+            texto, pos = texto[pos:] + utf8.decode(bloque, final=agotado), 0
+    except UnicodeDecodeError as e:
+        raise ErrorImportacion(f"El archivo no es UTF-8 válido: {e}") from None
+
+
+def _texto(fila, campo):
+    valor = fila.get(campo)
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return valor or None
+
+
+def _numero(valores, campo):
+    try:
+        numero = Decimal(valores[campo])
+    except InvalidOperation:
+        raise ValueError(f"'{campo}' no es un número") from None
+    if not numero.is_finite():
+        raise ValueError(f"'{campo}' no es un número")
+    return numero
+
+
+def _entero(valores, campo):
+    numero = _numero(valores, campo)
+    if numero != numero.to_integral_value():
+        raise ValueError(f"'{campo}' debe ser un número entero")
+    return int(numero)
+
+
+def _precio(valores, campo):
+    # Redondeado a céntimos como lo guarda NUMBER(10, 2) antes de que lo vea el trigger
+    precio = _numero(valores, campo).quantize(CENTIMOS, rounding=ROUND_HALF_UP)
+    if not 0 <= precio <= PRECIO_MAXIMO:
+        raise ValueError(f"'{campo}' debe estar entre 0 y {PRECIO_MAXIMO}")
+    return precio
+
+
+def validar(fila, categorias, proveedores, hoy):
+    """Devuelve la tupla a insertar o lanza ValueError con el motivo del rechazo.
+
+    Reglas de trg_validar_medicamento_completo (vencimiento, precios y margen) más las
+    restricciones de la tabla; el lote duplicado lo rechaza el índice al insertar.
+    """
+    if not isinstance(fila, dict):
+        raise ValueError("El registro debe ser un objeto")
+    if fila.get(None):
+        raise ValueError("El registro tiene más columnas que el encabezado")
+    valores = {campo: _texto(fila, campo) for campo in COLUMNAS}
+    faltan = [campo for campo in OBLIGATORIAS if valores[campo] is None]
+    if faltan:
+        raise ValueError("Faltan campos: " + ", ".join(faltan))
+    for campo, largo in LARGOS.items():
+        if valores[campo] is not None and len(valores[campo]) > largo:
+            raise ValueError(f"'{campo}' supera los {largo} caracteres")
+
+    id_categoria = _entero(valores, 'id_categoria')
+    if id_categoria not in categorias:
+        raise ValueError(f"La categoría {id_categoria} no existe")
+    id_proveedor = _entero(valores, 'id_proveedor') if valores['id_proveedor'] is not None else None
+    if id_proveedor is not None and id_proveedor not in proveedores:
+        raise ValueError(f"El proveedor {id_proveedor} no existe")
+    stock = _entero(valores, 'stock')
+    if not 0 <= stock <= STOCK_MAXIMO:
+        raise ValueError(f"'stock' debe estar entre 0 y {STOCK_MAXIMO}")
+    precio_compra = _precio(valores, 'precio_compra')
+    precio_venta = _precio(valores, 'precio_venta')
+    try:
+        vencimiento = datetime.strptime(valores['fecha_vencimiento'], '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError("'fecha_vencimiento' debe tener el formato YYYY-MM-DD") from None
+
+    if vencimiento < hoy:
+        raise ValueError(MENSAJES_ORA['ORA-20001'])
+    if precio_venta <= precio_compra:
+        raise ValueError(MENSAJES_ORA['ORA-20004'])
+    if (precio_venta - precio_compra) / precio_venta < MARGEN_MINIMO:
+        raise ValueError(MENSAJES_ORA['ORA-20005'])
+    return (valores['nombre'], id_categoria, id_proveedor, stock, float(precio_compra), float(precio_venta),
+            vencimiento, valores['lote'], valores['ubicacion'], valores['descripcion'])
+
+
+def lote_duplicado(mensaje):
+    """True si el error de la BD es un lote y nombre ya registrados."""
+    return 'ORA-20006' in mensaje or ('ORA-00001' in mensaje and INDICE_LOTE in mensaje.upper())
+
+
+def _mensaje_bd(mensaje):
+    if lote_duplicado(mensaje):
+        return MENSAJES_ORA['ORA-20006']
+    for codigo, texto in MENSAJES_ORA.items():
+        if codigo in mensaje:
+            return texto
+    return mensaje
+
+
+class Importacion:
+    """Una carga: recorre los registros, inserta por lotes y acumula el informe."""
+
+    def __init__(self, connection, tamano_lote):
+        self.connection = connection
+        self.tamano_lote = tamano_lote
+        self.filas = self.insertadas = self.rechazadas = self.lotes = 0
+        self.errores = []
+        self.segundos = self.segundos_bd = 0.0
+
+    def _rechazar(self, numero, mensaje, nombre=None, lote=None):
+        self.rechazadas += 1
+        if len(self.errores) < ERRORES_MAXIMOS:
+            self.errores.append({"fila": numero, "nombre": nombre, "lote": lote, "mensaje": mensaje})
+
+    def ejecutar(self, registros):
+        """Procesa `registros` ((número, dict) en orden de archivo).
+
+        Lanza ErrorImportacion si el archivo deja de poder leerse y oracledb.Error si falla la BD;
+        en ambos casos los lotes ya confirmados se conservan y el informe queda hasta ahí.
+        """
+        inicio = time.perf_counter()
+        cursor = self.connection.cursor()
+        cursor.execute(SQL_CATEGORIAS)
+        categorias = {fila[0] for fila in cursor}
+        cursor.execute(SQL_PROVEEDORES)
+        proveedores = {fila[0] for fila in cursor}
+        hoy = date.today()
+        vistos, pendientes = set(), []
+        self.connection.autocommit = False
+        try:
+            for numero, fila in registros:
+                self.filas += 1
+                try:
+                    tupla = validar(fila, categorias, proveedores, hoy)
+                except ValueError as e:
+                    datos = fila if isinstance(fila, dict) else {}
+                    self._rechazar(numero, str(e), _texto(datos, 'nombre'), _texto(datos, 'lote'))
+                    continue
+                # Mismo lote y nombre dos veces en el archivo: se queda el primero
+                clave = (tupla[7], tupla[0])
+                if clave in vistos:
+                    self._rechazar(numero, "Lote repetido en el archivo", tupla[0], tupla[7])
+                    continue
+                vistos.add(clave)
+                pendientes.append((numero, tupla))
+                if len(pendientes) >= self.tamano_lote:
+                    self._insertar(cursor, pendientes)
+                    pendientes = []
+            if pendientes:
+                self._insertar(cursor, pendientes)
+        finally:
+            self.segundos = time.perf_counter() - inicio
+
+    def _insertar(self, cursor, pendientes):
+        inicio = time.perf_counter()
+        try:
+            cursor.executemany(SQL_INSERTAR, [tupla for _, tupla in pendientes], batcherrors=True)
+            errores = cursor.getbatcherrors()
+            for error in errores:
+                numero, tupla = pendientes[error.offset]
+                self._rechazar(numero, _mensaje_bd(error.message), tupla[0], tupla[7])
+            self.connection.commit()
+            self.insertadas += len(pendientes) - len(errores)
+            self.lotes += 1
+        except oracledb.Error:
+            self.connection.rollback()
+            raise
+        finally:
+            self.segundos_bd += time.perf_counter() - inicio
+
+    def informe(self):
+        return {
+            "filas": self.filas,
+            "insertadas": self.insertadas,
+            "rechazadas": self.rechazadas,
+            "lotes": self.lotes,
+            "segundos": round(self.segundos, 3),
+            "filas_por_segundo": round(self.filas / self.segundos, 1) if self.segundos else 0.0,
+            # Lectura y validación del archivo frente a consultas, inserciones y COMMIT
+            "tiempos_ms": {"lectura_validacion": round((self.segundos - self.segundos_bd) * 1000, 3),
+                           "bd": round(self.segundos_bd * 1000, 3)},
+        }
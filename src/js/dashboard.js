@@ -30,7 +30,10 @@ export async function cargarResumen() {
                     <div class="stat-card"><h3>${
                       d.medicamentos_proximos_vencer
                     }</h3><p>Por Vencer (30 días)</p></div>
-                </div>`;
+                </div>
+                <p class="report-date">Datos de hace ${Math.round(
+                  data.snapshot.edad_segundos
+                )} s</p>`;
     } else mostrarAlerta(div, data.mensaje, "error");
   } catch (e) {
     mostrarAlerta(div, `Error: ${e.message}`, "error");
@@ -97,7 +97,7 @@ export async function cargarMedicamentos() {
   div.innerHTML =
     '<div class="loading"><div class="spinner"></div><p>Cargando...</p></div>';
   try {
-    const res = await fetch(`${API_URL}/medicamentos`);
+    const res = await fetch(`${API_URL}/medicamentos?todo=1`);
     const data = await res.json();
     if (data.estado === "exito") {
       listaMedicamentos = data.datos;
@@ -184,23 +184,23 @@ export async function abrirModalEditarCompleto(id) {
   modal.style.display = "block";
 
   try {
-    const resMed = await fetch(`${API_URL}/medicamentos/${id}`);
-    const dataMed = await resMed.json();
-    const resCat = await fetch(`${API_URL}/categorias`);
-    const dataCat = await resCat.json();
-    const resProv = await fetch(`${API_URL}/proveedores`);
-    const dataProv = await resProv.json();
+    // Medicamento, categorías y proveedores en una sola solicitud (consultas en paralelo)
+    const res = await fetch(
+      `${API_URL}/compuesto?partes=medicamento,categorias,proveedores&id_medicamento=${id}`
+    );
+    const data = await res.json();
+    const errores = data.errores || {};
 
-    if (dataMed.estado === "exito") {
-      const m = dataMed.datos;
+    if (data.datos && data.datos.medicamento && !errores.categorias && !errores.proveedores) {
+      const m = data.datos.medicamento;
       let optsCat = "";
-      dataCat.datos.forEach((c) => {
+      data.datos.categorias.forEach((c) => {
         optsCat += `<option value="${c.id_categoria}" ${
           c.id_categoria == m.id_categoria ? "selected" : ""
         }>${c.nombre}</option>`;
       });
       let optsProv = '<option value="">Ninguno</option>';
-      dataProv.datos.forEach((p) => {
+      data.datos.proveedores.forEach((p) => {
         if (p.estado === "Activo" || p.id_proveedor == m.id_proveedor) {
           optsProv += `<option value="${p.id_proveedor}" ${
             p.id_proveedor == m.id_proveedor ? "selected" : ""
@@ -243,6 +243,9 @@ export async function abrirModalEditarCompleto(id) {
                     </div>
                 </form>
                 <div id="resultadoEdicion"></div>`;
+    } else {
+      const mensaje = Object.values(errores).join("; ") || data.mensaje;
+      content.innerHTML = `<div class="alert alert-error">Error: ${mensaje}</div>`;
     }
   } catch (e) {
     content.innerHTML = `<div class="alert alert-error">Error: ${e.message}</div>`;
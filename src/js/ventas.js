@@ -2,9 +2,20 @@ import { API_URL } from "./config.js";
 import { showMessageModal } from "./modal_utils.js";
 import { cerrarModal } from "./utils.js";
 
-let medicamentosDisponibles = [];
 let listaVentas = [];
 let contadorDetalles = 0;
+// Autocompletado: resultados de la última búsqueda de cada fila de detalle
+const sugerencias = {};
+const temporizadores = {};
+const ESPERA_BUSQUEDA_MS = 150;
+// Sincronización de stock, precio y estado: stream SSE de /medicamentos/cambios o, si no
+// está abierto, una consulta al feed después de cada venta
+let tokenCambios = null;
+let fuenteCambios = null;
+const versiones = {};
+// Idempotency-Key del ticket: se repite mientras se reintente la misma venta (sin
+// respuesta, servidor ocupado) para que el servidor no la registre dos veces
+let intentoVenta = null;
 
 export async function cargarEmpleados() {
   try {
@@ -22,18 +33,59 @@ export async function cargarEmpleados() {
   }
 }
 
-export async function cargarMedicamentosVenta() {
+function etiquetaMedicamento(m) {
+  return `${m.nombre} · Lote ${m.lote || "-"} (Stock: ${m.stock})`;
+}
+
+export async function buscarMedicamentosVenta(id) {
+  const texto = document
+    .querySelector(`.input-buscar-medicamento[data-id="${id}"]`)
+    .value.trim();
+  if (!texto) return;
   try {
-    const res = await fetch(`${API_URL}/medicamentos`);
+    const res = await fetch(
+      `${API_URL}/medicamentos/buscar?q=${encodeURIComponent(texto)}&solo_disponibles=1&limite=10`
+    );
     const data = await res.json();
     if (data.estado === "exito") {
-      medicamentosDisponibles = data.datos.filter((m) => m.estado === "Activo");
+      sugerencias[id] = data.datos;
+      mostrarSugerencias(id);
     }
   } catch (e) {
     console.error(e);
   }
 }
 
+function mostrarSugerencias(id) {
+  document.getElementById(`sugerencias_${id}`).innerHTML = sugerencias[id]
+    .map((m) => `<option value="${etiquetaMedicamento(m)}"></option>`)
+    .join("");
+}
+
+// Cada tecla reinicia la espera; solo se consulta cuando el usuario deja de escribir
+export function escribirMedicamento(id) {
+  seleccionarMedicamento(id);
+  clearTimeout(temporizadores[id]);
+  temporizadores[id] = setTimeout(
+    () => buscarMedicamentosVenta(id),
+    ESPERA_BUSQUEDA_MS
+  );
+}
+
+export function seleccionarMedicamento(id) {
+  const texto = document.querySelector(
+    `.input-buscar-medicamento[data-id="${id}"]`
+  ).value;
+  const elegido = (sugerencias[id] || []).find(
+    (m) => etiquetaMedicamento(m) === texto
+  );
+  const sel = document.querySelector(`.select-medicamento[data-id="${id}"]`);
+  sel.value = elegido ? elegido.id_medicamento : "";
+  sel.dataset.precio = elegido ? elegido.precio_venta : "";
+  sel.dataset.stock = elegido ? elegido.stock : "";
+  actualizarPrecioDetalle(id);
+}
+
 export function renumerarProductos() {
   const items = document.querySelectorAll(".detalle-item");
   items.forEach((item, index) => {
@@ -45,18 +97,13 @@ export function renumerarProductos() {
 export function agregarDetalle() {
   contadorDetalles++;
   const container = document.getElementById("detallesVenta");
-  let opts = '<option value="">Seleccionar...</option>';
-  medicamentosDisponibles.forEach(
-    (m) =>
-      (opts += `<option value="${m.id_medicamento}" data-precio="${m.precio_venta}" data-stock="${m.stock}">${m.nombre} (Stock: ${m.stock})</option>`)
-  );
   container.insertAdjacentHTML(
     "beforeend",
     `
         <div class="detalle-item" id="detalle_${contadorDetalles}">
             <div class="detalle-header"><strong>Prod #${contadorDetalles}</strong><button type="button" class="btn btn-danger" onclick="eliminarDetalle(${contadorDetalles})"><i class="fa-solid fa-trash"></i></button></div>
             <div class="form-grid">
-                <div class="form-group"><label>Medicamento</label><select class="select-medicamento" data-id="${contadorDetalles}" onchange="actualizarPrecioDetalle(${contadorDetalles})">${opts}</select></div>
+                <div class="form-group"><label>Medicamento</label><input type="text" class="input-buscar-medicamento" data-id="${contadorDetalles}" list="sugerencias_${contadorDetalles}" placeholder="Buscar por nombre, lote o categoría..." autocomplete="off" oninput="escribirMedicamento(${contadorDetalles})"><datalist id="sugerencias_${contadorDetalles}"></datalist><input type="hidden" class="select-medicamento" data-id="${contadorDetalles}"></div>
                 <div class="form-group"><label>Cantidad</label><input type="number" class="input-cantidad" data-id="${contadorDetalles}" min="1" value="1" onchange="calcularTotal()"></div>
                 <div class="form-group"><label>Precio</label><input type="number" class="input-precio" data-id="${contadorDetalles}" readonly></div>
                 <div class="form-group"><label>Subtotal</label><input type="text" class="input-subtotal" data-id="${contadorDetalles}" readonly></div>
@@ -69,19 +116,92 @@ export function agregarDetalle() {
 export function eliminarDetalle(id) {
   const el = document.getElementById(`detalle_${id}`);
   if (el) el.remove();
+  clearTimeout(temporizadores[id]);
+  delete sugerencias[id];
+  delete temporizadores[id];
   calcularTotal();
   renumerarProductos();
 }
 
 export function actualizarPrecioDetalle(id) {
   const sel = document.querySelector(`.select-medicamento[data-id="${id}"]`);
-  const precio =
-    sel.options[sel.selectedIndex].getAttribute("data-precio") || 0;
+  const precio = sel.dataset.precio || 0;
   document.querySelector(`.input-precio[data-id="${id}"]`).value =
     parseFloat(precio).toFixed(2);
+  document.querySelector(`.input-cantidad[data-id="${id}"]`).max =
+    sel.dataset.stock || "";
   calcularTotal();
 }
 
+// Aplica las filas del feed (id, stock, precio_venta, estado, version) a las sugerencias
+// y a los productos ya elegidos; una fila repetida o más antigua se ignora
+function aplicarCambios(filas) {
+  filas.forEach((c) => {
+    if ((versiones[c.id_medicamento] || 0) >= c.version) return;
+    versiones[c.id_medicamento] = c.version;
+    Object.keys(sugerencias).forEach((id) => {
+      const m = sugerencias[id].find(
+        (s) => s.id_medicamento === c.id_medicamento
+      );
+      if (!m) return;
+      Object.assign(m, {
+        stock: c.stock,
+        precio_venta: c.precio_venta,
+        estado: c.estado,
+      });
+      mostrarSugerencias(id);
+      const sel = document.querySelector(`.select-medicamento[data-id="${id}"]`);
+      if (sel && sel.value === String(c.id_medicamento)) {
+        // La etiqueta incluye el stock: se actualiza para que siga coincidiendo
+        document.querySelector(
+          `.input-buscar-medicamento[data-id="${id}"]`
+        ).value = etiquetaMedicamento(m);
+        sel.dataset.precio = c.precio_venta;
+        sel.dataset.stock = c.stock;
+        actualizarPrecioDetalle(id);
+      }
+    });
+  });
+}
+
+export async function sincronizarCambios() {
+  if (!tokenCambios) return;
+  try {
+    let hayMas = true;
+    while (hayMas) {
+      const res = await fetch(
+        `${API_URL}/medicamentos/cambios?since=${tokenCambios}&limite=500`
+      );
+      const data = await res.json();
+      if (data.estado !== "exito") return;
+      aplicarCambios(data.datos);
+      tokenCambios = data.siguiente;
+      hayMas = data.hay_mas;
+    }
+  } catch (e) {
+    console.error(e);
+  }
+}
+
+export async function iniciarSincronizacion() {
+  try {
+    const res = await fetch(`${API_URL}/medicamentos/cambios`);
+    const data = await res.json();
+    if (data.estado === "exito") tokenCambios = data.siguiente;
+  } catch (e) {
+    console.error(e);
+  }
+  if (!window.EventSource || !tokenCambios) return;
+  // EventSource se reconecta solo y envía el último token en Last-Event-ID
+  fuenteCambios = new EventSource(
+    `${API_URL}/medicamentos/cambios/stream?since=${tokenCambios}`
+  );
+  fuenteCambios.addEventListener("cambios", (e) => {
+    tokenCambios = e.lastEventId;
+    aplicarCambios(JSON.parse(e.data));
+  });
+}
+
 export function calcularTotal() {
   let total = 0;
   document.querySelectorAll(".detalle-item").forEach((d) => {
@@ -154,18 +274,26 @@ export async function procesarVenta() {
     total_venta: parseFloat(document.getElementById("totalVenta").textContent),
     detalles: detalles,
   };
+  const cuerpo = JSON.stringify(datosVenta);
+  if (!intentoVenta || intentoVenta.cuerpo !== cuerpo)
+    intentoVenta = { cuerpo, clave: nuevaClaveVenta() };
   try {
     const res = await fetch(`${API_URL}/ventas`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(datosVenta),
+      headers: {
+        "Content-Type": "application/json",
+        "Idempotency-Key": intentoVenta.clave,
+      },
+      body: cuerpo,
     });
     const data = await res.json();
     if (data.estado === "exito") {
+      intentoVenta = null;
       showMessageModal("Éxito", "Venta registrada correctamente", "success");
+      if (!fuenteCambios || fuenteCambios.readyState !== EventSource.OPEN)
+        sincronizarCambios(); // Sin stream: actualizar stock de las sugerencias
       setTimeout(() => {
         limpiarFormularioVenta();
-        cargarMedicamentosVenta(); // Actualizar stock en dropdown
         cargarVentas();
       }, 2000);
     } else showMessageModal("Error", data.mensaje, "error");
@@ -174,10 +302,17 @@ export async function procesarVenta() {
   }
 }
 
+function nuevaClaveVenta() {
+  if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
 export function limpiarFormularioVenta() {
+  intentoVenta = null;
   document.getElementById("formVenta").reset();
   document.getElementById("detallesVenta").innerHTML = "";
   document.getElementById("totalVenta").textContent = "0.00";
+  Object.keys(sugerencias).forEach((id) => delete sugerencias[id]);
   contadorDetalles = 0;
 }
 
@@ -185,7 +320,7 @@ export async function cargarVentas() {
   const div = document.getElementById("historialVentas");
   div.innerHTML = '<div class="loading"><div class="spinner"></div></div>';
   try {
-    const res = await fetch(`${API_URL}/ventas`);
+    const res = await fetch(`${API_URL}/ventas?todo=1`);
     const data = await res.json();
     if (data.estado === "exito") {
       listaVentas = data.datos;
@@ -260,6 +395,7 @@ export async function verDetalleVenta(id) {
 window.agregarDetalle = agregarDetalle;
 window.eliminarDetalle = eliminarDetalle;
 window.actualizarPrecioDetalle = actualizarPrecioDetalle;
+window.escribirMedicamento = escribirMedicamento;
 window.calcularTotal = calcularTotal;
 window.procesarVenta = procesarVenta;
 window.limpiarFormularioVenta = limpiarFormularioVenta;
@@ -272,7 +408,7 @@ window.cerrarModal = cerrarModal;
 window.addEventListener("load", () => {
   if (document.getElementById("selectEmpleado")) {
     cargarEmpleados();
-    cargarMedicamentosVenta();
     cargarVentas();
+    iniciarSincronizacion();
   }
 });
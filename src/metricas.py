@@ -0,0 +1,386 @@
+import math
+import os
+import re
+import threading
+import time
+from flask import Response, g, request
+
+# Métricas por endpoint: tiempo total, viajes a la BD, sentencias, tiempo en
+# execute/callproc/fetch, filas leídas y bytes de respuesta. Se exponen en /metrics
+# (formato de texto de Prometheus). Con METRICAS_ACTIVAS=0 no se registra ningún
+# hook ni se envuelven las conexiones.
+PREFIJO = "farmacia"
+CUBETAS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_SQL_POR_SOLICITUD = 50
+
+_lock = threading.Lock()
+_por_endpoint = {}
+_solicitudes = {}
+
+
+def _reiniciar_tras_fork():
+    # Cada worker expone sus propios contadores
+    global _lock
+    _lock = threading.Lock()
+    _por_endpoint.clear()
+    _solicitudes.clear()
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+class _Acumulado:
+    __slots__ = ("cubetas", "suma", "cuenta", "viajes", "sentencias", "t_execute", "t_callproc", "t_fetch",
+                 "filas", "bytes", "espera_pool")
+
+    def __init__(self):
+        self.cubetas = [0] * len(CUBETAS)
+        self.suma = 0.0
+        self.cuenta = 0
+        self.viajes = 0
+        self.sentencias = 0
+        self.t_execute = 0.0
+        self.t_callproc = 0.0
+        self.t_fetch = 0.0
+        self.filas = 0
+        self.bytes = 0
+        self.espera_pool = 0.0
+
+
+class Medicion:
+    """Lo que ocurrió en la BD durante una solicitud."""
+
+    __slots__ = ("inicio", "viajes", "sentencias", "t_execute", "t_callproc", "t_fetch", "filas", "bytes",
+                 "espera_pool", "sql", "_envuelta", "_real")
+
+    def __init__(self, guardar_sql):
+        self.inicio = time.perf_counter()
+        self.viajes = 0
+        self.sentencias = 0
+        self.t_execute = 0.0
+        self.t_callproc = 0.0
+        self.t_fetch = 0.0
+        self.filas = 0
+        self.bytes = 0
+        self.espera_pool = 0.0
+        self.sql = [] if guardar_sql else None
+        self._envuelta = None
+        self._real = None
+
+    def envolver(self, connection):
+        if self._real is not connection:
+            self._real = connection
+            self._envuelta = _ConexionMedida(connection, self)
+        return self._envuelta
+
+    def anotar_sql(self, texto, segundos):
+        if self.sql is not None and len(self.sql) < MAX_SQL_POR_SOLICITUD:
+            self.sql.append((" ".join(texto.split())[:300], segundos))
+
+
+def _real(valor):
+    return valor._cursor if isinstance(valor, _CursorMedido) else valor
+
+
+class _CursorMedido:
+    """Cursor que cuenta sentencias, viajes estimados, filas y tiempos; delega todo lo demás."""
+
+    __slots__ = ("_cursor", "_medicion", "_filas")
+
+    def __init__(self, cursor, medicion):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_medicion", medicion)
+        object.__setattr__(self, "_filas", 0)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._cursor, nombre, valor)
+
+    def _sentencia(self, texto, inicio, campo):
+        segundos = time.perf_counter() - inicio
+        m = self._medicion
+        m.sentencias += 1
+        m.viajes += 1
+        setattr(m, campo, getattr(m, campo) + segundos)
+        m.anotar_sql(texto, segundos)
+        object.__setattr__(self, "_filas", 0)
+
+    def _leidas(self, cantidad, inicio):
+        m = self._medicion
+        m.t_fetch += time.perf_counter() - inicio
+        if not cantidad:
+            return
+        # Viajes estimados: la primera tanda (prefetchrows) llega con el execute y el
+        # resto en lotes de arraysize
+        antes = self._filas
+        despues = antes + cantidad
+        object.__setattr__(self, "_filas", despues)
+        prefetch = self._cursor.prefetchrows
+        tamano = max(1, self._cursor.arraysize)
+        m.viajes += max(0, math.ceil((despues - prefetch) / tamano)) - max(0, math.ceil((antes - prefetch) / tamano))
+        m.filas += cantidad
+
+    def execute(self, statement, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            resultado = self._cursor.execute(statement, *args, **kwargs)
+        finally:
+            self._sentencia(statement or "", inicio, "t_execute")
+        return self if resultado is self._cursor else resultado
+
+    def executemany(self, statement, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(statement, *args, **kwargs)
+        finally:
+            self._sentencia(statement or "", inicio, "t_execute")
+
+    def callproc(self, name, parameters=None, keywordParameters=None, **kwargs):
+        if parameters is not None:
+            parameters = [_real(p) for p in parameters]
+        if keywordParameters is not None:
+            keywordParameters = {k: _real(v) for k, v in keywordParameters.items()}
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.callproc(name, parameters, keywordParameters, **kwargs)
+        finally:
+            self._sentencia(f"CALL {name}", inicio, "t_callproc")
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        fila = self._cursor.fetchone()
+        self._leidas(0 if fila is None else 1, inicio)
+        return fila
+
+    def fetchmany(self, size=None, *args, **kwargs):
+        inicio = time.perf_counter()
+        filas = self._cursor.fetchmany(size, *args, **kwargs) if size is not None else self._cursor.fetchmany()
+        self._leidas(len(filas), inicio)
+        return filas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        filas = self._cursor.fetchall()
+        self._leidas(len(filas), inicio)
+        return filas
+
+    def __iter__(self):
+        while True:
+            filas = self.fetchmany()
+            if not filas:
+                return
+            yield from filas
+
+
+class _ConexionMedida:
+    __slots__ = ("_connection", "_medicion")
+
+    def __init__(self, connection, medicion):
+        object.__setattr__(self, "_connection", connection)
+        object.__setattr__(self, "_medicion", medicion)
+
+    def __getattr__(self, nombre):
+        return getattr(self._connection, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._connection, nombre, valor)
+
+    def cursor(self, *args, **kwargs):
+        return _CursorMedido(self._connection.cursor(*args, **kwargs), self._medicion)
+
+    def commit(self):
+        self._medicion.viajes += 1
+        return self._connection.commit()
+
+    def rollback(self):
+        self._medicion.viajes += 1
+        return self._connection.rollback()
+
+
+def _endpoint():
+    regla = request.url_rule
+    return f"{request.method} {regla.rule if regla is not None else '<sin ruta>'}"
+
+
+def _registrar(endpoint, estado, medicion, lento_ms):
+    duracion = time.perf_counter() - medicion.inicio
+    with _lock:
+        a = _por_endpoint.get(endpoint)
+        if a is None:
+            a = _por_endpoint[endpoint] = _Acumulado()
+        for i, limite in enumerate(CUBETAS):
+            if duracion <= limite:
+                a.cubetas[i] += 1
+        a.suma += duracion
+        a.cuenta += 1
+        a.viajes += medicion.viajes
+        a.sentencias += medicion.sentencias
+        a.t_execute += medicion.t_execute
+        a.t_callproc += medicion.t_callproc
+        a.t_fetch += medicion.t_fetch
+        a.filas += medicion.filas
+        a.bytes += medicion.bytes
+        a.espera_pool += medicion.espera_pool
+        clave = (endpoint, estado)
+        _solicitudes[clave] = _solicitudes.get(clave, 0) + 1
+
+    if lento_ms and duracion * 1000 >= lento_ms:
+        lineas = [f"Solicitud lenta: {endpoint} -> {estado} en {duracion * 1000:.1f} ms "
+                  f"({medicion.sentencias} sentencias, {medicion.viajes} viajes, {medicion.filas} filas, "
+                  f"{medicion.bytes} bytes)"]
+        lineas += [f"    {segundos * 1000:8.1f} ms  {sql}" for sql, segundos in medicion.sql or []]
+        print("\n".join(lineas))
+
+
+def _contar_bytes(cuerpo, medicion):
+    for trozo in cuerpo:
+        medicion.bytes += len(trozo.encode('utf-8') if isinstance(trozo, str) else trozo)
+        yield trozo
+
+
+def iniciar_metricas(app):
+    """Registra los hooks por solicitud y la ruta /metrics si METRICAS_ACTIVAS está habilitado."""
+    if not app.config.get('METRICAS_ACTIVAS', True):
+        return
+    lento_ms = app.config.get('METRICAS_LENTO_MS', 0)
+
+    @app.before_request
+    def iniciar_medicion():
+        g.medicion = Medicion(lento_ms > 0)
+
+    @app.after_request
+    def cerrar_medicion(response):
+        medicion = g.pop('medicion', None)
+        if medicion is None or request.path == '/metrics':
+            return response
+        endpoint, estado = _endpoint(), response.status_code
+        if response.is_streamed:
+            # El cuerpo (y sus fetch) se produce después de este hook: se registra al cerrar la
+            # respuesta, que ocurre aunque el cuerpo nunca se recorra (HEAD, cliente que corta)
+            cuerpo = response.response
+            response.response = _contar_bytes(cuerpo, medicion)
+
+            def al_cerrar():
+                # Cierra el iterable original aunque no se haya consumido (libera su conexión)
+                try:
+                    if hasattr(cuerpo, "close"):
+                        cuerpo.close()
+                finally:
+                    _registrar(endpoint, estado, medicion, lento_ms)
+            response.call_on_close(al_cerrar)
+        else:
+            medicion.bytes = response.calculate_content_length() or 0
+            _registrar(endpoint, estado, medicion, lento_ms)
+        return response
+
+    @app.route('/metrics')
+    def metricas():
+        return Response(exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _etiqueta(valor):
+    return re.sub(r'(["\\\n])', lambda m: '\\n' if m.group(1) == '\n' else '\\' + m.group(1), str(valor))
+
+
+def exportar():
+    """Texto en formato de exposición de Prometheus."""
+    from src.db import PRIMARIA, REPLICA, get_pool_stats, hay_replica
+    from src.replica import get_replica_stats
+    from src.cache import get_cache_stats
+    from src.contencion import get_contencion_stats
+    from src.archivo import get_archivo_stats
+    with _lock:
+        datos = {e: (list(a.cubetas), a.suma, a.cuenta, a.viajes, a.sentencias, a.t_execute, a.t_callproc,
+                     a.t_fetch, a.filas, a.bytes, a.espera_pool) for e, a in _por_endpoint.items()}
+        solicitudes = dict(_solicitudes)
+
+    p = PREFIJO
+    lineas = [f"# HELP {p}_solicitudes_total Solicitudes atendidas por endpoint y código HTTP.",
+              f"# TYPE {p}_solicitudes_total counter"]
+    for (endpoint, estado), n in sorted(solicitudes.items()):
+        lineas.append(f'{p}_solicitudes_total{{endpoint="{_etiqueta(endpoint)}",codigo="{estado}"}} {n}')
+
+    lineas += [f"# HELP {p}_solicitud_segundos Tiempo total de la solicitud (incluye la transmisión del cuerpo).",
+               f"# TYPE {p}_solicitud_segundos histogram"]
+    for endpoint, d in sorted(datos.items()):
+        e = _etiqueta(endpoint)
+        for limite, n in zip(CUBETAS, d[0]):
+            lineas.append(f'{p}_solicitud_segundos_bucket{{endpoint="{e}",le="{limite}"}} {n}')
+        lineas.append(f'{p}_solicitud_segundos_bucket{{endpoint="{e}",le="+Inf"}} {d[2]}')
+        lineas.append(f'{p}_solicitud_segundos_sum{{endpoint="{e}"}} {d[1]:.6f}')
+        lineas.append(f'{p}_solicitud_segundos_count{{endpoint="{e}"}} {d[2]}')
+
+    contadores = [
+        ("bd_viajes_total", "Viajes de ida y vuelta a la BD (estimados a partir de arraysize/prefetchrows).", 3, None),
+        ("bd_sentencias_total", "Sentencias ejecutadas (execute, executemany y callproc).", 4, None),
+        ("bd_filas_total", "Filas leídas de cursores.", 8, None),
+        ("respuesta_bytes_total", "Bytes enviados en el cuerpo de las respuestas.", 9, None),
+        ("pool_espera_segundos_total", "Tiempo esperando una conexión del pool.", 10, ".6f"),
+    ]
+    for nombre, ayuda, indice, formato in contadores:
+        lineas += [f"# HELP {p}_{nombre} {ayuda}", f"# TYPE {p}_{nombre} counter"]
+        for endpoint, d in sorted(datos.items()):
+            valor = format(d[indice], formato) if formato else d[indice]
+            lineas.append(f'{p}_{nombre}{{endpoint="{_etiqueta(endpoint)}"}} {valor}')
+
+    lineas += [f"# HELP {p}_bd_segundos_total Tiempo en llamadas a la BD por operación.",
+               f"# TYPE {p}_bd_segundos_total counter"]
+    for endpoint, d in sorted(datos.items()):
+        e = _etiqueta(endpoint)
+        for operacion, valor in (("execute", d[5]), ("callproc", d[6]), ("fetch", d[7])):
+            lineas.append(f'{p}_bd_segundos_total{{endpoint="{e}",operacion="{operacion}"}} {valor:.6f}')
+
+    pools = {destino: get_pool_stats(destino) for destino in ((PRIMARIA, REPLICA) if hay_replica() else (PRIMARIA,))}
+    pools = {destino: stats for destino, stats in pools.items() if stats.get("creado")}
+    if pools:
+        lineas += [f"# HELP {p}_pool_conexiones Conexiones de cada pool por estado.",
+                   f"# TYPE {p}_pool_conexiones gauge"]
+        for destino, pool in pools.items():
+            lineas += [f'{p}_pool_conexiones{{pool="{destino}",estado="ocupadas"}} {pool["ocupadas"]}',
+                       f'{p}_pool_conexiones{{pool="{destino}",estado="abiertas"}} {pool["abiertas"]}']
+        lineas += [f"# HELP {p}_pool_adquisiciones_total Conexiones obtenidas de cada pool.",
+                   f"# TYPE {p}_pool_adquisiciones_total counter"]
+        lineas += [f'{p}_pool_adquisiciones_total{{pool="{destino}"}} {pool["adquisiciones"]}' for destino, pool in pools.items()]
+        lineas += [f"# HELP {p}_pool_errores_total Fallos al obtener una conexión de cada pool.",
+                   f"# TYPE {p}_pool_errores_total counter"]
+        lineas += [f'{p}_pool_errores_total{{pool="{destino}"}} {pool["errores"]}' for destino, pool in pools.items()]
+    if hay_replica():
+        replica = get_replica_stats()
+        lineas += [f"# HELP {p}_replica_sana 1 si la réplica de lectura respondió en la última verificación.",
+                   f"# TYPE {p}_replica_sana gauge",
+                   f"{p}_replica_sana {1 if replica['sana'] else 0}"]
+        if replica["retraso_segundos"] is not None:
+            lineas += [f"# HELP {p}_replica_retraso_segundos Retraso medido de la réplica respecto de la primaria.",
+                       f"# TYPE {p}_replica_retraso_segundos gauge",
+                       f"{p}_replica_retraso_segundos {replica['retraso_segundos']}"]
+        lineas += [f"# HELP {p}_bd_ruteo_total Conexiones de solicitudes por destino y motivo de la elección.",
+                   f"# TYPE {p}_bd_ruteo_total counter"]
+        lineas += [f'{p}_bd_ruteo_total{{destino="{d["destino"]}",motivo="{d["motivo"]}"}} {d["total"]}'
+                   for d in replica["decisiones"]]
+    contencion = get_contencion_stats()
+    lineas += [f"# HELP {p}_ventas_conflictos_total Ventas deshechas por un conflicto de bloqueo, por tipo.",
+               f"# TYPE {p}_ventas_conflictos_total counter"]
+    lineas += [f'{p}_ventas_conflictos_total{{tipo="{tipo}"}} {n}' for tipo, n in sorted(contencion["conflictos"].items())]
+    for evento, ayuda in (("reintentos", "Reintentos de ventas tras un conflicto de bloqueo."),
+                          ("agotados", "Ventas rechazadas (503) tras agotar los reintentos."),
+                          ("repetidas", "Ventas repetidas con la misma Idempotency-Key (no se registran otra vez).")):
+        lineas += [f"# HELP {p}_ventas_{evento}_total {ayuda}", f"# TYPE {p}_ventas_{evento}_total counter",
+                   f"{p}_ventas_{evento}_total {contencion[evento]}"]
+    archivo = get_archivo_stats()
+    lineas += [f"# HELP {p}_archivo_filas_total Filas trasladadas a las tablas históricas por este proceso.",
+               f"# TYPE {p}_archivo_filas_total counter"]
+    lineas += [f'{p}_archivo_filas_total{{tabla="{tabla}"}} {stats["movidas"]}' for tabla, stats in sorted(archivo.items())]
+    lineas += [f"# HELP {p}_archivo_lecturas_total Consultas que también leyeron el tramo histórico.",
+               f"# TYPE {p}_archivo_lecturas_total counter"]
+    lineas += [f'{p}_archivo_lecturas_total{{tabla="{tabla}"}} {stats["lecturas_frias"]}' for tabla, stats in sorted(archivo.items())]
+    lineas += [f"# HELP {p}_cache_operaciones_total Aciertos, fallos, invalidaciones, desalojos y aciertos descartados por desactualizados de las cachés en proceso.",
+               f"# TYPE {p}_cache_operaciones_total counter"]
+    caches = get_cache_stats()
+    for nombre, stats in caches.items():
+        for operacion in ("aciertos", "fallos", "invalidaciones", "desalojos", "desactualizadas"):
+            lineas.append(f'{p}_cache_operaciones_total{{cache="{nombre}",operacion="{operacion}"}} {stats[operacion]}')
+    lineas += [f"# HELP {p}_cache_entradas Entradas en cada caché.", f"# TYPE {p}_cache_entradas gauge"]
+    lineas += [f'{p}_cache_entradas{{cache="{nombre}"}} {stats["tamano"]}' for nombre, stats in caches.items()]
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,55 @@
+import base64
+import json
+from datetime import date, datetime, timedelta
+
+# Tamaño de página para los listados paginados por clave (keyset)
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+
+
+def codificar_token(valores):
+    """Convierte la clave de la última fila en un token opaco para la siguiente página."""
+    serializables = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in valores]
+    crudo = json.dumps(serializables, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def decodificar_token(token):
+    """Devuelve la lista de valores de la clave; lanza ValueError si el token no es válido."""
+    try:
+        relleno = '=' * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + relleno))
+    except (ValueError, TypeError):
+        raise ValueError("Token de paginación inválido")
+    if not isinstance(valores, list):
+        raise ValueError("Token de paginación inválido")
+    return valores
+
+
+def leer_limite(args):
+    limite = args.get('limite', default=LIMITE_POR_DEFECTO, type=int)
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def leer_flag(args, clave):
+    return args.get(clave, '').lower() in ('1', 'true', 'si', 'sí')
+
+
+def leer_fecha(args, clave):
+    """Lee una fecha YYYY-MM-DD de la query string; lanza ValueError si el formato es incorrecto."""
+    valor = args.get(clave)
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"Fecha inválida en '{clave}' (formato YYYY-MM-DD)")
+
+
+def dia_siguiente(fecha):
+    # Para rangos sargables: columna >= desde AND columna < hasta + 1 día
+    return fecha + timedelta(days=1)
+
+
+def escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
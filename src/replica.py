@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+from collections import Counter
+import oracledb
+from flask import current_app, g, has_request_context, request
+from src.db import PRIMARIA, REPLICA, get_pool, hay_replica
+
+# Ruteo de lecturas a la réplica (DB_DSN_LECTURA). Las solicitudes GET/HEAD leen de la
+# réplica y el resto va a la primaria, salvo que la réplica:
+#  - no respondió en la última verificación o no se verifica hace rato ('replica_caida', 'sin_verificar')
+#  - lleva más de DB_LECTURA_MAX_RETRASO segundos de retraso ('retraso')
+#  - todavía no tiene lo que la solicitud necesita leer ('lectura_propia'): la última escritura
+#    del mismo cliente (cookie bd_escritura) o la invalidación de un caché que se va a recargar
+#
+# El retraso se mide con un latido: cada DB_LECTURA_VERIFICAR segundos cada worker lee la
+# marca de Replica_Latido en la réplica y escribe la hora actual en la primaria. La marca
+# leída dice hasta cuándo están aplicados los cambios en la réplica ("al día hasta"); las
+# horas son del reloj de los servidores de la app, que se asumen sincronizados (NTP).
+SQL_LEER_LATIDO = "SELECT marca FROM Replica_Latido WHERE id = 1"
+SQL_ESCRIBIR_LATIDO = "UPDATE Replica_Latido SET marca = :marca WHERE id = 1"
+METODOS_LECTURA = ('GET', 'HEAD')
+COOKIE_ESCRITURA = 'bd_escritura'
+# Verificaciones seguidas sin resultado antes de dejar de confiar en la última medición
+VERIFICACIONES_VIGENTES = 3
+
+_estado = {"sana": None, "retraso": None, "al_dia_hasta": 0.0, "verificado": None, "fallos": 0}
+_ultimo_latido = 0.0
+_decisiones = Counter()
+_lock = threading.Lock()
+_hilo = None
+_hilo_lock = threading.Lock()
+_detener = threading.Event()
+
+
+def _reiniciar_tras_fork():
+    global _ultimo_latido, _lock, _hilo, _hilo_lock, _detener
+    _estado.update(sana=None, retraso=None, al_dia_hasta=0.0, verificado=None, fallos=0)
+    _ultimo_latido = 0.0
+    _decisiones.clear()
+    _lock, _hilo, _hilo_lock, _detener = threading.Lock(), None, threading.Lock(), threading.Event()
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def _leer_latido():
+    pool = get_pool(REPLICA)
+    conn = pool.acquire()
+    try:
+        # Una réplica colgada no debe frenar el monitor más que el intervalo de verificación
+        conn.call_timeout = int(current_app.config.get('DB_LECTURA_VERIFICAR', 2) * 1000)
+        cursor = conn.cursor()
+        cursor.execute(SQL_LEER_LATIDO)
+        fila = cursor.fetchone()
+        return float(fila[0]) if fila else 0.0
+    finally:
+        pool.release(conn)
+
+
+def _escribir_latido(marca):
+    pool = get_pool(PRIMARIA)
+    conn = pool.acquire()
+    try:
+        conn.cursor().execute(SQL_ESCRIBIR_LATIDO, {'marca': marca})
+        conn.commit()
+    finally:
+        pool.release(conn)
+
+
+def verificar():
+    """Mide el retraso de la réplica y deja un latido nuevo en la primaria."""
+    global _ultimo_latido
+    try:
+        marca = _leer_latido()
+    except oracledb.Error as e:
+        print(f"Réplica de lectura sin respuesta: {e}")
+        with _lock:
+            _estado.update(sana=False, verificado=time.monotonic())
+            _estado["fallos"] += 1
+    else:
+        ahora = time.time()
+        with _lock:
+            # Si ya llegó el latido anterior de este worker el retraso es menor que el intervalo
+            retraso = 0.0 if _ultimo_latido and marca >= _ultimo_latido else max(0.0, ahora - marca)
+            _estado.update(sana=True, retraso=retraso, al_dia_hasta=marca, verificado=time.monotonic())
+    latido = time.time()
+    try:
+        _escribir_latido(latido)
+        _ultimo_latido = latido
+    except oracledb.Error as e:
+        print(f"Error al escribir el latido de la réplica: {e}")
+
+
+def registrar_fallo():
+    """La réplica no entregó una conexión: se marca caída hasta la próxima verificación."""
+    with _lock:
+        _estado["sana"] = False
+        _estado["fallos"] += 1
+        _decisiones[(PRIMARIA, 'replica_caida')] += 1
+
+
+def requerir_al_dia(marca):
+    """La lectura de esta solicitud debe incluir lo confirmado hasta `marca` (time.time())."""
+    if has_request_context() and marca:
+        g.db_al_dia = max(g.get('db_al_dia', 0.0), marca)
+
+
+def _escritura_cliente():
+    try:
+        return float(request.cookies.get(COOKIE_ESCRITURA, 0))
+    except ValueError:
+        return 0.0
+
+
+def _motivo_primaria(requerido):
+    """Motivo para no usar la réplica, o None si puede atender la lectura."""
+    config = current_app.config
+    with _lock:
+        sana, retraso = _estado["sana"], _estado["retraso"]
+        al_dia_hasta, verificado = _estado["al_dia_hasta"], _estado["verificado"]
+    if sana is False:
+        return 'replica_caida'
+    vigencia = VERIFICACIONES_VIGENTES * config.get('DB_LECTURA_VERIFICAR', 2)
+    if sana is None or verificado is None or time.monotonic() - verificado > vigencia:
+        return 'sin_verificar'
+    if retraso > config.get('DB_LECTURA_MAX_RETRASO', 30):
+        return 'retraso'
+    if requerido and requerido >= al_dia_hasta:
+        return 'lectura_propia'
+    return None
+
+
+def elegir_destino():
+    """PRIMARIA o REPLICA para la conexión de la solicitud actual (ver el comentario del módulo)."""
+    if not has_request_context() or not hay_replica():
+        return PRIMARIA
+    if request.method not in METODOS_LECTURA:
+        destino, motivo = PRIMARIA, 'escritura'
+    else:
+        motivo = _motivo_primaria(max(_escritura_cliente(), g.get('db_al_dia', 0.0)))
+        destino = PRIMARIA if motivo else REPLICA
+        motivo = motivo or 'lectura'
+    with _lock:
+        _decisiones[(destino, motivo)] += 1
+    return destino
+
+
+def disponible(requerido=0.0):
+    """True si la réplica puede atender una lectura de fondo que debe incluir lo confirmado hasta `requerido`."""
+    return hay_replica() and _motivo_primaria(requerido) is None
+
+
+def iniciar_ruteo(app):
+    """Cabecera X-BD-Destino en cada respuesta que usó la BD y cookie de la última escritura."""
+    @app.after_request
+    def marcar_destino(response):
+        destino = g.get('db_destino')
+        if destino is None or not app.config.get('DB_DSN_LECTURA'):
+            return response
+        response.headers['X-BD-Destino'] = destino
+        if request.method not in METODOS_LECTURA and response.status_code < 400:
+            # Pasado este tiempo la réplica ya la tiene o su retraso manda las lecturas a la primaria
+            vida = app.config.get('DB_LECTURA_MAX_RETRASO', 30) + \
+                VERIFICACIONES_VIGENTES * app.config.get('DB_LECTURA_VERIFICAR', 2)
+            response.set_cookie(COOKIE_ESCRITURA, f"{time.time():.3f}", max_age=vida, httponly=True, samesite='Lax')
+        return response
+
+
+def _bucle_monitor(app):
+    with app.app_context():
+        intervalo = app.config.get('DB_LECTURA_VERIFICAR', 2)
+        while not _detener.is_set():
+            verificar()
+            _detener.wait(intervalo)
+
+
+def iniciar_monitor_replica(app):
+    global _hilo
+    if not app.config.get('DB_DSN_LECTURA'):
+        return
+    with _hilo_lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_bucle_monitor, args=(app,), daemon=True, name='monitor-replica')
+            _hilo.start()
+
+
+def detener_monitor_replica(timeout=5):
+    global _hilo
+    with _hilo_lock:
+        hilo, _hilo = _hilo, None
+    if hilo is not None:
+        _detener.set()
+        hilo.join(timeout)
+
+
+def get_replica_stats():
+    with _lock:
+        estado = dict(_estado)
+        decisiones = dict(_decisiones)
+    edad = None if estado["verificado"] is None else round(time.monotonic() - estado["verificado"], 1)
+    return {
+        "sana": estado["sana"],
+        "retraso_segundos": None if estado["retraso"] is None else round(estado["retraso"], 3),
+        "al_dia_hasta": estado["al_dia_hasta"] or None,
+        "ultima_verificacion_segundos": edad,
+        "fallos": estado["fallos"],
+        "decisiones": [{"destino": d, "motivo": m, "total": n} for (d, m), n in sorted(decisiones.items())],
+    }
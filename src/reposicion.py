@@ -0,0 +1,211 @@
+import math
+import os
+import threading
+import time
+from datetime import date
+import numpy as np
+from src.eventos import suscribir
+
+# Motor de reposición de /api/reportes/reposicion. En vez de un umbral fijo de stock
+# (bajo-stock / sin-stock) estima la demanda de cada medicamento activo a partir del
+# historial de ventas y sugiere cuánto pedir a cada proveedor. Todo se calcula en bloque:
+# una consulta trae las unidades diarias de todos los medicamentos, otra el catálogo,
+# y las métricas salen de operaciones NumPy sobre la matriz medicamento x día.
+#
+# El historial sale de Resumen_Ventas_Medicamento (Venta_Detalle ya agregada por día
+# desde trg_resumen_ventas) y solo cubre días cerrados, así que se guarda hasta que
+# cambia el día o pasan REPOSICION_MAX_EDAD segundos. El catálogo (stock, vencimiento)
+# se relee cuando una escritura en Medicamentos invalida el resultado.
+SQL_HISTORIAL = """
+    SELECT r.id_medicamento, TRUNC(SYSDATE) - r.dia AS hace, r.unidades
+    FROM Resumen_Ventas_Medicamento r
+    WHERE r.dia >= TRUNC(SYSDATE) - :dias AND r.dia < TRUNC(SYSDATE)
+"""
+SQL_CATALOGO = """
+    SELECT m.id_medicamento, m.nombre, m.id_proveedor, p.nombre AS proveedor, m.stock,
+           m.precio_compra, TRUNC(m.fecha_vencimiento) - TRUNC(SYSDATE) AS dias_vencer
+    FROM Medicamentos m
+    LEFT JOIN Proveedores p ON m.id_proveedor = p.id_proveedor
+    WHERE m.estado = 'Activo'
+    ORDER BY m.id_medicamento
+"""
+# Días recientes para la tendencia y factor z del stock de seguridad (nivel de servicio del 95%)
+DIAS_RECIENTES = 7
+Z_SERVICIO = 1.65
+# Medicamentos con mayor riesgo de vencimiento que se listan en la respuesta
+RIESGO_MAXIMO = 20
+# Combinaciones de parámetros guardadas a la vez
+RESULTADOS_MAXIMOS = 16
+
+_historial = {}
+_resultados = {}
+_version = 0
+_invalidado = 0.0
+_lock = threading.Lock()
+_calculo_lock = threading.Lock()
+
+
+def _reiniciar_tras_fork():
+    global _version, _invalidado, _lock, _calculo_lock
+    _historial.clear()
+    _resultados.clear()
+    _version, _invalidado = 0, 0.0
+    _lock, _calculo_lock = threading.Lock(), threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def _invalidar(tabla, id):
+    global _version, _invalidado
+    with _lock:
+        _version += 1
+        _invalidado = time.time()
+
+
+def ultima_invalidacion():
+    """Hora (time.time()) de la última escritura que invalidó los resultados en este proceso."""
+    with _lock:
+        return _invalidado
+
+
+for _tabla in ('Medicamentos', 'Proveedores'):
+    suscribir(_tabla, _invalidar)
+
+
+def _leer_historial(connection, dias, arraysize):
+    """(ids ordenados, matriz ids x dias) con las unidades vendidas; columna 0 = ayer."""
+    cursor = connection.cursor()
+    cursor.arraysize = arraysize
+    cursor.execute(SQL_HISTORIAL, {'dias': dias})
+    filas = cursor.fetchall()
+    if not filas:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, dias))
+    datos = np.array(filas, dtype=float)
+    ids, fila = np.unique(datos[:, 0].astype(np.int64), return_inverse=True)
+    columna = np.clip(datos[:, 1].astype(np.int64) - 1, 0, dias - 1)
+    matriz = np.zeros((len(ids), dias))
+    np.add.at(matriz, (fila, columna), datos[:, 2])
+    return ids, matriz
+
+
+def _historial_vigente(connection, dias, max_edad, arraysize):
+    hoy = date.today()
+    with _lock:
+        guardado = _historial.get(dias)
+    if guardado and guardado[0] == hoy and time.time() - guardado[1] <= max_edad:
+        return guardado[2], guardado[3]
+    ids, matriz = _leer_historial(connection, dias, arraysize)
+    with _lock:
+        _historial[dias] = (hoy, time.time(), ids, matriz)
+    return ids, matriz
+
+
+def _leer_catalogo(connection, arraysize):
+    cursor = connection.cursor()
+    cursor.arraysize = arraysize
+    cursor.execute(SQL_CATALOGO)
+    return cursor.fetchall()
+
+
+def calcular(ids_hist, matriz, catalogo, plazo, cobertura):
+    """Métricas por medicamento y sugerencias agrupadas por proveedor."""
+    n, dias = len(catalogo), matriz.shape[1]
+    ids = np.array([f[0] for f in catalogo], dtype=np.int64)
+    stock = np.array([f[4] for f in catalogo], dtype=float)
+    precio = np.array([f[5] for f in catalogo], dtype=float)
+    dias_vencer = np.array([f[6] for f in catalogo], dtype=float)
+
+    # Historial alineado con el catálogo (medicamentos sin ventas quedan en cero)
+    ventas = np.zeros((n, dias))
+    if len(ids_hist):
+        pos = np.clip(np.searchsorted(ids_hist, ids), 0, len(ids_hist) - 1)
+        encontrado = ids_hist[pos] == ids
+        ventas[encontrado] = matriz[pos[encontrado]]
+
+    recientes = min(DIAS_RECIENTES, dias)
+    velocidad = ventas.mean(axis=1)
+    velocidad_reciente = ventas[:, :recientes].mean(axis=1)
+    tendencia = np.divide(velocidad_reciente, velocidad, out=np.ones(n), where=velocidad > 0)
+    # Se planifica con la mayor de las dos: una subida reciente no espera a todo el historial
+    demanda = np.maximum(velocidad, velocidad_reciente)
+    desviacion = ventas.std(axis=1)
+
+    # Unidades que no alcanzarán a venderse antes de vencer; no cuentan como stock útil
+    vendibles = demanda * np.maximum(dias_vencer, 0)
+    en_riesgo = np.clip(stock - vendibles, 0, None)
+    stock_util = stock - en_riesgo
+    cubre = np.divide(stock_util, demanda, out=np.full(n, np.inf), where=demanda > 0)
+
+    seguridad = Z_SERVICIO * desviacion * math.sqrt(plazo)
+    punto_pedido = demanda * plazo + seguridad
+    sugerido = np.ceil(np.clip(demanda * (plazo + cobertura) + seguridad - stock_util, 0, None))
+    sugerido[stock_util > punto_pedido] = 0
+
+    medicamentos = [{
+        "id_medicamento": int(ids[i]),
+        "nombre": catalogo[i][1],
+        "id_proveedor": catalogo[i][2],
+        "proveedor": catalogo[i][3],
+        "stock": int(stock[i]),
+        "velocidad_diaria": round(float(velocidad[i]), 3),
+        "tendencia": round(float(tendencia[i]), 2),
+        "dias_cobertura": None if math.isinf(cubre[i]) else round(float(cubre[i]), 1),
+        "dias_vencer": int(dias_vencer[i]),
+        "unidades_en_riesgo": int(math.ceil(en_riesgo[i])),
+        "costo_en_riesgo": round(float(math.ceil(en_riesgo[i]) * precio[i]), 2),
+        "punto_pedido": int(math.ceil(punto_pedido[i])),
+        "cantidad_sugerida": int(sugerido[i]),
+        "costo_sugerido": round(float(sugerido[i] * precio[i]), 2),
+    } for i in range(n)]
+
+    proveedores = {}
+    for i in np.argsort(cubre, kind='stable'):
+        if not sugerido[i]:
+            continue
+        med = medicamentos[i]
+        grupo = proveedores.setdefault(med["id_proveedor"], {
+            "id_proveedor": med["id_proveedor"], "proveedor": med["proveedor"],
+            "unidades": 0, "costo": 0.0, "medicamentos": []})
+        grupo["unidades"] += med["cantidad_sugerida"]
+        grupo["costo"] = round(grupo["costo"] + med["costo_sugerido"], 2)
+        grupo["medicamentos"].append(med)
+
+    riesgo = [medicamentos[i] for i in np.argsort(-en_riesgo * precio, kind='stable')[:RIESGO_MAXIMO]
+              if en_riesgo[i] > 0]
+    return {"proveedores": sorted(proveedores.values(), key=lambda g: -g["costo"]),
+            "riesgo_vencimiento": riesgo}
+
+
+def reposicion(connection, dias, plazo, cobertura, config):
+    """Devuelve (datos, generado) desde el caché o recalculados."""
+    max_edad = config.get('REPOSICION_MAX_EDAD', 300)
+    arraysize = config.get('REPORTE_ARRAYSIZE', 500)
+    clave = (dias, plazo, cobertura)
+
+    def vigente():
+        with _lock:
+            guardado = _resultados.get(clave)
+            if guardado and guardado[0] == _version and guardado[1] == date.today() \
+                    and time.time() - guardado[2] <= max_edad:
+                return guardado[3], guardado[2]
+            return None
+
+    resultado = vigente()
+    if resultado:
+        return resultado
+    # Un solo cálculo a la vez por worker: las solicitudes que esperaban encuentran el resultado
+    with _calculo_lock:
+        resultado = vigente()
+        if resultado:
+            return resultado
+        with _lock:
+            version = _version
+        ids_hist, matriz = _historial_vigente(connection, dias, max_edad, arraysize)
+        datos = calcular(ids_hist, matriz, _leer_catalogo(connection, arraysize), plazo, cobertura)
+        generado = time.time()
+        with _lock:
+            if len(_resultados) >= RESULTADOS_MAXIMOS and clave not in _resultados:
+                _resultados.pop(next(iter(_resultados)))
+            _resultados[clave] = (version, date.today(), generado, datos)
+        return datos, generado
@@ -0,0 +1,132 @@
+import functools
+import os
+import threading
+import time
+import oracledb
+from flask import jsonify
+from src.db import PRIMARIA, REPLICA, get_pool, hay_replica, cerrar_pool
+from src.db_async import cerrar_pool_async
+from src.auditoria import iniciar_drenado_auditoria, detener_drenado_auditoria, drenar_auditoria
+from src.cambios import cerrar_suscripciones
+from src.replica import iniciar_monitor_replica, detener_monitor_replica
+
+# Ciclo de vida de cada worker en producción (ver gunicorn.conf.py): preparar_worker()
+# corre después del fork y antes de aceptar tráfico; apagar_worker() al terminar.
+# Las ventas en curso se cuentan para esperarlas antes de cerrar el pool.
+_en_curso = 0
+_apagando = False
+_cond = threading.Condition()
+
+
+def _reiniciar_tras_fork():
+    global _en_curso, _apagando, _cond
+    _en_curso, _apagando, _cond = 0, False, threading.Condition()
+
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def operacion_critica(vista):
+    """Registra la vista como escritura a esperar en el apagado; rechaza nuevas mientras se apaga."""
+    @functools.wraps(vista)
+    def envoltura(*args, **kwargs):
+        global _en_curso
+        with _cond:
+            if _apagando:
+                respuesta = jsonify({"estado": "error", "mensaje": "Servidor reiniciando, reintente la operación"})
+                respuesta.headers['Retry-After'] = '1'
+                respuesta.headers['Connection'] = 'close'
+                return respuesta, 503
+            _en_curso += 1
+        try:
+            return vista(*args, **kwargs)
+        finally:
+            with _cond:
+                _en_curso -= 1
+                _cond.notify_all()
+    return envoltura
+
+
+def iniciar_apagado():
+    """Desde aquí las operaciones críticas nuevas reciben 503 y se cierran los streams SSE.
+
+    Se llama al recibir la señal de apagado (SIGTERM en gunicorn.conf.py), mientras el
+    worker todavía atiende las solicitudes que ya aceptó.
+    """
+    global _apagando
+    with _cond:
+        _apagando = True
+    cerrar_suscripciones()
+
+
+def calentar_pool(app):
+    """Abre las conexiones mínimas de cada pool y ejecuta en cada una las consultas frecuentes.
+
+    Así el caché de sentencias de cada sesión ya tiene los cursores parseados cuando
+    llega la primera solicitud. Devuelve cuántas conexiones se calentaron.
+    """
+    from src.blueprints.gestion import SQL_MEDICAMENTO, SQL_CATEGORIAS, SQL_PROVEEDORES, SQL_EMPLEADOS
+    from src.blueprints.reportes import _calcular_resumen
+    from src.busqueda import construir_indice
+
+    with app.app_context():
+        calentadas = 0
+        for destino in ((PRIMARIA, REPLICA) if hay_replica() else (PRIMARIA,)):
+            pool = get_pool(destino)
+            conexiones = []
+            try:
+                for _ in range(max(pool.min, 1)):
+                    conexiones.append(pool.acquire())
+                for conn in conexiones:
+                    cursor = conn.cursor()
+                    for sql in (SQL_CATEGORIAS, SQL_PROVEEDORES, SQL_EMPLEADOS):
+                        cursor.execute(sql)
+                        cursor.fetchall()
+                    cursor.execute(SQL_MEDICAMENTO, {'id': 0})
+                    cursor.fetchall()
+                if destino == PRIMARIA:
+                    # El snapshot del resumen y el índice de búsqueda quedan listos
+                    _calcular_resumen(conexiones[0])
+                    construir_indice(conexiones[0])
+            finally:
+                for conn in conexiones:
+                    pool.release(conn)
+            calentadas += len(conexiones)
+        return calentadas
+
+
+def preparar_worker(app):
+    inicio = time.perf_counter()
+    if app.config.get('SERVIDOR_CALENTAR', True):
+        try:
+            n = calentar_pool(app)
+            print(f"[worker {os.getpid()}] pool calentado: {n} conexiones en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        except oracledb.Error as e:
+            # El worker igual arranca: el pool se crea bajo demanda en la primera solicitud
+            print(f"[worker {os.getpid()}] Error al calentar el pool: {e}")
+    iniciar_drenado_auditoria(app)
+    iniciar_monitor_replica(app)
+
+
+def apagar_worker(app, timeout=None):
+    """Espera las ventas en curso, drena la auditoría pendiente y cierra los pools."""
+    if timeout is None:
+        timeout = app.config.get('SERVIDOR_GRACEFUL_TIMEOUT', 30)
+    limite = time.monotonic() + timeout
+    iniciar_apagado()
+    with _cond:
+        while _en_curso > 0 and time.monotonic() < limite:
+            _cond.wait(limite - time.monotonic())
+        pendientes = _en_curso
+    if pendientes:
+        print(f"[worker {os.getpid()}] {pendientes} venta(s) seguían en curso al agotar el tiempo de apagado")
+    detener_drenado_auditoria()
+    detener_monitor_replica()
+    with app.app_context():
+        if app.config.get('AUDITORIA_DRENADO', True):
+            try:
+                drenar_auditoria(app.config.get('AUDITORIA_LOTE', 500))
+            except oracledb.Error as e:
+                print(f"[worker {os.getpid()}] Error al drenar auditoría en el apagado: {e}")
+        cerrar_pool_async()
+        cerrar_pool()
@@ -0,0 +1,94 @@
+# Marcas del feed de cambios (src/cambios.py): python -m pytest tests (usa benchmark/oracledb_falso)
+import os
+import tempfile
+import unittest
+
+from benchmark import oracledb_falso
+
+# Antes de importar src: los módulos toman `oracledb` al importarse
+oracledb_falso.instalar()
+from src.cambios import codificar_marcas, leer_cambios, leer_marcas, version_actual
+from src.paginacion import codificar_token
+
+MARGEN = 60
+
+
+class LeerCambiosTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.ruta = os.path.join(cls.dir.name, 'farmacia.db')
+        oracledb_falso.preparar_base(cls.ruta, medicamentos=10, clientes=2, ventas=2)
+        cls.conn = oracledb_falso.connect(dsn=cls.ruta)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        cls.dir.cleanup()
+
+    def _versiones(self, **filas):
+        """Fija version_cambio y la antigüedad en segundos del cambio: _versiones(m1=(3, 600)).
+        Los demás medicamentos quedan sin cambios (versión 0)."""
+        sesion = oracledb_falso._abrir_sesion(self.ruta)
+        try:
+            sesion.execute("UPDATE Medicamentos SET version_cambio = 0, fecha_cambio = SYSDATE() - 1")
+            for clave, (version, hace) in filas.items():
+                sesion.execute("UPDATE Medicamentos SET version_cambio = ?, fecha_cambio = SYSDATE() - ? / 86400.0 "
+                               "WHERE id_medicamento = ?", (version, hace, int(clave[1:])))
+            sesion.commit()
+        finally:
+            sesion.close()
+
+    def _leer(self, asentado, ultimo, limite=10):
+        filas, asentado, ultimo, hay_mas = leer_cambios(self.conn, asentado, ultimo, limite, MARGEN)
+        return [f['version'] for f in filas], asentado, ultimo, hay_mas
+
+    def test_cambios_asentados(self):
+        self._versiones(m1=(1, 600), m2=(2, 600), m3=(3, 600))
+        self.assertEqual(self._leer(0, 0), ([1, 2, 3], 3, 3, False))
+        self.assertEqual(self._leer(3, 3), ([], 3, 3, False))
+        self.assertEqual(version_actual(self.conn, MARGEN), (3, 3))
+
+    def test_limite_por_pagina(self):
+        self._versiones(m1=(1, 600), m2=(2, 600), m3=(3, 600), m4=(4, 600), m5=(5, 600))
+        self.assertEqual(self._leer(0, 0, limite=2), ([1, 2], 2, 2, True))
+        self.assertEqual(self._leer(2, 2, limite=2), ([3, 4], 4, 4, True))
+        self.assertEqual(self._leer(4, 4, limite=2), ([5], 5, 5, False))
+
+    def test_cambio_reciente_detiene_la_marca_asentada(self):
+        # La versión 2 todavía puede tener una vecina menor sin confirmar
+        self._versiones(m1=(1, 600), m2=(2, 5), m3=(3, 600))
+        self.assertEqual(self._leer(0, 0), ([1, 2, 3], 1, 3, False))
+        self.assertEqual(version_actual(self.conn, MARGEN), (3, 3))
+        # Se vuelve a entregar mientras sea reciente; la 3 ya no
+        self.assertEqual(self._leer(1, 3), ([2], 1, 3, False))
+
+    def test_commit_tardio(self):
+        # Otra venta tomó la versión 2 antes que la 3 pero confirma después de la primera lectura
+        self._versiones(m1=(1, 600), m3=(3, 5))
+        self.assertEqual(self._leer(0, 0), ([1, 3], 1, 3, False))
+        self._versiones(m1=(1, 600), m2=(2, 1), m3=(3, 5))
+        self.assertEqual(self._leer(1, 3), ([2, 3], 1, 3, False))
+        # Pasado el margen ya no puede aparecer otra: la marca asentada alcanza a la última
+        self._versiones(m1=(1, 600), m2=(2, 600), m3=(3, 600))
+        self.assertEqual(self._leer(1, 3), ([], 3, 3, False))
+
+    def test_nuevas_despues_de_una_pagina_con_recientes(self):
+        self._versiones(m1=(1, 5), m2=(2, 600), m3=(3, 600))
+        self.assertEqual(self._leer(0, 0, limite=2), ([1, 2], 0, 2, True))
+        self.assertEqual(self._leer(0, 2, limite=2), ([1, 3], 0, 3, False))
+
+
+class MarcasTest(unittest.TestCase):
+    def test_ida_y_vuelta(self):
+        self.assertEqual(leer_marcas(codificar_marcas(4, 9)), (4, 9))
+
+    def test_tokens_invalidos(self):
+        for token in ("no-es-base64!", codificar_marcas(5, 2), codificar_marcas(-1, 3), codificar_token([1]),
+                      codificar_token(["a", "b"])):
+            with self.subTest(token=token), self.assertRaises(ValueError):
+                leer_marcas(token)
+
+
+if __name__ == '__main__':
+    unittest.main()
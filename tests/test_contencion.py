@@ -0,0 +1,132 @@
+# Reintentos de POST /api/ventas ante bloqueos: python -m pytest tests (usa benchmark/oracledb_falso)
+import os
+import tempfile
+import unittest
+
+from benchmark import farmacia_sqlite, oracledb_falso
+
+PROCEDIMIENTO = "pkg_gestion_farmacia.p_registrar_venta_completa"
+DEADLOCK = "ORA-00060: deadlock detected while waiting for resource"
+ESPERA_AGOTADA = "ORA-30006: resource busy; acquire with WAIT timeout expired"
+
+
+class ReintentosVentaTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        ruta = os.path.join(cls.dir.name, 'farmacia.db')
+        oracledb_falso.preparar_base(ruta, medicamentos=20, clientes=10, ventas=20)
+        oracledb_falso.instalar()
+        os.environ.update(DB_DSN=ruta, DB_DSN_LECTURA='', AUDITORIA_DRENADO='0', SERVIDOR_CALENTAR='0')
+        import main
+        cls.app = main.create_app(segundo_plano=False)
+        cls.app.config.update(VENTAS_REINTENTOS=3, VENTAS_REINTENTO_BASE_MS=1, VENTAS_REINTENTO_MAX_MS=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        import src.servidor
+        src.servidor.apagar_worker(cls.app, timeout=1)
+        src.servidor._apagando = False
+        cls.dir.cleanup()
+
+    def setUp(self):
+        self.cliente = self.app.test_client()
+        self.original = farmacia_sqlite.PROCEDIMIENTOS[PROCEDIMIENTO]
+        self.llamadas = 0
+
+    def tearDown(self):
+        farmacia_sqlite.PROCEDIMIENTOS[PROCEDIMIENTO] = self.original
+
+    def _fallar(self, errores):
+        """Las primeras llamadas al procedimiento fallan, una por cada error de `errores`: ORA-00060
+        como lo informa su manejo de errores (p_linea_error) y ORA-30006 lanzado sin pasar por él."""
+        def procedimiento(con, *args, **kwargs):
+            self.llamadas += 1
+            if self.llamadas <= len(errores):
+                error = errores[self.llamadas - 1]
+                if error == DEADLOCK:
+                    kwargs['p_id_venta_generada'].setvalue(0, None)
+                    kwargs['p_linea_error'].setvalue(0, 1)
+                    kwargs['p_mensaje_error'].setvalue(0, error)
+                    return
+                raise farmacia_sqlite.ErrorAplicacion(30006, error.split(': ', 1)[1])
+            return self.original(con, *args, **kwargs)
+        farmacia_sqlite.PROCEDIMIENTOS[PROCEDIMIENTO] = procedimiento
+
+    def _venta(self, dni="70000002"):
+        medicamento = [m for m in self.cliente.get('/api/medicamentos?estado=Activo&limite=20').get_json()['datos']
+                       if m['stock'] > 0][0]
+        empleado = self.cliente.get('/api/empleados').get_json()['datos'][0]
+        return medicamento, {
+            "cliente": {"dni": dni, "nombre": "Luis", "apellido_paterno": "Quispe"},
+            "dni_empleado": empleado['dni'], "total_venta": medicamento['precio_venta'],
+            "detalles": [{"id_medicamento": medicamento['id_medicamento'], "cantidad": 1,
+                          "precio_unitario_venta": medicamento['precio_venta']}]}
+
+    def _stats(self):
+        from src.contencion import get_contencion_stats
+        return get_contencion_stats()
+
+    def _stock(self, id_medicamento):
+        return self.cliente.get(f'/api/medicamentos/{id_medicamento}').get_json()['datos']['stock']
+
+    def test_reintenta_deadlock_y_espera_agotada(self):
+        medicamento, venta = self._venta()
+        antes = self._stats()
+        self._fallar([DEADLOCK, ESPERA_AGOTADA])
+
+        respuesta = self.cliente.post('/api/ventas', json=venta)
+
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(self.llamadas, 3)
+        despues = self._stats()
+        self.assertEqual(despues['reintentos'] - antes['reintentos'], 2)
+        self.assertEqual(despues['agotados'], antes['agotados'])
+        self.assertEqual(despues['conflictos']['deadlock'] - antes['conflictos']['deadlock'], 1)
+        self.assertEqual(despues['conflictos']['espera_agotada'] - antes['conflictos']['espera_agotada'], 1)
+        id_venta = respuesta.get_json()['id_venta']
+        self.assertEqual(self.cliente.get(f'/api/ventas/{id_venta}').status_code, 200)
+        self.assertEqual(self._stock(medicamento['id_medicamento']), medicamento['stock'] - 1)
+
+    def test_agota_reintentos_503(self):
+        medicamento, venta = self._venta()
+        antes = self._stats()
+        self._fallar([ESPERA_AGOTADA] * 10)
+
+        respuesta = self.cliente.post('/api/ventas', json=venta)
+
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta.headers['Retry-After'], '1')
+        self.assertEqual(respuesta.get_json()['estado'], 'error')
+        self.assertEqual(self.llamadas, self.app.config['VENTAS_REINTENTOS'] + 1)
+        despues = self._stats()
+        self.assertEqual(despues['reintentos'] - antes['reintentos'], self.app.config['VENTAS_REINTENTOS'])
+        self.assertEqual(despues['agotados'] - antes['agotados'], 1)
+        # Nada de la venta quedó confirmado
+        self.assertEqual(self._stock(medicamento['id_medicamento']), medicamento['stock'])
+
+    def test_repeticion_idempotente_tras_reintento(self):
+        medicamento, venta = self._venta(dni="70000003")
+        cabeceras = {'Idempotency-Key': 'prueba-contencion-1'}
+        antes = self._stats()
+        self._fallar([DEADLOCK])
+
+        primera = self.cliente.post('/api/ventas', json=venta, headers=cabeceras)
+        self.assertEqual(primera.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', primera.headers)
+
+        # El cliente no recibió la respuesta y repite la misma venta con la misma clave
+        segunda = self.cliente.post('/api/ventas', json=venta, headers=cabeceras)
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(segunda.get_json()['id_venta'], primera.get_json()['id_venta'])
+        self.assertEqual(self.llamadas, 3)
+        despues = self._stats()
+        self.assertEqual(despues['reintentos'] - antes['reintentos'], 1)
+        self.assertEqual(despues['repetidas'] - antes['repetidas'], 1)
+        # Se descontó una sola vez
+        self.assertEqual(self._stock(medicamento['id_medicamento']), medicamento['stock'] - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+# Lectura y validación de la importación masiva (src/importacion.py): python -m pytest tests (usa benchmark/oracledb_falso)
+import io
+import json
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+from benchmark import oracledb_falso
+
+# Antes de importar src: los módulos toman `oracledb` al importarse
+oracledb_falso.instalar()
+from src import importacion
+from src.importacion import ErrorImportacion, leer_csv, leer_json, lote_duplicado, validar
+
+HOY = date(2026, 3, 1)
+CATEGORIAS = {1, 2}
+PROVEEDORES = {7}
+
+
+def _fila(**cambios):
+    fila = {"nombre": "Paracetamol 500mg", "id_categoria": "1", "id_proveedor": "7", "stock": "120",
+            "precio_compra": "1.20", "precio_venta": "2.50", "fecha_vencimiento": "2027-06-30",
+            "lote": "L-001", "ubicacion": "Estante A1", "descripcion": ""}
+    fila.update(cambios)
+    return fila
+
+
+class ValidarTest(unittest.TestCase):
+    def test_fila_valida(self):
+        tupla = validar(_fila(), CATEGORIAS, PROVEEDORES, HOY)
+        self.assertEqual(tupla, ("Paracetamol 500mg", 1, 7, 120, 1.2, 2.5, date(2027, 6, 30),
+                                 "L-001", "Estante A1", None))
+
+    def test_acepta_numeros_json_y_proveedor_vacio(self):
+        tupla = validar(_fila(id_categoria=2, id_proveedor=None, stock=5, precio_compra=1, precio_venta=3),
+                        CATEGORIAS, PROVEEDORES, HOY)
+        self.assertEqual(tupla[1:6], (2, None, 5, 1.0, 3.0))
+
+    def test_precios_redondeados_a_centimos_antes_del_margen(self):
+        # 1.004 se guarda como 1.00: el margen se calcula con el precio redondeado
+        tupla = validar(_fila(precio_compra="1.004", precio_venta="1.115"), CATEGORIAS, PROVEEDORES, HOY)
+        self.assertEqual(tupla[4:6], (1.0, 1.12))
+
+    def _rechazo(self, fila, mensaje):
+        with self.assertRaises(ValueError) as contexto:
+            validar(fila, CATEGORIAS, PROVEEDORES, HOY)
+        self.assertIn(mensaje, str(contexto.exception))
+
+    def test_rechazos(self):
+        casos = [
+            (["no", "es", "objeto"], "debe ser un objeto"),
+            ({**_fila(), None: ["sobra"]}, "más columnas que el encabezado"),
+            (_fila(nombre="  ", lote=None), "Faltan campos: nombre, lote"),
+            (_fila(nombre="x" * 101), "'nombre' supera los 100 caracteres"),
+            (_fila(id_categoria="9"), "La categoría 9 no existe"),
+            (_fila(id_proveedor="8"), "El proveedor 8 no existe"),
+            (_fila(stock="1.5"), "'stock' debe ser un número entero"),
+            (_fila(stock="-1"), "'stock' debe estar entre 0 y 999999"),
+            (_fila(stock="abc"), "'stock' no es un número"),
+            (_fila(stock="NaN"), "'stock' no es un número"),
+            (_fila(precio_venta="100000000"), "'precio_venta' debe estar entre 0 y"),
+            (_fila(fecha_vencimiento="30/06/2027"), "formato YYYY-MM-DD"),
+            (_fila(fecha_vencimiento=(HOY - timedelta(days=1)).isoformat()), importacion.MENSAJES_ORA['ORA-20001']),
+            (_fila(precio_compra="2.50"), importacion.MENSAJES_ORA['ORA-20004']),
+            (_fila(precio_compra="2.30"), importacion.MENSAJES_ORA['ORA-20005']),
+        ]
+        for fila, mensaje in casos:
+            with self.subTest(mensaje=mensaje):
+                self._rechazo(fila, mensaje)
+
+    def test_margen_minimo_exacto_se_acepta(self):
+        tupla = validar(_fila(precio_compra="9", precio_venta="10"), CATEGORIAS, PROVEEDORES, HOY)
+        self.assertEqual(tupla[4:6], (9.0, 10.0))
+
+
+class LeerJsonTest(unittest.TestCase):
+    def _leer(self, datos):
+        return list(leer_json(io.BytesIO(datos.encode("utf-8") if isinstance(datos, str) else datos)))
+
+    def test_arreglo(self):
+        self.assertEqual(self._leer('[{"a": 1}, {"a": 2}]'), [(1, {"a": 1}), (2, {"a": 2})])
+
+    def test_ndjson_con_bom_y_lineas_vacias(self):
+        datos = "\ufeff" + '{"a": 1}\n\n{"a": 2}\r\n'
+        self.assertEqual(self._leer(datos), [(1, {"a": 1}), (2, {"a": 2})])
+
+    def test_vacio(self):
+        self.assertEqual(self._leer(""), [])
+        self.assertEqual(self._leer("[]"), [])
+
+    def test_objetos_cortados_entre_bloques(self):
+        registros = [{"nombre": f"Médico {i}", "lote": "L" * i} for i in range(1, 40)]
+        datos = json.dumps(registros, ensure_ascii=False).encode("utf-8")
+        # Bloques de 7 bytes: cortan objetos y caracteres UTF-8 de varios bytes
+        with mock.patch.object(importacion, "BLOQUE_LECTURA", 7):
+            leidos = self._leer(datos)
+        self.assertEqual(leidos, list(enumerate(registros, start=1)))
+
+    def test_json_invalido(self):
+        with self.assertRaises(ErrorImportacion) as contexto:
+            self._leer('[{"a": 1}, {"a": }]')
+        self.assertIn("después del registro 1", str(contexto.exception))
+
+    def test_objeto_sin_terminar(self):
+        with self.assertRaises(ErrorImportacion):
+            self._leer('[{"a": 1}, {"a": 2')
+
+    def test_objeto_demasiado_grande(self):
+        with mock.patch.object(importacion, "OBJETO_MAXIMO", 16), \
+                mock.patch.object(importacion, "BLOQUE_LECTURA", 8):
+            with self.assertRaises(ErrorImportacion):
+                self._leer('{"a": "' + "x" * 100 + '"}')
+
+    def test_utf8_invalido(self):
+        with self.assertRaises(ErrorImportacion) as contexto:
+            self._leer(b'{"a": "\xff"}')
+        self.assertIn("UTF-8", str(contexto.exception))
+
+
+class LeerCsvTest(unittest.TestCase):
+    ENCABEZADO = "nombre,id_categoria,stock,precio_compra,precio_venta,fecha_vencimiento,lote"
+
+    def test_encabezado_normalizado_y_bom(self):
+        flujo = io.BytesIO(("\ufeff Nombre ,ID_CATEGORIA,Stock,precio_compra,precio_venta,fecha_vencimiento,LOTE\r\n"
+                            "Ibuprofeno,1,10,1,2,2027-01-01,L1\r\n").encode("utf-8"))
+        (numero, fila), = list(leer_csv(flujo))
+        self.assertEqual(numero, 1)
+        self.assertEqual(fila["nombre"], "Ibuprofeno")
+        self.assertEqual(fila["lote"], "L1")
+        # El flujo de la solicitud queda abierto
+        self.assertFalse(flujo.closed)
+
+    def test_columnas_de_mas_y_campos_con_comillas(self):
+        flujo = io.BytesIO((self.ENCABEZADO + "\n"
+                            '"Jarabe, 120 ml",1,10,1,2,2027-01-01,L1\n'
+                            "Gasa,1,10,1,2,2027-01-01,L2,sobra\n").encode("utf-8"))
+        filas = list(leer_csv(flujo))
+        self.assertEqual(filas[0][1]["nombre"], "Jarabe, 120 ml")
+        self.assertEqual(filas[1][1][None], ["sobra"])
+        with self.assertRaises(ValueError):
+            validar(filas[1][1], CATEGORIAS, PROVEEDORES, HOY)
+
+    def test_vacio(self):
+        self.assertEqual(list(leer_csv(io.BytesIO(b""))), [])
+
+    def test_faltan_columnas(self):
+        with self.assertRaises(ErrorImportacion) as contexto:
+            list(leer_csv(io.BytesIO(b"nombre,stock\nA,1\n")))
+        self.assertIn("id_categoria", str(contexto.exception))
+
+    def test_utf8_invalido(self):
+        with self.assertRaises(ErrorImportacion):
+            list(leer_csv(io.BytesIO((self.ENCABEZADO + "\n").encode("utf-8") + b"\xff\xfe,1\n")))
+
+
+class ErroresBdTest(unittest.TestCase):
+    def test_lote_duplicado(self):
+        self.assertTrue(lote_duplicado("ORA-00001: unique constraint (FARMACIA.IDX_MEDICAMENTOS_LOTE_NOMBRE) violated"))
+        self.assertTrue(lote_duplicado("ORA-20006: Ya existe un medicamento con el lote L1"))
+        self.assertFalse(lote_duplicado("ORA-00001: unique constraint (FARMACIA.PK_RESUMEN_VTA_EMP) violated"))
+
+    def test_mensaje_bd(self):
+        self.assertEqual(importacion._mensaje_bd("ORA-00001: unique constraint (X.IDX_MEDICAMENTOS_LOTE_NOMBRE) violated"),
+                         importacion.MENSAJES_ORA['ORA-20006'])
+        self.assertEqual(importacion._mensaje_bd("ORA-02291: integrity constraint violated"),
+                         importacion.MENSAJES_ORA['ORA-02291'])
+        self.assertEqual(importacion._mensaje_bd("ORA-12899: value too large"), "ORA-12899: value too large")
+
+
+if __name__ == '__main__':
+    unittest.main()
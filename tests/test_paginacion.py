@@ -0,0 +1,110 @@
+# Paginación por clave y filtros de la query string (src/paginacion.py): python -m pytest tests (usa benchmark/oracledb_falso)
+import base64
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+
+from werkzeug.datastructures import MultiDict
+
+from benchmark import oracledb_falso
+
+# Antes de importar src: los módulos toman `oracledb` al importarse
+oracledb_falso.instalar()
+from src.paginacion import (LIMITE_MAXIMO, LIMITE_POR_DEFECTO, codificar_token, decodificar_token, dia_siguiente,
+                            escapar_like, leer_fecha, leer_flag, leer_limite)
+
+
+class TokenTest(unittest.TestCase):
+    def test_ida_y_vuelta(self):
+        token = codificar_token(["Paracetamol", 15])
+        self.assertNotIn("=", token)
+        self.assertEqual(decodificar_token(token), ["Paracetamol", 15])
+
+    def test_fechas_en_iso(self):
+        token = codificar_token([datetime(2026, 3, 1, 14, 30, 5), date(2026, 3, 2), 10])
+        self.assertEqual(decodificar_token(token), ["2026-03-01T14:30:05", "2026-03-02", 10])
+
+    def test_invalidos(self):
+        for token in ("", "%%%", "bm8tanNvbg", base64.urlsafe_b64encode(b'{"a":1}').decode()):
+            with self.subTest(token=token), self.assertRaises(ValueError):
+                decodificar_token(token)
+
+
+class QueryStringTest(unittest.TestCase):
+    def test_limite(self):
+        self.assertEqual(leer_limite(MultiDict()), LIMITE_POR_DEFECTO)
+        self.assertEqual(leer_limite(MultiDict({"limite": "20"})), 20)
+        self.assertEqual(leer_limite(MultiDict({"limite": "0"})), 1)
+        self.assertEqual(leer_limite(MultiDict({"limite": "100000"})), LIMITE_MAXIMO)
+        self.assertEqual(leer_limite(MultiDict({"limite": "veinte"})), LIMITE_POR_DEFECTO)
+
+    def test_flag(self):
+        for valor in ("1", "true", "TRUE", "si", "Sí"):
+            self.assertTrue(leer_flag(MultiDict({"total": valor}), "total"), valor)
+        for valor in ("0", "false", "no", ""):
+            self.assertFalse(leer_flag(MultiDict({"total": valor}), "total"), valor)
+        self.assertFalse(leer_flag(MultiDict(), "total"))
+
+    def test_fecha(self):
+        self.assertIsNone(leer_fecha(MultiDict(), "desde"))
+        self.assertIsNone(leer_fecha(MultiDict({"desde": ""}), "desde"))
+        self.assertEqual(leer_fecha(MultiDict({"desde": "2026-02-28"}), "desde"), datetime(2026, 2, 28))
+        with self.assertRaises(ValueError) as contexto:
+            leer_fecha(MultiDict({"hasta": "28/02/2026"}), "hasta")
+        self.assertIn("'hasta'", str(contexto.exception))
+
+    def test_dia_siguiente(self):
+        self.assertEqual(dia_siguiente(datetime(2026, 2, 28)), datetime(2026, 3, 1))
+
+    def test_escapar_like(self):
+        self.assertEqual(escapar_like("50%_a\\b"), "50\\%\\_a\\\\b")
+        self.assertEqual(escapar_like("Paracetamol"), "Paracetamol")
+
+
+class FiltroNombreTest(unittest.TestCase):
+    """?nombre= filtra por prefijo sin distinguir mayúsculas y sin comodines del usuario."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        ruta = os.path.join(cls.dir.name, 'farmacia.db')
+        oracledb_falso.preparar_base(ruta, medicamentos=20, clientes=2, ventas=2)
+        sesion = oracledb_falso._abrir_sesion(ruta)
+        try:
+            sesion.execute("UPDATE Medicamentos SET nombre = 'Crema 50% urea' WHERE id_medicamento = 1")
+            sesion.execute("UPDATE Medicamentos SET nombre = 'Crema 500 g' WHERE id_medicamento = 2")
+            sesion.execute("UPDATE Medicamentos SET nombre = 'crema_base' WHERE id_medicamento = 3")
+            sesion.execute("UPDATE Medicamentos SET nombre = 'Cremallera' WHERE id_medicamento = 4")
+            sesion.commit()
+        finally:
+            sesion.close()
+        os.environ.update(DB_DSN=ruta, DB_DSN_LECTURA='', AUDITORIA_DRENADO='0', SERVIDOR_CALENTAR='0')
+        import main
+        cls.app = main.create_app(segundo_plano=False)
+        cls.cliente = cls.app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        import src.servidor
+        src.servidor.apagar_worker(cls.app, timeout=1)
+        src.servidor._apagando = False
+        cls.dir.cleanup()
+
+    def _nombres(self, nombre):
+        respuesta = self.cliente.get('/api/medicamentos', query_string={"nombre": nombre, "limite": 50})
+        self.assertEqual(respuesta.status_code, 200)
+        return sorted(m['nombre'] for m in respuesta.get_json()['datos'])
+
+    def test_prefijo_sin_mayusculas(self):
+        self.assertEqual(self._nombres("CREMA"), ["Crema 50% urea", "Crema 500 g", "Cremallera", "crema_base"])
+        self.assertEqual(self._nombres("crema 5"), ["Crema 50% urea", "Crema 500 g"])
+
+    def test_comodines_literales(self):
+        self.assertEqual(self._nombres("crema 50%"), ["Crema 50% urea"])
+        self.assertEqual(self._nombres("crema_"), ["crema_base"])
+        self.assertEqual(self._nombres("%"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# Apagado de un worker de gunicorn: python -m pytest tests (usa benchmark/oracledb_falso, sin Oracle)
+import os
+import runpy
+import signal
+import tempfile
+import types
+import unittest
+
+from benchmark import oracledb_falso
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ApagadoWorkerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        ruta = os.path.join(cls.dir.name, 'farmacia.db')
+        oracledb_falso.preparar_base(ruta, medicamentos=20, clientes=10, ventas=20)
+        oracledb_falso.instalar()
+        os.environ.update(DB_DSN=ruta, DB_DSN_LECTURA='', AUDITORIA_DRENADO='0', SERVIDOR_CALENTAR='0')
+        import main
+        cls.app = main.create_app(segundo_plano=False)
+        cls.hooks = runpy.run_path(os.path.join(RAIZ, 'gunicorn.conf.py'))
+
+    @classmethod
+    def tearDownClass(cls):
+        from src.servidor import apagar_worker
+        apagar_worker(cls.app, timeout=1)
+        cls.dir.cleanup()
+
+    def setUp(self):
+        self.manejador = signal.getsignal(signal.SIGTERM)
+        self.cliente = self.app.test_client()
+
+    def tearDown(self):
+        import src.servidor
+        signal.signal(signal.SIGTERM, self.manejador)
+        src.servidor._apagando = False
+
+    def _venta(self):
+        medicamento = self.cliente.get('/api/medicamentos?limite=1').get_json()['datos'][0]
+        empleado = self.cliente.get('/api/empleados').get_json()['datos'][0]
+        return {"cliente": {"dni": "70000001", "nombre": "Ana", "apellido_paterno": "Rojas"},
+                "dni_empleado": empleado['dni'], "total_venta": medicamento['precio_venta'],
+                "detalles": [{"id_medicamento": medicamento['id_medicamento'], "cantidad": 1,
+                              "precio_unitario_venta": medicamento['precio_venta']}]}
+
+    def test_sigterm_rechaza_ventas_nuevas(self):
+        venta = self._venta()
+        self.hooks['post_worker_init'](types.SimpleNamespace(wsgi=self.app))
+        self.assertEqual(self.cliente.post('/api/ventas', json=venta).status_code, 201)
+
+        # gunicorn recibe TERM y sigue atendiendo hasta graceful_timeout
+        signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+
+        respuesta = self.cliente.post('/api/ventas', json=venta)
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta.headers['Retry-After'], '1')
+        self.assertEqual(respuesta.get_json()['estado'], 'error')
+        # Las lecturas se siguen atendiendo
+        self.assertEqual(self.cliente.get('/api/medicamentos?limite=1').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()